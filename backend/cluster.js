@@ -0,0 +1,284 @@
+/**
+ * Cluster mode entry point
+ * Runs server.js in several worker processes sharing one listening socket.
+ *
+ * Usage: npm run start:cluster
+ *   CLUSTER_WORKERS  Number of workers (default: one per CPU core)
+ *
+ * - The hold expiry job runs in exactly one worker, assigned by the primary;
+ *   if that worker exits, another one takes over
+ * - Crashed workers are replaced (with a delay if they keep crashing)
+ * - SIGHUP: rolling restart, one worker at a time, each replaced only after
+ *   its replacement is listening
+ * - SIGTERM/SIGINT: graceful shutdown of every worker
+ * - Workers report health over IPC; GET /api/cluster/health shows all of them
+ * - METRICS_PORT: the primary serves /metrics summed over all workers
+ *   (a worker's own /metrics only covers that worker)
+ */
+
+import cluster from "cluster";
+import http from "http";
+import os from "os";
+import path from "path";
+import { fileURLToPath } from "url";
+import dotenv from "dotenv";
+import { AggregatorRegistry } from "prom-client";
+import { HEALTH_REPORT_INTERVAL_MS, MESSAGES } from "./lib/cluster.js";
+
+dotenv.config();
+
+const WORKER_COUNT = parseInt(process.env.CLUSTER_WORKERS) || os.availableParallelism();
+const SHUTDOWN_TIMEOUT_MS = 30 * 1000;
+const QUICK_EXIT_MS = 10 * 1000;
+const MAX_RESPAWN_DELAY_MS = 30 * 1000;
+const STALE_REPORT_MS = 3 * HEALTH_REPORT_INTERVAL_MS;
+
+cluster.setupPrimary({
+  exec: path.join(path.dirname(fileURLToPath(import.meta.url)), "server.js"),
+});
+
+const slots = new Map(); // slot -> current worker
+const workerInfo = new Map(); // worker.id -> { slot, startedAt, listening, health, reportedAt }
+const respawnDelays = new Map(); // slot -> ms
+let holdJobWorker = null;
+let shuttingDown = false;
+let restarting = false;
+let clusterStats = {
+  startTime: new Date(),
+  workerExits: 0,
+  rollingRestarts: 0,
+};
+
+const isAlive = (worker) => worker && !worker.isDead() && workerInfo.has(worker.id);
+
+/**
+ * Give the hold expiry job to one listening worker, unless one already runs it
+ */
+const assignHoldJob = () => {
+  if (shuttingDown || isAlive(holdJobWorker)) {
+    return;
+  }
+
+  const candidates = [...slots.entries()]
+    .sort(([a], [b]) => a - b)
+    .map(([, worker]) => worker)
+    .filter(worker => isAlive(worker) && workerInfo.get(worker.id).listening);
+
+  holdJobWorker = candidates[0] || null;
+  if (holdJobWorker) {
+    holdJobWorker.send({ type: MESSAGES.holdJob, run: true });
+    console.log(`Hold expiry job assigned to worker ${holdJobWorker.process.pid}`);
+  }
+};
+
+const getClusterHealth = () => {
+  const now = Date.now();
+  const workers = [...slots.entries()]
+    .sort(([a], [b]) => a - b)
+    .map(([slot, worker]) => {
+      const info = workerInfo.get(worker.id) || {};
+      const stale = !info.reportedAt || now - info.reportedAt > STALE_REPORT_MS;
+      return {
+        slot,
+        pid: worker.process.pid,
+        status: !info.listening ? "starting" : stale ? "unresponsive" : "healthy",
+        secondsSinceReport: info.reportedAt ? Math.floor((now - info.reportedAt) / 1000) : null,
+        runsHoldExpiryJob: worker === holdJobWorker,
+        ...info.health,
+      };
+    });
+
+  const holdJobInfo = holdJobWorker ? workerInfo.get(holdJobWorker.id) : null;
+
+  return {
+    mode: "cluster",
+    primaryPid: process.pid,
+    targetWorkers: WORKER_COUNT,
+    healthyWorkers: workers.filter(w => w.status === "healthy").length,
+    rollingRestartInProgress: restarting,
+    ...clusterStats,
+    uptimeSeconds: Math.floor((now - clusterStats.startTime) / 1000),
+    holdExpiryJob: holdJobInfo?.health?.holdExpiryJob || { isRunning: false },
+    workers,
+  };
+};
+
+const handleWorkerMessage = (worker, message) => {
+  if (!message || typeof message !== "object") {
+    return;
+  }
+
+  if (message.type === MESSAGES.health) {
+    const info = workerInfo.get(worker.id);
+    if (info) {
+      info.health = message.health;
+      info.reportedAt = Date.now();
+    }
+  } else if (message.type === MESSAGES.healthRequest) {
+    worker.send({ type: MESSAGES.healthResponse, id: message.id, health: getClusterHealth() });
+  }
+};
+
+const forkWorker = (slot) => {
+  const worker = cluster.fork({ CLUSTER_WORKER_SLOT: String(slot) });
+  workerInfo.set(worker.id, { slot, startedAt: Date.now(), listening: false, health: null, reportedAt: null });
+
+  worker.on("message", (message) => handleWorkerMessage(worker, message));
+  worker.on("listening", () => {
+    workerInfo.get(worker.id).listening = true;
+    assignHoldJob();
+  });
+  return worker;
+};
+
+const waitForListening = (worker) => new Promise((resolve, reject) => {
+  const onListening = () => {
+    worker.off("exit", onExit);
+    resolve();
+  };
+  const onExit = (code, signal) => {
+    worker.off("listening", onListening);
+    reject(new Error(`worker exited before listening (${signal || code})`));
+  };
+  worker.once("listening", onListening);
+  worker.once("exit", onExit);
+});
+
+// SIGTERM lets server.js shut down gracefully; SIGKILL if it takes too long
+const stopWorker = (worker) => new Promise(resolve => {
+  if (worker.isDead()) {
+    return resolve();
+  }
+  const timer = setTimeout(() => {
+    console.log(`Worker ${worker.process.pid} did not stop in time, killing it`);
+    worker.process.kill("SIGKILL");
+  }, SHUTDOWN_TIMEOUT_MS);
+  worker.once("exit", () => {
+    clearTimeout(timer);
+    resolve();
+  });
+  worker.process.kill("SIGTERM");
+});
+
+cluster.on("exit", (worker, code, signal) => {
+  const info = workerInfo.get(worker.id);
+  workerInfo.delete(worker.id);
+  clusterStats.workerExits++;
+
+  if (worker === holdJobWorker) {
+    holdJobWorker = null;
+    // Only after the old holder is gone, so two sweeps never overlap
+    assignHoldJob();
+  }
+
+  // Replaced during a rolling restart, or shutting down
+  if (shuttingDown || !info || slots.get(info.slot) !== worker) {
+    return;
+  }
+
+  console.error(`Worker ${worker.process.pid} (slot ${info.slot}) exited (${signal || code}), replacing it`);
+
+  // Back off if the worker keeps dying right after starting
+  const quickExit = Date.now() - info.startedAt < QUICK_EXIT_MS;
+  const delay = quickExit ? Math.min((respawnDelays.get(info.slot) || 500) * 2, MAX_RESPAWN_DELAY_MS) : 0;
+  respawnDelays.set(info.slot, delay);
+
+  setTimeout(() => {
+    if (!shuttingDown && slots.get(info.slot) === worker) {
+      slots.set(info.slot, forkWorker(info.slot));
+    }
+  }, delay);
+});
+
+const rollingRestart = async () => {
+  if (restarting || shuttingDown) {
+    console.log("Rolling restart already in progress");
+    return;
+  }
+  restarting = true;
+  clusterStats.rollingRestarts++;
+  console.log(`🔄 Rolling restart of ${slots.size} workers`);
+
+  try {
+    for (const slot of [...slots.keys()].sort((a, b) => a - b)) {
+      const previous = slots.get(slot);
+      const replacement = forkWorker(slot);
+
+      try {
+        await waitForListening(replacement);
+      } catch (error) {
+        // Keep the running worker; a broken build shouldn't take the cluster down
+        console.error(`Rolling restart stopped: new worker for slot ${slot} failed: ${error.message}`);
+        return;
+      }
+
+      slots.set(slot, replacement);
+      await stopWorker(previous);
+      console.log(`  ✓ Slot ${slot}: ${previous.process.pid} → ${replacement.process.pid}`);
+    }
+    console.log("✓ Rolling restart complete");
+  } finally {
+    restarting = false;
+  }
+};
+
+const shutdown = async () => {
+  if (shuttingDown) {
+    return;
+  }
+  shuttingDown = true;
+  console.log("Shutting down cluster gracefully...");
+  await Promise.all(Object.values(cluster.workers).map(stopWorker));
+  console.log("Cluster stopped");
+  process.exit(0);
+};
+
+console.log(`Cluster primary ${process.pid} starting ${WORKER_COUNT} workers`);
+for (let slot = 0; slot < WORKER_COUNT; slot++) {
+  slots.set(slot, forkWorker(slot));
+}
+
+// Aggregated Prometheus metrics; each worker answers over IPC via prom-client
+if (process.env.METRICS_PORT) {
+  const aggregator = new AggregatorRegistry();
+  const metricsServer = http.createServer(async (req, res) => {
+    const token = process.env.METRICS_TOKEN;
+    if (req.url !== "/metrics") {
+      res.writeHead(404).end();
+      return;
+    }
+    if (token && req.headers.authorization !== `Bearer ${token}`) {
+      res.writeHead(401).end();
+      return;
+    }
+    try {
+      const metrics = await aggregator.clusterMetrics();
+      res.writeHead(200, { "Content-Type": aggregator.contentType }).end(metrics);
+    } catch (error) {
+      console.error("Error collecting cluster metrics:", error.message);
+      res.writeHead(500).end(error.message);
+    }
+  });
+  metricsServer.listen(process.env.METRICS_PORT, () => {
+    console.log(`Cluster metrics on port ${process.env.METRICS_PORT}/metrics`);
+  });
+}
+
+process.on("SIGHUP", () => {
+  rollingRestart().catch(err => {
+    console.error("Error during rolling restart:", err);
+  });
+});
+process.on("SIGTERM", shutdown);
+process.on("SIGINT", shutdown);
+
+// Workers that stopped reporting are only flagged, not killed: a long
+// synchronous task may be legitimate, and their requests are still served
+setInterval(() => {
+  for (const worker of slots.values()) {
+    const info = workerInfo.get(worker.id);
+    if (info?.listening && info.reportedAt && Date.now() - info.reportedAt > STALE_REPORT_MS) {
+      console.warn(`Worker ${worker.process.pid} has not reported health for ${Math.round((Date.now() - info.reportedAt) / 1000)}s`);
+    }
+  }
+}, STALE_REPORT_MS).unref();
@@ -1,19 +1,23 @@
-import Order from "../models/order.model.js";
 import Product from "../models/product.model.js";
 import User from "../models/user.model.js";
+import SalesRollup from "../models/salesRollup.model.js";
+import { parseSalesQuery, querySales } from "../lib/analyticsQuery.js";
 
 export const getAnalyticsData = async () => {
-	const totalUsers = await User.countDocuments();
-	const totalProducts = await Product.countDocuments();
-
-	const salesData = await Order.aggregate([
-		{
-			$group: {
-				_id: null, // it groups all documents together,
-				totalSales: { $sum: 1 },
-				totalRevenue: { $sum: "$totalAmount" },
+	// Collection metadata counts are O(1); sales come from the daily rollups (paid orders only)
+	const [totalUsers, totalProducts, salesData] = await Promise.all([
+		User.estimatedDocumentCount(),
+		Product.estimatedDocumentCount(),
+		SalesRollup.aggregate([
+			{ $match: { period: "day", scope: "total" } },
+			{
+				$group: {
+					_id: null,
+					totalSales: { $sum: "$orders" },
+					totalRevenue: { $sum: "$revenue" },
+				},
 			},
-		},
+		]),
 	]);
 
 	const { totalSales, totalRevenue } = salesData[0] || { totalSales: 0, totalRevenue: 0 };
@@ -26,51 +30,21 @@ export const getAnalyticsData = async () => {
 	};
 };
 
-export const getDailySalesData = async (startDate, endDate) => {
+/**
+ * Sales series for a date range
+ * Query: from, to (ISO dates), granularity (hour|day|week|month),
+ * timezone (IANA name), groupBy (product|category)
+ */
+export const getSalesAnalytics = async (req, res) => {
 	try {
-		const dailySalesData = await Order.aggregate([
-			{
-				$match: {
-					createdAt: {
-						$gte: startDate,
-						$lte: endDate,
-					},
-				},
-			},
-			{
-				$group: {
-					_id: { $dateToString: { format: "%Y-%m-%d", date: "$createdAt" } },
-					sales: { $sum: 1 },
-					revenue: { $sum: "$totalAmount" },
-				},
-			},
-			{ $sort: { _id: 1 } },
-		]);
-
-		const dateArray = getDatesInRange(startDate, endDate);
-
-		return dateArray.map((date) => {
-			const foundData = dailySalesData.find((item) => item._id === date);
+		const { query, error } = parseSalesQuery(req.query);
+		if (error) {
+			return res.status(400).json({ message: error });
+		}
 
-			return {
-				date,
-				sales: foundData?.sales || 0,
-				revenue: foundData?.revenue || 0,
-			};
-		});
+		res.json(await querySales(query));
 	} catch (error) {
-		throw error;
+		console.log("Error in getSalesAnalytics controller", error.message);
+		res.status(500).json({ message: "Server error", error: error.message });
 	}
 };
-
-function getDatesInRange(startDate, endDate) {
-	const dates = [];
-	let currentDate = new Date(startDate);
-
-	while (currentDate <= endDate) {
-		dates.push(currentDate.toISOString().split("T")[0]);
-		currentDate.setDate(currentDate.getDate() + 1);
-	}
-
-	return dates;
-}
@@ -2,7 +2,7 @@ import Order from "../models/order.model.js";
 import Expense from "../models/expense.model.js";
 import PartnerBalance from "../models/partnerBalance.model.js";
 import Reimbursement from "../models/reimbursement.model.js";
-import { calculateDeliveryCharge, calculatePlatformFee } from "../lib/pricing.js";
+import { getMonthBoundaries, getMonthlySales } from "../lib/monthlySales.js";
 
 /**
  * FINANCE / COSTING MODULE
@@ -40,58 +40,6 @@ function escapeCSV(value) {
   return needsQuote ? `"${escapedStr}"` : escapedStr;
 }
 
-// Helper: Get month boundaries
-function getMonthBoundaries(year, month) {
-  const startDate = new Date(year, month - 1, 1, 0, 0, 0, 0);
-  const endDate = new Date(year, month, 0, 23, 59, 59, 999);
-  return { startDate, endDate };
-}
-
-// Helper: Calculate total sales for a month (Product Price only - excludes delivery/platform fees)
-// Also calculates delivery and platform fees for display purposes
-async function calculateMonthlySales(year, month) {
-  const { startDate, endDate } = getMonthBoundaries(year, month);
-  
-  const orders = await Order.find({
-    status: "paid",
-    createdAt: { $gte: startDate, $lte: endDate },
-  });
-
-  let totalProductRevenue = 0;
-  let totalDeliveryCharges = 0;
-  let totalPlatformFeeConstant = 0;
-  let totalPlatformFeeRazorpay = 0;
-  let razorpayPercentage = 2.0; // Default
-
-  orders.forEach(order => {
-    // Calculate product subtotal only (this is the SALES figure)
-    let orderSubtotal = 0;
-    order.products.forEach(item => {
-      orderSubtotal += item.quantity * item.price;
-    });
-    totalProductRevenue += orderSubtotal;
-
-    // Calculate delivery and platform fees (for display only, NOT part of sales)
-    const deliveryCharge = calculateDeliveryCharge(order.address);
-    totalDeliveryCharges += deliveryCharge;
-
-    const platformFee = calculatePlatformFee(orderSubtotal);
-    totalPlatformFeeConstant += platformFee.constant;
-    totalPlatformFeeRazorpay += platformFee.razorpayFee;
-    razorpayPercentage = platformFee.razorpayPercentage; // Get from config
-  });
-
-  return {
-    totalSales: totalProductRevenue, // Sales = product revenue only (used for calculations)
-    totalDeliveryCharges, // For display only
-    totalPlatformFeeConstant, // For display only - constant part
-    totalPlatformFeeRazorpay, // For display only - Razorpay variable part
-    totalPlatformFees: totalPlatformFeeConstant + totalPlatformFeeRazorpay, // For display only - total
-    razorpayPercentage, // Razorpay percentage from config
-    orderCount: orders.length,
-  };
-}
-
 // Main dashboard - simplified finance view
 export const getFinanceDashboard = async (req, res) => {
   try {
@@ -106,11 +54,21 @@ export const getFinanceDashboard = async (req, res) => {
     const targetYear = !isNaN(parsedYear) && parsedYear > 0 ? parsedYear : now.getFullYear();
     const targetMonth = !isNaN(parsedMonth) && parsedMonth >= 1 && parsedMonth <= 12 ? parsedMonth : now.getMonth() + 1;
 
-    // Get monthly sales
-    const salesData = await calculateMonthlySales(targetYear, targetMonth);
+    const { startDate, endDate } = getMonthBoundaries(targetYear, targetMonth);
 
-    // Get partner balances
-    const partnerBalances = await PartnerBalance.find().sort({ partner: 1 });
+    // Monthly sales (stored for closed months), partner balances, recent expenses
+    // and any existing reimbursement are independent, so fetch them together
+    const [salesData, partnerBalances, recentExpenses, existingReimbursement] = await Promise.all([
+      getMonthlySales(targetYear, targetMonth),
+      PartnerBalance.find().sort({ partner: 1 }),
+      Expense.find({
+        expenseDate: { $gte: startDate, $lte: endDate },
+      }).sort({ expenseDate: -1 }).limit(20),
+      Reimbursement.findOne({
+        year: targetYear,
+        month: targetMonth,
+      }),
+    ]);
     
     // Ensure all partners have records
     const balanceMap = {};
@@ -124,18 +82,6 @@ export const getFinanceDashboard = async (req, res) => {
       };
     });
 
-    // Get recent expenses
-    const { startDate, endDate } = getMonthBoundaries(targetYear, targetMonth);
-    const recentExpenses = await Expense.find({
-      expenseDate: { $gte: startDate, $lte: endDate },
-    }).sort({ expenseDate: -1 }).limit(20);
-
-    // Get existing reimbursement for this month (if any)
-    const existingReimbursement = await Reimbursement.findOne({
-      year: targetYear,
-      month: targetMonth,
-    });
-
     // Calculate potential recovery (preview)
     const recoveryPercentage = DEFAULT_RECOVERY_PERCENTAGE;
     const potentialRecoveryPool = salesData.totalSales * (recoveryPercentage / 100);
@@ -255,7 +201,7 @@ export const processMonthlyReimbursement = async (req, res) => {
     }
 
     // Calculate sales for the month
-    const salesData = await calculateMonthlySales(targetYear, targetMonth);
+    const salesData = await getMonthlySales(targetYear, targetMonth);
     const recoveryPool = salesData.totalSales * (recoveryPct / 100);
 
     // Get current partner balances
@@ -396,9 +342,12 @@ export const getMonthlyProfitTrend = async (req, res) => {
   try {
     const { months = 6 } = req.query;
     
+    // Finalized months only, newest first (served by the year/month index)
     const history = await Reimbursement.find({ isFinalized: true })
+      .select("year month totalSales totalReimbursed profit")
       .sort({ year: -1, month: -1 })
-      .limit(parseInt(months));
+      .limit(parseInt(months))
+      .lean();
 
     const trend = history.map(r => ({
       year: r.year,
@@ -1,51 +1,34 @@
 import Order from "../models/order.model.js";
-import Product from "../models/product.model.js";
-import User from "../models/user.model.js";
 import mongoose from "mongoose";
-import crypto from "crypto";
-import twilio from "twilio";
-import { getDeliveryType } from "../lib/pricing.js";
-
-// Twilio configuration
-const accountSid = process.env.TWILIO_ACCOUNT_SID;
-const authToken = process.env.TWILIO_AUTH_TOKEN;
-const twilioPhoneNumber = process.env.TWILIO_PHONE_NUMBER;
-
-let twilioClient = null;
-if (accountSid && authToken) {
-	twilioClient = twilio(accountSid, authToken);
-}
-
-// Helper function to send SMS notification (currently logging instead of sending)
-const sendOrderStatusSMS = async (phoneNumber, orderPublicId, status) => {
-	try {
-		let message = "";
-		if (status === "shipped") {
-			message = `Your order #${orderPublicId} has been shipped! Track your order to see delivery updates.`;
-		} else if (status === "delivered") {
-			message = `Your order #${orderPublicId} has been delivered! Thank you for shopping with us.`;
-		} else {
-			// Don't send SMS for other statuses
-			return { success: false, reason: "Status not eligible for SMS" };
-		}
-
-		// Log SMS instead of sending (SMS sending disabled)
-		console.log(`[SMS LOG] Would send SMS to ${phoneNumber} for order ${orderPublicId}`);
-		console.log(`[SMS LOG] Message: ${message}`);
-		console.log(`[SMS LOG] Status: ${status}`);
-		
-		// Original SMS sending code (commented out):
-		// await twilioClient.messages.create({
-		// 	body: message,
-		// 	from: twilioPhoneNumber,
-		// 	to: `+91${phoneNumber}`,
-		// });
-
-		return { success: true, logged: true };
-	} catch (error) {
-		console.error(`[SMS LOG] Error logging SMS for ${phoneNumber}:`, error.message);
-		return { success: false, reason: error.message };
+import { quote } from "../lib/pricing.js";
+import { buildLabelsPdf, scheduleLabelPrerender } from "../lib/labelPdf.js";
+import { enqueueJobInBackground } from "../lib/jobQueue.js";
+import { createManualOrders, MAX_MANUAL_ORDERS_PER_BATCH } from "../lib/manualOrders.js";
+
+// Helper function to build the admin phone search filter
+// Phone numbers are stored as 10 digits; the search matches their start, so it
+// is an anchored, case-sensitive prefix that reads only the matching keys of
+// the phoneNumber index (an unanchored regex reads all of them)
+const phoneSearchFilter = (phoneNumber) => {
+	let digits = String(phoneNumber).replace(/\D/g, '');
+	// Drop a +91 country code or 0 trunk prefix typed in front of the number
+	if (digits.length > 10 && digits.startsWith('91')) {
+		digits = digits.slice(2);
+	} else if (digits.length === 11 && digits.startsWith('0')) {
+		digits = digits.slice(1);
 	}
+	if (!digits) {
+		return null;
+	}
+	return { phoneNumber: digits.length === 10 ? digits : { $regex: `^${digits}` } };
+};
+
+// Helper function to send server-rendered labels as a PDF download
+const sendLabelsPdf = async (res, orders, filename, options) => {
+	const pdf = await buildLabelsPdf(orders, options);
+	res.setHeader('Content-Type', 'application/pdf');
+	res.setHeader('Content-Disposition', `inline; filename="${filename}"`);
+	res.send(pdf);
 };
 
 export const getOrdersData = async (req, res) => {
@@ -81,11 +64,11 @@ export const getOrdersData = async (req, res) => {
 		
 		// Filter by user phone number (not address)
 		if (phoneNumber) {
-			const sanitizedPhone = phoneNumber.replace(/[^0-9+\-\s()]/g, '');
-			if (sanitizedPhone) {
+			const phoneFilter = phoneSearchFilter(phoneNumber);
+			if (phoneFilter) {
 				// Find user IDs matching phone number
 				const User = mongoose.model('User');
-				const users = await User.find({ phoneNumber: { $regex: sanitizedPhone, $options: 'i' } }, '_id');
+				const users = await User.find(phoneFilter, '_id');
 				const userIds = users.map(u => u._id);
 				if (userIds.length > 0) {
 					filter.user = { $in: userIds };
@@ -256,11 +239,13 @@ export const updateOrderTracking = async (req, res) => {
 				note: note || `Status updated to ${trackingStatus}`,
 			});
 
-			// Log SMS notification (instead of sending) for shipped and delivered statuses
+			// Queue SMS notification for shipped and delivered statuses (sent by a job worker)
 			if ((trackingStatus === "shipped" || trackingStatus === "delivered") && order.user?.phoneNumber) {
-				// Log SMS instead of sending (asynchronously, don't wait for it to complete)
-				sendOrderStatusSMS(order.user.phoneNumber, order.publicOrderId, trackingStatus)
-					.catch(error => console.error("[SMS LOG] SMS notification error:", error));
+				enqueueJobInBackground("order.statusSms", {
+					phoneNumber: order.user.phoneNumber,
+					orderPublicId: order.publicOrderId,
+					status: trackingStatus,
+				});
 			}
 		}
 
@@ -278,6 +263,11 @@ export const updateOrderTracking = async (req, res) => {
 
 		await order.save();
 
+		// Pre-render the shipping label in the background once the order needs packing
+		if (order.trackingStatus === "processing" && previousStatus !== "processing") {
+			scheduleLabelPrerender(order._id);
+		}
+
 		res.json({
 			success: true,
 			message: "Order tracking updated successfully",
@@ -335,12 +325,20 @@ export const getAddressSheet = async (req, res) => {
 		
 		const order = await Order.findById(orderId)
 			.populate('user', 'name phoneNumber')
+			.populate({
+				path: 'products.product',
+				select: 'name',
+			})
 			.lean();
 
 		if (!order) {
 			return res.status(404).json({ success: false, message: "Order not found" });
 		}
 
+		if (req.query.format === 'pdf') {
+			return await sendLabelsPdf(res, [order], `address-sheet-${order.publicOrderId || order._id}.pdf`, { numbered: false });
+		}
+
 		const address = order.address || {};
 		const user = order.user || {};
 
@@ -463,7 +461,7 @@ export const getAddressSheet = async (req, res) => {
 export const getBulkAddressSheets = async (req, res) => {
 	try {
 		// Extract filter parameters from query
-		const { phoneNumber, publicOrderId, status, deliveryType, orderIds } = req.query;
+		const { phoneNumber, publicOrderId, status, deliveryType, orderIds, format } = req.query;
 		
 		// Build filter object
 		let filter = {};
@@ -491,10 +489,10 @@ export const getBulkAddressSheets = async (req, res) => {
 			
 			// Filter by user phone number (optional)
 			if (phoneNumber) {
-				const sanitizedPhone = phoneNumber.replace(/[^0-9+\-\s()]/g, '');
-				if (sanitizedPhone) {
+				const phoneFilter = phoneSearchFilter(phoneNumber);
+				if (phoneFilter) {
 					const User = mongoose.model('User');
-					const users = await User.find({ phoneNumber: { $regex: sanitizedPhone, $options: 'i' } }, '_id');
+					const users = await User.find(phoneFilter, '_id');
 					const userIds = users.map(u => u._id);
 					if (userIds.length > 0) {
 						filter.user = { $in: userIds };
@@ -516,13 +514,15 @@ export const getBulkAddressSheets = async (req, res) => {
 			.sort({ createdAt: 1 })
 			.lean();
 
+		// Quote the batch once; the filter, summary and labels below reuse it
+		const deliveryTypeOf = new Map(
+			quote(orders.map(order => order.address)).map((q, index) => [orders[index], q.deliveryType])
+		);
+
 		// Filter by delivery type if specified
 		let filteredOrders = orders;
 		if (deliveryType && deliveryType !== 'all') {
-			filteredOrders = orders.filter(order => {
-				const orderDeliveryType = getDeliveryType(order.address);
-				return orderDeliveryType === deliveryType;
-			});
+			filteredOrders = orders.filter(order => deliveryTypeOf.get(order) === deliveryType);
 		}
 
 		if (filteredOrders.length === 0) {
@@ -543,6 +543,11 @@ export const getBulkAddressSheets = async (req, res) => {
 			`);
 		}
 
+		// Server-rendered PDF: summary page + pre-rendered labels
+		if (format === 'pdf') {
+			return await sendLabelsPdf(res, filteredOrders, `address-sheets-${Date.now()}.pdf`, { summary: true });
+		}
+
 		// ============================================
 		// PAGE 1: LABEL VERIFICATION SUMMARY
 		// ============================================
@@ -557,8 +562,8 @@ export const getBulkAddressSheets = async (req, res) => {
 			
 			<div style="display: flex; justify-content: space-between; margin-bottom: 15px; padding: 10px; background: #f0f0f0; border-radius: 5px;">
 				<div><strong>Total Orders:</strong> ${filteredOrders.length}</div>
-				<div><strong>Local:</strong> ${filteredOrders.filter(o => getDeliveryType(o.address) === 'local').length} 🟢</div>
-				<div><strong>National:</strong> ${filteredOrders.filter(o => getDeliveryType(o.address) === 'national').length} 🔵</div>
+				<div><strong>Local:</strong> ${filteredOrders.filter(o => deliveryTypeOf.get(o) === 'local').length} 🟢</div>
+				<div><strong>National:</strong> ${filteredOrders.filter(o => deliveryTypeOf.get(o) === 'national').length} 🔵</div>
 				<div><strong>Printed:</strong> ${new Date().toLocaleString('en-IN', { timeZone: 'Asia/Kolkata' })}</div>
 			</div>
 			
@@ -580,7 +585,7 @@ export const getBulkAddressSheets = async (req, res) => {
 						const itemsList = (order.products || [])
 							.map(p => `${p.product?.name || 'ITEM'} ×${p.quantity}`)
 							.join(', ');
-						const isLocal = getDeliveryType(order.address) === 'local';
+						const isLocal = deliveryTypeOf.get(order) === 'local';
 						const totalItems = (order.products || []).reduce((sum, p) => sum + p.quantity, 0);
 						return `
 						<tr style="background: ${index % 2 === 0 ? '#fff' : '#f8f8f8'};">
@@ -636,7 +641,7 @@ export const getBulkAddressSheets = async (req, res) => {
 				const globalIndex = i + pageIndex + 1; // Sequence number starting from 1
 				const address = order.address || {};
 				const user = order.user || {};
-				const isLocal = getDeliveryType(order.address) === 'local';
+				const isLocal = deliveryTypeOf.get(order) === 'local';
 				const isManual = order.isManualOrder || false;
 				
 				// Build order items list
@@ -875,10 +880,10 @@ export const exportOrdersCSV = async (req, res) => {
 		}
 		
 		if (phoneNumber) {
-			const sanitizedPhone = phoneNumber.replace(/[^0-9+\-\s()]/g, '');
-			if (sanitizedPhone) {
+			const phoneFilter = phoneSearchFilter(phoneNumber);
+			if (phoneFilter) {
 				const User = mongoose.model('User');
-				const users = await User.find({ phoneNumber: { $regex: sanitizedPhone, $options: 'i' } }, '_id');
+				const users = await User.find(phoneFilter, '_id');
 				const userIds = users.map(u => u._id);
 				if (userIds.length > 0) {
 					filter.user = { $in: userIds };
@@ -1044,7 +1049,7 @@ export const markLabelsAsPrinted = async (req, res) => {
  */
 export const getOrdersForLabels = async (req, res) => {
 	try {
-		const { status = 'processing', printed = 'unprinted' } = req.query;
+		const { status = 'processing', printed = 'unprinted', format } = req.query;
 
 		let filter = {};
 
@@ -1070,8 +1075,15 @@ export const getOrdersForLabels = async (req, res) => {
 			.sort({ createdAt: 1 }) // Oldest first
 			.lean();
 
+		// Labels as a PDF, in the same sequence as the JSON listing
+		if (format === 'pdf') {
+			return await sendLabelsPdf(res, orders, `labels-${Date.now()}.pdf`, { summary: true });
+		}
+
+		const quotes = quote(orders.map(order => order.address));
+
 		const formatted = orders.map((order, index) => {
-			const deliveryType = getDeliveryType(order.address);
+			const { deliveryType } = quotes[index];
 			return {
 				orderId: order._id,
 				publicOrderId: order.publicOrderId,
@@ -1170,10 +1182,12 @@ export const exportLabelsSummaryCSV = async (req, res) => {
 		].join(','));
 
 		// CSV Data
+		const quotes = quote(orders.map(order => order.address));
+
 		orders.forEach((order, index) => {
 			const address = order.address || {};
 			const user = order.user || {};
-			const deliveryType = getDeliveryType(address);
+			const { deliveryType } = quotes[index];
 			const itemsList = (order.products || [])
 				.map(p => `${p.product?.name || 'ITEM'} x${p.quantity}`)
 				.join(' | ');
@@ -1215,178 +1229,66 @@ export const exportLabelsSummaryCSV = async (req, res) => {
  */
 export const createManualOrder = async (req, res) => {
 	try {
-		const {
-			customerName,
-			customerPhone,
-			customerEmail,
-			products, // Array of { productId, quantity }
-			address,
-			orderSource,
-			paymentMethod,
-			paymentStatus,
-			deliveryFee,
-			platformFee,
-			adminNotes
-		} = req.body;
-
-		// Validate required fields
-		if (!customerName || !customerPhone) {
-			return res.status(400).json({ 
-				success: false, 
-				message: "Customer name and phone number are required" 
-			});
+		const [result] = await createManualOrders([req.body]);
+
+		if (!result.success) {
+			return res.status(400).json(result);
 		}
 
-		if (!products || products.length === 0) {
+		res.status(201).json({
+			success: true,
+			message: "Manual order created successfully",
+			order: result.order
+		});
+
+	} catch (error) {
+		console.error('Error creating manual order:', error);
+		res.status(500).json({ 
+			success: false, 
+			message: error.message || 'Server error creating manual order' 
+		});
+	}
+};
+
+/**
+ * Create many manual orders at once (bulk entry of DM / WhatsApp / Instagram orders)
+ * Admin only. Body: { orders: [same fields as createManualOrder] }
+ * Each order succeeds or fails on its own; results are in request order
+ */
+export const createManualOrdersBulk = async (req, res) => {
+	try {
+		const { orders } = req.body;
+
+		if (!Array.isArray(orders) || orders.length === 0) {
 			return res.status(400).json({ 
 				success: false, 
-				message: "At least one product is required" 
+				message: "At least one order is required" 
 			});
 		}
 
-		if (!address || !address.pincode || !address.city || !address.state) {
+		if (orders.length > MAX_MANUAL_ORDERS_PER_BATCH) {
 			return res.status(400).json({ 
 				success: false, 
-				message: "Complete address with pincode, city, and state is required" 
-			});
-		}
-
-		// Find or create user by phone number
-		let user = await User.findOne({ phoneNumber: customerPhone });
-		
-		if (!user) {
-			// Create a new guest user for this order
-			user = await User.create({
-				name: customerName,
-				phoneNumber: customerPhone,
-				email: customerEmail || undefined,
-				isGuest: true
+				message: `At most ${MAX_MANUAL_ORDERS_PER_BATCH} orders per request` 
 			});
 		}
 
-		// Validate and fetch products
-		const orderProducts = [];
-		let subtotal = 0;
-
-		for (const item of products) {
-			const product = await Product.findById(item.productId);
-			
-			if (!product) {
-				return res.status(400).json({ 
-					success: false, 
-					message: `Product not found: ${item.productId}` 
-				});
-			}
-
-			// Check stock
-			const availableStock = product.stockQuantity - (product.reservedQuantity || 0);
-			if (item.quantity > availableStock) {
-				return res.status(400).json({ 
-					success: false, 
-					message: `Insufficient stock for ${product.name}. Available: ${availableStock}` 
-				});
-			}
-
-			orderProducts.push({
-				product: product._id,
-				quantity: item.quantity,
-				price: product.price
-			});
-
-			subtotal += product.price * item.quantity;
+		const results = await createManualOrders(orders);
+		const created = results.filter(r => r.success).length;
 
-			// Deduct stock immediately for manual orders (they're confirmed)
-			product.stockQuantity -= item.quantity;
-			product.sold = (product.sold || 0) + item.quantity;
-			await product.save();
-		}
-
-		// Calculate total amount
-		const deliveryFeeAmount = deliveryFee || 0;
-		const platformFeeAmount = platformFee || 0;
-		const totalAmount = subtotal + deliveryFeeAmount + platformFeeAmount;
-
-		// Generate unique public order ID
-		const publicOrderId = `MAN-${Date.now().toString(36).toUpperCase()}-${crypto.randomBytes(2).toString('hex').toUpperCase()}`;
-
-		// Create the order
-		const order = new Order({
-			user: user._id,
-			products: orderProducts,
-			totalAmount,
-			publicOrderId,
-			address: {
-				name: address.name || customerName,
-				phoneNumber: address.phoneNumber || customerPhone,
-				pincode: address.pincode,
-				houseNumber: address.houseNumber || "",
-				streetAddress: address.streetAddress || "",
-				landmark: address.landmark || "",
-				city: address.city,
-				state: address.state
-			},
-			status: paymentStatus === "paid" ? "paid" : "pending",
-			isManualOrder: true,
-			orderSource: orderSource || "other",
-			paymentMethod: paymentMethod || "cash",
-			paymentStatus: paymentStatus || "paid",
-			deliveryFee: deliveryFeeAmount,
-			platformFee: platformFeeAmount,
-			adminNotes: adminNotes || "",
-			trackingStatus: "processing", // Manual orders go straight to processing
-			trackingHistory: [{
-				status: "processing",
-				timestamp: new Date(),
-				note: `Manual order created via ${orderSource || "admin"}`
-			}]
-		});
-
-		await order.save();
-
-		// Populate and return the created order
-		const populatedOrder = await Order.findById(order._id)
-			.populate('user', 'name phoneNumber email')
-			.populate({
-				path: 'products.product',
-				select: 'name price image'
-			})
-			.lean();
-
-		res.status(201).json({
-			success: true,
-			message: "Manual order created successfully",
-			order: {
-				orderId: populatedOrder._id,
-				publicOrderId: populatedOrder.publicOrderId,
-				totalAmount: populatedOrder.totalAmount,
-				subtotal,
-				deliveryFee: deliveryFeeAmount,
-				platformFee: platformFeeAmount,
-				customer: {
-					name: populatedOrder.user.name,
-					phone: populatedOrder.user.phoneNumber,
-					email: populatedOrder.user.email
-				},
-				products: populatedOrder.products.map(p => ({
-					name: p.product?.name,
-					price: p.price,
-					quantity: p.quantity,
-					image: p.product?.image
-				})),
-				address: populatedOrder.address,
-				orderSource: populatedOrder.orderSource,
-				paymentMethod: populatedOrder.paymentMethod,
-				paymentStatus: populatedOrder.paymentStatus,
-				trackingStatus: populatedOrder.trackingStatus,
-				createdAt: populatedOrder.createdAt
-			}
+		res.status(created > 0 ? 201 : 400).json({
+			success: created === results.length,
+			message: `Created ${created} of ${results.length} manual orders`,
+			created,
+			failed: results.length - created,
+			results: results.map((result, index) => ({ index, ...result }))
 		});
 
 	} catch (error) {
-		console.error('Error creating manual order:', error);
+		console.error('Error creating manual orders:', error);
 		res.status(500).json({ 
 			success: false, 
-			message: error.message || 'Server error creating manual order' 
+			message: error.message || 'Server error creating manual orders' 
 		});
 	}
-};
\ No newline at end of file
+};
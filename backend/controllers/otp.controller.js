@@ -1,22 +1,9 @@
 import twilio from "twilio";
 import crypto from "crypto";
 import User from "../models/user.model.js";
-import { redis } from "../lib/redis.js";
+import { issueOTP, verifyOTPCode } from "../lib/otpThrottle.js";
 import { generateTokens, storeRefreshToken, setCookies } from "./auth.controller.js";
 
-// Redis key prefixes
-const OTP_PREFIX = "otp:";
-const THROTTLE_PREFIX = "otp_throttle:";
-const FAILED_ATTEMPTS_PREFIX = "otp_failed:";
-
-// Throttling configuration
-const OTP_EXPIRY_SECONDS = 5 * 60; // 5 minutes
-const RESEND_COOLDOWN_SECONDS = 60; // Minimum time between resends
-const MAX_RESENDS_PER_WINDOW = 3; // Maximum resends allowed in the time window
-const THROTTLE_WINDOW_SECONDS = 15 * 60; // 15 minutes
-const MAX_FAILED_ATTEMPTS = 3; // Maximum failed OTP attempts
-const FREEZE_DURATION_SECONDS = 15 * 60; // 15 minutes freeze
-
 // Twilio configuration
 const accountSid = process.env.TWILIO_ACCOUNT_SID;
 const authToken = process.env.TWILIO_AUTH_TOKEN;
@@ -32,128 +19,6 @@ const generateOTP = () => {
   return Math.floor(1000 + Math.random() * 9000).toString();
 };
 
-// Check if phone number is throttled
-const checkThrottle = async (phoneNumber) => {
-  const now = Date.now();
-  const throttleKey = THROTTLE_PREFIX + phoneNumber;
-  const throttleDataStr = await redis.get(throttleKey);
-
-  if (!throttleDataStr) {
-    return { allowed: true };
-  }
-
-  const throttleData = JSON.parse(throttleDataStr);
-
-  // Check cooldown period
-  const timeSinceLastSend = (now - throttleData.lastSentAt) / 1000;
-  if (timeSinceLastSend < RESEND_COOLDOWN_SECONDS) {
-    const waitTime = Math.ceil(RESEND_COOLDOWN_SECONDS - timeSinceLastSend);
-    return {
-      allowed: false,
-      reason: "cooldown",
-      waitTime,
-      message: `Please wait ${waitTime} seconds before requesting another OTP`,
-    };
-  }
-
-  // Check if max resends reached
-  if (throttleData.count >= MAX_RESENDS_PER_WINDOW) {
-    const ttl = await redis.ttl(throttleKey);
-    const resetInMinutes = Math.ceil(ttl / 60);
-    return {
-      allowed: false,
-      reason: "limit_reached",
-      resetInMinutes,
-      message: `Too many OTP requests. Please try again in ${resetInMinutes} minute(s)`,
-    };
-  }
-
-  return { allowed: true };
-};
-
-// Update throttle data after sending OTP
-const updateThrottle = async (phoneNumber) => {
-  const now = Date.now();
-  const throttleKey = THROTTLE_PREFIX + phoneNumber;
-  const throttleDataStr = await redis.get(throttleKey);
-
-  if (!throttleDataStr) {
-    // First request - create new throttle data
-    const newData = {
-      count: 1,
-      lastSentAt: now,
-    };
-    await redis.setex(throttleKey, THROTTLE_WINDOW_SECONDS, JSON.stringify(newData));
-  } else {
-    // Increment count within existing window
-    const throttleData = JSON.parse(throttleDataStr);
-    throttleData.count += 1;
-    throttleData.lastSentAt = now;
-    
-    // Get remaining TTL to preserve the original window
-    const ttl = await redis.ttl(throttleKey);
-    if (ttl > 0) {
-      await redis.setex(throttleKey, ttl, JSON.stringify(throttleData));
-    }
-  }
-};
-
-// Check if phone number is frozen due to failed attempts
-const checkFailedAttempts = async (phoneNumber) => {
-  const failedKey = FAILED_ATTEMPTS_PREFIX + phoneNumber;
-  const attemptDataStr = await redis.get(failedKey);
-
-  if (!attemptDataStr) {
-    return { allowed: true };
-  }
-
-  const attemptData = JSON.parse(attemptDataStr);
-
-  // If frozen (attempts >= max), check remaining time
-  if (attemptData.attempts >= MAX_FAILED_ATTEMPTS) {
-    const ttl = await redis.ttl(failedKey);
-    if (ttl > 0) {
-      const remainingMinutes = Math.ceil(ttl / 60);
-      return {
-        allowed: false,
-        reason: "frozen",
-        remainingMinutes,
-        message: `Too many failed attempts. Please try again in ${remainingMinutes} minute(s)`,
-      };
-    }
-  }
-
-  return { allowed: true };
-};
-
-// Record a failed OTP attempt
-const recordFailedAttempt = async (phoneNumber) => {
-  const failedKey = FAILED_ATTEMPTS_PREFIX + phoneNumber;
-  const attemptDataStr = await redis.get(failedKey);
-
-  let attemptData;
-  if (!attemptDataStr) {
-    attemptData = { attempts: 1 };
-  } else {
-    attemptData = JSON.parse(attemptDataStr);
-    attemptData.attempts += 1;
-  }
-
-  // Set TTL based on whether we've hit the freeze threshold
-  const ttl = attemptData.attempts >= MAX_FAILED_ATTEMPTS 
-    ? FREEZE_DURATION_SECONDS 
-    : OTP_EXPIRY_SECONDS; // Keep attempts alive as long as OTP could be valid
-
-  await redis.setex(failedKey, ttl, JSON.stringify(attemptData));
-  
-  return attemptData;
-};
-
-// Clear failed attempts on successful verification
-const clearFailedAttempts = async (phoneNumber) => {
-  await redis.del(FAILED_ATTEMPTS_PREFIX + phoneNumber);
-};
-
 // Send OTP via Twilio or log to console
 const sendOTPMessage = async (phoneNumber, otp) => {
   if (twilioClient && twilioPhoneNumber) {
@@ -190,27 +55,6 @@ export const sendOTP = async (req, res) => {
       return res.status(400).json({ message: "Invalid phone number format. Must be 10 digits." });
     }
 
-    // Check if phone number is frozen due to failed attempts
-    const failedCheck = await checkFailedAttempts(phoneNumber);
-    if (!failedCheck.allowed) {
-      return res.status(429).json({
-        message: failedCheck.message,
-        reason: failedCheck.reason,
-        remainingMinutes: failedCheck.remainingMinutes,
-      });
-    }
-
-    // Check throttling
-    const throttleCheck = await checkThrottle(phoneNumber);
-    if (!throttleCheck.allowed) {
-      return res.status(429).json({
-        message: throttleCheck.message,
-        reason: throttleCheck.reason,
-        waitTime: throttleCheck.waitTime,
-        resetInMinutes: throttleCheck.resetInMinutes,
-      });
-    }
-
     // Check if user exists
     const userExists = await User.findOne({ phoneNumber });
 
@@ -234,16 +78,22 @@ export const sendOTP = async (req, res) => {
 
     const otp = generateOTP();
 
-    // Store OTP in Redis with TTL (auto-expires)
-    const otpKey = OTP_PREFIX + phoneNumber;
-    await redis.setex(otpKey, OTP_EXPIRY_SECONDS, JSON.stringify({ otp }));
+    // Freeze and throttle checks, storing the OTP and counting the send
+    // happen in one atomic Redis script
+    const throttleCheck = await issueOTP(phoneNumber, otp);
+    if (!throttleCheck.allowed) {
+      return res.status(429).json({
+        message: throttleCheck.message,
+        reason: throttleCheck.reason,
+        waitTime: throttleCheck.waitTime,
+        resetInMinutes: throttleCheck.resetInMinutes,
+        remainingMinutes: throttleCheck.remainingMinutes,
+      });
+    }
 
     // Send OTP via Twilio or log to console
     await sendOTPMessage(phoneNumber, otp);
 
-    // Update throttle data
-    await updateThrottle(phoneNumber);
-
     res.json({
       message: "OTP sent successfully",
       userExists: !!userExists,
@@ -263,49 +113,26 @@ export const verifyOTP = async (req, res) => {
       return res.status(400).json({ message: "Phone number and OTP are required" });
     }
 
-    // Check if phone number is frozen due to failed attempts
-    const failedCheck = await checkFailedAttempts(phoneNumber);
-    if (!failedCheck.allowed) {
-      return res.status(429).json({
-        message: failedCheck.message,
-        reason: failedCheck.reason,
-        remainingMinutes: failedCheck.remainingMinutes,
-      });
-    }
-
-    // Check if OTP exists in Redis
-    const otpKey = OTP_PREFIX + phoneNumber;
-    const storedDataStr = await redis.get(otpKey);
-    if (!storedDataStr) {
-      return res.status(400).json({ message: "OTP not found or expired" });
-    }
-
-    const storedData = JSON.parse(storedDataStr);
-
-    // Verify OTP
-    if (storedData.otp !== otp) {
-      const attemptData = await recordFailedAttempt(phoneNumber);
-      const remainingAttempts = MAX_FAILED_ATTEMPTS - attemptData.attempts;
-      
-      if (remainingAttempts <= 0) {
-        return res.status(429).json({ 
-          message: `Too many failed attempts. Your number is frozen for ${Math.ceil(FREEZE_DURATION_SECONDS / 60)} minutes.`,
-          reason: "frozen",
-          remainingMinutes: Math.ceil(FREEZE_DURATION_SECONDS / 60),
+    // One atomic script: freeze check, code comparison, failed attempt
+    // tracking; on success the OTP, throttle and failed attempts are cleared
+    const result = await verifyOTPCode(phoneNumber, otp);
+    if (!result.verified) {
+      if (result.reason === "frozen") {
+        return res.status(429).json({
+          message: result.message,
+          reason: result.reason,
+          remainingMinutes: result.remainingMinutes,
         });
       }
-      
-      return res.status(400).json({ 
-        message: "Invalid OTP",
-        remainingAttempts,
+      if (result.reason === "not_found") {
+        return res.status(400).json({ message: result.message });
+      }
+      return res.status(400).json({
+        message: result.message,
+        remainingAttempts: result.remainingAttempts,
       });
     }
 
-    // OTP verified - delete it and clear throttle data and failed attempts
-    await redis.del(otpKey);
-    await redis.del(THROTTLE_PREFIX + phoneNumber);
-    await clearFailedAttempts(phoneNumber);
-
     // Check if user exists
     let user = await User.findOne({ phoneNumber });
     let isNewUser = false;
@@ -368,36 +195,28 @@ export const resendOTP = async (req, res) => {
       return res.status(400).json({ message: "Invalid phone number format. Must be 10 digits." });
     }
 
-    // Check if there's an existing OTP for this phone number
-    const otpKey = OTP_PREFIX + phoneNumber;
-    const existingOTP = await redis.get(otpKey);
-    if (!existingOTP) {
-      return res.status(400).json({ message: "No OTP request found. Please request a new OTP first." });
-    }
+    // Generate new OTP
+    const otp = generateOTP();
 
-    // Check throttling
-    const throttleCheck = await checkThrottle(phoneNumber);
+    // Replaces the pending OTP (with a fresh TTL) only if there is one and
+    // the throttles allow it, atomically
+    const throttleCheck = await issueOTP(phoneNumber, otp, { requireExisting: true });
     if (!throttleCheck.allowed) {
+      if (throttleCheck.reason === "no_otp") {
+        return res.status(400).json({ message: throttleCheck.message });
+      }
       return res.status(429).json({
         message: throttleCheck.message,
         reason: throttleCheck.reason,
         waitTime: throttleCheck.waitTime,
         resetInMinutes: throttleCheck.resetInMinutes,
+        remainingMinutes: throttleCheck.remainingMinutes,
       });
     }
 
-    // Generate new OTP
-    const otp = generateOTP();
-
-    // Update OTP in Redis with fresh TTL
-    await redis.setex(otpKey, OTP_EXPIRY_SECONDS, JSON.stringify({ otp }));
-
     // Send OTP via Twilio or log to console
     await sendOTPMessage(phoneNumber, otp);
 
-    // Update throttle data
-    await updateThrottle(phoneNumber);
-
     res.json({
       message: "OTP resent successfully",
     });
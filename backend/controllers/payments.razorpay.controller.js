@@ -1,6 +1,7 @@
 // controllers/payments.razorpay.controller.js
 import Razorpay from "razorpay";
 import crypto from "crypto";
+import mongoose from "mongoose";
 import Order from "../models/order.model.js";
 import User from "../models/user.model.js";
 import Product from "../models/product.model.js";
@@ -8,12 +9,16 @@ import {
   checkStockAvailability,
   reserveStock,
   createHoldOrder,
+  getHoldExpiry,
   finalizeOrder,
   releaseReservedStock,
   getHoldOrderInfo,
+  describeHold,
   cancelHoldOrder
 } from "../lib/stockHold.js";
+import { publishHoldStatus, trackHoldWatcher, watchHoldStatus } from "../lib/holdEvents.js";
 import { calculatePricingBreakdown } from "../lib/pricing.js";
+import { ingestRazorpayWebhook } from "../lib/paymentWebhooks.js";
 import { validateIndianAddress } from "../lib/addressValidation.js";
 
 const razorpay = new Razorpay({
@@ -24,6 +29,13 @@ const razorpay = new Razorpay({
 // Hold duration in seconds (15 minutes)
 const HOLD_DURATION_SECONDS = 15 * 60;
 
+// Hold status streaming / long-polling
+const MAX_LONG_POLL_SECONDS = 25;
+const STREAM_HEARTBEAT_MS = 25 * 1000;
+const STREAM_RETRY_MS = 3000; // EventSource reconnect delay
+// The expiry sweeper runs every minute
+const STREAM_EXPIRY_GRACE_MS = 90 * 1000;
+
 /**
  * Create a Razorpay order with HOLD status.
  * This reserves stock for the user and creates a 15-minute countdown.
@@ -82,8 +94,12 @@ export const createRazorpayOrder = async (req, res) => {
       userId = user._id;
     }
 
+    // The hold's ID and expiry are fixed now so the reservation ledger can refer to it
+    const holdId = new mongoose.Types.ObjectId();
+    const expiresAt = getHoldExpiry();
+
     // Reserve stock for these products
-    const reserved = await reserveStock(products);
+    const reserved = await reserveStock(products, { holdId, expiresAt });
     if (!reserved) {
       return res.status(400).json({
         message: "Could not reserve stock. Items may have been purchased by another user.",
@@ -122,12 +138,14 @@ export const createRazorpayOrder = async (req, res) => {
       await releaseReservedStock(products.map(p => ({
         product: p._id || p.id,
         quantity: p.quantity
-      })));
+      })), holdId, "checkout_failed");
       throw rzpError;
     }
 
     // Create a HOLD order with expiration time
     const holdOrder = await createHoldOrder({
+      _id: holdId,
+      expiresAt,
       user: userId,
       products: products.map((p) => ({
         product: p._id || p.id,
@@ -223,7 +241,8 @@ export const verifyRazorpayPayment = async (req, res) => {
       // Mark as expired and release stock
       order.status = "expired";
       await order.save();
-      await releaseReservedStock(order.products);
+      await releaseReservedStock(order.products, order._id, "expired");
+      publishHoldStatus(order);
       
       return res.status(400).json({
         success: false,
@@ -265,29 +284,165 @@ export const verifyRazorpayPayment = async (req, res) => {
 
 /**
  * Get hold order status including time remaining
- * Expects: { localOrderId } in query
+ * Expects: { localOrderId } in query; optional wait (seconds, up to 25):
+ * while the order is on hold, answer only when its status changes or the
+ * wait is over (long-poll fallback for clients without EventSource)
  */
 export const getHoldStatus = async (req, res) => {
   try {
     const { localOrderId } = req.query;
+    const waitSeconds = Math.min(parseInt(req.query.wait) || 0, MAX_LONG_POLL_SECONDS);
     
     if (!localOrderId) {
       return res.status(400).json({ message: "localOrderId is required" });
     }
     
-    const holdInfo = await getHoldOrderInfo(localOrderId);
+    if (!mongoose.isValidObjectId(localOrderId)) {
+      return res.status(404).json({ message: "Order not found" });
+    }
+    
+    // A long-poll subscribes before reading, so a transition during the read is not missed
+    const watch = waitSeconds > 0
+      ? await watchHoldStatus(localOrderId, () => getHoldOrderInfo(localOrderId))
+      : null;
+    const holdInfo = watch ? watch.value : await getHoldOrderInfo(localOrderId);
     
     if (!holdInfo) {
+      watch?.unsubscribe();
       return res.status(404).json({ message: "Order not found" });
     }
     
-    return res.json(holdInfo);
+    if (!watch || holdInfo.status !== "hold") {
+      watch?.unsubscribe();
+      return res.json(holdInfo);
+    }
+
+    // Wait for a transition instead of reading the order again
+    let timer = null;
+    let untrack = () => {};
+    const cleanup = () => {
+      clearTimeout(timer);
+      watch.unsubscribe();
+      untrack();
+      req.off("close", cleanup);
+    };
+    const respond = (info) => {
+      cleanup();
+      if (!res.writableEnded) {
+        res.json(info);
+      }
+    };
+    const respondUnchanged = () => respond(describeHold(holdInfo.orderId, holdInfo.status, holdInfo.expiresAt));
+
+    req.on("close", cleanup);
+    timer = setTimeout(respondUnchanged, waitSeconds * 1000);
+    // On shutdown, answer now; the client polls again
+    untrack = trackHoldWatcher(respondUnchanged);
+    watch.listen((message) => {
+      respond(describeHold(holdInfo.orderId, message.status, message.expiresAt));
+    });
   } catch (err) {
     console.error("getHoldStatus:", err);
     return res.status(500).json({ message: "Server error", error: err.message });
   }
 };
 
+/**
+ * Stream hold status as Server-Sent Events
+ * Expects: { localOrderId } in query
+ * Sends the current status, then each transition (paid, expired, cancelled)
+ * as it happens; the stream ends after the hold leaves "hold"
+ */
+export const streamHoldStatus = async (req, res) => {
+  try {
+    const { localOrderId } = req.query;
+    
+    if (!localOrderId) {
+      return res.status(400).json({ message: "localOrderId is required" });
+    }
+    
+    if (!mongoose.isValidObjectId(localOrderId)) {
+      return res.status(404).json({ message: "Order not found" });
+    }
+    
+    // Subscribe before reading, so a transition during the read is not missed
+    const watch = await watchHoldStatus(localOrderId, () => getHoldOrderInfo(localOrderId));
+    const holdInfo = watch.value;
+    
+    if (!holdInfo) {
+      watch.unsubscribe();
+      return res.status(404).json({ message: "Order not found" });
+    }
+
+    res.status(200).set({
+      "Content-Type": "text/event-stream",
+      "Cache-Control": "no-store",
+      Connection: "keep-alive",
+      // Stop nginx and similar proxies from buffering the stream
+      "X-Accel-Buffering": "no",
+    });
+    res.flushHeaders();
+
+    const send = (info) => res.write(`event: status\ndata: ${JSON.stringify(info)}\n\n`);
+    res.write(`retry: ${STREAM_RETRY_MS}\n\n`);
+    send(holdInfo);
+
+    if (holdInfo.status !== "hold") {
+      watch.unsubscribe();
+      return res.end();
+    }
+
+    let heartbeat = null;
+    let expiryCheck = null;
+    let untrack = () => {};
+    const close = () => {
+      clearInterval(heartbeat);
+      clearTimeout(expiryCheck);
+      watch.unsubscribe();
+      untrack();
+      if (!res.writableEnded) {
+        res.end();
+      }
+    };
+    req.on("close", close);
+
+    // Comments keep proxies and load balancers from closing an idle stream
+    heartbeat = setInterval(() => res.write(": ping\n\n"), STREAM_HEARTBEAT_MS);
+
+    // If the expiry transition was missed, read the order once the sweeper
+    // should have released it; either way the stream ends (the client
+    // reconnects and gets the current status)
+    const remainingMs = holdInfo.remainingSeconds * 1000;
+    expiryCheck = setTimeout(async () => {
+      const latest = await getHoldOrderInfo(localOrderId).catch(() => null);
+      if (latest && latest.status !== holdInfo.status && !res.writableEnded) {
+        send(latest);
+      }
+      close();
+    }, remainingMs + STREAM_EXPIRY_GRACE_MS);
+
+    // On shutdown, end the stream; EventSource reconnects after `retry`
+    untrack = trackHoldWatcher(close);
+
+    // Transitions buffered during the read come first
+    watch.listen((message) => {
+      if (res.writableEnded) {
+        return;
+      }
+      send(describeHold(holdInfo.orderId, message.status, message.expiresAt));
+      if (message.status !== "hold") {
+        close();
+      }
+    });
+  } catch (err) {
+    console.error("streamHoldStatus:", err);
+    if (!res.headersSent) {
+      return res.status(500).json({ message: "Server error", error: err.message });
+    }
+    res.end();
+  }
+};
+
 /**
  * Cancel a hold order and release reserved stock
  * Expects: { localOrderId } in body
@@ -316,7 +471,9 @@ export const cancelHold = async (req, res) => {
 
 /**
  * Webhook handler for Razorpay events (recommended as source-of-truth).
- * This route must receive raw body (see server.js change below) and verify webhook signature.
+ * This route must receive raw body (see server.js) and verify webhook signature.
+ * Verified events are stored in the webhook inbox and acknowledged right away;
+ * the payment.webhook job applies them to orders (lib/paymentWebhooks.js).
  */
 export const razorpayWebhook = async (req, res) => {
   try {
@@ -326,55 +483,29 @@ export const razorpayWebhook = async (req, res) => {
 
     if (webhookSecret) {
       const expectedSignature = crypto.createHmac("sha256", webhookSecret).update(body).digest("hex");
-      if (expectedSignature !== signature) {
+      const valid = typeof signature === "string" &&
+        signature.length === expectedSignature.length &&
+        crypto.timingSafeEqual(Buffer.from(signature), Buffer.from(expectedSignature));
+      if (!valid) {
         console.warn("Razorpay webhook signature mismatch");
         return res.status(400).send("invalid signature");
       }
     }
 
-    const event = JSON.parse(body.toString());
-    // handle event types you care about
-    if (event.event === "payment.captured") {
-      const payment = event.payload.payment.entity;
-      // find order by razorpay order id
-      const order = await Order.findOne({ razorpayOrderId: payment.order_id });
-      if (order) {
-        // Use finalize to atomically update stock
-        if (order.status !== "paid") {
-          const result = await finalizeOrder(order._id);
-          if (result.success) {
-            order.razorpayPaymentId = payment.id;
-            await order.save();
-          } else {
-            console.warn("Webhook: finalize failed for order", order._id, result.error);
-          }
-        }
-      } else {
-        // optionally create order record here (if you didn't create pending before)
-        console.warn("Webhook payment.captured: no local order found for", payment.order_id);
-      }
-    } else if (event.event === "payment.failed") {
-      const payment = event.payload.payment.entity;
-      // find order by razorpay order id
-      const order = await Order.findOne({ razorpayOrderId: payment.order_id });
-      if (order && order.status === "hold") {
-        // Update order status to cancelled
-        order.status = "cancelled";
-        order.trackingStatus = "cancelled";
-        order.trackingHistory.push({
-          status: "cancelled",
-          timestamp: new Date(),
-          note: "Payment failed - order cancelled"
-        });
-        await order.save();
-        // Release reserved stock
-        await releaseReservedStock(order.products);
+    let result;
+    try {
+      result = await ingestRazorpayWebhook(body, req.headers["x-razorpay-event-id"]);
+    } catch (err) {
+      if (err instanceof SyntaxError) {
+        return res.status(400).send("invalid payload");
       }
+      throw err;
     }
 
     // respond quickly
-    res.json({ status: "ok" });
+    res.json({ status: "ok", duplicate: result.duplicate });
   } catch (err) {
+    // Not stored; Razorpay will deliver the event again
     console.error("razorpayWebhook:", err);
     res.status(500).send("server error");
   }
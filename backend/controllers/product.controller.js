@@ -1,8 +1,21 @@
+import crypto from "crypto";
+import Busboy from "busboy";
 import { redis } from "../lib/redis.js";
-import cloudinary from "../lib/cloudinary.js";
 import Product from "../models/product.model.js";
-import { extractCloudinaryPublicId } from "../lib/cloudinaryUtils.js";
-import { notifyWaitlist } from "./waitlist.controller.js";
+import { enqueueJob, enqueueJobInBackground } from "../lib/jobQueue.js";
+import { isRedisInventory, setInventoryStock } from "../lib/inventory.js";
+import {
+	ALLOWED_IMAGE_TYPES,
+	MAX_IMAGE_BYTES,
+	deleteStoredImage,
+	getImageVariants,
+	isDataUrlImage,
+	parseDataUrlImage,
+	storeDataUrlImage,
+	storeImageStream,
+} from "../lib/imageStorage.js";
+
+const INVALID_INLINE_IMAGE = `Inline images must be a base64 JPEG, PNG, WebP or GIF data URL under ${MAX_IMAGE_BYTES / (1024 * 1024)}MB`;
 
 export const getAllProducts = async (req, res) => {
 	try {
@@ -18,17 +31,22 @@ export const createProduct = async (req, res) => {
 	try {
 		const { name, description, price, image, stockQuantity } = req.body;
 
-		let cloudinaryResponse = null;
-
-		if (image) {
-			cloudinaryResponse = await cloudinary.uploader.upload(image, { folder: "products" });
+		// Images come from POST /products/images as a URL. A new product has no
+		// image to show meanwhile, so inline data URLs are stored right away
+		let storedImage = null;
+		if (isDataUrlImage(image)) {
+			if (!parseDataUrlImage(image)) {
+				return res.status(400).json({ message: INVALID_INLINE_IMAGE });
+			}
+			storedImage = await storeDataUrlImage(image);
 		}
 
 		const product = await Product.create({
 			name,
 			description,
 			price,
-			image: cloudinaryResponse?.secure_url ? cloudinaryResponse.secure_url : "",
+			image: storedImage ? storedImage.url : image || "",
+			imageVariants: storedImage ? storedImage.variants : await getImageVariants(image),
 			stockQuantity: stockQuantity || 0,
 		});
 
@@ -48,14 +66,10 @@ export const deleteProduct = async (req, res) => {
 		}
 
 		if (product.image) {
-			const publicId = extractCloudinaryPublicId(product.image);
-			if (publicId) {
-				try {
-					await cloudinary.uploader.destroy(publicId);
-					console.log("deleted image from cloudinary");
-				} catch (error) {
-					console.log("error deleting image from cloudinary", error);
-				}
+			try {
+				await deleteStoredImage(product.image);
+			} catch (error) {
+				console.log("error deleting product image", error);
 			}
 		}
 
@@ -80,6 +94,7 @@ export const getRecommendedProducts = async (req, res) => {
 					name: 1,
 					description: 1,
 					image: 1,
+					imageVariants: 1,
 					price: 1,
 					stockQuantity: 1,
 					reservedQuantity: 1,
@@ -111,6 +126,9 @@ export const updateProductStock = async (req, res) => {
 		}
 
 		const updatedProduct = await product.save();
+		if (stockQuantity !== undefined && isRedisInventory()) {
+			await setInventoryStock(updatedProduct._id, updatedProduct.stockQuantity);
+		}
 		
 		// Check if product is now back in stock
 		const isNowInStock = (updatedProduct.stockQuantity || 0) - (updatedProduct.reservedQuantity || 0) > 0;
@@ -118,9 +136,7 @@ export const updateProductStock = async (req, res) => {
 		// If product was out of stock and is now in stock, notify waitlist
 		if (wasOutOfStock && isNowInStock) {
 			console.log(`Product ${updatedProduct.name} is back in stock, notifying waitlist...`);
-			notifyWaitlist(updatedProduct._id.toString()).catch(err => {
-				console.error("Error notifying waitlist:", err);
-			});
+			enqueueJobInBackground("waitlist.notify", { productId: updatedProduct._id.toString() });
 		}
 		
 		res.json(updatedProduct);
@@ -137,9 +153,7 @@ const updateStock = (stockQuantity, product) => {
 
 	if (wasOutOfStock && isNowInStock) {
 		console.log(`Product ${product.name} is back in stock, notifying waitlist...`);
-		notifyWaitlist(product._id.toString()).catch(err => {
-			console.error("Error notifying waitlist:", err);
-		});
+		enqueueJobInBackground("waitlist.notify", { productId: product._id.toString() });
 	}
 }
 
@@ -152,25 +166,12 @@ export const updateProduct = async (req, res) => {
 			return res.status(404).json({ message: "Product not found" });
 		}
 
-		// If there's a new image, upload it to Cloudinary
-		let cloudinaryResponse = null;
-		// Check if image is base64 (new upload) by checking if it starts with data:image
-		const isNewImage = image && image.startsWith('data:image');
-		
-		if (isNewImage) {
-			// Delete old image from Cloudinary if it exists
-			if (product.image) {
-				const publicId = extractCloudinaryPublicId(product.image);
-				if (publicId) {
-					try {
-						await cloudinary.uploader.destroy(publicId);
-					} catch (error) {
-						console.log("error deleting old image from cloudinary", error);
-						// Continue with upload even if delete fails
-					}
-				}
-			}
-			cloudinaryResponse = await cloudinary.uploader.upload(image, { folder: "products" });
+		// A new image is either an uploaded image URL or a legacy base64 data URL
+		const previousImage = product.image;
+		const isNewImage = Boolean(image) && image !== previousImage;
+		const isInlineImage = isNewImage && isDataUrlImage(image);
+		if (isInlineImage && !parseDataUrlImage(image)) {
+			return res.status(400).json({ message: INVALID_INLINE_IMAGE });
 		}
 
 		// Update product fields
@@ -178,12 +179,110 @@ export const updateProduct = async (req, res) => {
 		if (description !== undefined) product.description = description;
 		if (price !== undefined) product.price = price;
 		if (stockQuantity !== undefined) updateStock(stockQuantity, product);
-		if (cloudinaryResponse?.secure_url) product.image = cloudinaryResponse.secure_url;
+		// Inline images never go into `image`: the product keeps its current
+		// image and the data URL travels in the upload job, which swaps the
+		// images once stored. Any later image change supersedes the pending one
+		const uploadId = isInlineImage ? crypto.randomUUID() : null;
+		if (isInlineImage) {
+			product.pendingImage = { uploadId, requestedAt: new Date() };
+		} else if (isNewImage) {
+			product.image = image;
+			product.imageVariants = await getImageVariants(image);
+			product.pendingImage = undefined;
+		}
 		
-		const updatedProduct = await product.save();
+		let updatedProduct = await product.save();
+		if (stockQuantity !== undefined && isRedisInventory()) {
+			await setInventoryStock(updatedProduct._id, updatedProduct.stockQuantity);
+		}
+
+		if (isInlineImage) {
+			try {
+				await enqueueJob("product.uploadImage", { productId: product._id.toString(), uploadId, image });
+			} catch (error) {
+				// No queue: store it now rather than drop it
+				console.log("Error enqueueing product image upload, storing inline image now", error.message);
+				const storedImage = await storeDataUrlImage(image);
+				updatedProduct.image = storedImage.url;
+				updatedProduct.imageVariants = storedImage.variants;
+				updatedProduct.pendingImage = undefined;
+				updatedProduct = await updatedProduct.save();
+				if (previousImage) {
+					deleteStoredImage(previousImage).catch(err => {
+						console.log("error deleting old product image", err);
+					});
+				}
+			}
+		} else if (isNewImage && previousImage) {
+			deleteStoredImage(previousImage).catch(err => {
+				console.log("error deleting old product image", err);
+			});
+		}
+
 		res.json(updatedProduct);
 	} catch (error) {
 		console.log("Error in updateProduct controller", error.message);
 		res.status(500).json({ message: "Server error", error: error.message });
 	}
 };
+
+export const uploadProductImage = (req, res) => {
+	let busboy;
+	try {
+		busboy = Busboy({ headers: req.headers, limits: { files: 1, fileSize: MAX_IMAGE_BYTES } });
+	} catch (error) {
+		return res.status(400).json({ message: "Expected a multipart/form-data upload" });
+	}
+
+	let upload = null;
+	let rejection = null;
+
+	// The file is piped to the image store as it arrives, never buffered whole
+	busboy.on("file", (fieldName, file, { mimeType }) => {
+		if (fieldName !== "image" || upload || !ALLOWED_IMAGE_TYPES.includes(mimeType)) {
+			rejection = rejection || { status: 400, message: "Please upload a JPEG, PNG, WebP or GIF image in the 'image' field" };
+			file.resume();
+			return;
+		}
+
+		file.on("limit", () => {
+			rejection = { status: 413, message: `Image size must be less than ${MAX_IMAGE_BYTES / (1024 * 1024)}MB` };
+		});
+
+		upload = storeImageStream(file, { mimeType });
+		// Awaited once the form has been read
+		upload.catch(() => {});
+	});
+
+	busboy.on("close", async () => {
+		try {
+			if (!upload) {
+				const { status, message } = rejection || { status: 400, message: "No image uploaded" };
+				return res.status(status).json({ message });
+			}
+
+			const stored = await upload;
+			if (rejection) {
+				// Truncated at the size limit, or sent alongside an invalid file
+				await deleteStoredImage(stored.url).catch(() => {});
+				return res.status(rejection.status).json({ message: rejection.message });
+			}
+
+			res.status(201).json({ url: stored.url, variants: stored.variants });
+		} catch (error) {
+			if (rejection) {
+				return res.status(rejection.status).json({ message: rejection.message });
+			}
+			console.log("Error in uploadProductImage controller", error.message);
+			res.status(500).json({ message: "Server error", error: error.message });
+		}
+	});
+
+	busboy.on("error", (error) => {
+		if (!res.headersSent) {
+			res.status(400).json({ message: "Invalid upload", error: error.message });
+		}
+	});
+
+	req.pipe(busboy);
+};
@@ -1,16 +1,6 @@
 import { redis } from "../lib/redis.js";
 import Product from "../models/product.model.js";
-import twilio from "twilio";
-
-// Twilio configuration
-const accountSid = process.env.TWILIO_ACCOUNT_SID;
-const authToken = process.env.TWILIO_AUTH_TOKEN;
-const twilioPhoneNumber = process.env.TWILIO_PHONE_NUMBER;
-
-let twilioClient = null;
-if (accountSid && authToken) {
-	twilioClient = twilio(accountSid, authToken);
-}
+import { dispatchWaitlist } from "../lib/waitlistDispatcher.js";
 
 // TTL for waitlist entries (30 days in seconds)
 const WAITLIST_TTL = 30 * 24 * 60 * 60;
@@ -150,69 +140,11 @@ export const getWaitlist = async (req, res) => {
 
 /**
  * Notify waitlist users when product is back in stock
- * Uses Twilio SMS for notifications (same as OTP flow)
+ * Uses Twilio SMS for notifications (same as OTP flow); see lib/waitlistDispatcher.js
  */
 export const notifyWaitlist = async (productId) => {
 	try {
-		const waitlistKey = `waitlist:${productId}`;
-		
-		// Get all waitlist entries
-		const waitlistData = await redis.hgetall(waitlistKey);
-		
-		if (!waitlistData || Object.keys(waitlistData).length === 0) {
-			console.log(`No waitlist entries for product ${productId}`);
-			return { success: true, notified: 0 };
-		}
-
-		const product = await Product.findById(productId);
-		if (!product) {
-			console.log(`Product ${productId} not found`);
-			return { success: false, error: "Product not found" };
-		}
-
-		// Parse waitlist entries
-		const waitlist = Object.entries(waitlistData).map(([phoneNumber, data]) => {
-			const parsed = JSON.parse(data);
-			return {
-				phoneNumber
-			};
-		});
-
-		console.log(`📱 Notifying ${waitlist.length} users about ${product.name} being back in stock`);
-		
-		let notifiedCount = 0;
-		let failedCount = 0;
-
-		// Send SMS to each user using Twilio
-		for (const user of waitlist) {
-			if (user.phoneNumber) {
-				try {
-					if (twilioClient && twilioPhoneNumber) {
-						const message = `Great news! ${product.name} is back in stock. Order now!`;
-						await twilioClient.messages.create({
-							body: message,
-							from: twilioPhoneNumber,
-							to: `+91${user.phoneNumber}`, // Assuming Indian phone numbers
-						});
-						console.log(`  ✓ SMS sent to ${user.phoneNumber}`);
-						notifiedCount++;
-					} else {
-						// Development mode - just log
-						console.log(`  📱 Would send SMS to ${user.phoneNumber}: ${product.name} is back in stock!`);
-						notifiedCount++;
-					}
-				} catch (error) {
-					console.error(`  ✗ Failed to send SMS to ${user.phoneNumber}:`, error.message);
-					failedCount++;
-				}
-			}
-		}
-
-		// Clear the waitlist after notifying
-		await redis.del(waitlistKey);
-
-		console.log(`✓ Notified ${notifiedCount} users, ${failedCount} failed`);
-		return { success: true, notified: notifiedCount, failed: failedCount };
+		return await dispatchWaitlist(productId);
 	} catch (error) {
 		console.error("Error notifying waitlist:", error);
 		return { success: false, error: error.message };
@@ -0,0 +1,365 @@
+/**
+ * Analytics Query Service
+ *
+ * Sales series for an arbitrary date range at hour/day/week/month granularity,
+ * optionally broken down per product or per category.
+ *
+ * - Source: sales rollups when the requested timezone matches the rollup
+ *   timezone, otherwise paid orders aggregated directly in that timezone
+ * - Gap filling: rows are indexed by bucket start and joined against the list
+ *   of expected buckets, so empty buckets cost O(1) each
+ * - Caching: buckets that closed more than SETTLE_MS ago no longer change, so
+ *   that part of a result is cached in Redis; only open buckets are recomputed
+ */
+
+import { redis } from "./redis.js";
+import Order from "../models/order.model.js";
+import Product from "../models/product.model.js";
+import SalesRollup from "../models/salesRollup.model.js";
+import { ROLLUP_TIMEZONE, getBucketsInRange, getNextBucket } from "./salesRollup.js";
+
+export const GRANULARITIES = ["hour", "day", "week", "month"];
+export const BREAKDOWNS = ["product", "category"];
+
+const HOUR_MS = 60 * 60 * 1000;
+const DAY_MS = 24 * HOUR_MS;
+const APPROX_BUCKET_MS = { hour: HOUR_MS, day: DAY_MS, week: 7 * DAY_MS, month: 28 * DAY_MS };
+const MAX_BUCKETS = 2000;
+const DEFAULT_RANGE_MS = 7 * DAY_MS;
+
+// Orders can be paid after their bucket ends (checkout holds, late webhooks),
+// so a bucket is only treated as final once this long has passed
+const SETTLE_MS = 60 * 60 * 1000;
+const CACHE_TTL_SECONDS = 6 * 60 * 60;
+const CACHE_VERSION_KEY = "analytics:sales:version";
+
+const UNCATEGORIZED = "Uncategorized";
+
+const isValidTimeZone = (timeZone) => {
+  try {
+    new Intl.DateTimeFormat("en-US", { timeZone });
+    return true;
+  } catch {
+    return false;
+  }
+};
+
+const parseDate = (value, fallback) => {
+  if (value === undefined || value === null || value === "") {
+    return fallback;
+  }
+  const date = new Date(value);
+  return Number.isNaN(date.getTime()) ? null : date;
+};
+
+/**
+ * Validate and normalize query parameters
+ * @param {Object} params - { from, to, granularity, timezone, groupBy } (strings)
+ * @returns {Object} - { query } or { error }
+ */
+export const parseSalesQuery = (params = {}) => {
+  const to = parseDate(params.to, new Date());
+  if (!to) {
+    return { error: "Invalid 'to' date" };
+  }
+  const from = parseDate(params.from, new Date(to.getTime() - DEFAULT_RANGE_MS));
+  if (!from) {
+    return { error: "Invalid 'from' date" };
+  }
+  if (from > to) {
+    return { error: "'from' must be before 'to'" };
+  }
+
+  const granularity = params.granularity || "day";
+  if (!GRANULARITIES.includes(granularity)) {
+    return { error: `granularity must be one of: ${GRANULARITIES.join(", ")}` };
+  }
+
+  const timezone = params.timezone || ROLLUP_TIMEZONE;
+  if (!isValidTimeZone(timezone)) {
+    return { error: `Unknown timezone: ${timezone}` };
+  }
+
+  const groupBy = params.groupBy || null;
+  if (groupBy && !BREAKDOWNS.includes(groupBy)) {
+    return { error: `groupBy must be one of: ${BREAKDOWNS.join(", ")}` };
+  }
+
+  if ((to - from) / APPROX_BUCKET_MS[granularity] > MAX_BUCKETS) {
+    return { error: `Range too large for ${granularity} granularity (max ${MAX_BUCKETS} buckets)` };
+  }
+
+  return { query: { from, to, granularity, timezone, groupBy } };
+};
+
+const bucketExpression = (date, granularity, timezone) => ({
+  $dateTrunc: { date, unit: granularity, timezone, startOfWeek: "monday" },
+});
+
+/**
+ * Aggregate raw rows for [start, end): { _id: { bucket, product }, orders, units, revenue }
+ * product is null for whole-order totals.
+ */
+const aggregateRows = async ({ granularity, timezone }, start, end, byProduct) => {
+  // Rollup buckets line up with the requested ones only in the rollup timezone
+  if (timezone === ROLLUP_TIMEZONE) {
+    return SalesRollup.aggregate([
+      {
+        $match: {
+          period: granularity === "hour" ? "hour" : "day",
+          scope: byProduct ? { $ne: "total" } : "total",
+          bucketStart: { $gte: start, $lt: end },
+        },
+      },
+      {
+        $group: {
+          _id: {
+            bucket: bucketExpression("$bucketStart", granularity, timezone),
+            product: byProduct ? "$product" : null,
+          },
+          orders: { $sum: "$orders" },
+          units: { $sum: "$units" },
+          revenue: { $sum: "$revenue" },
+        },
+      },
+    ]);
+  }
+
+  const match = { $match: { status: "paid", createdAt: { $gte: start, $lt: end } } };
+  const bucket = bucketExpression("$createdAt", granularity, timezone);
+
+  if (!byProduct) {
+    return Order.aggregate([
+      match,
+      {
+        $group: {
+          _id: { bucket, product: null },
+          orders: { $sum: 1 },
+          units: { $sum: { $sum: "$products.quantity" } },
+          revenue: { $sum: "$totalAmount" },
+        },
+      },
+    ]);
+  }
+
+  return Order.aggregate([
+    match,
+    { $unwind: "$products" },
+    // Group per order first so duplicate lines count one order
+    {
+      $group: {
+        _id: { bucket, product: "$products.product", order: "$_id" },
+        units: { $sum: "$products.quantity" },
+        revenue: { $sum: { $multiply: ["$products.quantity", "$products.price"] } },
+      },
+    },
+    {
+      $group: {
+        _id: { bucket: "$_id.bucket", product: "$_id.product" },
+        orders: { $sum: 1 },
+        units: { $sum: "$units" },
+        revenue: { $sum: "$revenue" },
+      },
+    },
+  ]);
+};
+
+const emptyPoint = (date) => ({ date, sales: 0, units: 0, revenue: 0 });
+
+const addTo = (point, row) => {
+  point.sales += row.orders;
+  point.units += row.units;
+  point.revenue += row.revenue;
+};
+
+/**
+ * Resolve breakdown group keys for product rows
+ * @returns {Map} - productId -> { key, name }
+ */
+const resolveGroups = async (rows, groupBy) => {
+  const ids = [...new Set(rows.map((row) => row._id.product?.toString()).filter(Boolean))];
+  const products = await Product.find({ _id: { $in: ids } }, { name: 1, category: 1 }).lean();
+  const byId = new Map(products.map((product) => [product._id.toString(), product]));
+
+  const groups = new Map();
+  for (const id of ids) {
+    const product = byId.get(id);
+    if (groupBy === "category") {
+      const category = product?.category || UNCATEGORIZED;
+      groups.set(id, { key: category, name: category });
+    } else {
+      groups.set(id, { key: id, name: product?.name || "Deleted product" });
+    }
+  }
+  return groups;
+};
+
+/**
+ * Compute gap-filled series for a run of consecutive buckets
+ * @returns {Object} - { series: [point], groups: { key: { name, series: [point] } } }
+ */
+const computeSegment = async (query, buckets) => {
+  const start = buckets[0].bucketStart;
+  const end = getNextBucket(buckets[buckets.length - 1], query.granularity, query.timezone).bucketStart;
+
+  const [totalRows, productRows] = await Promise.all([
+    aggregateRows(query, start, end, false),
+    query.groupBy ? aggregateRows(query, start, end, true) : [],
+  ]);
+
+  // Hash join: index rows by bucket start, then walk the expected buckets once
+  const bucketIndex = new Map(buckets.map((bucket, index) => [bucket.bucketStart.getTime(), index]));
+  const series = buckets.map((bucket) => emptyPoint(bucket.bucketKey));
+
+  for (const row of totalRows) {
+    const index = bucketIndex.get(new Date(row._id.bucket).getTime());
+    if (index !== undefined) {
+      addTo(series[index], row);
+    }
+  }
+
+  const groups = {};
+  if (query.groupBy && productRows.length > 0) {
+    const groupOf = await resolveGroups(productRows, query.groupBy);
+
+    for (const row of productRows) {
+      const index = bucketIndex.get(new Date(row._id.bucket).getTime());
+      const group = groupOf.get(row._id.product?.toString());
+      if (index === undefined || !group) {
+        continue;
+      }
+      if (!groups[group.key]) {
+        groups[group.key] = { name: group.name, series: buckets.map((bucket) => emptyPoint(bucket.bucketKey)) };
+      }
+      addTo(groups[group.key].series[index], row);
+    }
+  }
+
+  return { series, groups };
+};
+
+const getCacheVersion = async () => {
+  try {
+    return (await redis.get(CACHE_VERSION_KEY)) || "0";
+  } catch (error) {
+    console.error("Error reading analytics cache version:", error.message);
+    return null;
+  }
+};
+
+/**
+ * Invalidate cached closed-period results (call after rebuilding rollups or
+ * editing historical orders)
+ */
+export const invalidateSalesQueryCache = async () => {
+  await redis.incr(CACHE_VERSION_KEY);
+};
+
+/**
+ * Compute a closed segment, served from Redis when possible
+ */
+const getClosedSegment = async (query, buckets) => {
+  const version = await getCacheVersion();
+  if (version === null) {
+    return computeSegment(query, buckets);
+  }
+
+  const { granularity, timezone, groupBy } = query;
+  const cacheKey = [
+    "analytics:sales",
+    version,
+    timezone,
+    granularity,
+    groupBy || "total",
+    buckets[0].bucketStart.getTime(),
+    buckets[buckets.length - 1].bucketStart.getTime(),
+  ].join(":");
+
+  try {
+    const cached = await redis.get(cacheKey);
+    if (cached) {
+      return JSON.parse(cached);
+    }
+  } catch (error) {
+    console.error("Error reading analytics cache:", error.message);
+  }
+
+  const segment = await computeSegment(query, buckets);
+
+  redis.setex(cacheKey, CACHE_TTL_SECONDS, JSON.stringify(segment)).catch((error) => {
+    console.error("Error writing analytics cache:", error.message);
+  });
+
+  return segment;
+};
+
+const sumSeries = (series) => series.reduce(
+  (total, point) => {
+    total.sales += point.sales;
+    total.units += point.units;
+    total.revenue += point.revenue;
+    return total;
+  },
+  { sales: 0, units: 0, revenue: 0 }
+);
+
+/**
+ * Run a sales query
+ * @param {Object} query - Result of parseSalesQuery
+ * @returns {Object} - { from, to, granularity, timezone, groupBy, totals, series, breakdown? }
+ */
+export const querySales = async (query) => {
+  const { from, to, granularity, timezone, groupBy } = query;
+  const buckets = getBucketsInRange(from, to, granularity, timezone);
+
+  // Split into buckets that can no longer change and those still open
+  const settledBefore = Date.now() - SETTLE_MS;
+  let closedCount = 0;
+  while (
+    closedCount < buckets.length &&
+    getNextBucket(buckets[closedCount], granularity, timezone).bucketStart.getTime() <= settledBefore
+  ) {
+    closedCount++;
+  }
+
+  const closedBuckets = buckets.slice(0, closedCount);
+  const openBuckets = buckets.slice(closedCount);
+
+  const segments = await Promise.all([
+    closedBuckets.length > 0 ? getClosedSegment(query, closedBuckets) : null,
+    openBuckets.length > 0 ? computeSegment(query, openBuckets) : null,
+  ]);
+
+  const parts = [
+    { buckets: closedBuckets, segment: segments[0] },
+    { buckets: openBuckets, segment: segments[1] },
+  ].filter((part) => part.segment);
+
+  const series = parts.flatMap((part) => part.segment.series);
+
+  const result = {
+    from: buckets[0].bucketStart,
+    to: getNextBucket(buckets[buckets.length - 1], granularity, timezone).bucketStart,
+    granularity,
+    timezone,
+    groupBy,
+    totals: sumSeries(series),
+    series,
+  };
+
+  if (groupBy) {
+    const keys = new Set(parts.flatMap((part) => Object.keys(part.segment.groups)));
+
+    result.breakdown = [...keys]
+      .map((key) => {
+        const groupSeries = parts.flatMap((part) =>
+          part.segment.groups[key]?.series || part.buckets.map((bucket) => emptyPoint(bucket.bucketKey))
+        );
+        const name = parts.find((part) => part.segment.groups[key])?.segment.groups[key].name;
+        return { key, name, totals: sumSeries(groupSeries), series: groupSeries };
+      })
+      .sort((a, b) => b.totals.revenue - a.totals.revenue);
+  }
+
+  return result;
+};
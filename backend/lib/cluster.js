@@ -0,0 +1,133 @@
+/**
+ * Cluster Support (worker side)
+ *
+ * In cluster mode (cluster.js) each worker reports its health to the primary
+ * over IPC, and the primary tells exactly one worker to run the hold expiry
+ * job. Any worker can ask the primary for the cluster-wide view.
+ *
+ * Outside cluster mode the helpers describe the single process.
+ *
+ * Has no app dependencies, so the primary can import it too; the hold job
+ * controls are passed in by server.js.
+ */
+
+import cluster from "cluster";
+import crypto from "crypto";
+import { monitorEventLoopDelay } from "perf_hooks";
+
+export const HEALTH_REPORT_INTERVAL_MS = 5000;
+const HEALTH_REQUEST_TIMEOUT_MS = 2000;
+
+// IPC message types shared with cluster.js
+export const MESSAGES = {
+  health: "cluster:health",
+  healthRequest: "cluster:health:request",
+  healthResponse: "cluster:health:response",
+  holdJob: "cluster:hold-job",
+};
+
+const eventLoopDelay = monitorEventLoopDelay({ resolution: 20 });
+const pendingHealthRequests = new Map();
+let reportTimer = null;
+let holdJob = null;
+
+const toMb = (bytes) => Math.round((bytes / 1024 / 1024) * 10) / 10;
+const toMs = (nanoseconds) => Math.round((nanoseconds / 1e6) * 10) / 10;
+
+export const isClusterWorker = () => cluster.isWorker;
+
+/**
+ * Health snapshot of this process
+ */
+export const getProcessHealth = () => {
+  const memory = process.memoryUsage();
+  return {
+    pid: process.pid,
+    slot: process.env.CLUSTER_WORKER_SLOT !== undefined ? Number(process.env.CLUSTER_WORKER_SLOT) : null,
+    uptimeSeconds: Math.floor(process.uptime()),
+    memory: { rssMb: toMb(memory.rss), heapUsedMb: toMb(memory.heapUsed) },
+    eventLoopDelayMs: eventLoopDelay.count > 0
+      ? { mean: toMs(eventLoopDelay.mean), p99: toMs(eventLoopDelay.percentile(99)), max: toMs(eventLoopDelay.max) }
+      : null,
+    holdExpiryJob: holdJob ? holdJob.getStats() : null,
+  };
+};
+
+const handlePrimaryMessage = (message) => {
+  if (!message || typeof message !== "object") {
+    return;
+  }
+
+  if (message.type === MESSAGES.holdJob && holdJob) {
+    const { isRunning } = holdJob.getStats();
+    if (message.run && !isRunning) {
+      holdJob.start();
+    } else if (!message.run && isRunning) {
+      holdJob.stop();
+    }
+    return;
+  }
+
+  if (message.type === MESSAGES.healthResponse) {
+    const pending = pendingHealthRequests.get(message.id);
+    if (pending) {
+      pendingHealthRequests.delete(message.id);
+      pending(message.health);
+    }
+  }
+};
+
+/**
+ * Start reporting to the primary (no-op outside cluster mode)
+ * @param {Object} options - { holdJob: { start, stop, getStats } } run when the primary assigns it
+ */
+export const startWorkerHealthReports = (options = {}) => {
+  holdJob = options.holdJob || null;
+  if (!cluster.isWorker || reportTimer) {
+    return;
+  }
+
+  eventLoopDelay.enable();
+  process.on("message", handlePrimaryMessage);
+
+  const report = () => {
+    process.send({ type: MESSAGES.health, health: getProcessHealth() });
+    // Delay percentiles cover the last interval only
+    eventLoopDelay.reset();
+  };
+  report();
+  reportTimer = setInterval(report, HEALTH_REPORT_INTERVAL_MS);
+  reportTimer.unref();
+};
+
+export const stopWorkerHealthReports = () => {
+  if (reportTimer) {
+    clearInterval(reportTimer);
+    reportTimer = null;
+  }
+};
+
+/**
+ * Health of every worker, as last reported to the primary
+ * @returns {Object} - { mode, workers: [...], holdExpiryJob, ... }
+ */
+export const getClusterHealth = async () => {
+  if (!cluster.isWorker) {
+    const health = getProcessHealth();
+    return { mode: "single", workers: [health], holdExpiryJob: health.holdExpiryJob };
+  }
+
+  const id = crypto.randomBytes(8).toString("hex");
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => {
+      pendingHealthRequests.delete(id);
+      reject(new Error("Cluster primary did not respond"));
+    }, HEALTH_REQUEST_TIMEOUT_MS);
+
+    pendingHealthRequests.set(id, (health) => {
+      clearTimeout(timer);
+      resolve(health);
+    });
+    process.send({ type: MESSAGES.healthRequest, id });
+  });
+};
@@ -0,0 +1,182 @@
+/**
+ * Hold Status Events
+ *
+ * Pushes hold status transitions (paid, expired, cancelled) to the checkout
+ * pages watching them, so they don't poll GET /payments/hold-status.
+ *
+ * Transitions are published on a Redis channel, so every process (cluster
+ * workers, several servers) hears about orders changed elsewhere, e.g. by the
+ * expiry sweeper running in one worker. Each process subscribes with its own
+ * connection once the first client watches, and fans messages out to its
+ * local listeners per order ID.
+ *
+ * If publishing fails, the transition is still delivered to this process's
+ * listeners; the stream endpoint also re-reads the order when the hold
+ * should have expired, so a lost message only delays the update.
+ *
+ * Watchers subscribe before reading the order (watchHoldStatus), so a
+ * transition published while the read runs is buffered, not lost. Open
+ * streams and long-polls register with trackHoldWatcher, so shutdown can end
+ * them instead of waiting for every hold to expire.
+ */
+
+import { EventEmitter } from "events";
+import { redis } from "./redis.js";
+
+const CHANNEL = "hold:status";
+
+const localBus = new EventEmitter();
+// One listener per open stream
+localBus.setMaxListeners(0);
+
+// How long a watcher waits for Redis to confirm the subscription
+const SUBSCRIBE_WAIT_MS = 2000;
+
+let subscriber = null;
+let subscribed = null;
+// close() of every open stream and long-poll; null once shutdown ended them
+let openWatchers = new Set();
+
+let holdEventStats = {
+  startTime: new Date(),
+  published: 0,
+  delivered: 0,
+  publishErrors: 0,
+};
+
+const deliver = (message) => {
+  if (localBus.listenerCount(message.orderId) > 0) {
+    holdEventStats.delivered++;
+    localBus.emit(message.orderId, message);
+  }
+};
+
+// Subscribe this process to the channel (once, on first use)
+const ensureSubscribed = () => {
+  if (subscriber) {
+    return;
+  }
+  subscriber = redis.duplicate();
+  subscriber.on("error", (err) => console.error("Hold events subscriber error:", err.message));
+  subscriber.on("message", (channel, raw) => {
+    try {
+      deliver(JSON.parse(raw));
+    } catch (error) {
+      console.log("Error in hold events message", error.message);
+    }
+  });
+  subscribed = subscriber.subscribe(CHANNEL).catch(err => {
+    console.error("Error subscribing to hold events:", err.message);
+  });
+};
+
+// Resolves once the subscription is confirmed, or after SUBSCRIBE_WAIT_MS
+// (Redis unreachable: the expiry re-read covers the missed messages)
+const waitSubscribed = () => {
+  let timer = null;
+  const timeout = new Promise(resolve => {
+    timer = setTimeout(resolve, SUBSCRIBE_WAIT_MS);
+  });
+  return Promise.race([subscribed, timeout]).finally(() => clearTimeout(timer));
+};
+
+/**
+ * Announce an order's new hold status; never throws
+ * @param {Object} order - Order (or { _id, status, expiresAt }) after the change
+ */
+export const publishHoldStatus = async (order) => {
+  const message = {
+    orderId: String(order._id),
+    status: order.status,
+    expiresAt: order.expiresAt || null,
+  };
+  holdEventStats.published++;
+  try {
+    await redis.publish(CHANNEL, JSON.stringify(message));
+  } catch (error) {
+    holdEventStats.publishErrors++;
+    console.log("Error publishing hold status", error.message);
+    deliver(message);
+  }
+};
+
+/**
+ * Call listener with every status published for an order
+ * @param {string} orderId - Local order ID
+ * @param {Function} listener - ({ orderId, status, expiresAt }) => void
+ * @returns {Function} - Unsubscribe
+ */
+export const subscribeHoldStatus = (orderId, listener) => {
+  ensureSubscribed();
+  const key = String(orderId);
+  localBus.on(key, listener);
+  return () => localBus.off(key, listener);
+};
+
+/**
+ * Subscribe to an order's statuses, then read its current state
+ * Messages published while read() runs are buffered until listen() is called,
+ * so a transition between the read and the subscription is not missed.
+ * @param {string} orderId - Local order ID
+ * @param {Function} read - async () => current state of the order
+ * @returns {Promise<Object>} - { value, listen(listener), unsubscribe }; call
+ *   listen() to receive the buffered and later messages, or unsubscribe()
+ */
+export const watchHoldStatus = async (orderId, read) => {
+  const buffered = [];
+  let forward = (message) => buffered.push(message);
+  const unsubscribe = subscribeHoldStatus(orderId, (message) => forward(message));
+
+  try {
+    await waitSubscribed();
+    const value = await read();
+    const listen = (listener) => {
+      forward = listener;
+      for (const message of buffered.splice(0)) {
+        listener(message);
+      }
+    };
+    return { value, listen, unsubscribe };
+  } catch (error) {
+    unsubscribe();
+    throw error;
+  }
+};
+
+/**
+ * Register an open stream or long-poll so shutdown can end it
+ * During shutdown, close is called right away.
+ * @param {Function} close - Ends the response
+ * @returns {Function} - Unregister (call when the response ends)
+ */
+export const trackHoldWatcher = (close) => {
+  if (!openWatchers) {
+    close();
+    return () => {};
+  }
+  openWatchers.add(close);
+  return () => openWatchers?.delete(close);
+};
+
+/**
+ * End every open stream and long-poll (on shutdown)
+ * Streams tell EventSource to reconnect, which reaches another worker or the
+ * restarted server; without this, server.close() waits for the holds to expire.
+ */
+export const closeHoldWatchers = () => {
+  const watchers = openWatchers;
+  openWatchers = null;
+  for (const close of watchers || []) {
+    try {
+      close();
+    } catch (error) {
+      console.log("Error closing hold status watcher", error.message);
+    }
+  }
+};
+
+// Get hold event statistics for monitoring
+export const getHoldEventStats = () => ({
+  ...holdEventStats,
+  watchers: localBus.eventNames().reduce((sum, name) => sum + localBus.listenerCount(name), 0),
+});
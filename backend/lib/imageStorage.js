@@ -0,0 +1,261 @@
+/**
+ * Image Storage
+ *
+ * Stores uploaded product images from a stream, without buffering the file:
+ * - cloudinary: piped into a Cloudinary upload stream (default when configured)
+ * - local: written to IMAGE_UPLOAD_DIR and served by the API at /uploads
+ *   (offline/dev; IMAGE_PUBLIC_URL is the public base URL of that path)
+ *
+ * Select explicitly with IMAGE_STORAGE=cloudinary|local.
+ *
+ * Inline base64 data URLs (legacy clients) are decoded and stored the same
+ * way (storeDataUrlImage), so they work on both backends.
+ *
+ * Every upload also gets resized, compressed WebP derivatives (IMAGE_VARIANTS),
+ * generated at upload time: eager transformations on Cloudinary, sharp on
+ * local disk. Products keep their URLs in `imageVariants`.
+ */
+
+import fs from "fs";
+import path from "path";
+import crypto from "crypto";
+import { Readable } from "stream";
+import { pipeline } from "stream/promises";
+import sharp from "sharp";
+import cloudinary from "./cloudinary.js";
+import { extractCloudinaryPublicId } from "./cloudinaryUtils.js";
+
+export const LOCAL_UPLOAD_DIR = path.resolve(process.env.IMAGE_UPLOAD_DIR || "uploads");
+const LOCAL_PUBLIC_URL = (process.env.IMAGE_PUBLIC_URL || `http://localhost:${process.env.PORT || 5000}/uploads`).replace(/\/+$/, "");
+
+export const MAX_IMAGE_BYTES = 5 * 1024 * 1024;
+
+// Derivative name -> max width and WebP quality
+export const IMAGE_VARIANTS = {
+  thumb: { width: 200, quality: 70 },
+  card: { width: 480, quality: 75 },
+  large: { width: 1200, quality: 80 },
+};
+
+const EXTENSIONS = {
+  "image/jpeg": ".jpg",
+  "image/jpg": ".jpg",
+  "image/png": ".png",
+  "image/webp": ".webp",
+  "image/gif": ".gif",
+};
+
+export const ALLOWED_IMAGE_TYPES = Object.keys(EXTENSIONS);
+
+const DATA_URL_PATTERN = /^data:(image\/[a-z+.-]+);base64,/;
+
+const CLOUDINARY_UPLOAD_PATTERN = /^https?:\/\/res\.cloudinary\.com\/[^/]+\/image\/upload\//;
+
+// Same transformation string for the eager upload and the delivery URL, so
+// requests hit the derivative generated at upload time
+const cloudinaryTransformation = ({ width, quality }) => `c_limit,f_webp,q_${quality},w_${width}`;
+
+export const getImageStorageName = () => {
+  if (process.env.IMAGE_STORAGE) {
+    return process.env.IMAGE_STORAGE;
+  }
+  return process.env.CLOUDINARY_CLOUD_NAME ? "cloudinary" : "local";
+};
+
+/**
+ * Cloudinary upload options that pre-generate every derivative
+ * @param {string} folder - Cloudinary folder
+ */
+export const getCloudinaryUploadOptions = (folder = "products") => ({
+  folder,
+  eager: Object.values(IMAGE_VARIANTS).map(cloudinaryTransformation).join("|"),
+});
+
+const getCloudinaryVariants = (url) => {
+  const variants = {};
+  for (const [name, variant] of Object.entries(IMAGE_VARIANTS)) {
+    variants[name] = url.replace("/image/upload/", `/image/upload/${cloudinaryTransformation(variant)}/`);
+  }
+  return variants;
+};
+
+// products/abc.png -> products/abc-thumb.webp
+const localVariantName = (filename, name) => `${path.parse(filename).name}-${name}.webp`;
+
+const localPathFromUrl = (url) => {
+  if (!url.startsWith(`${LOCAL_PUBLIC_URL}/`)) {
+    return null;
+  }
+  const filePath = path.resolve(LOCAL_UPLOAD_DIR, url.slice(LOCAL_PUBLIC_URL.length + 1));
+  // Never touch files outside the upload directory
+  return filePath.startsWith(LOCAL_UPLOAD_DIR + path.sep) ? filePath : null;
+};
+
+const localVariantPaths = (filePath) => {
+  const filename = path.basename(filePath);
+  return Object.keys(IMAGE_VARIANTS).map(name => [name, path.join(path.dirname(filePath), localVariantName(filename, name))]);
+};
+
+const fileExists = (file) => fs.promises.access(file).then(() => true, () => false);
+
+const generateLocalVariants = async (filePath) => {
+  await Promise.all(
+    localVariantPaths(filePath).map(([name, variantPath]) =>
+      sharp(filePath)
+        .rotate() // apply EXIF orientation before metadata is stripped
+        .resize({ width: IMAGE_VARIANTS[name].width, withoutEnlargement: true })
+        .webp({ quality: IMAGE_VARIANTS[name].quality })
+        .toFile(variantPath)
+    )
+  );
+};
+
+const storeInCloudinary = (fileStream, folder) => new Promise((resolve, reject) => {
+  const upload = cloudinary.uploader.upload_stream(getCloudinaryUploadOptions(folder), (error, result) => {
+    if (error) {
+      reject(error);
+    } else {
+      resolve({ url: result.secure_url, storage: "cloudinary", variants: getCloudinaryVariants(result.secure_url) });
+    }
+  });
+  fileStream.on("error", reject);
+  fileStream.pipe(upload);
+});
+
+const storeLocally = async (fileStream, folder, mimeType) => {
+  const directory = path.join(LOCAL_UPLOAD_DIR, folder);
+  await fs.promises.mkdir(directory, { recursive: true });
+
+  const filename = `${crypto.randomBytes(12).toString("hex")}${EXTENSIONS[mimeType] || ""}`;
+  const filePath = path.join(directory, filename);
+
+  try {
+    await pipeline(fileStream, fs.createWriteStream(filePath));
+  } catch (error) {
+    await fs.promises.unlink(filePath).catch(() => {});
+    throw error;
+  }
+
+  const url = `${LOCAL_PUBLIC_URL}/${folder}/${filename}`;
+
+  // Without derivatives pages fall back to the original, so keep the upload
+  try {
+    await generateLocalVariants(filePath);
+  } catch (error) {
+    console.log("error generating image variants", error.message);
+  }
+
+  return { url, storage: "local", variants: await getImageVariants(url) };
+};
+
+/**
+ * Store an image from a readable stream and generate its derivatives
+ * @param {Readable} fileStream - Image bytes
+ * @param {Object} options - { mimeType, folder }
+ * @returns {Object} - { url, storage, variants }
+ */
+export const storeImageStream = (fileStream, { mimeType, folder = "products" } = {}) => {
+  if (getImageStorageName() === "local") {
+    return storeLocally(fileStream, folder, mimeType);
+  }
+  return storeInCloudinary(fileStream, folder);
+};
+
+// Legacy clients send the image inline as a base64 data URL
+export const isDataUrlImage = (image) => typeof image === "string" && image.startsWith("data:image");
+
+/**
+ * Decode an inline base64 data URL image
+ * @param {string} dataUrl - data:image/...;base64,...
+ * @returns {Object|null} - { buffer, mimeType }, or null if it is not an allowed image
+ *   type or is larger than MAX_IMAGE_BYTES
+ */
+export const parseDataUrlImage = (dataUrl) => {
+  const match = isDataUrlImage(dataUrl) && DATA_URL_PATTERN.exec(dataUrl.slice(0, 100));
+  if (!match || !ALLOWED_IMAGE_TYPES.includes(match[1])) {
+    return null;
+  }
+  const buffer = Buffer.from(dataUrl.slice(match[0].length), "base64");
+  if (buffer.length === 0 || buffer.length > MAX_IMAGE_BYTES) {
+    return null;
+  }
+  return { buffer, mimeType: match[1] };
+};
+
+/**
+ * Store an inline base64 data URL image like an upload
+ * @param {string} dataUrl - data:image/...;base64,...
+ * @param {Object} options - { folder }
+ * @returns {Object} - { url, storage, variants }
+ */
+export const storeDataUrlImage = async (dataUrl, { folder = "products" } = {}) => {
+  const image = parseDataUrlImage(dataUrl);
+  if (!image) {
+    throw new Error("Inline image must be a base64 JPEG, PNG, WebP or GIF data URL under the size limit");
+  }
+  return storeImageStream(Readable.from([image.buffer]), { mimeType: image.mimeType, folder });
+};
+
+/**
+ * Derivative URLs of a stored image
+ * Images stored elsewhere and inline data URLs have none; pages use `image`
+ * @param {string} url - Image URL as saved on the product
+ * @param {Object} options - { generate: create missing derivatives first }
+ * @returns {Object} - { thumb, card, large } (only those that exist)
+ */
+export const getImageVariants = async (url, { generate = false } = {}) => {
+  if (!url || typeof url !== "string") {
+    return {};
+  }
+
+  if (CLOUDINARY_UPLOAD_PATTERN.test(url)) {
+    const publicId = generate && extractCloudinaryPublicId(url);
+    if (publicId) {
+      await cloudinary.uploader.explicit(publicId, { type: "upload", eager: getCloudinaryUploadOptions().eager });
+    }
+    return getCloudinaryVariants(url);
+  }
+
+  const filePath = localPathFromUrl(url);
+  if (!filePath) {
+    return {};
+  }
+
+  const paths = localVariantPaths(filePath);
+  let present = await Promise.all(paths.map(([, variantPath]) => fileExists(variantPath)));
+  if (generate && present.includes(false) && await fileExists(filePath)) {
+    await generateLocalVariants(filePath);
+    present = await Promise.all(paths.map(([, variantPath]) => fileExists(variantPath)));
+  }
+
+  const variants = {};
+  paths.forEach(([name, variantPath], index) => {
+    if (present[index]) {
+      variants[name] = url.replace(/[^/]+$/, path.basename(variantPath));
+    }
+  });
+  return variants;
+};
+
+/**
+ * Delete a stored image and its derivatives by URL; other URLs are ignored
+ * @param {string} url - Image URL as saved on the product
+ */
+export const deleteStoredImage = async (url) => {
+  if (!url || typeof url !== "string") {
+    return;
+  }
+
+  const filePath = localPathFromUrl(url);
+  if (filePath) {
+    const files = [filePath, ...localVariantPaths(filePath).map(([, variantPath]) => variantPath)];
+    await Promise.all(files.map(file => fs.promises.unlink(file).catch(() => {})));
+    return;
+  }
+
+  // Destroying the original also removes its derived images
+  const publicId = extractCloudinaryPublicId(url);
+  if (publicId) {
+    await cloudinary.uploader.destroy(publicId, { invalidate: true });
+  }
+};
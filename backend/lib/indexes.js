@@ -0,0 +1,105 @@
+/**
+ * Index Verification
+ *
+ * Diffs the indexes declared on each mongoose schema against the ones that
+ * exist in MongoDB:
+ * - missing: declared but not built (autoIndex off, a failed build, a new
+ *   index on a deploy that skipped the build)
+ * - extra: present in MongoDB but no longer declared (candidates to drop;
+ *   every index slows down writes)
+ *
+ * Runs at startup (warnings only) and via `npm run indexes:check`.
+ * The declared set and the queries behind it: docs/DATABASE_INDEXES.md
+ */
+
+import mongoose from "mongoose";
+
+const NAMESPACE_NOT_FOUND = 26;
+
+// { trackingStatus: 1, createdAt: 1 } -> trackingStatus_1_createdAt_1
+export const indexName = (fields) =>
+  Object.entries(fields).map(([field, direction]) => `${field}_${direction}`).join("_");
+
+/**
+ * Declared vs. actual indexes of one model
+ * @param {Model} Model - mongoose model
+ * @returns {Object} - { model, collection, declared, missing, extra, error }
+ */
+export const diffModelIndexes = async (Model) => {
+  const result = {
+    model: Model.modelName,
+    collection: Model.collection.collectionName,
+    declared: Model.schema.indexes().map(([fields]) => indexName(fields)),
+    missing: [],
+    extra: [],
+    error: null,
+  };
+
+  try {
+    // Let builds started by autoIndex finish first
+    await Model.init();
+  } catch (error) {
+    // e.g. a unique index that existing duplicates prevent from building
+    result.error = error.message;
+  }
+
+  try {
+    const { toCreate, toDrop } = await Model.diffIndexes();
+    result.missing = toCreate.map(indexName);
+    result.extra = toDrop;
+  } catch (error) {
+    if (error.code !== NAMESPACE_NOT_FOUND) {
+      throw error;
+    }
+    // Collection not created yet: everything is missing, nothing is wrong
+    result.missing = result.declared;
+  }
+
+  return result;
+};
+
+/**
+ * Diff every registered model
+ * @returns {Array} - diffModelIndexes results, models with problems first
+ */
+export const diffIndexes = async () => {
+  const results = [];
+  for (const Model of Object.values(mongoose.models)) {
+    results.push(await diffModelIndexes(Model));
+  }
+  const problems = (r) => r.missing.length + r.extra.length + (r.error ? 1 : 0);
+  return results.sort((a, b) => problems(b) - problems(a) || a.model.localeCompare(b.model));
+};
+
+/**
+ * Log index drift at startup; never throws
+ */
+export const verifyIndexes = async () => {
+  try {
+    const results = await diffIndexes();
+    let problems = 0;
+
+    for (const { model, missing, extra, error } of results) {
+      if (missing.length > 0) {
+        console.warn(`⚠ ${model}: missing indexes ${missing.join(", ")}`);
+      }
+      if (extra.length > 0) {
+        console.warn(`⚠ ${model}: undeclared indexes ${extra.join(", ")}`);
+      }
+      if (error) {
+        console.warn(`⚠ ${model}: index build failed: ${error}`);
+      }
+      problems += missing.length + extra.length + (error ? 1 : 0);
+    }
+
+    if (problems === 0) {
+      console.log(`✓ Indexes match their declarations (${results.length} models)`);
+    } else {
+      console.warn("Run `npm run indexes:check` for details");
+    }
+    return results;
+  } catch (error) {
+    console.error("Error verifying indexes:", error.message);
+    return null;
+  }
+};
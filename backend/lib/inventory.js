@@ -0,0 +1,641 @@
+/**
+ * Redis Inventory Counters
+ *
+ * Optional inventory mode (INVENTORY_MODE=redis) for flash sales. In the
+ * default mode every reservation is a conditional update of the Product
+ * document, so all buyers of one product queue up on that document. Here
+ * the counters live in Redis and each reserve / release / finalize is one
+ * atomic script over all the order's products:
+ *
+ *   inventory:<productId>        hash { stock, reserved, sold }  (authoritative)
+ *   inventory:delta:<productId>  hash of changes not yet written to MongoDB
+ *   inventory:dirty              set of products with a pending delta
+ *
+ * Write-behind: every INVENTORY_FLUSH_MS each process takes the pending
+ * deltas (atomically, so two processes never apply the same delta) and
+ * applies them to stockQuantity / reservedQuantity / sold with one bulkWrite.
+ * A failed write puts the deltas back. Product documents therefore lag Redis
+ * by about one flush interval.
+ *
+ * A product's counters are loaded from MongoDB the first time it is used.
+ * Admin stock edits set the Redis stock too (setInventoryStock).
+ *
+ * Drift detector: every INVENTORY_DRIFT_CHECK_MS one process compares
+ * Redis (minus pending deltas) with MongoDB and reports products that
+ * disagree twice in a row (a flush may be in flight the first time).
+ * Drift is reported, never fixed automatically: `npm run inventory:drift`
+ * shows it, `-- --fix` corrects MongoDB to match Redis.
+ */
+
+import { redis } from "./redis.js";
+import Product from "../models/product.model.js";
+import { recordInventoryDrift, recordInventoryOperation } from "./metrics.js";
+
+export const INVENTORY_MODE = process.env.INVENTORY_MODE === "redis" ? "redis" : "mongo";
+
+const FLUSH_INTERVAL_MS = parseInt(process.env.INVENTORY_FLUSH_MS) || 1000;
+const DRIFT_CHECK_INTERVAL_MS = parseInt(process.env.INVENTORY_DRIFT_CHECK_MS) || 5 * 60 * 1000;
+const DRIFT_RECHECK_DELAY_MS = Math.max(2 * FLUSH_INTERVAL_MS, 2000);
+const DRIFT_BATCH = 500;
+const FLUSH_BATCH = 500;
+
+const DIRTY_KEY = "inventory:dirty";
+const DRIFT_LOCK_KEY = "inventory:drift:lock";
+const inventoryKey = (productId) => `inventory:${productId}`;
+const deltaKey = (productId) => `inventory:delta:${productId}`;
+
+const FIELDS = ["stock", "reserved", "sold"];
+// Redis field -> Product field
+const PRODUCT_FIELDS = { stock: "stockQuantity", reserved: "reservedQuantity", sold: "sold" };
+
+/* =======================
+   Scripts
+======================= */
+// KEYS: dirty set, then (inventory, delta) per product
+// ARGV: op, then (productId, qty, reservedQty) per product
+// op: reserve (reserved += qty if stock - reserved >= qty)
+//     release (reserved -= qty, not below 0)
+//     commit  (stock -= qty if stock >= qty, reserved -= reservedQty, sold += qty)
+//     sell    (stock -= qty, sold += qty if stock - reserved >= qty)
+// All products or none. Returns { 'ok' } / { 'missing', i } / { 'insufficient', i, available }
+redis.defineCommand("inventoryApply", {
+  lua: `
+    local op = ARGV[1]
+    local n = (#KEYS - 1) / 2
+    local state = {}
+
+    for i = 1, n do
+      local counters = redis.call('HMGET', KEYS[i * 2], 'stock', 'reserved')
+      if not counters[1] then return { 'missing', i } end
+      local stock = tonumber(counters[1])
+      local reserved = tonumber(counters[2]) or 0
+      local qty = tonumber(ARGV[i * 3])
+      if (op == 'reserve' or op == 'sell') and stock - reserved < qty then
+        return { 'insufficient', i, stock - reserved }
+      end
+      if op == 'commit' and stock < qty then
+        return { 'insufficient', i, stock }
+      end
+      state[i] = { reserved, qty, tonumber(ARGV[i * 3 + 1]) }
+    end
+
+    for i = 1, n do
+      local reserved, qty, reservedQty = state[i][1], state[i][2], state[i][3]
+      local changes = {}
+      if op == 'reserve' then
+        changes.reserved = qty
+      elseif op == 'release' then
+        changes.reserved = -math.min(reserved, qty)
+      elseif op == 'commit' then
+        changes.stock = -qty
+        changes.reserved = -math.min(reserved, reservedQty)
+        changes.sold = qty
+      elseif op == 'sell' then
+        changes.stock = -qty
+        changes.sold = qty
+      end
+      for field, change in pairs(changes) do
+        if change ~= 0 then
+          redis.call('HINCRBY', KEYS[i * 2], field, change)
+          redis.call('HINCRBY', KEYS[i * 2 + 1], field, change)
+        end
+      end
+      redis.call('SADD', KEYS[1], ARGV[i * 3 - 1])
+    end
+    return { 'ok' }
+  `,
+});
+
+// KEYS: dirty set, then (inventory, delta) per product
+// ARGV: (productId, stockChange, reservedChange, soldChange) per product
+// Reconciliation corrections and returned sales; counters don't go below 0.
+// Missing products are skipped
+redis.defineCommand("inventoryAdjust", {
+  lua: `
+    local n = (#KEYS - 1) / 2
+    for i = 1, n do
+      if redis.call('EXISTS', KEYS[i * 2]) == 1 then
+        local counters = redis.call('HMGET', KEYS[i * 2], 'stock', 'reserved', 'sold')
+        local changes = {
+          stock = math.max(-(tonumber(counters[1]) or 0), tonumber(ARGV[i * 4 - 2])),
+          reserved = math.max(-(tonumber(counters[2]) or 0), tonumber(ARGV[i * 4 - 1])),
+          sold = math.max(-(tonumber(counters[3]) or 0), tonumber(ARGV[i * 4])),
+        }
+        for field, change in pairs(changes) do
+          if change ~= 0 then
+            redis.call('HINCRBY', KEYS[i * 2], field, change)
+            redis.call('HINCRBY', KEYS[i * 2 + 1], field, change)
+          end
+        end
+        redis.call('SADD', KEYS[1], ARGV[i * 4 - 3])
+      end
+    end
+    return n
+  `,
+});
+
+// KEYS: inventory; ARGV: stock, reserved, sold. Loads only if not loaded yet
+redis.defineCommand("inventoryLoad", {
+  numberOfKeys: 1,
+  lua: `
+    if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+    redis.call('HSET', KEYS[1], 'stock', ARGV[1], 'reserved', ARGV[2], 'sold', ARGV[3])
+    return 1
+  `,
+});
+
+// KEYS: inventory, delta; ARGV: stock. Absolute stock from an admin edit;
+// the pending stock delta is dropped because MongoDB already has the value
+redis.defineCommand("inventorySetStock", {
+  numberOfKeys: 2,
+  lua: `
+    if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+    redis.call('HSET', KEYS[1], 'stock', ARGV[1])
+    redis.call('HDEL', KEYS[2], 'stock')
+    return 1
+  `,
+});
+
+// KEYS: dirty set, then delta per product; ARGV: productIds
+// Takes and clears the deltas; returns flattened HGETALL per product
+redis.defineCommand("inventoryTakeDeltas", {
+  lua: `
+    local result = {}
+    for i = 2, #KEYS do
+      result[i - 1] = redis.call('HGETALL', KEYS[i])
+      redis.call('DEL', KEYS[i])
+      redis.call('SREM', KEYS[1], ARGV[i - 1])
+    end
+    return result
+  `,
+});
+
+// KEYS: inventory, delta per product. Counters and pending deltas read together
+redis.defineCommand("inventorySnapshot", {
+  lua: `
+    local result = {}
+    for i = 1, #KEYS, 2 do
+      result[#result + 1] = redis.call('HMGET', KEYS[i], 'stock', 'reserved', 'sold')
+      result[#result + 1] = redis.call('HMGET', KEYS[i + 1], 'stock', 'reserved', 'sold')
+    end
+    return result
+  `,
+});
+
+/* =======================
+   State
+======================= */
+let flushIntervalId = null;
+let driftIntervalId = null;
+let inventoryStats = {
+  startTime: new Date(),
+  operations: { reserve: 0, release: 0, commit: 0, sell: 0, adjust: 0 },
+  insufficient: 0,
+  loads: 0,
+  flushes: 0,
+  flushedProducts: 0,
+  flushErrors: 0,
+  lastFlushAt: null,
+  lastDriftCheck: null,
+};
+
+const toNumber = (value) => Number(value) || 0;
+
+// Sum quantities per product (the scripts check each product once);
+// reserved is the part of quantity a commit takes off reserved (default all)
+const mergeItems = (items) => {
+  const merged = new Map();
+  for (const { productId, quantity, reserved = quantity } of items) {
+    const id = String(productId);
+    const entry = merged.get(id) || { productId: id, quantity: 0, reserved: 0 };
+    entry.quantity += quantity;
+    entry.reserved += reserved;
+    merged.set(id, entry);
+  }
+  return [...merged.values()];
+};
+
+/**
+ * Load a product's counters from MongoDB (no-op if already loaded)
+ * @returns {boolean} - false if the product doesn't exist
+ */
+const loadProduct = async (productId) => {
+  const product = await Product.findById(productId).select("stockQuantity reservedQuantity sold").lean();
+  if (!product) {
+    return false;
+  }
+  await redis.inventoryLoad(
+    inventoryKey(productId),
+    product.stockQuantity || 0,
+    product.reservedQuantity || 0,
+    product.sold || 0
+  );
+  inventoryStats.loads++;
+  return true;
+};
+
+/**
+ * Run one counter operation over several products
+ * @param {string} op - reserve, release, commit or sell
+ * @param {Array} items - [{ productId, quantity, reserved? }]
+ * @returns {Object} - { success: true } or { success: false, productId, available }
+ */
+const applyInventory = async (op, items) => {
+  const merged = mergeItems(items);
+  if (merged.length === 0) {
+    return { success: true };
+  }
+
+  const keys = [DIRTY_KEY];
+  const args = [op];
+  for (const { productId, quantity, reserved } of merged) {
+    keys.push(inventoryKey(productId), deltaKey(productId));
+    args.push(productId, quantity, reserved);
+  }
+
+  // Each retry loads one more product; after that every product is loaded
+  for (let attempt = 0; attempt <= merged.length; attempt++) {
+    const [outcome, index, available] = await redis.inventoryApply(keys.length, ...keys, ...args);
+
+    if (outcome === "ok") {
+      inventoryStats.operations[op]++;
+      recordInventoryOperation(op, "success");
+      return { success: true };
+    }
+
+    const { productId } = merged[index - 1];
+    if (outcome === "insufficient") {
+      inventoryStats.insufficient++;
+      recordInventoryOperation(op, "insufficient");
+      return { success: false, productId, available: Math.max(0, toNumber(available)) };
+    }
+
+    // missing: first use of this product
+    if (!(await loadProduct(productId))) {
+      recordInventoryOperation(op, "not_found");
+      return { success: false, productId, available: 0, notFound: true };
+    }
+  }
+  throw new Error(`Inventory ${op} could not load its products`);
+};
+
+/* =======================
+   Operations
+======================= */
+export const isRedisInventory = () => INVENTORY_MODE === "redis";
+
+// Increment reserved for every item, or none (stock - reserved must cover each)
+export const reserveInventory = (items) => applyInventory("reserve", items);
+
+// Decrement reserved (never below 0)
+export const releaseInventory = (items) => applyInventory("release", items);
+
+// Payment confirmed: stock and reserved down, sold up, for every item or none
+// (item.reserved: how much of the quantity was still reserved, default all)
+export const commitInventory = (items) => applyInventory("commit", items);
+
+// Sale without a hold (manual orders): stock down, sold up if available
+export const sellInventory = (items) => applyInventory("sell", items);
+
+/**
+ * Add to stock / reserved / sold (negative to remove), not below 0: reconciliation
+ * corrections, and sales given back (manual orders that weren't saved)
+ * @param {Array} changes - [{ productId, stock, reserved, sold }]
+ */
+export const adjustInventory = async (changes) => {
+  if (changes.length === 0) {
+    return;
+  }
+  const keys = [DIRTY_KEY];
+  const args = [];
+  for (const { productId, stock = 0, reserved = 0, sold = 0 } of changes) {
+    keys.push(inventoryKey(productId), deltaKey(productId));
+    args.push(String(productId), stock, reserved, sold);
+  }
+  await redis.inventoryAdjust(keys.length, ...keys, ...args);
+  inventoryStats.operations.adjust++;
+  recordInventoryOperation("adjust", "success");
+};
+
+/**
+ * Available stock (stock - reserved) per product
+ * @param {Array<string>} productIds
+ * @returns {Map} - productId -> available, or null for products that don't exist
+ */
+export const getAvailableInventory = async (productIds) => {
+  const ids = [...new Set(productIds.map(String))];
+  const result = new Map();
+
+  const read = async (pending) => {
+    const pipeline = redis.pipeline();
+    for (const id of pending) {
+      pipeline.hmget(inventoryKey(id), "stock", "reserved");
+    }
+    const replies = await pipeline.exec();
+    const missing = [];
+    replies.forEach(([error, counters], i) => {
+      if (error) throw error;
+      if (counters[0] === null) {
+        missing.push(pending[i]);
+      } else {
+        result.set(pending[i], toNumber(counters[0]) - toNumber(counters[1]));
+      }
+    });
+    return missing;
+  };
+
+  const missing = await read(ids);
+  const loaded = [];
+  for (const id of missing) {
+    if (await loadProduct(id)) {
+      loaded.push(id);
+    } else {
+      result.set(id, null);
+    }
+  }
+  if (loaded.length > 0) {
+    await read(loaded);
+  }
+  return result;
+};
+
+/**
+ * Admin stock edit: MongoDB was just updated, make Redis match
+ * (products not loaded yet pick the value up when they are)
+ */
+export const setInventoryStock = async (productId, stockQuantity) => {
+  await redis.inventorySetStock(inventoryKey(productId), deltaKey(productId), stockQuantity);
+};
+
+/* =======================
+   Write-behind
+======================= */
+/**
+ * Apply pending deltas to MongoDB
+ * @returns {number} - Products updated
+ */
+export const flushInventory = async () => {
+  const productIds = await redis.srandmember(DIRTY_KEY, FLUSH_BATCH);
+  if (productIds.length === 0) {
+    return 0;
+  }
+
+  const replies = await redis.inventoryTakeDeltas(
+    productIds.length + 1,
+    DIRTY_KEY,
+    ...productIds.map(deltaKey),
+    ...productIds
+  );
+
+  const deltas = [];
+  replies.forEach((flat, i) => {
+    const change = {};
+    for (let f = 0; f < flat.length; f += 2) {
+      const value = toNumber(flat[f + 1]);
+      if (value !== 0) change[flat[f]] = value;
+    }
+    if (Object.keys(change).length > 0) {
+      deltas.push({ productId: productIds[i], change });
+    }
+  });
+  if (deltas.length === 0) {
+    return 0;
+  }
+
+  try {
+    await Product.bulkWrite(
+      deltas.map(({ productId, change }) => ({
+        updateOne: {
+          filter: { _id: productId },
+          update: {
+            $inc: Object.fromEntries(Object.entries(change).map(([field, value]) => [PRODUCT_FIELDS[field], value])),
+          },
+        },
+      })),
+      { ordered: false }
+    );
+  } catch (error) {
+    // Put the deltas back for the next flush (a partially applied bulkWrite
+    // leaves drift for the detector to report)
+    inventoryStats.flushErrors++;
+    const pipeline = redis.pipeline();
+    for (const { productId, change } of deltas) {
+      for (const [field, value] of Object.entries(change)) {
+        pipeline.hincrby(deltaKey(productId), field, value);
+      }
+      pipeline.sadd(DIRTY_KEY, productId);
+    }
+    await pipeline.exec();
+    throw error;
+  }
+
+  inventoryStats.flushes++;
+  inventoryStats.flushedProducts += deltas.length;
+  inventoryStats.lastFlushAt = new Date();
+  return deltas.length;
+};
+
+/* =======================
+   Drift detection
+======================= */
+// Products whose MongoDB counters differ from Redis minus pending deltas
+const findDrift = async (productIds) => {
+  const keys = productIds.flatMap(id => [inventoryKey(id), deltaKey(id)]);
+  const [snapshot, products] = await Promise.all([
+    redis.inventorySnapshot(keys.length, ...keys),
+    Product.find({ _id: { $in: productIds } }).select("name stockQuantity reservedQuantity sold").lean(),
+  ]);
+  const byId = new Map(products.map(p => [String(p._id), p]));
+
+  const drifted = [];
+  productIds.forEach((id, i) => {
+    const counters = snapshot[i * 2];
+    const pending = snapshot[i * 2 + 1];
+    const product = byId.get(id);
+    if (counters[0] === null || !product) {
+      return; // not loaded, or deleted
+    }
+    const fields = {};
+    FIELDS.forEach((field, f) => {
+      const expected = toNumber(counters[f]) - toNumber(pending[f]);
+      const actual = product[PRODUCT_FIELDS[field]] || 0;
+      if (expected !== actual) {
+        fields[PRODUCT_FIELDS[field]] = { redis: toNumber(counters[f]), pending: toNumber(pending[f]), mongo: actual };
+      }
+    });
+    if (Object.keys(fields).length > 0) {
+      drifted.push({ productId: id, name: product.name, fields });
+    }
+  });
+  return drifted;
+};
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// IDs of every product with counters in Redis
+const scanLoadedProducts = async () => {
+  const productIds = [];
+  let cursor = "0";
+  do {
+    const [next, keys] = await redis.scan(cursor, "MATCH", "inventory:*", "COUNT", 1000);
+    cursor = next;
+    for (const key of keys) {
+      const id = key.slice("inventory:".length);
+      // Skip inventory:delta:*, inventory:dirty and other non-product keys
+      if (/^[0-9a-f]{24}$/i.test(id)) productIds.push(id);
+    }
+  } while (cursor !== "0");
+  return productIds;
+};
+
+/**
+ * Counters of every loaded product, plus the given products (loaded first
+ * if needed); products that don't exist are left out
+ * @param {Array<string>} productIds
+ * @returns {Map} - productId -> { stock, reserved, sold }
+ */
+export const getInventoryCounters = async (productIds = []) => {
+  const result = new Map();
+  const read = async (ids) => {
+    for (let i = 0; i < ids.length; i += DRIFT_BATCH) {
+      const batch = ids.slice(i, i + DRIFT_BATCH);
+      const pipeline = redis.pipeline();
+      for (const id of batch) {
+        pipeline.hmget(inventoryKey(id), "stock", "reserved", "sold");
+      }
+      const replies = await pipeline.exec();
+      replies.forEach(([error, counters], j) => {
+        if (error) throw error;
+        if (counters[0] !== null) {
+          const [stock, reserved, sold] = counters.map(toNumber);
+          result.set(batch[j], { stock, reserved, sold });
+        }
+      });
+    }
+  };
+
+  await read([...new Set([...(await scanLoadedProducts()), ...productIds.map(String)])]);
+  const loaded = [];
+  for (const id of new Set(productIds.map(String))) {
+    if (!result.has(id) && (await loadProduct(id))) {
+      loaded.push(id);
+    }
+  }
+  await read(loaded);
+  return result;
+};
+
+/**
+ * Compare every loaded product's counters with MongoDB
+ * @returns {Object} - { checkedAt, products, drifted: [{ productId, name, fields }] }
+ */
+export const checkInventoryDrift = async () => {
+  const productIds = await scanLoadedProducts();
+
+  const drifted = [];
+  for (let i = 0; i < productIds.length; i += DRIFT_BATCH) {
+    const batch = productIds.slice(i, i + DRIFT_BATCH);
+    const suspects = await findDrift(batch);
+    if (suspects.length > 0) {
+      // A flush may have been between Redis and MongoDB; look again
+      await sleep(DRIFT_RECHECK_DELAY_MS);
+      drifted.push(...(await findDrift(suspects.map(s => s.productId))));
+    }
+  }
+
+  const result = { checkedAt: new Date(), products: productIds.length, drifted };
+  inventoryStats.lastDriftCheck = { checkedAt: result.checkedAt, products: result.products, drifted: drifted.length };
+  recordInventoryDrift(drifted.length);
+  return result;
+};
+
+/**
+ * Correct MongoDB to match Redis (Redis is authoritative in this mode)
+ * Applied as $inc of the difference seen by the drift check, so a flush
+ * landing in between is still counted exactly once
+ * @param {Array} drifted - checkInventoryDrift().drifted
+ * @returns {number} - Products corrected
+ */
+export const repairInventoryDrift = async (drifted) => {
+  if (drifted.length === 0) {
+    return 0;
+  }
+  const result = await Product.bulkWrite(
+    drifted.map(({ productId, fields }) => ({
+      updateOne: {
+        filter: { _id: productId },
+        update: {
+          $inc: Object.fromEntries(
+            Object.entries(fields).map(([field, { redis: redisValue, pending, mongo }]) => [field, redisValue - pending - mongo])
+          ),
+        },
+      },
+    })),
+    { ordered: false }
+  );
+  return result.modifiedCount;
+};
+
+/* =======================
+   Lifecycle
+======================= */
+// Start write-behind flushing and the drift detector (Redis mode only)
+export const startInventorySync = () => {
+  if (!isRedisInventory() || flushIntervalId) {
+    return;
+  }
+  console.log(`🔄 Redis inventory: flushing to MongoDB every ${FLUSH_INTERVAL_MS}ms`);
+
+  let flushing = false;
+  flushIntervalId = setInterval(async () => {
+    if (flushing) return;
+    flushing = true;
+    try {
+      // Drain in batches while there is a backlog
+      while ((await flushInventory()) >= FLUSH_BATCH);
+    } catch (error) {
+      console.error("Error flushing inventory:", error.message);
+    } finally {
+      flushing = false;
+    }
+  }, FLUSH_INTERVAL_MS);
+
+  driftIntervalId = setInterval(async () => {
+    try {
+      // One process checks per interval
+      const acquired = await redis.set(DRIFT_LOCK_KEY, "1", "PX", DRIFT_CHECK_INTERVAL_MS - 1000, "NX");
+      if (!acquired) return;
+      const { drifted } = await checkInventoryDrift();
+      for (const { productId, name, fields } of drifted) {
+        console.warn(`⚠ Inventory drift for ${name} (${productId}):`, JSON.stringify(fields));
+      }
+    } catch (error) {
+      console.error("Error checking inventory drift:", error.message);
+    }
+  }, DRIFT_CHECK_INTERVAL_MS);
+};
+
+// Stop flushing, after one last flush of this process's pending deltas
+export const stopInventorySync = async () => {
+  if (!flushIntervalId) {
+    return;
+  }
+  clearInterval(flushIntervalId);
+  clearInterval(driftIntervalId);
+  flushIntervalId = null;
+  driftIntervalId = null;
+  try {
+    await flushInventory();
+  } catch (error) {
+    console.error("Error in final inventory flush:", error.message);
+  }
+  console.log("Redis inventory sync stopped");
+};
+
+// Get inventory statistics for monitoring
+export const getInventoryStats = async () => ({
+  mode: INVENTORY_MODE,
+  ...inventoryStats,
+  isSyncing: flushIntervalId !== null,
+  pendingProducts: isRedisInventory() ? await redis.scard(DIRTY_KEY) : 0,
+});
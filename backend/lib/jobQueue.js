@@ -0,0 +1,372 @@
+/**
+ * Background Job Queue
+ *
+ * Durable Redis-backed queue for work that shouldn't run on the request path
+ * (SMS, waitlist fan-out, image uploads). Uses the shared lib/redis.js
+ * connection, so it only issues non-blocking commands and polls when idle.
+ *
+ * - Durable: jobs live in Redis until completed, so restarts don't lose them
+ * - Workers: per-type concurrency, run in the API process and/or `npm run worker`
+ * - Retries: failed jobs are retried with exponential backoff up to maxAttempts,
+ *   then kept in a failed list for inspection
+ * - Delayed jobs: enqueueJob(type, payload, { delayMs })
+ * - Timeouts: a job running past timeoutMs is aborted (job.signal); it is
+ *   only retried once the handler has stopped or abortGraceMs has passed
+ * - Crash recovery: a claimed job has a lease (timeoutMs + abortGraceMs); jobs
+ *   whose worker died are re-queued when the lease runs out
+ *
+ * Delivery is at-least-once, so handlers must be safe to run twice. Long
+ * handlers should check job.signal and stop once it is aborted; a handler
+ * that ignores it can still be running when its retry starts.
+ *
+ * Not for Redis Cluster: the claim script reads jobs:data:<id> hashes that
+ * aren't passed as KEYS (their IDs are only known inside the script).
+ *
+ * Keys: jobs:<type>:waiting (list), jobs:<type>:delayed (zset, run-at),
+ * jobs:<type>:active (zset, lease deadline), jobs:<type>:failed (list),
+ * jobs:<type>:stats (hash), jobs:data:<id> (hash)
+ */
+
+import crypto from "crypto";
+import { EventEmitter } from "events";
+import { redis } from "./redis.js";
+
+const DEFAULTS = {
+  concurrency: 1,
+  maxAttempts: 5,
+  backoffMs: 2000,
+  timeoutMs: 5 * 60 * 1000,
+  abortGraceMs: 30 * 1000,
+};
+
+const IDLE_POLL_MS = 1000;
+const PROMOTE_INTERVAL_MS = 1000;
+const RECOVER_INTERVAL_MS = 30 * 1000;
+const FAILED_LIST_LIMIT = 1000;
+const FAILED_JOB_TTL_SECONDS = 7 * 24 * 60 * 60;
+
+const key = (type, name) => `jobs:${type}:${name}`;
+const dataKey = (id) => `jobs:data:${id}`;
+
+// Pop the oldest waiting job and lease it; returns [id, payload, attempts, maxAttempts]
+// ARGV[2] .. id is the job's data hash, which isn't in KEYS (single Redis only)
+redis.defineCommand("jobClaim", {
+  numberOfKeys: 2,
+  lua: `
+    local id = redis.call('RPOP', KEYS[1])
+    if not id then return nil end
+    redis.call('ZADD', KEYS[2], ARGV[1], id)
+    local data = ARGV[2] .. id
+    local attempts = redis.call('HINCRBY', data, 'attempts', 1)
+    local fields = redis.call('HMGET', data, 'payload', 'maxAttempts')
+    return { id, fields[1] or '', attempts, fields[2] or '' }
+  `,
+});
+
+// Move up to ARGV[2] members scored <= ARGV[1] from a zset to the waiting list
+redis.defineCommand("jobMoveDue", {
+  numberOfKeys: 2,
+  lua: `
+    local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+    for _, id in ipairs(ids) do
+      redis.call('ZREM', KEYS[1], id)
+      redis.call('LPUSH', KEYS[2], id)
+    end
+    return #ids
+  `,
+});
+
+const definitions = new Map();
+const wakeups = new EventEmitter();
+wakeups.setMaxListeners(0);
+
+let running = false;
+let workerLoops = [];
+let maintenanceTimers = [];
+let localStats = {
+  startTime: null,
+  processed: 0,
+  failed: 0,
+  inFlight: 0,
+};
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+/**
+ * Register a handler for a job type
+ * @param {string} type - Job type, e.g. 'order.statusSms'
+ * @param {Function} handler - async (payload, job) => any; job is
+ *   { id, type, attempts, maxAttempts, signal }, signal aborts after timeoutMs
+ * @param {Object} options - { concurrency, maxAttempts, backoffMs, timeoutMs, abortGraceMs }
+ */
+export const defineJob = (type, handler, options = {}) => {
+  definitions.set(type, { type, handler, ...DEFAULTS, ...options });
+};
+
+/**
+ * Add a job to the queue
+ * @param {string} type - Job type
+ * @param {Object} payload - JSON-serializable job data
+ * @param {Object} options - { delayMs, maxAttempts }
+ * @returns {string} - Job ID
+ */
+export const enqueueJob = async (type, payload = {}, options = {}) => {
+  const id = `${Date.now().toString(36)}-${crypto.randomBytes(6).toString("hex")}`;
+  const maxAttempts = options.maxAttempts || definitions.get(type)?.maxAttempts || DEFAULTS.maxAttempts;
+  const delayMs = options.delayMs || 0;
+
+  const pipeline = redis.multi().hset(dataKey(id), {
+    type,
+    payload: JSON.stringify(payload),
+    attempts: 0,
+    maxAttempts,
+    createdAt: Date.now(),
+  });
+
+  if (delayMs > 0) {
+    pipeline.zadd(key(type, "delayed"), Date.now() + delayMs, id);
+  } else {
+    pipeline.lpush(key(type, "waiting"), id);
+  }
+  await pipeline.exec();
+
+  // Wake an idle local worker instead of waiting for its next poll
+  if (delayMs === 0) {
+    wakeups.emit(type);
+  }
+  return id;
+};
+
+/**
+ * Enqueue from a request handler without failing the request
+ * (errors are logged; use enqueueJob directly when the caller must know)
+ */
+export const enqueueJobInBackground = (type, payload, options) => {
+  enqueueJob(type, payload, options).catch(err => {
+    console.error(`Error enqueueing ${type} job:`, err);
+  });
+};
+
+const waitForWork = (type) => new Promise(resolve => {
+  const done = () => {
+    clearTimeout(timer);
+    wakeups.off(type, done);
+    resolve();
+  };
+  const timer = setTimeout(done, IDLE_POLL_MS);
+  wakeups.once(type, done);
+});
+
+const TIMED_OUT = Symbol("timed out");
+
+// Run a handler; past timeoutMs, abort job.signal and wait (up to abortGraceMs,
+// still inside the lease) for the handler to stop before failing the job, so
+// the retry doesn't run next to it
+const runHandler = async (definition, job, payload) => {
+  const controller = new AbortController();
+  job.signal = controller.signal;
+  const run = Promise.resolve().then(() => definition.handler(payload, job));
+
+  let timer;
+  const timeout = new Promise(resolve => {
+    timer = setTimeout(() => resolve(TIMED_OUT), definition.timeoutMs);
+  });
+  const result = await Promise.race([run, timeout]).finally(() => clearTimeout(timer));
+  if (result !== TIMED_OUT) {
+    return result;
+  }
+
+  const error = new Error(`Job timed out after ${definition.timeoutMs}ms`);
+  controller.abort(error);
+  // { value } if it finished anyway, null if it stopped with an error, undefined if still running
+  let graceTimer;
+  const outcome = await Promise.race([
+    run.then(value => ({ value }), () => null),
+    new Promise(resolve => {
+      graceTimer = setTimeout(resolve, definition.abortGraceMs);
+    }),
+  ]).finally(() => clearTimeout(graceTimer));
+  if (outcome) {
+    return outcome.value;
+  }
+  if (outcome === undefined) {
+    console.error(`Job ${job.type} ${job.id} ignored its abort signal and is still running`);
+  }
+  throw error;
+};
+
+const completeJob = (definition, id) =>
+  redis.multi()
+    .zrem(key(definition.type, "active"), id)
+    .del(dataKey(id))
+    .hincrby(key(definition.type, "stats"), "completed", 1)
+    .exec();
+
+const failJob = async (definition, job, error) => {
+  const { type } = definition;
+  const pipeline = redis.multi()
+    .zrem(key(type, "active"), job.id)
+    .hset(dataKey(job.id), "lastError", String(error?.message || error).slice(0, 500));
+
+  if (job.attempts < job.maxAttempts) {
+    // Exponential backoff: backoffMs, 2x, 4x, ...
+    const delay = definition.backoffMs * 2 ** (job.attempts - 1);
+    pipeline
+      .zadd(key(type, "delayed"), Date.now() + delay, job.id)
+      .hincrby(key(type, "stats"), "retried", 1);
+  } else {
+    pipeline
+      .hset(dataKey(job.id), "failedAt", Date.now())
+      .expire(dataKey(job.id), FAILED_JOB_TTL_SECONDS)
+      .lpush(key(type, "failed"), job.id)
+      .ltrim(key(type, "failed"), 0, FAILED_LIST_LIMIT - 1)
+      .hincrby(key(type, "stats"), "failed", 1);
+  }
+  await pipeline.exec();
+};
+
+const runWorker = async (definition) => {
+  const { type } = definition;
+
+  while (running) {
+    let claimed;
+    try {
+      claimed = await redis.jobClaim(
+        key(type, "waiting"),
+        key(type, "active"),
+        Date.now() + definition.timeoutMs + definition.abortGraceMs,
+        dataKey("")
+      );
+    } catch (error) {
+      console.error(`Job queue error claiming ${type}:`, error.message);
+      await sleep(IDLE_POLL_MS);
+      continue;
+    }
+
+    if (!claimed) {
+      await waitForWork(type);
+      continue;
+    }
+
+    const [id, payload, attempts, maxAttempts] = claimed;
+    const job = { id, type, attempts: Number(attempts), maxAttempts: Number(maxAttempts) || definition.maxAttempts };
+
+    localStats.inFlight++;
+    try {
+      await runHandler(definition, job, JSON.parse(payload || "{}"));
+      await completeJob(definition, id);
+      localStats.processed++;
+    } catch (error) {
+      localStats.failed++;
+      console.error(`Job ${type} ${id} failed (attempt ${job.attempts}/${job.maxAttempts}):`, error.message);
+      await failJob(definition, job, error).catch(err => {
+        console.error(`Error recording failure of job ${id}:`, err.message);
+      });
+    } finally {
+      localStats.inFlight--;
+    }
+  }
+};
+
+const runMaintenance = async (name, fromKey) => {
+  for (const type of definitions.keys()) {
+    try {
+      const moved = await redis.jobMoveDue(key(type, fromKey), key(type, "waiting"), Date.now(), 100);
+      if (moved > 0) {
+        if (name === "recover") {
+          console.log(`Re-queued ${moved} ${type} job(s) whose worker stopped responding`);
+        }
+        wakeups.emit(type);
+      }
+    } catch (error) {
+      console.error(`Job queue ${name} error for ${type}:`, error.message);
+    }
+  }
+};
+
+/**
+ * Start workers for every defined job type
+ */
+export const startJobWorkers = () => {
+  if (running) {
+    return;
+  }
+  running = true;
+  localStats.startTime = new Date();
+
+  for (const definition of definitions.values()) {
+    for (let i = 0; i < definition.concurrency; i++) {
+      workerLoops.push(runWorker(definition));
+    }
+  }
+
+  maintenanceTimers = [
+    setInterval(() => runMaintenance("promote", "delayed"), PROMOTE_INTERVAL_MS),
+    setInterval(() => runMaintenance("recover", "active"), RECOVER_INTERVAL_MS),
+  ];
+
+  const summary = [...definitions.values()].map(d => `${d.type}×${d.concurrency}`).join(", ");
+  console.log(`🔄 Job workers started (${summary})`);
+};
+
+/**
+ * Stop taking new jobs and wait for in-flight jobs to finish
+ */
+export const stopJobWorkers = async () => {
+  if (!running) {
+    return;
+  }
+  running = false;
+  maintenanceTimers.forEach(clearInterval);
+  maintenanceTimers = [];
+  for (const type of definitions.keys()) {
+    wakeups.emit(type);
+  }
+  await Promise.all(workerLoops);
+  workerLoops = [];
+  console.log("Job workers stopped");
+};
+
+/**
+ * Queue statistics for monitoring
+ * Queue depths and counters are global (all processes); `workers` is this process
+ */
+export const getJobQueueStats = async () => {
+  const types = [...definitions.keys()];
+  const pipeline = redis.pipeline();
+  for (const type of types) {
+    pipeline
+      .llen(key(type, "waiting"))
+      .zcard(key(type, "delayed"))
+      .zcard(key(type, "active"))
+      .llen(key(type, "failed"))
+      .hgetall(key(type, "stats"));
+  }
+  const results = await pipeline.exec();
+
+  const queues = {};
+  types.forEach((type, index) => {
+    const [waiting, delayed, active, failedList, counters] = results
+      .slice(index * 5, index * 5 + 5)
+      .map(([, value]) => value);
+    queues[type] = {
+      waiting,
+      delayed,
+      active,
+      failedJobs: failedList,
+      completed: Number(counters?.completed || 0),
+      retried: Number(counters?.retried || 0),
+      failed: Number(counters?.failed || 0),
+      concurrency: definitions.get(type).concurrency,
+    };
+  });
+
+  return {
+    queues,
+    workers: {
+      ...localStats,
+      isRunning: running,
+      uptimeSeconds: localStats.startTime ? Math.floor((Date.now() - localStats.startTime) / 1000) : 0,
+    },
+  };
+};
@@ -0,0 +1,101 @@
+/**
+ * Background Job Definitions
+ *
+ * Registers the handlers for every job type with the queue (lib/jobQueue.js).
+ * Import this module in any process that runs workers (server.js, worker.js).
+ *
+ * Job types:
+ * - waitlist.notify      { productId }                          Back-in-stock SMS fan-out
+ * - order.statusSms      { phoneNumber, orderPublicId, status } Shipped/delivered SMS
+ * - product.uploadImage  { productId, uploadId, image }         Store an inline (data URL)
+ *                                                                product image and swap it in
+ * - payment.webhook      { eventId }                            Apply a stored Razorpay
+ *                                                                webhook event to its order
+ */
+
+import Product from "../models/product.model.js";
+import { defineJob } from "./jobQueue.js";
+import { deleteStoredImage, storeDataUrlImage } from "./imageStorage.js";
+import { dispatchWaitlist } from "./waitlistDispatcher.js";
+import { processWebhookEvent, WEBHOOK_JOB_TYPE } from "./paymentWebhooks.js";
+import { sendOrderStatusSMS } from "./sms.js";
+
+defineJob(
+  "waitlist.notify",
+  async ({ productId }) => {
+    const result = await dispatchWaitlist(productId);
+    if (!result.success) {
+      throw new Error(result.error || "Waitlist dispatch failed");
+    }
+    // Subscribers that couldn't be reached yet stay on the list; try them again later
+    if (result.pending > 0) {
+      throw new Error(`${result.pending} waitlist notifications still pending`);
+    }
+    return result;
+  },
+  // The dispatcher runs its own send pool, so only a few dispatches at a time
+  { concurrency: 2, maxAttempts: 4, backoffMs: 60 * 1000, timeoutMs: 30 * 60 * 1000 }
+);
+
+defineJob(
+  "order.statusSms",
+  async ({ phoneNumber, orderPublicId, status }) => {
+    const result = await sendOrderStatusSMS(phoneNumber, orderPublicId, status);
+    if (!result.success && result.reason !== "Status not eligible for SMS") {
+      throw new Error(result.reason);
+    }
+    return result;
+  },
+  { concurrency: 5, maxAttempts: 5 }
+);
+
+defineJob(
+  "product.uploadImage",
+  async ({ productId, uploadId, image }, job) => {
+    const product = await Product.findById(productId).select("image pendingImage").lean();
+    if (!image || !product || product.pendingImage?.uploadId !== uploadId) {
+      // Deleted, superseded by a later image change, or already stored by an
+      // earlier attempt (jobs queued before uploadId existed: npm run images:inline)
+      return null;
+    }
+
+    // Through the configured image storage (Cloudinary or local disk)
+    const stored = await storeDataUrlImage(image);
+    if (job.signal?.aborted) {
+      // Timed out; the retry stores it again
+      await deleteStoredImage(stored.url).catch(() => {});
+      throw job.signal.reason;
+    }
+
+    // Only if this upload is still the pending one
+    const updated = await Product.updateOne(
+      { _id: productId, "pendingImage.uploadId": uploadId },
+      { $set: { image: stored.url, imageVariants: stored.variants }, $unset: { pendingImage: 1 } }
+    );
+    if (updated.modifiedCount === 0) {
+      await deleteStoredImage(stored.url).catch(() => {});
+      return null;
+    }
+
+    // Remove the image this upload replaced
+    if (product.image && product.image !== stored.url) {
+      try {
+        await deleteStoredImage(product.image);
+      } catch (error) {
+        console.log("error deleting old product image", error);
+      }
+    }
+
+    return stored.url;
+  },
+  { concurrency: 3, maxAttempts: 5, backoffMs: 5000 }
+);
+
+defineJob(
+  WEBHOOK_JOB_TYPE,
+  // Also throws (and is retried) while an earlier event for the same order is pending
+  async ({ eventId }, job) => processWebhookEvent(eventId, job),
+  // Timeout plus abort grace stays below the order lock TTL (LOCK_TTL_MS in paymentWebhooks.js),
+  // so a timed-out event can't overlap the next event for its order
+  { concurrency: 5, maxAttempts: 8, backoffMs: 1000, timeoutMs: 30 * 1000, abortGraceMs: 10 * 1000 }
+);
@@ -0,0 +1,374 @@
+/**
+ * Label PDF Service
+ *
+ * Renders shipping labels to PDF on the server.
+ * Each order's label is pre-rendered once (in the background, when the order
+ * becomes paid/processing) and stored as a deflated content stream.
+ * Batch print runs assemble A4 pages by placing the stored streams in a
+ * 3x2 grid, so a large print run is mostly string concatenation.
+ */
+
+import Order from "../models/order.model.js";
+import LabelRender from "../models/labelRender.model.js";
+import { getDeliveryType } from "./pricing.js";
+import {
+  A4,
+  MM,
+  ContentStream,
+  buildPdf,
+  deflateContent,
+  hexToRgb,
+  textWidth,
+  truncateText,
+  wrapText,
+} from "./pdfDocument.js";
+
+// Bump when the label layout changes so stored renders are regenerated
+const LABEL_LAYOUT_VERSION = 1;
+
+// Grid layout (matches the HTML bulk address sheets: 6 labels per A4 page)
+const PAGE_MARGIN = 8 * MM;
+const LABEL_GAP = 5 * MM;
+const LABELS_PER_ROW = 3;
+const LABEL_ROWS = 2;
+export const LABELS_PER_PAGE = LABELS_PER_ROW * LABEL_ROWS;
+const LABEL_WIDTH = (A4.width - 2 * PAGE_MARGIN - (LABELS_PER_ROW - 1) * LABEL_GAP) / LABELS_PER_ROW;
+const LABEL_HEIGHT = (A4.height - 2 * PAGE_MARGIN - (LABEL_ROWS - 1) * LABEL_GAP) / LABEL_ROWS;
+const LABEL_PADDING = 12;
+const BADGE_RADIUS = 14;
+
+const COLORS = {
+  black: [0, 0, 0],
+  white: [1, 1, 1],
+  muted: hexToRgb("#666666"),
+  rule: hexToRgb("#cccccc"),
+  local: hexToRgb("#4caf50"),
+  national: hexToRgb("#2196f3"),
+  manual: hexToRgb("#ff9800"),
+  localCell: hexToRgb("#c8e6c9"),
+  nationalCell: hexToRgb("#bbdefb"),
+  headerFill: hexToRgb("#222222"),
+  stripe: hexToRgb("#f8f8f8"),
+};
+
+const formatOrderDate = (date) =>
+  new Date(date).toLocaleDateString("en-IN", { timeZone: "Asia/Kolkata" });
+
+const toBuffer = (content) => (Buffer.isBuffer(content) ? content : Buffer.from(content.buffer));
+
+/**
+ * Draw a single label in label-local coordinates (origin bottom-left)
+ * @param {Object} order - Lean order with populated user and products.product name
+ * @returns {ContentStream}
+ */
+function drawLabel(order) {
+  const address = order.address || {};
+  const user = order.user || {};
+  const c = new ContentStream();
+  const left = LABEL_PADDING;
+  const innerWidth = LABEL_WIDTH - 2 * LABEL_PADDING;
+  const bottom = LABEL_PADDING;
+
+  c.rect(0, 0, LABEL_WIDTH, LABEL_HEIGHT, { lineWidth: 2 });
+
+  // Header leaves room on the left for the sequence badge drawn per batch
+  const headerX = left + 2 * BADGE_RADIUS + 4;
+  let headerWidth = LABEL_WIDTH - LABEL_PADDING - headerX;
+  let y = LABEL_HEIGHT - LABEL_PADDING;
+
+  if (order.isManualOrder) {
+    const badgeText = (order.orderSource || "manual").toUpperCase();
+    // Uppercase glyphs run wider than the average width estimate
+    const badgeWidth = textWidth(badgeText, 7, true) * 1.3 + 8;
+    c.rect(LABEL_WIDTH - LABEL_PADDING - badgeWidth, y - 11, badgeWidth, 11, { fill: COLORS.manual, stroke: null });
+    c.text(LABEL_WIDTH - LABEL_PADDING - badgeWidth + 4, y - 8.5, badgeText, { size: 7, bold: true, color: COLORS.white });
+    headerWidth -= badgeWidth + 4;
+  }
+
+  y -= 12;
+  c.text(headerX, y, truncateText(`#${order.publicOrderId || order._id}`, 11, headerWidth, true), { size: 11, bold: true });
+  y -= 12;
+  c.text(headerX, y, formatOrderDate(order.createdAt), { size: 8, color: COLORS.muted });
+  y -= 10;
+  c.line(left, y, LABEL_WIDTH - LABEL_PADDING, y, { lineWidth: 1.5 });
+
+  y -= 18;
+  for (const line of wrapText(address.name || user.name || "N/A", 13, innerWidth, true).slice(0, 2)) {
+    c.text(left, y, line, { size: 13, bold: true });
+    y -= 15;
+  }
+  c.text(left, y, address.phoneNumber || user.phoneNumber || "N/A", { size: 11, bold: true });
+  y -= 20;
+
+  const addressLines = [
+    ...wrapText(`${address.houseNumber || ""}, ${address.streetAddress || ""}`, 9, innerWidth),
+    ...(address.landmark ? wrapText(`Near: ${address.landmark}`, 9, innerWidth) : []),
+  ];
+  for (const line of addressLines) {
+    c.text(left, y, line, { size: 9 });
+    y -= 12;
+  }
+  for (const line of wrapText(`${address.city || ""}, ${address.state || ""} - ${address.pincode || ""}`, 9, innerWidth, true)) {
+    c.text(left, y, line, { size: 9, bold: true });
+    y -= 12;
+  }
+
+  // Items checklist
+  y -= 2;
+  c.line(left, y, LABEL_WIDTH - LABEL_PADDING, y, { color: COLORS.rule, dash: [2, 2] });
+  y -= 12;
+  c.text(left, y, "ITEMS:", { size: 7.5, bold: true, color: COLORS.muted });
+  y -= 12;
+
+  const items = order.products || [];
+  if (items.length === 0) {
+    c.text(left, y, "No items", { size: 8 });
+  }
+  for (let i = 0; i < items.length; i++) {
+    const lines = wrapText(`${items[i].product?.name || "ITEM"} x ${items[i].quantity}`, 8, innerWidth - 12);
+    if (y - (lines.length - 1) * 10 < bottom + 10 && i < items.length - 1) {
+      c.text(left, y, `+ ${items.length - i} more item(s)`, { size: 8, bold: true });
+      break;
+    }
+    c.rect(left, y - 1, 7, 7, { lineWidth: 0.8 });
+    for (const line of lines) {
+      c.text(left + 12, y, line, { size: 8 });
+      y -= 10;
+    }
+  }
+
+  return c;
+}
+
+/**
+ * Render an order's label
+ * @param {Object} order - Lean order with populated user and product names
+ * @returns {Object} - { content: Buffer (deflated stream), deliveryType }
+ */
+export const renderOrderLabel = (order) => ({
+  content: drawLabel(order).compress(),
+  deliveryType: getDeliveryType(order.address),
+});
+
+const labelRenderUpsert = (orderId, rendered) => ({
+  updateOne: {
+    filter: { order: orderId },
+    update: {
+      $set: {
+        content: rendered.content,
+        deliveryType: rendered.deliveryType,
+        layoutVersion: LABEL_LAYOUT_VERSION,
+        renderedAt: new Date(),
+      },
+    },
+    upsert: true,
+  },
+});
+
+/**
+ * Render and store the label for one order
+ * @param {string} orderId - The order ID
+ */
+export const prerenderOrderLabel = async (orderId) => {
+  const order = await Order.findById(orderId)
+    .populate("user", "name phoneNumber")
+    .populate({ path: "products.product", select: "name" })
+    .lean();
+
+  if (!order) {
+    return null;
+  }
+
+  const rendered = renderOrderLabel(order);
+  await LabelRender.bulkWrite([labelRenderUpsert(order._id, rendered)]);
+  return rendered;
+};
+
+/**
+ * Pre-render an order's label in the background (does not block the caller)
+ * @param {string} orderId - The order ID
+ */
+export const scheduleLabelPrerender = (orderId) => {
+  setImmediate(() => {
+    prerenderOrderLabel(orderId).catch(err => {
+      console.error(`Error pre-rendering label for order ${orderId}:`, err);
+    });
+  });
+};
+
+/**
+ * Fetch stored labels for orders, rendering (and storing) any that are missing
+ * @param {Array} orders - Lean orders with populated user and product names
+ * @returns {Array} - Labels in the same order as `orders`
+ */
+const loadOrderLabels = async (orders) => {
+  const renders = await LabelRender.find({
+    order: { $in: orders.map(o => o._id) },
+    layoutVersion: LABEL_LAYOUT_VERSION,
+  }).lean();
+
+  const byOrderId = new Map(renders.map(r => [r.order.toString(), r]));
+  const missing = [];
+
+  const labels = orders.map(order => {
+    const stored = byOrderId.get(order._id.toString());
+    if (stored) {
+      return { order, content: toBuffer(stored.content), deliveryType: stored.deliveryType };
+    }
+    const rendered = renderOrderLabel(order);
+    missing.push(labelRenderUpsert(order._id, rendered));
+    return { order, ...rendered };
+  });
+
+  if (missing.length > 0) {
+    // Store renders for next time, but don't hold the print run up on it
+    LabelRender.bulkWrite(missing, { ordered: false }).catch(err => {
+      console.error("Error storing label renders:", err);
+    });
+  }
+
+  return labels;
+};
+
+const sequenceBadge = (sequence, deliveryType) => {
+  const c = new ContentStream();
+  const cx = LABEL_PADDING + BADGE_RADIUS - 4;
+  const cy = LABEL_HEIGHT - LABEL_PADDING - BADGE_RADIUS + 4;
+  c.circle(cx, cy, BADGE_RADIUS, { fill: deliveryType === "local" ? COLORS.local : COLORS.national });
+  c.centeredText(cx, cy - 4.5, String(sequence), { size: sequence > 99 ? 10 : 13, bold: true, color: COLORS.white });
+  return c;
+};
+
+/**
+ * Build the label-verification summary pages (batch specific, rendered per request)
+ */
+function drawSummaryPages(labels) {
+  const columns = [
+    { title: "SEQ", width: 28 },
+    { title: "ORDER ID", width: 78 },
+    { title: "CUSTOMER", width: 100 },
+    { title: "PHONE", width: 62 },
+    { title: "LOCATION", width: 70 },
+    { title: "ITEMS", width: 0 },
+    { title: "LABEL", width: 32 },
+    { title: "PACK", width: 32 },
+  ];
+  const left = PAGE_MARGIN + 6;
+  const tableWidth = A4.width - 2 * left;
+  columns[5].width = tableWidth - columns.reduce((sum, col) => sum + col.width, 0);
+
+  const localCount = labels.filter(l => l.deliveryType === "local").length;
+  const pages = [];
+  let c = new ContentStream();
+  let y = A4.height - PAGE_MARGIN - 20;
+
+  c.centeredText(A4.width / 2, y, "LABEL VERIFICATION SUMMARY", { size: 18, bold: true });
+  y -= 16;
+  c.centeredText(A4.width / 2, y, "Use this sheet to verify each label matches the correct order before attaching", { size: 9, color: COLORS.muted });
+  y -= 20;
+  c.text(left, y, `Total Orders: ${labels.length}    Local: ${localCount}    National: ${labels.length - localCount}    ` +
+    `Printed: ${new Date().toLocaleString("en-IN", { timeZone: "Asia/Kolkata" })}`, { size: 9, bold: true });
+  y -= 14;
+
+  const drawHeader = () => {
+    c.rect(left, y - 16, tableWidth, 16, { fill: COLORS.headerFill, stroke: null });
+    let x = left;
+    for (const col of columns) {
+      c.text(x + 3, y - 11, col.title, { size: 7, bold: true, color: COLORS.white });
+      x += col.width;
+    }
+    y -= 16;
+  };
+  drawHeader();
+
+  labels.forEach((label, index) => {
+    const { order, deliveryType } = label;
+    const address = order.address || {};
+    const items = (order.products || []).map(p => `${p.product?.name || "ITEM"} x${p.quantity}`).join(", ");
+    const totalItems = (order.products || []).reduce((sum, p) => sum + p.quantity, 0);
+    const itemLines = wrapText(`${items || "No items"} [${totalItems}]`, 7, columns[5].width - 6);
+    const customerLines = wrapText(`${address.name || "N/A"}${order.isManualOrder ? " (DM)" : ""}`, 7.5, columns[2].width - 6, true);
+    const rowHeight = Math.max(24, 9 * Math.max(itemLines.length, customerLines.length, 2) + 8);
+
+    if (y - rowHeight < PAGE_MARGIN + 40) {
+      pages.push([c.compress()]);
+      c = new ContentStream();
+      y = A4.height - PAGE_MARGIN;
+      drawHeader();
+    }
+
+    if (index % 2 === 1) {
+      c.rect(left, y - rowHeight, tableWidth, rowHeight, { fill: COLORS.stripe, stroke: null });
+    }
+    c.rect(left, y - rowHeight, columns[0].width, rowHeight, {
+      fill: deliveryType === "local" ? COLORS.localCell : COLORS.nationalCell,
+      stroke: null,
+    });
+
+    const textTop = y - 11;
+    let x = left;
+    c.centeredText(x + columns[0].width / 2, textTop, String(index + 1), { size: 11, bold: true, color: deliveryType === "local" ? COLORS.local : COLORS.national });
+    x += columns[0].width;
+    c.text(x + 3, textTop, truncateText(order.publicOrderId || "N/A", 6.5, columns[1].width - 6), { size: 6.5 });
+    x += columns[1].width;
+    customerLines.forEach((line, i) => c.text(x + 3, textTop - i * 9, line, { size: 7.5, bold: true }));
+    x += columns[2].width;
+    c.text(x + 3, textTop, address.phoneNumber || "N/A", { size: 7 });
+    x += columns[3].width;
+    c.text(x + 3, textTop, truncateText(address.city || "", 7, columns[4].width - 6), { size: 7 });
+    c.text(x + 3, textTop - 9, address.pincode || "", { size: 7, color: COLORS.muted });
+    x += columns[4].width;
+    itemLines.forEach((line, i) => c.text(x + 3, textTop - i * 9, line, { size: 7 }));
+    x += columns[5].width;
+    c.rect(x + columns[6].width / 2 - 5, y - rowHeight / 2 - 5, 10, 10, { lineWidth: 1.2 });
+    x += columns[6].width;
+    c.rect(x + columns[7].width / 2 - 5, y - rowHeight / 2 - 5, 10, 10, { lineWidth: 1.2 });
+
+    c.line(left, y - rowHeight, left + tableWidth, y - rowHeight, { lineWidth: 0.5, color: COLORS.rule });
+    y -= rowHeight;
+  });
+
+  y -= 18;
+  c.text(left, y, "Instructions: 1) Find the label with matching SEQ # > 2) Verify customer name & phone > " +
+    "3) Check LABEL box > 4) Pack items > 5) Check PACK box", { size: 7.5 });
+  y -= 11;
+  c.text(left, y, "Green = Local Delivery | Blue = National Delivery | (DM) = Manual/DM Order", { size: 7.5, color: COLORS.muted });
+
+  pages.push([c.compress()]);
+  return pages;
+}
+
+const placeLabel = (x, y) => deflateContent(Buffer.from(`q 1 0 0 1 ${x.toFixed(2)} ${y.toFixed(2)} cm\n`, "latin1"));
+const RESTORE = deflateContent(Buffer.from("\nQ", "latin1"));
+
+/**
+ * Build a labels PDF for a batch of orders
+ * @param {Array} orders - Lean orders (populated user / product names), in print order
+ * @param {Object} options - { summary: include verification summary, numbered: draw sequence badges }
+ * @returns {Buffer} - PDF file
+ */
+export const buildLabelsPdf = async (orders, { summary = false, numbered = true } = {}) => {
+  const labels = await loadOrderLabels(orders);
+  const pages = summary && labels.length > 0 ? drawSummaryPages(labels) : [];
+
+  for (let start = 0; start < labels.length; start += LABELS_PER_PAGE) {
+    const streams = [];
+    labels.slice(start, start + LABELS_PER_PAGE).forEach((label, index) => {
+      const column = index % LABELS_PER_ROW;
+      const row = Math.floor(index / LABELS_PER_ROW);
+      const x = numbered || labels.length > 1
+        ? PAGE_MARGIN + column * (LABEL_WIDTH + LABEL_GAP)
+        : (A4.width - LABEL_WIDTH) / 2;
+      const y = A4.height - PAGE_MARGIN - (row + 1) * LABEL_HEIGHT - row * LABEL_GAP;
+
+      streams.push(placeLabel(x, y), label.content);
+      if (numbered) {
+        streams.push(sequenceBadge(start + index + 1, label.deliveryType).compress());
+      }
+      streams.push(RESTORE);
+    });
+    pages.push(streams);
+  }
+
+  return buildPdf(pages);
+};
@@ -0,0 +1,411 @@
+/**
+ * Manual Orders
+ *
+ * Orders admins enter by hand (WhatsApp, Instagram, phone). They are
+ * confirmed on entry: stock is deducted right away and the order goes
+ * straight to processing.
+ *
+ * createManualOrders handles a whole batch with a few queries: all products
+ * in one $in read, the stock taken with one conditional update per product,
+ * all customers in one $in read plus one upserting bulkWrite for new guests,
+ * and all orders in one insertMany. Each order succeeds or fails on its own;
+ * the response is built from the data already in memory.
+ *
+ * Stock is taken before the orders are written, by updates that only apply
+ * while enough unreserved stock is left, so concurrent batches (and
+ * checkouts) can't oversell. Orders that end up not being written give their
+ * stock back.
+ */
+
+import crypto from "crypto";
+import mongoose from "mongoose";
+import Order from "../models/order.model.js";
+import Product from "../models/product.model.js";
+import User from "../models/user.model.js";
+import { scheduleLabelPrerender } from "./labelPdf.js";
+import { recordOrderSaleInBackground } from "./salesRollup.js";
+import { adjustInventory, isRedisInventory, sellInventory } from "./inventory.js";
+
+export const MAX_MANUAL_ORDERS_PER_BATCH = 100;
+
+const generateManualOrderId = () =>
+  `MAN-${Date.now().toString(36).toUpperCase()}-${crypto.randomBytes(2).toString("hex").toUpperCase()}`;
+
+// Error message for an order request, or null if it can be created
+const validateManualOrder = ({ customerName, customerPhone, products, address }) => {
+  if (!customerName || !customerPhone) {
+    return "Customer name and phone number are required";
+  }
+  if (!Array.isArray(products) || products.length === 0) {
+    return "At least one product is required";
+  }
+  if (!address || !address.pincode || !address.city || !address.state) {
+    return "Complete address with pincode, city, and state is required";
+  }
+  for (const item of products) {
+    if (!Number.isInteger(item.quantity) || item.quantity < 1) {
+      return `Invalid quantity for product ${item.productId}`;
+    }
+    if (!mongoose.isValidObjectId(item.productId)) {
+      return `Product not found: ${item.productId}`;
+    }
+  }
+  return null;
+};
+
+// Quantity per product of one order request
+const quantitiesByProduct = (products) => {
+  const quantities = new Map();
+  for (const { productId, quantity } of products) {
+    quantities.set(String(productId), (quantities.get(String(productId)) || 0) + quantity);
+  }
+  return quantities;
+};
+
+// Total quantity per product over several order requests
+const totalQuantities = (requests, skip = () => false) => {
+  const totals = new Map();
+  for (const { quantities } of requests) {
+    for (const [productId, quantity] of quantities) {
+      if (!skip(productId)) {
+        totals.set(productId, (totals.get(productId) || 0) + quantity);
+      }
+    }
+  }
+  return totals;
+};
+
+// Take stock for a sale, only if enough unreserved stock is left
+const takeStock = async (productId, quantity) => {
+  const result = await Product.updateOne(
+    {
+      _id: productId,
+      $expr: { $gte: [{ $subtract: ["$stockQuantity", { $ifNull: ["$reservedQuantity", 0] }] }, quantity] },
+    },
+    { $inc: { stockQuantity: -quantity, sold: quantity } }
+  );
+  return result.modifiedCount === 1;
+};
+
+/**
+ * Give back the stock taken for a sale
+ * @param {Map} totals - productId -> quantity
+ */
+const returnStock = async (totals) => {
+  if (totals.size === 0) {
+    return;
+  }
+  if (isRedisInventory()) {
+    await adjustInventory([...totals].map(([productId, quantity]) => ({ productId, stock: quantity, sold: -quantity })));
+    return;
+  }
+  await Product.bulkWrite(
+    [...totals].map(([productId, quantity]) => ({
+      updateOne: {
+        filter: { _id: productId },
+        update: { $inc: { stockQuantity: quantity, sold: -quantity } }
+      }
+    })),
+    { ordered: false }
+  );
+};
+
+const insufficientStock = (product, available) =>
+  `Insufficient stock for ${product?.name || "a product"}. Available: ${Math.max(0, available)}`;
+
+// One order's lines, each taken conditionally; all or none
+const takeOrderStock = async (request, productById) => {
+  const taken = new Map();
+  for (const [productId, quantity] of request.quantities) {
+    if (!(await takeStock(productId, quantity))) {
+      await returnStock(taken);
+      const current = await Product.findById(productId).select("stockQuantity reservedQuantity").lean();
+      return insufficientStock(productById.get(productId), (current?.stockQuantity || 0) - (current?.reservedQuantity || 0));
+    }
+    taken.set(productId, quantity);
+  }
+  return null;
+};
+
+/**
+ * Take stock for each order in request order; orders that don't fit fail.
+ * Runs before the orders are written; the caller gives back the stock of
+ * orders it doesn't write (returnStock)
+ */
+const allocateStock = async (pending, productById, fail) => {
+  if (isRedisInventory()) {
+    // One atomic script per order
+    for (const request of pending) {
+      const sold = await sellInventory(
+        [...request.quantities].map(([productId, quantity]) => ({ productId, quantity }))
+      );
+      if (!sold.success) {
+        fail(request, insufficientStock(productById.get(String(sold.productId)), sold.available));
+      }
+    }
+    return;
+  }
+
+  // Fail early the orders that don't fit the products as just read
+  const available = new Map(
+    [...productById.values()].map(p => [String(p._id), p.stockQuantity - (p.reservedQuantity || 0)])
+  );
+  for (const request of pending) {
+    for (const [productId, quantity] of request.quantities) {
+      if (quantity > available.get(productId)) {
+        fail(request, insufficientStock(productById.get(productId), available.get(productId)));
+        break;
+      }
+    }
+    if (!request.error) {
+      for (const [productId, quantity] of request.quantities) {
+        available.set(productId, available.get(productId) - quantity);
+      }
+    }
+  }
+
+  // Take the batch's total per product, one conditional update each
+  const candidates = pending.filter(r => !r.error);
+  const totals = totalQuantities(candidates);
+  // A failed update counts as not taken; its orders are retried one at a time
+  const outcomes = await Promise.allSettled([...totals].map(([productId, quantity]) => takeStock(productId, quantity)));
+  const short = new Set([...totals.keys()].filter((productId, i) => outcomes[i].value !== true));
+  if (short.size === 0) {
+    return;
+  }
+
+  // Stock was sold meanwhile: orders with a product that fell short give
+  // back what the totals took for them and are taken one at a time
+  const contended = candidates.filter(r => [...r.quantities.keys()].some(productId => short.has(productId)));
+  await returnStock(totalQuantities(contended, productId => short.has(productId)));
+  for (const request of contended) {
+    const error = await takeOrderStock(request, productById);
+    if (error) {
+      fail(request, error);
+    }
+  }
+};
+
+/**
+ * Find customers by phone; create guest users for new phone numbers in one bulkWrite
+ * @returns {Map} - phoneNumber -> user
+ */
+const resolveCustomers = async (requests) => {
+  const phones = [...new Set(requests.map(r => r.input.customerPhone))];
+  const users = await User.find({ phoneNumber: { $in: phones } }).select("name phoneNumber email").lean();
+  const userByPhone = new Map(users.map(u => [u.phoneNumber, u]));
+
+  const missing = phones.filter(phone => !userByPhone.has(phone));
+  if (missing.length === 0) {
+    return userByPhone;
+  }
+
+  const guests = missing.map(phone => {
+    const { customerName, customerEmail } = requests.find(r => r.input.customerPhone === phone).input;
+    return { name: customerName, phoneNumber: phone, email: customerEmail || undefined, isGuest: true };
+  });
+  const result = await User.bulkWrite(
+    guests.map(guest => ({
+      updateOne: {
+        filter: { phoneNumber: guest.phoneNumber },
+        update: { $setOnInsert: guest },
+        upsert: true,
+        setDefaultsOnInsert: true,
+      },
+    })),
+    { ordered: false }
+  );
+
+  const raced = [];
+  guests.forEach((guest, i) => {
+    const _id = result.upsertedIds?.[i];
+    if (_id) {
+      userByPhone.set(guest.phoneNumber, { _id, ...guest });
+    } else {
+      raced.push(guest.phoneNumber);
+    }
+  });
+  // Created by someone else between the read and the upsert
+  if (raced.length > 0) {
+    const created = await User.find({ phoneNumber: { $in: raced } }).select("name phoneNumber email").lean();
+    for (const user of created) {
+      userByPhone.set(user.phoneNumber, user);
+    }
+  }
+  return userByPhone;
+};
+
+const buildOrder = ({ input, quantities }, user, productById) => {
+  const {
+    customerName,
+    customerPhone,
+    address,
+    orderSource,
+    paymentMethod,
+    paymentStatus,
+    deliveryFee,
+    platformFee,
+    adminNotes
+  } = input;
+
+  const products = input.products.map(({ productId, quantity }) => ({
+    product: productById.get(String(productId))._id,
+    quantity,
+    price: productById.get(String(productId)).price
+  }));
+  const subtotal = products.reduce((sum, p) => sum + p.price * p.quantity, 0);
+  const deliveryFeeAmount = deliveryFee || 0;
+  const platformFeeAmount = platformFee || 0;
+
+  return {
+    subtotal,
+    quantities,
+    doc: {
+      user: user._id,
+      products,
+      totalAmount: subtotal + deliveryFeeAmount + platformFeeAmount,
+      publicOrderId: generateManualOrderId(),
+      address: {
+        name: address.name || customerName,
+        phoneNumber: address.phoneNumber || customerPhone,
+        pincode: address.pincode,
+        houseNumber: address.houseNumber || "",
+        streetAddress: address.streetAddress || "",
+        landmark: address.landmark || "",
+        city: address.city,
+        state: address.state
+      },
+      status: paymentStatus === "paid" ? "paid" : "pending",
+      isManualOrder: true,
+      orderSource: orderSource || "other",
+      paymentMethod: paymentMethod || "cash",
+      paymentStatus: paymentStatus || "paid",
+      deliveryFee: deliveryFeeAmount,
+      platformFee: platformFeeAmount,
+      adminNotes: adminNotes || "",
+      trackingStatus: "processing", // Manual orders go straight to processing
+      trackingHistory: [{
+        status: "processing",
+        timestamp: new Date(),
+        note: `Manual order created via ${orderSource || "admin"}`
+      }]
+    }
+  };
+};
+
+// Response entry for a created order, from the inserted document and the lookups
+const describeManualOrder = (order, subtotal, user, productById) => ({
+  orderId: order._id,
+  publicOrderId: order.publicOrderId,
+  totalAmount: order.totalAmount,
+  subtotal,
+  deliveryFee: order.deliveryFee,
+  platformFee: order.platformFee,
+  customer: {
+    name: user.name,
+    phone: user.phoneNumber,
+    email: user.email
+  },
+  products: order.products.map(p => {
+    const product = productById.get(String(p.product));
+    return {
+      name: product?.name,
+      price: p.price,
+      quantity: p.quantity,
+      image: product?.image
+    };
+  }),
+  address: order.address,
+  orderSource: order.orderSource,
+  paymentMethod: order.paymentMethod,
+  paymentStatus: order.paymentStatus,
+  trackingStatus: order.trackingStatus,
+  createdAt: order.createdAt
+});
+
+/**
+ * Create manual orders
+ * @param {Array} inputs - [{ customerName, customerPhone, customerEmail, products: [{ productId, quantity }],
+ *   address, orderSource, paymentMethod, paymentStatus, deliveryFee, platformFee, adminNotes }]
+ * @returns {Array} - Per input, in order: { success: true, order } or { success: false, message }
+ */
+export const createManualOrders = async (inputs) => {
+  const requests = inputs.map(input => ({ input, error: validateManualOrder(input) }));
+  const fail = (request, message) => {
+    request.error = message;
+  };
+  const pending = () => requests.filter(r => !r.error);
+
+  // Products of every order in one query
+  const productIds = [...new Set(pending().flatMap(r => r.input.products.map(p => String(p.productId))))];
+  const products = productIds.length > 0
+    ? await Product.find({ _id: { $in: productIds } }).select("name price image stockQuantity reservedQuantity").lean()
+    : [];
+  const productById = new Map(products.map(p => [String(p._id), p]));
+
+  for (const request of pending()) {
+    const missing = request.input.products.find(p => !productById.has(String(p.productId)));
+    if (missing) {
+      fail(request, `Product not found: ${missing.productId}`);
+    } else {
+      request.quantities = quantitiesByProduct(request.input.products);
+    }
+  }
+
+  await allocateStock(pending(), productById, fail);
+
+  const accepted = pending();
+  if (accepted.length > 0) {
+    let built = [];
+    let orders;
+    try {
+      const userByPhone = await resolveCustomers(accepted);
+      built = accepted.map(request => {
+        const user = userByPhone.get(request.input.customerPhone);
+        const order = buildOrder(request, user, productById);
+        // Known IDs, so the written orders can be told apart if the insert fails
+        order.doc._id = new mongoose.Types.ObjectId();
+        return { request, user, ...order };
+      });
+      orders = await Order.insertMany(built.map(b => b.doc), { ordered: false });
+    } catch (error) {
+      console.error("Error creating manual orders:", error);
+      // Some orders may have been written before the failure
+      orders = built.length > 0
+        ? await Order.find({ _id: { $in: built.map(b => b.doc._id) } })
+        : [];
+    }
+
+    const orderById = new Map(orders.map(order => [String(order._id), order]));
+    const unsaved = accepted.filter((request, i) => !orderById.has(String(built[i]?.doc._id)));
+    if (unsaved.length > 0) {
+      for (const request of unsaved) {
+        fail(request, "Could not save the order; its stock was released");
+      }
+      const totals = totalQuantities(unsaved);
+      try {
+        await returnStock(totals);
+      } catch (error) {
+        console.error("Error returning stock of unsaved manual orders:", Object.fromEntries(totals), error);
+      }
+    }
+
+    for (const { request, user, subtotal, doc } of built) {
+      const order = orderById.get(String(doc._id));
+      if (!order) {
+        continue;
+      }
+      request.order = describeManualOrder(order, subtotal, user, productById);
+
+      // Manual orders go straight to processing, so pre-render the label now
+      scheduleLabelPrerender(order._id);
+      if (order.status === "paid") {
+        recordOrderSaleInBackground(order);
+      }
+    }
+  }
+
+  return requests.map(({ error, order }) =>
+    error ? { success: false, message: error } : { success: true, order }
+  );
+};
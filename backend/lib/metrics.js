@@ -0,0 +1,307 @@
+/**
+ * Prometheus Metrics
+ *
+ * Collects metrics for GET /metrics (text exposition format, prom-client):
+ * - http_request_duration_seconds / http_requests_in_flight: per-route latency
+ * - mongodb_operation_duration_seconds: every query, aggregate and save,
+ *   timed by a global mongoose plugin
+ * - redis_command_duration_seconds: every ioredis command (incl. pipelines)
+ * - stock_reservations_total: reservation outcomes
+ * - rate_limit_decisions_total: rate limiter outcomes per route class
+ * - hold_release_lag_seconds / hold_sweeper_last_run_age_seconds: how late
+ *   expired holds are released, and whether the sweeper is running
+ * - payment_webhook_*: webhook inbox events by outcome, receive-to-processed
+ *   lag, and the pending backlog
+ * - inventory_*: Redis inventory operations and drift (INVENTORY_MODE=redis)
+ * - Node process defaults (CPU, memory, event loop lag, GC)
+ *
+ * Must be imported before any model is compiled (first import in server.js),
+ * otherwise the mongoose plugin misses those models.
+ */
+
+import mongoose from "mongoose";
+import client from "prom-client";
+import { redis } from "./redis.js";
+
+export const register = client.register;
+
+client.collectDefaultMetrics({ register });
+
+const LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10];
+
+const httpRequestDuration = new client.Histogram({
+  name: "http_request_duration_seconds",
+  help: "HTTP request latency by route",
+  labelNames: ["method", "route", "status_code"],
+  buckets: LATENCY_BUCKETS,
+});
+
+const httpRequestsInFlight = new client.Gauge({
+  name: "http_requests_in_flight",
+  help: "HTTP requests currently being handled",
+});
+
+const mongoOperationDuration = new client.Histogram({
+  name: "mongodb_operation_duration_seconds",
+  help: "MongoDB operation latency by model and operation",
+  labelNames: ["model", "operation", "outcome"],
+  buckets: LATENCY_BUCKETS,
+});
+
+const redisCommandDuration = new client.Histogram({
+  name: "redis_command_duration_seconds",
+  help: "Redis command latency by command",
+  labelNames: ["command", "outcome"],
+  buckets: LATENCY_BUCKETS,
+});
+
+const stockReservations = new client.Counter({
+  name: "stock_reservations_total",
+  help: "Stock reservation attempts by result",
+  labelNames: ["result"],
+});
+
+const rateLimitDecisions = new client.Counter({
+  name: "rate_limit_decisions_total",
+  help: "Rate limiter decisions by route class (allowed, limited, rejectedBusy, errors)",
+  labelNames: ["class", "result"],
+});
+
+const holdReleaseLag = new client.Histogram({
+  name: "hold_release_lag_seconds",
+  help: "Time between a hold expiring and the sweeper releasing it",
+  buckets: [1, 5, 15, 30, 60, 90, 120, 300, 600, 1800],
+});
+
+const holdsReleased = new client.Counter({
+  name: "holds_released_total",
+  help: "Expired holds released by the sweeper",
+});
+
+let lastHoldSweepAt = null;
+
+const webhookEvents = new client.Counter({
+  name: "payment_webhook_events_total",
+  help: "Payment webhook events by type and outcome (received, duplicate, processed, failed)",
+  labelNames: ["event", "result"],
+});
+
+const webhookLag = new client.Histogram({
+  name: "payment_webhook_lag_seconds",
+  help: "Time between a webhook being received and applied to its order",
+  labelNames: ["event"],
+  buckets: [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900],
+});
+
+const inventoryOperations = new client.Counter({
+  name: "inventory_operations_total",
+  help: "Redis inventory operations by type and result (INVENTORY_MODE=redis)",
+  labelNames: ["op", "result"],
+});
+
+const inventoryDrift = new client.Gauge({
+  name: "inventory_drift_products",
+  help: "Products whose MongoDB counters disagreed with Redis at the last drift check",
+  aggregator: "max",
+});
+
+// Set by the inbox sweep (every minute, in every process running job workers)
+const webhookBacklog = new client.Gauge({
+  name: "payment_webhook_inbox_pending",
+  help: "Webhook events received but not yet processed",
+  aggregator: "max",
+});
+
+const webhookOldestPending = new client.Gauge({
+  name: "payment_webhook_oldest_pending_age_seconds",
+  help: "Age of the oldest unprocessed webhook event",
+  aggregator: "max",
+});
+
+new client.Gauge({
+  name: "hold_sweeper_last_run_age_seconds",
+  help: "Seconds since the hold expiry sweeper last completed (0 if it hasn't run in this process)",
+  // In cluster mode only one worker sweeps; the others report 0
+  aggregator: "max",
+  collect() {
+    this.set(lastHoldSweepAt ? (Date.now() - lastHoldSweepAt) / 1000 : 0);
+  },
+});
+
+const seconds = (start) => Number(process.hrtime.bigint() - start) / 1e9;
+
+/**
+ * Express middleware: route latency histogram and in-flight gauge
+ */
+export const httpMetrics = (req, res, next) => {
+  const start = process.hrtime.bigint();
+  httpRequestsInFlight.inc();
+
+  let recorded = false;
+  const record = () => {
+    if (recorded) return;
+    recorded = true;
+    httpRequestsInFlight.dec();
+
+    // Route patterns, not raw URLs, to keep label cardinality bounded
+    const route = req.route ? `${req.baseUrl}${req.route.path}` : req.baseUrl || "unmatched";
+    httpRequestDuration.observe(
+      { method: req.method, route, status_code: res.statusCode },
+      seconds(start)
+    );
+  };
+
+  res.on("finish", record);
+  res.on("close", record);
+  next();
+};
+
+/* =======================
+   MongoDB (mongoose plugin)
+======================= */
+const QUERY_OPERATIONS = [
+  "find",
+  "findOne",
+  "countDocuments",
+  "estimatedDocumentCount",
+  "distinct",
+  "findOneAndUpdate",
+  "findOneAndDelete",
+  "findOneAndReplace",
+  "updateOne",
+  "updateMany",
+  "replaceOne",
+  "deleteOne",
+  "deleteMany",
+];
+
+const startTimer = Symbol("metricsStart");
+
+mongoose.plugin((schema) => {
+  const observe = (context, model, operation, outcome) => {
+    // Subdocument schemas get the plugin too, but have no model of their own
+    if (model && context[startTimer]) {
+      mongoOperationDuration.observe({ model, operation, outcome }, seconds(context[startTimer]));
+    }
+  };
+
+  schema.pre(QUERY_OPERATIONS, function () {
+    this[startTimer] = process.hrtime.bigint();
+  });
+  schema.post(QUERY_OPERATIONS, function () {
+    observe(this, this.model.modelName, this.op, "success");
+  });
+  schema.post(QUERY_OPERATIONS, function (error, result, next) {
+    observe(this, this.model.modelName, this.op, "error");
+    next(error);
+  });
+
+  schema.pre("aggregate", function () {
+    this[startTimer] = process.hrtime.bigint();
+  });
+  schema.post("aggregate", function () {
+    observe(this, this._model.modelName, "aggregate", "success");
+  });
+  schema.post("aggregate", function (error, result, next) {
+    observe(this, this._model.modelName, "aggregate", "error");
+    next(error);
+  });
+
+  schema.pre("save", function () {
+    this[startTimer] = process.hrtime.bigint();
+  });
+  schema.post("save", function () {
+    observe(this, this.constructor.modelName, "save", "success");
+  });
+  schema.post("save", function (error, doc, next) {
+    observe(this, this.constructor.modelName, "save", "error");
+    next(error);
+  });
+});
+
+/* =======================
+   Redis (ioredis)
+======================= */
+// Every command, including pipeline and MULTI members, goes through sendCommand
+const sendCommand = redis.sendCommand.bind(redis);
+redis.sendCommand = (command, ...args) => {
+  const start = process.hrtime.bigint();
+  command.promise.then(
+    () => redisCommandDuration.observe({ command: command.name, outcome: "success" }, seconds(start)),
+    () => redisCommandDuration.observe({ command: command.name, outcome: "error" }, seconds(start))
+  );
+  return sendCommand(command, ...args);
+};
+
+/* =======================
+   Stock holds
+======================= */
+/**
+ * @param {string} result - 'success', 'insufficient_stock' or 'error'
+ */
+export const recordStockReservation = (result) => {
+  stockReservations.inc({ result });
+};
+
+/**
+ * Record one sweep of the hold expiry job
+ * @param {Array<Date>} releasedExpiresAt - expiresAt of each hold it released
+ */
+export const recordHoldSweep = (releasedExpiresAt = []) => {
+  const now = Date.now();
+  for (const expiresAt of releasedExpiresAt) {
+    holdReleaseLag.observe(Math.max(0, (now - new Date(expiresAt).getTime()) / 1000));
+  }
+  holdsReleased.inc(releasedExpiresAt.length);
+  lastHoldSweepAt = now;
+};
+
+/* =======================
+   Rate limiting
+======================= */
+/**
+ * @param {string} routeClass - catalog, cart, checkout or admin
+ * @param {string} result - 'allowed', 'limited', 'rejectedBusy' or 'errors'
+ */
+export const recordRateLimit = (routeClass, result) => {
+  rateLimitDecisions.inc({ class: routeClass, result });
+};
+
+/* =======================
+   Payment webhooks
+======================= */
+/**
+ * @param {string} event - e.g. payment.captured
+ * @param {string} result - 'received', 'duplicate', 'processed' or 'failed'
+ */
+export const recordWebhookEvent = (event, result) => {
+  webhookEvents.inc({ event, result });
+};
+
+/**
+ * @param {string} event - e.g. payment.captured
+ * @param {number} lagSeconds - Received to processed
+ */
+export const recordWebhookProcessed = (event, lagSeconds) => {
+  webhookLag.observe({ event }, Math.max(0, lagSeconds));
+};
+
+export const recordWebhookBacklog = (pending, oldestPendingAgeSeconds) => {
+  webhookBacklog.set(pending);
+  webhookOldestPending.set(oldestPendingAgeSeconds);
+};
+
+/* =======================
+   Redis inventory
+======================= */
+/**
+ * @param {string} op - reserve, release, commit or sell
+ * @param {string} result - 'success', 'insufficient' or 'not_found'
+ */
+export const recordInventoryOperation = (op, result) => {
+  inventoryOperations.inc({ op, result });
+};
+
+export const recordInventoryDrift = (products) => {
+  inventoryDrift.set(products);
+};
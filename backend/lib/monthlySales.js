@@ -0,0 +1,120 @@
+/**
+ * Monthly Sales Service
+ *
+ * Computes a month's sales, delivery and platform-fee figures for the finance
+ * module in a single aggregation pipeline, and stores the result once the
+ * month has closed so later reads are a single document lookup.
+ *
+ * Figures match the original per-order calculation: sales are product revenue
+ * (quantity x price), delivery charges are derived from each order's address
+ * with the current pricing config, and platform fees are constant + Razorpay %
+ * of the product subtotal.
+ */
+
+import Order from "../models/order.model.js";
+import MonthlySales from "../models/monthlySales.model.js";
+import { calculatePlatformFee, getDeliveryCharge, getLocalDeliveryExpression } from "./pricing.js";
+
+// Late payment webhooks can still mark orders paid after the month ends,
+// so a month is only stored once this much time has passed
+const MONTH_SETTLE_MS = 24 * 60 * 60 * 1000;
+
+/**
+ * Get month boundaries (server local time)
+ * @returns {Object} - { startDate, endDate }
+ */
+export function getMonthBoundaries(year, month) {
+  const startDate = new Date(year, month - 1, 1, 0, 0, 0, 0);
+  const endDate = new Date(year, month, 0, 23, 59, 59, 999);
+  return { startDate, endDate };
+}
+
+/**
+ * Aggregate paid orders of a month
+ * @returns {Object} - Sales figures (same shape as MonthlySales)
+ */
+export const computeMonthlySales = async (year, month) => {
+  const { startDate, endDate } = getMonthBoundaries(year, month);
+
+  const [result] = await Order.aggregate([
+    { $match: { status: "paid", createdAt: { $gte: startDate, $lte: endDate } } },
+    {
+      $project: {
+        subtotal: {
+          $sum: {
+            $map: {
+              input: "$products",
+              as: "item",
+              in: { $multiply: ["$$item.quantity", "$$item.price"] },
+            },
+          },
+        },
+        isLocal: getLocalDeliveryExpression("$address"),
+      },
+    },
+    {
+      $group: {
+        _id: null,
+        totalSales: { $sum: "$subtotal" },
+        orderCount: { $sum: 1 },
+        localOrders: { $sum: { $cond: ["$isLocal", 1, 0] } },
+      },
+    },
+  ]);
+
+  const { totalSales = 0, orderCount = 0, localOrders = 0 } = result || {};
+
+  // Fees are linear in order count and subtotal, so they can be applied to the totals
+  const { constant, razorpayPercentage } = calculatePlatformFee(0);
+  const totalPlatformFeeConstant = constant * orderCount;
+  const totalPlatformFeeRazorpay = (totalSales * razorpayPercentage) / 100;
+
+  return {
+    totalSales,
+    totalDeliveryCharges:
+      localOrders * getDeliveryCharge("local") + (orderCount - localOrders) * getDeliveryCharge("national"),
+    totalPlatformFeeConstant,
+    totalPlatformFeeRazorpay,
+    totalPlatformFees: totalPlatformFeeConstant + totalPlatformFeeRazorpay,
+    razorpayPercentage,
+    orderCount,
+  };
+};
+
+/**
+ * Check whether a month is closed (ended and settled)
+ */
+export const isMonthClosed = (year, month, now = new Date()) => {
+  const { endDate } = getMonthBoundaries(year, month);
+  return now.getTime() - endDate.getTime() >= MONTH_SETTLE_MS;
+};
+
+/**
+ * Get sales figures for a month
+ * Closed months are served from (and on first use written to) the
+ * MonthlySales store; the open month is always aggregated live.
+ * @returns {Object} - Sales figures
+ */
+export const getMonthlySales = async (year, month) => {
+  if (!isMonthClosed(year, month)) {
+    return computeMonthlySales(year, month);
+  }
+
+  const stored = await MonthlySales.findOne({ year, month }).lean();
+  if (stored) {
+    return stored;
+  }
+
+  const sales = await computeMonthlySales(year, month);
+  try {
+    await MonthlySales.updateOne({ year, month }, { $setOnInsert: sales }, { upsert: true });
+  } catch (error) {
+    // A concurrent request stored the same month first
+    if (error.code !== 11000) {
+      throw error;
+    }
+  }
+
+  return sales;
+};
+
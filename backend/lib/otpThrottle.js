@@ -0,0 +1,208 @@
+/**
+ * OTP Throttling
+ *
+ * Issuing and verifying an OTP are each one atomic Redis script, so a request
+ * costs a single round-trip and concurrent sends for the same phone can't
+ * both pass the checks:
+ * - issueOTP: freeze check, resend cooldown, resends per window, then stores
+ *   the OTP and counts the send
+ * - verifyOTPCode: freeze check, compares the code, records the failed
+ *   attempt (freezing after MAX_FAILED_ATTEMPTS) or clears everything
+ *
+ * Values stay JSON strings (otp:<phone> {otp}, otp_throttle:<phone>
+ * {count, lastSentAt}, otp_failed:<phone> {attempts}), so keys written
+ * before these scripts existed are still understood.
+ */
+
+import { redis } from "./redis.js";
+
+// Redis key prefixes
+const OTP_PREFIX = "otp:";
+const THROTTLE_PREFIX = "otp_throttle:";
+const FAILED_ATTEMPTS_PREFIX = "otp_failed:";
+
+// Throttling configuration
+export const OTP_EXPIRY_SECONDS = 5 * 60; // 5 minutes
+const RESEND_COOLDOWN_SECONDS = 60; // Minimum time between resends
+const MAX_RESENDS_PER_WINDOW = 3; // Maximum resends allowed in the time window
+const THROTTLE_WINDOW_SECONDS = 15 * 60; // 15 minutes
+const MAX_FAILED_ATTEMPTS = 3; // Maximum failed OTP attempts
+const FREEZE_DURATION_SECONDS = 15 * 60; // 15 minutes freeze
+
+// Returns { decision, seconds }: frozen (seconds left), no_otp,
+// cooldown (seconds to wait), limit_reached (seconds until the window resets) or sent
+redis.defineCommand("otpIssue", {
+  numberOfKeys: 3,
+  lua: `
+    local failed = redis.call('GET', KEYS[1])
+    if failed then
+      local ttl = redis.call('TTL', KEYS[1])
+      if cjson.decode(failed).attempts >= tonumber(ARGV[6]) and ttl > 0 then
+        return { 'frozen', ttl }
+      end
+    end
+
+    if ARGV[7] == '1' and redis.call('EXISTS', KEYS[3]) == 0 then
+      return { 'no_otp', 0 }
+    end
+
+    local now = tonumber(ARGV[1])
+    local throttle = redis.call('GET', KEYS[2])
+    local count = 1
+    local ttl = tonumber(ARGV[5]) * 1000
+    if throttle then
+      local data = cjson.decode(throttle)
+      local elapsed = (now - data.lastSentAt) / 1000
+      if elapsed < tonumber(ARGV[3]) then
+        return { 'cooldown', math.ceil(tonumber(ARGV[3]) - elapsed) }
+      end
+      local remaining = redis.call('PTTL', KEYS[2])
+      if data.count >= tonumber(ARGV[4]) then
+        return { 'limit_reached', math.ceil(remaining / 1000) }
+      end
+      count = data.count + 1
+      -- Keep the original window
+      if remaining > 0 then ttl = remaining end
+    end
+
+    redis.call('SET', KEYS[3], cjson.encode({ otp = ARGV[2] }), 'EX', ARGV[8])
+    redis.call('SET', KEYS[2], cjson.encode({ count = count, lastSentAt = now }), 'PX', ttl)
+    return { 'sent', 0 }
+  `,
+});
+
+// Returns { decision, value }: frozen (seconds left), not_found,
+// invalid (attempts so far), or verified
+redis.defineCommand("otpVerify", {
+  numberOfKeys: 3,
+  lua: `
+    local maxFailed = tonumber(ARGV[2])
+    local failed = redis.call('GET', KEYS[1])
+    local attempts = 0
+    if failed then
+      attempts = cjson.decode(failed).attempts
+      local ttl = redis.call('TTL', KEYS[1])
+      if attempts >= maxFailed and ttl > 0 then
+        return { 'frozen', ttl }
+      end
+    end
+
+    local stored = redis.call('GET', KEYS[2])
+    if not stored then
+      return { 'not_found', 0 }
+    end
+
+    if cjson.decode(stored).otp ~= ARGV[1] then
+      attempts = attempts + 1
+      -- Attempts live as long as an OTP could be valid, or the freeze once reached
+      local ttl = attempts >= maxFailed and ARGV[4] or ARGV[3]
+      redis.call('SET', KEYS[1], cjson.encode({ attempts = attempts }), 'EX', ttl)
+      return { 'invalid', attempts }
+    end
+
+    redis.call('DEL', KEYS[2], KEYS[3], KEYS[1])
+    return { 'verified', 0 }
+  `,
+});
+
+const toMinutes = (seconds) => Math.ceil(seconds / 60);
+
+/**
+ * Check the throttles and, if allowed, store a new OTP and count the send
+ * @param {string} phoneNumber - 10-digit phone number
+ * @param {string} otp - Code to store
+ * @param {Object} options - { requireExisting: only replace an OTP that is still pending (resend) }
+ * @returns {Object} - { allowed: true } or { allowed: false, reason, message, ... }
+ */
+export const issueOTP = async (phoneNumber, otp, { requireExisting = false } = {}) => {
+  const [decision, seconds] = await redis.otpIssue(
+    FAILED_ATTEMPTS_PREFIX + phoneNumber,
+    THROTTLE_PREFIX + phoneNumber,
+    OTP_PREFIX + phoneNumber,
+    Date.now(),
+    otp,
+    RESEND_COOLDOWN_SECONDS,
+    MAX_RESENDS_PER_WINDOW,
+    THROTTLE_WINDOW_SECONDS,
+    MAX_FAILED_ATTEMPTS,
+    requireExisting ? "1" : "0",
+    OTP_EXPIRY_SECONDS
+  );
+
+  switch (decision) {
+    case "sent":
+      return { allowed: true };
+    case "frozen":
+      return {
+        allowed: false,
+        reason: "frozen",
+        remainingMinutes: toMinutes(seconds),
+        message: `Too many failed attempts. Please try again in ${toMinutes(seconds)} minute(s)`,
+      };
+    case "no_otp":
+      return {
+        allowed: false,
+        reason: "no_otp",
+        message: "No OTP request found. Please request a new OTP first.",
+      };
+    case "cooldown":
+      return {
+        allowed: false,
+        reason: "cooldown",
+        waitTime: seconds,
+        message: `Please wait ${seconds} seconds before requesting another OTP`,
+      };
+    default:
+      return {
+        allowed: false,
+        reason: "limit_reached",
+        resetInMinutes: toMinutes(seconds),
+        message: `Too many OTP requests. Please try again in ${toMinutes(seconds)} minute(s)`,
+      };
+  }
+};
+
+/**
+ * Check a code; a match deletes the OTP and clears throttling and failed attempts
+ * @param {string} phoneNumber - 10-digit phone number
+ * @param {string} otp - Code entered by the user
+ * @returns {Object} - { verified: true } or { verified: false, reason, message, ... }
+ */
+export const verifyOTPCode = async (phoneNumber, otp) => {
+  const [decision, value] = await redis.otpVerify(
+    FAILED_ATTEMPTS_PREFIX + phoneNumber,
+    OTP_PREFIX + phoneNumber,
+    THROTTLE_PREFIX + phoneNumber,
+    // Stored codes are strings; anything else never matches
+    typeof otp === "string" ? otp : "",
+    MAX_FAILED_ATTEMPTS,
+    OTP_EXPIRY_SECONDS,
+    FREEZE_DURATION_SECONDS
+  );
+
+  switch (decision) {
+    case "verified":
+      return { verified: true };
+    case "frozen":
+      return {
+        verified: false,
+        reason: "frozen",
+        remainingMinutes: toMinutes(value),
+        message: `Too many failed attempts. Please try again in ${toMinutes(value)} minute(s)`,
+      };
+    case "not_found":
+      return { verified: false, reason: "not_found", message: "OTP not found or expired" };
+    default: {
+      const remainingAttempts = MAX_FAILED_ATTEMPTS - value;
+      if (remainingAttempts <= 0) {
+        return {
+          verified: false,
+          reason: "frozen",
+          remainingMinutes: toMinutes(FREEZE_DURATION_SECONDS),
+          message: `Too many failed attempts. Your number is frozen for ${toMinutes(FREEZE_DURATION_SECONDS)} minutes.`,
+        };
+      }
+      return { verified: false, reason: "invalid", remainingAttempts, message: "Invalid OTP" };
+    }
+  }
+};
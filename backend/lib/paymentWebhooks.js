@@ -0,0 +1,335 @@
+/**
+ * Payment Webhook Inbox
+ *
+ * Razorpay retries a webhook until it is acknowledged quickly, and may deliver
+ * the same event more than once. So the webhook route only verifies the
+ * signature and stores the event (webhookEvent.model.js, unique per event ID),
+ * then answers; the payment.webhook job applies it to the order afterwards.
+ *
+ * - Duplicates: a redelivered event hits the unique index and is acknowledged
+ *   without being stored again; a job for an event that is already processed
+ *   does nothing; captures for paid orders don't finalize again
+ * - Order per payment: events for one Razorpay order are applied one at a
+ *   time (Redis lock per order) and oldest first (by the event's created_at);
+ *   a job whose event has an earlier unprocessed one is retried later
+ * - Lost jobs: a sweep re-enqueues pending events that have been waiting too
+ *   long (e.g. Redis was down when the event arrived)
+ * - Lag: receive-to-processed time and the backlog go to /metrics
+ */
+
+import crypto from "crypto";
+import { redis } from "./redis.js";
+import { enqueueJob, enqueueJobInBackground } from "./jobQueue.js";
+import { finalizeOrder, releaseReservedStock } from "./stockHold.js";
+import { publishHoldStatus } from "./holdEvents.js";
+import { recordWebhookBacklog, recordWebhookEvent, recordWebhookProcessed } from "./metrics.js";
+import Order from "../models/order.model.js";
+import WebhookEvent from "../models/webhookEvent.model.js";
+
+export const WEBHOOK_JOB_TYPE = "payment.webhook";
+
+const DUPLICATE_KEY = 11000;
+// Only one event per Razorpay order is applied at a time; the job's timeout
+// plus abort grace (lib/jobs.js) must stay below this
+const LOCK_TTL_MS = 60 * 1000;
+// Pending events older than this are re-enqueued by the sweep
+const STALE_PENDING_MS = 2 * 60 * 1000;
+const SWEEP_INTERVAL_MS = 60 * 1000;
+const SWEEP_BATCH = 100;
+
+const lockKey = (orderKey) => `webhook:lock:${orderKey}`;
+const SWEEP_LOCK_KEY = "webhook:sweep:lock";
+
+/**
+ * Thrown while an earlier event for the same order is unprocessed or being
+ * processed; the job is retried and the event stays pending
+ */
+class EventNotReadyError extends Error {}
+
+let sweepIntervalId = null;
+let webhookStats = {
+  startTime: new Date(),
+  received: 0,
+  duplicates: 0,
+  processed: 0,
+  alreadyProcessed: 0,
+  deferred: 0,
+  failed: 0,
+  requeued: 0,
+  lastSweepAt: null,
+};
+
+/**
+ * Store a verified Razorpay webhook and queue it for processing
+ * @param {Buffer|string} rawBody - Request body exactly as received
+ * @param {string} headerEventId - x-razorpay-event-id header, if sent
+ * @returns {Object} - { duplicate: boolean, eventId }
+ * @throws when the body isn't a Razorpay event or the inbox can't be written
+ */
+export const ingestRazorpayWebhook = async (rawBody, headerEventId) => {
+  const body = Buffer.isBuffer(rawBody) ? rawBody : Buffer.from(String(rawBody));
+  const event = JSON.parse(body.toString());
+  if (!event || typeof event.event !== "string") {
+    throw new SyntaxError("Not a Razorpay event");
+  }
+
+  // Redeliveries carry the same event ID (and body)
+  const eventId = headerEventId || `sha256:${crypto.createHash("sha256").update(body).digest("hex")}`;
+  const payment = event.payload?.payment?.entity;
+  const orderKey = payment?.order_id || event.payload?.order?.entity?.id || eventId;
+
+  try {
+    await WebhookEvent.create({
+      eventId,
+      event: event.event,
+      orderKey,
+      paymentId: payment?.id,
+      payload: event,
+      eventCreatedAt: event.created_at ? new Date(event.created_at * 1000) : new Date(),
+    });
+  } catch (error) {
+    if (error.code === DUPLICATE_KEY) {
+      webhookStats.duplicates++;
+      recordWebhookEvent(event.event, "duplicate");
+      return { duplicate: true, eventId };
+    }
+    throw error;
+  }
+
+  webhookStats.received++;
+  recordWebhookEvent(event.event, "received");
+  // The event is safe in the inbox; if this enqueue fails the sweep picks it up
+  enqueueJobInBackground(WEBHOOK_JOB_TYPE, { eventId });
+  return { duplicate: false, eventId };
+};
+
+/* =======================
+   Event handlers
+======================= */
+// Each returns a short result for the inbox record; they must be safe to
+// run twice for the same event (a job can run again after a crash)
+const eventHandlers = {
+  "payment.captured": async (payload) => {
+    const payment = payload.payload.payment.entity;
+    const order = await Order.findOne({ razorpayOrderId: payment.order_id });
+    if (!order) {
+      console.warn("Webhook payment.captured: no local order found for", payment.order_id);
+      return "no_order";
+    }
+
+    if (order.status === "paid") {
+      if (!order.razorpayPaymentId) {
+        await Order.updateOne({ _id: order._id }, { $set: { razorpayPaymentId: payment.id } });
+      }
+      return "already_paid";
+    }
+
+    // Use finalize to atomically update stock
+    const result = await finalizeOrder(order._id);
+    if (!result.success) {
+      console.warn("Webhook: finalize failed for order", order._id, result.error);
+      return `finalize_failed: ${result.error}`;
+    }
+    await Order.updateOne({ _id: order._id }, { $set: { razorpayPaymentId: payment.id } });
+    return "finalized";
+  },
+
+  "payment.failed": async (payload) => {
+    const payment = payload.payload.payment.entity;
+    // Only cancel while still on hold (a no-op when the event is applied twice)
+    const order = await Order.findOneAndUpdate(
+      { razorpayOrderId: payment.order_id, status: "hold" },
+      {
+        $set: { status: "cancelled", trackingStatus: "cancelled" },
+        $push: {
+          trackingHistory: {
+            status: "cancelled",
+            timestamp: new Date(),
+            note: "Payment failed - order cancelled",
+          },
+        },
+      },
+      { new: true }
+    );
+    if (!order) {
+      return "ignored";
+    }
+    // Release reserved stock
+    await releaseReservedStock(order.products, order._id, "payment_failed");
+    publishHoldStatus(order);
+    return "cancelled";
+  },
+};
+
+// An earlier event for the same order that hasn't been applied yet
+const hasEarlierUnprocessed = (inboxEvent) =>
+  WebhookEvent.exists({
+    orderKey: inboxEvent.orderKey,
+    _id: { $ne: inboxEvent._id },
+    status: { $in: ["pending", "processing"] },
+    $or: [
+      { eventCreatedAt: { $lt: inboxEvent.eventCreatedAt } },
+      { eventCreatedAt: inboxEvent.eventCreatedAt, receivedAt: { $lt: inboxEvent.receivedAt } },
+    ],
+  });
+
+/**
+ * Apply one inbox event (payment.webhook job handler)
+ * @param {string} eventId - Inbox event ID
+ * @param {Object} job - { attempts, maxAttempts, signal } from the job queue
+ * @returns {string|null} - The event's result, or null if there was nothing to do
+ */
+export const processWebhookEvent = async (eventId, job = { attempts: 1, maxAttempts: 1 }) => {
+  const inboxEvent = await WebhookEvent.findOne({ eventId }).lean();
+  if (!inboxEvent || inboxEvent.status === "processed" || inboxEvent.status === "failed") {
+    // Sent twice (sweep and original job) or finished by an earlier attempt
+    webhookStats.alreadyProcessed++;
+    return null;
+  }
+
+  const token = crypto.randomBytes(8).toString("hex");
+  const acquired = await redis.set(lockKey(inboxEvent.orderKey), token, "PX", LOCK_TTL_MS, "NX");
+  if (!acquired) {
+    webhookStats.deferred++;
+    throw new EventNotReadyError(`Another event for ${inboxEvent.orderKey} is being processed`);
+  }
+
+  try {
+    if (await hasEarlierUnprocessed(inboxEvent)) {
+      webhookStats.deferred++;
+      throw new EventNotReadyError(`Waiting for an earlier event for ${inboxEvent.orderKey}`);
+    }
+    // Timed out while waiting: leave the event pending for the retry
+    job.signal?.throwIfAborted();
+
+    // Holding the order's lock, so a "processing" event is one whose worker died
+    const claimed = await WebhookEvent.findOneAndUpdate(
+      { _id: inboxEvent._id, status: { $in: ["pending", "processing"] } },
+      { $set: { status: "processing" }, $inc: { attempts: 1 } },
+      { new: true }
+    );
+    if (!claimed) {
+      webhookStats.alreadyProcessed++;
+      return null;
+    }
+
+    let result;
+    try {
+      const handler = eventHandlers[claimed.event];
+      result = handler ? await handler(claimed.payload) : "ignored";
+    } catch (error) {
+      const final = job.attempts >= job.maxAttempts;
+      await WebhookEvent.updateOne(
+        { _id: claimed._id },
+        { $set: { status: final ? "failed" : "pending", lastError: String(error.message).slice(0, 500) } }
+      );
+      if (final) {
+        webhookStats.failed++;
+        recordWebhookEvent(claimed.event, "failed");
+      }
+      throw error;
+    }
+
+    const processedAt = new Date();
+    await WebhookEvent.updateOne(
+      { _id: claimed._id },
+      { $set: { status: "processed", result, processedAt }, $unset: { lastError: "" } }
+    );
+    webhookStats.processed++;
+    recordWebhookEvent(claimed.event, "processed");
+    recordWebhookProcessed(claimed.event, (processedAt - claimed.receivedAt) / 1000);
+    return result;
+  } finally {
+    // Release the lock only if it is still ours
+    const current = await redis.get(lockKey(inboxEvent.orderKey)).catch(() => null);
+    if (current === token) {
+      await redis.del(lockKey(inboxEvent.orderKey)).catch(() => {});
+    }
+  }
+};
+
+/**
+ * Record the backlog and re-enqueue pending events that have waited longer
+ * than STALE_PENDING_MS (one process re-enqueues per interval)
+ * @returns {number} - Events re-enqueued (0 if another process swept)
+ */
+export const sweepPendingWebhookEvents = async () => {
+  // Every process reports the backlog, so the aggregated gauge isn't stale
+  const backlog = await getWebhookBacklog();
+  recordWebhookBacklog(backlog.pending, backlog.oldestPendingAgeSeconds);
+  webhookStats.lastSweepAt = new Date();
+
+  const acquired = await redis.set(SWEEP_LOCK_KEY, "1", "PX", SWEEP_INTERVAL_MS - 1000, "NX");
+  if (!acquired) {
+    return 0;
+  }
+
+  const staleBefore = new Date(Date.now() - STALE_PENDING_MS);
+  const stale = await WebhookEvent.find({
+    status: { $in: ["pending", "processing"] },
+    receivedAt: { $lt: staleBefore },
+    updatedAt: { $lt: staleBefore },
+  })
+    .sort({ receivedAt: 1 })
+    .limit(SWEEP_BATCH)
+    .select("eventId")
+    .lean();
+
+  for (const { eventId } of stale) {
+    await enqueueJob(WEBHOOK_JOB_TYPE, { eventId });
+  }
+  webhookStats.requeued += stale.length;
+  if (stale.length > 0) {
+    console.log(`Re-queued ${stale.length} pending webhook event(s)`);
+  }
+
+  return stale.length;
+};
+
+const getWebhookBacklog = async () => {
+  const [pending, oldest] = await Promise.all([
+    WebhookEvent.countDocuments({ status: { $in: ["pending", "processing"] } }),
+    WebhookEvent.findOne({ status: "pending" }).sort({ receivedAt: 1 }).select("receivedAt").lean(),
+  ]);
+  return {
+    pending,
+    oldestPendingAgeSeconds: oldest ? Math.floor((Date.now() - oldest.receivedAt) / 1000) : 0,
+  };
+};
+
+// Start the pending event sweep (runs every minute where job workers run)
+export const startWebhookSweep = () => {
+  if (sweepIntervalId) {
+    return;
+  }
+  sweepIntervalId = setInterval(() => {
+    sweepPendingWebhookEvents().catch(err => {
+      console.error("Error sweeping pending webhook events:", err.message);
+    });
+  }, SWEEP_INTERVAL_MS);
+};
+
+// Stop the pending event sweep (for graceful shutdown)
+export const stopWebhookSweep = () => {
+  if (sweepIntervalId) {
+    clearInterval(sweepIntervalId);
+    sweepIntervalId = null;
+  }
+};
+
+/**
+ * Inbox statistics for monitoring
+ * Counters are this process; `backlog` and `failedEvents` cover the whole inbox
+ */
+export const getWebhookStats = async () => {
+  const [backlog, failedEvents] = await Promise.all([
+    getWebhookBacklog(),
+    WebhookEvent.countDocuments({ status: "failed" }),
+  ]);
+  return {
+    ...webhookStats,
+    isSweeping: sweepIntervalId !== null,
+    backlog,
+    failedEvents,
+  };
+};
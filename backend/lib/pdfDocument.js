@@ -0,0 +1,249 @@
+/**
+ * Minimal PDF Writer
+ * Builds PDF 1.4 documents from deflated content streams using the standard
+ * Helvetica fonts, so printable documents can be produced without a browser
+ * or any external rendering service.
+ */
+
+import zlib from "zlib";
+
+// A4 page size in PDF points (1/72 inch)
+export const A4 = { width: 595.28, height: 841.89 };
+
+export const MM = 72 / 25.4;
+
+// Average Helvetica glyph width as a fraction of the font size
+const AVG_CHAR_WIDTH = 0.5;
+const AVG_BOLD_CHAR_WIDTH = 0.55;
+
+const formatNumber = (value) => Number(value.toFixed(2)).toString();
+
+/**
+ * Convert a "#rrggbb" colour to a PDF rgb triple
+ * @param {string} hex - Hex colour string
+ * @returns {number[]} - [r, g, b] in the 0..1 range
+ */
+export function hexToRgb(hex) {
+  const value = parseInt(hex.replace("#", ""), 16);
+  return [(value >> 16) & 255, (value >> 8) & 255, value & 255].map(c => Number((c / 255).toFixed(3)));
+}
+
+/**
+ * Strip characters the standard fonts cannot draw (WinAnsi only)
+ * @param {*} value - Any value to render as text
+ * @returns {string} - Printable text
+ */
+export function toPrintableText(value) {
+  return String(value ?? "")
+    .normalize("NFKD")
+    .replace(/[^\x20-\x7E\xA0-\xFF]/g, "")
+    .trim();
+}
+
+/**
+ * Estimate rendered width of text in points
+ * @param {string} text - Text to measure
+ * @param {number} size - Font size
+ * @param {boolean} bold - Whether the bold face is used
+ * @returns {number} - Approximate width in points
+ */
+export function textWidth(text, size, bold = false) {
+  return text.length * size * (bold ? AVG_BOLD_CHAR_WIDTH : AVG_CHAR_WIDTH);
+}
+
+/**
+ * Truncate text with an ellipsis so it fits in maxWidth
+ */
+export function truncateText(text, size, maxWidth, bold = false) {
+  const printable = toPrintableText(text);
+  if (textWidth(printable, size, bold) <= maxWidth) {
+    return printable;
+  }
+  const maxChars = Math.max(1, Math.floor(maxWidth / (size * (bold ? AVG_BOLD_CHAR_WIDTH : AVG_CHAR_WIDTH))) - 3);
+  return `${printable.slice(0, maxChars)}...`;
+}
+
+/**
+ * Word-wrap text into lines no wider than maxWidth
+ * @returns {string[]} - Wrapped lines
+ */
+export function wrapText(text, size, maxWidth, bold = false) {
+  const maxChars = Math.max(1, Math.floor(maxWidth / (size * (bold ? AVG_BOLD_CHAR_WIDTH : AVG_CHAR_WIDTH))));
+  const words = toPrintableText(text).split(/\s+/).filter(Boolean);
+  const lines = [];
+  let current = "";
+
+  for (const word of words) {
+    const candidate = current ? `${current} ${word}` : word;
+    if (candidate.length <= maxChars) {
+      current = candidate;
+      continue;
+    }
+    if (current) {
+      lines.push(current);
+    }
+    // Hard-break words that are longer than a whole line
+    let rest = word;
+    while (rest.length > maxChars) {
+      lines.push(rest.slice(0, maxChars));
+      rest = rest.slice(maxChars);
+    }
+    current = rest;
+  }
+
+  if (current) {
+    lines.push(current);
+  }
+  return lines;
+}
+
+const escapeString = (text) =>
+  `(${text.replace(/\\/g, "\\\\").replace(/\(/g, "\\(").replace(/\)/g, "\\)")})`;
+
+/**
+ * Builder for a single PDF content stream (drawing operators)
+ */
+export class ContentStream {
+  constructor() {
+    this.ops = [];
+  }
+
+  raw(op) {
+    this.ops.push(op);
+    return this;
+  }
+
+  text(x, y, value, { size = 10, bold = false, color = [0, 0, 0] } = {}) {
+    const text = toPrintableText(value);
+    if (!text) {
+      return this;
+    }
+    this.ops.push(
+      `BT ${color.join(" ")} rg /${bold ? "F2" : "F1"} ${formatNumber(size)} Tf ` +
+      `${formatNumber(x)} ${formatNumber(y)} Td ${escapeString(text)} Tj ET`
+    );
+    return this;
+  }
+
+  centeredText(cx, y, value, options = {}) {
+    const text = toPrintableText(value);
+    const width = textWidth(text, options.size || 10, options.bold);
+    return this.text(cx - width / 2, y, text, options);
+  }
+
+  rect(x, y, width, height, { lineWidth = 1, stroke = [0, 0, 0], fill = null } = {}) {
+    const path = `${formatNumber(x)} ${formatNumber(y)} ${formatNumber(width)} ${formatNumber(height)} re`;
+    if (fill && stroke) {
+      this.ops.push(`${formatNumber(lineWidth)} w ${fill.join(" ")} rg ${stroke.join(" ")} RG ${path} B`);
+    } else if (fill) {
+      this.ops.push(`${fill.join(" ")} rg ${path} f`);
+    } else {
+      this.ops.push(`${formatNumber(lineWidth)} w ${stroke.join(" ")} RG ${path} S`);
+    }
+    return this;
+  }
+
+  line(x1, y1, x2, y2, { lineWidth = 1, color = [0, 0, 0], dash = null } = {}) {
+    const dashOp = dash ? `[${dash.join(" ")}] 0 d` : "[] 0 d";
+    this.ops.push(
+      `${formatNumber(lineWidth)} w ${dashOp} ${color.join(" ")} RG ` +
+      `${formatNumber(x1)} ${formatNumber(y1)} m ${formatNumber(x2)} ${formatNumber(y2)} l S [] 0 d`
+    );
+    return this;
+  }
+
+  circle(cx, cy, r, { fill = [0, 0, 0] } = {}) {
+    // Four cubic Bezier arcs approximate a circle
+    const k = 0.5523 * r;
+    const f = formatNumber;
+    this.ops.push(
+      `${fill.join(" ")} rg ${f(cx + r)} ${f(cy)} m ` +
+      `${f(cx + r)} ${f(cy + k)} ${f(cx + k)} ${f(cy + r)} ${f(cx)} ${f(cy + r)} c ` +
+      `${f(cx - k)} ${f(cy + r)} ${f(cx - r)} ${f(cy + k)} ${f(cx - r)} ${f(cy)} c ` +
+      `${f(cx - r)} ${f(cy - k)} ${f(cx - k)} ${f(cy - r)} ${f(cx)} ${f(cy - r)} c ` +
+      `${f(cx + k)} ${f(cy - r)} ${f(cx + r)} ${f(cy - k)} ${f(cx + r)} ${f(cy)} c f`
+    );
+    return this;
+  }
+
+  toBuffer() {
+    return Buffer.from(`${this.ops.join("\n")}\n`, "latin1");
+  }
+
+  /**
+   * Deflate the stream so it can be stored and embedded as-is
+   */
+  compress() {
+    return deflateContent(this.toBuffer());
+  }
+}
+
+/**
+ * Deflate raw content stream bytes (FlateDecode)
+ */
+export function deflateContent(buffer) {
+  return zlib.deflateSync(buffer);
+}
+
+/**
+ * Assemble a PDF document
+ * @param {Array<Buffer[]>} pages - One entry per page, each a list of deflated
+ *   content streams that are drawn in order
+ * @returns {Buffer} - Complete PDF file
+ */
+export function buildPdf(pages) {
+  const chunks = [];
+  const offsets = [];
+  let length = 0;
+
+  const write = (data) => {
+    const buffer = typeof data === "string" ? Buffer.from(data, "latin1") : data;
+    chunks.push(buffer);
+    length += buffer.length;
+  };
+
+  // Object numbering: 1 catalog, 2 page tree, 3-4 fonts, then pages and streams
+  let nextId = 5;
+  const layout = pages.map(streams => {
+    const pageId = nextId++;
+    const streamIds = streams.map(() => nextId++);
+    return { pageId, streamIds, streams };
+  });
+
+  const writeObject = (id, body) => {
+    offsets[id] = length;
+    write(`${id} 0 obj\n`);
+    write(body);
+    write("\nendobj\n");
+  };
+
+  write("%PDF-1.4\n%\xE2\xE3\xCF\xD3\n");
+  writeObject(1, "<< /Type /Catalog /Pages 2 0 R >>");
+  writeObject(2, `<< /Type /Pages /Kids [${layout.map(p => `${p.pageId} 0 R`).join(" ")}] /Count ${layout.length} >>`);
+  writeObject(3, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>");
+  writeObject(4, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>");
+
+  for (const page of layout) {
+    writeObject(
+      page.pageId,
+      `<< /Type /Page /Parent 2 0 R /MediaBox [0 0 ${A4.width} ${A4.height}] ` +
+      `/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> ` +
+      `/Contents [${page.streamIds.map(id => `${id} 0 R`).join(" ")}] >>`
+    );
+    page.streams.forEach((stream, index) => {
+      offsets[page.streamIds[index]] = length;
+      write(`${page.streamIds[index]} 0 obj\n<< /Length ${stream.length} /Filter /FlateDecode >>\nstream\n`);
+      write(stream);
+      write("\nendstream\nendobj\n");
+    });
+  }
+
+  const xrefOffset = length;
+  write(`xref\n0 ${nextId}\n0000000000 65535 f \n`);
+  for (let id = 1; id < nextId; id++) {
+    write(`${String(offsets[id]).padStart(10, "0")} 00000 n \n`);
+  }
+  write(`trailer\n<< /Size ${nextId} /Root 1 0 R >>\nstartxref\n${xrefOffset}\n%%EOF\n`);
+
+  return Buffer.concat(chunks, length);
+}
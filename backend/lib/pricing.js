@@ -1,6 +1,11 @@
 /**
  * Pricing Utility
  * Handles delivery charges and platform fee calculations based on YAML config
+ *
+ * The YAML config is compiled once into lookup structures (a pincode-prefix
+ * trie and a local-city set) so a delivery-type check is O(pincode length).
+ * watchPricingConfig() recompiles on file changes and swaps the compiled
+ * config in a single assignment; callers never see a half-updated config.
  */
 
 import fs from 'fs';
@@ -11,84 +16,169 @@ import yaml from 'js-yaml';
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
-let pricingConfig = null;
+const CONFIG_PATH = process.env.PRICING_CONFIG_PATH || path.join(__dirname, '../config/pricing.yaml');
+const RELOAD_DEBOUNCE_MS = 200;
+
+const DEFAULT_CONFIG = {
+  delivery: {
+    local: { price: 50 },
+    national: { price: 150 },
+    usePincodeLogic: true,
+    localPincodePrefixes: ['180', '190', '191', '192', '193', '194'],
+    localCities: []
+  },
+  platformFee: {
+    constant: 5,
+    razorpayPercentage: 2.0
+  }
+};
+
+let compiledConfig = null;
+let configWatcher = null;
+
+/**
+ * Build a prefix trie: nested Maps keyed by character, `end` marks a prefix
+ */
+function buildPrefixTrie(prefixes) {
+  const root = { children: new Map(), end: false };
+  for (const prefix of prefixes) {
+    let node = root;
+    for (const char of String(prefix).trim()) {
+      if (!node.children.has(char)) {
+        node.children.set(char, { children: new Map(), end: false });
+      }
+      node = node.children.get(char);
+    }
+    node.end = true;
+  }
+  return root;
+}
+
+function trieHasPrefixOf(trie, value) {
+  let node = trie;
+  if (node.end) {
+    return true;
+  }
+  for (const char of value) {
+    node = node.children.get(char);
+    if (!node) {
+      return false;
+    }
+    if (node.end) {
+      return true;
+    }
+  }
+  return false;
+}
+
+/**
+ * Compile a parsed pricing config into lookup structures
+ * @param {Object} config - Parsed pricing.yaml
+ * @returns {Object} - Frozen compiled config
+ */
+export function compilePricingConfig(config) {
+  const delivery = config?.delivery || {};
+  const localPincodePrefixes = (delivery.localPincodePrefixes || []).map(prefix => String(prefix).trim());
+  const localCities = (delivery.localCities || []).map(city => city.trim().toLowerCase());
+
+  return Object.freeze({
+    source: config,
+    usePincodeLogic: Boolean(delivery.usePincodeLogic),
+    localPincodePrefixes,
+    pincodeTrie: buildPrefixTrie(localPincodePrefixes),
+    localCities: new Set(localCities),
+    localState: delivery.localState ? delivery.localState.trim().toLowerCase() : null,
+    deliveryCharges: {
+      local: delivery.local?.price || 50,
+      national: delivery.national?.price || 150
+    },
+    platformFee: {
+      constant: config?.platformFee?.constant || 5,
+      razorpayPercentage: config?.platformFee?.razorpayPercentage || 2.0
+    }
+  });
+}
+
+const isPrice = (value) => typeof value === 'number' && Number.isFinite(value) && value >= 0;
+const isNonEmptyList = (value) => Array.isArray(value) && value.length > 0;
+
+/**
+ * Check a parsed pricing.yaml has everything pricing needs
+ * yaml.load() returns undefined for an empty file and a partial object for a
+ * truncated one (an editor mid-save) without throwing; compiling either would
+ * price every order as national with fallback fees.
+ * @param {Object} config - Parsed pricing.yaml
+ * @throws if a required section is missing
+ */
+export function validatePricingConfig(config) {
+  if (!config || typeof config !== 'object' || Array.isArray(config)) {
+    throw new Error('pricing config is empty or not a mapping');
+  }
+
+  const { delivery, platformFee } = config;
+  if (!delivery || typeof delivery !== 'object') {
+    throw new Error('pricing config has no delivery section');
+  }
+  if (!isPrice(delivery.local?.price) || !isPrice(delivery.national?.price)) {
+    throw new Error('pricing config needs delivery.local.price and delivery.national.price');
+  }
+  if (!isNonEmptyList(delivery.localPincodePrefixes) && !isNonEmptyList(delivery.localCities)) {
+    throw new Error('pricing config needs delivery.localPincodePrefixes or delivery.localCities');
+  }
+  if (!platformFee || !isPrice(platformFee.constant) || !isPrice(platformFee.razorpayPercentage)) {
+    throw new Error('pricing config needs platformFee.constant and platformFee.razorpayPercentage');
+  }
+}
 
 /**
- * Load pricing configuration from YAML file
+ * Read, parse, validate and compile pricing.yaml
+ * @throws if the file can't be read, parsed or is incomplete
  */
-function loadPricingConfig() {
-  if (pricingConfig) {
-    return pricingConfig;
+function readPricingConfig() {
+  const fileContents = fs.readFileSync(CONFIG_PATH, 'utf8');
+  const config = yaml.load(fileContents);
+  validatePricingConfig(config);
+  return compilePricingConfig(config);
+}
+
+/**
+ * Get the compiled pricing config (loaded on first use)
+ */
+function getCompiledConfig() {
+  if (compiledConfig) {
+    return compiledConfig;
   }
 
   try {
-    const configPath = path.join(__dirname, '../config/pricing.yaml');
-    const fileContents = fs.readFileSync(configPath, 'utf8');
-    pricingConfig = yaml.load(fileContents);
-    return pricingConfig;
+    compiledConfig = readPricingConfig();
   } catch (error) {
     console.error('Error loading pricing config:', error);
-    // Return default config if file not found
-    return {
-      delivery: {
-        local: { price: 50 },
-        national: { price: 150 },
-        usePincodeLogic: true,
-        localPincodePrefixes: ['180', '190', '191', '192', '193', '194'],
-        localCities: []
-      },
-      platformFee: {
-        constant: 5,
-        razorpayPercentage: 2.0
-      }
-    };
+    // Use default config if file not found
+    compiledConfig = compilePricingConfig(DEFAULT_CONFIG);
   }
+  return compiledConfig;
 }
 
-/**
- * Determine if address is local or national
- * @param {Object} address - Address object with pincode, city, and state
- * @returns {string} - 'local' or 'national'
- */
-export function getDeliveryType(address) {
-  const config = loadPricingConfig();
+function deliveryTypeFor(compiled, address) {
   const { pincode, city, state } = address || {};
-  
+
   // Use pincode-based logic if configured
-  if (config.delivery?.usePincodeLogic && pincode) {
-    const pincodeStr = String(pincode).trim();
-    
-    // Check if pincode starts with any of the configured local prefixes
-    const localPincodePrefixes = config.delivery?.localPincodePrefixes || [];
-    const isLocal = localPincodePrefixes.some(prefix => 
-      pincodeStr.startsWith(prefix)
-    );
-    
-    if (isLocal) {
+  if (compiled.usePincodeLogic && pincode) {
+    if (trieHasPrefixOf(compiled.pincodeTrie, String(pincode).trim())) {
       return 'local';
     }
   }
-  
-  // Fallback to city-based logic if pincode logic is not used or pincode not available
-  if (!config.delivery?.usePincodeLogic && city) {
-    const localCities = config.delivery?.localCities || [];
-    const normalizedCity = city.trim().toLowerCase();
-    
-    // Check if city matches any local city (case-insensitive)
-    const isLocal = localCities.some(localCity => 
-      localCity.trim().toLowerCase() === normalizedCity
-    );
-
-    if (isLocal) {
+
+  // Fallback to city-based logic if pincode logic is not used
+  if (!compiled.usePincodeLogic && city) {
+    if (compiled.localCities.has(city.trim().toLowerCase())) {
       return 'local';
     }
   }
 
   // Alternative: Check by state if localState is configured
-  if (config.delivery?.localState && state) {
-    const normalizedState = state.trim().toLowerCase();
-    const localState = config.delivery.localState.trim().toLowerCase();
-    if (normalizedState === localState) {
+  if (compiled.localState && state) {
+    if (state.trim().toLowerCase() === compiled.localState) {
       return 'local';
     }
   }
@@ -97,20 +187,77 @@ export function getDeliveryType(address) {
   return 'national';
 }
 
+function platformFeeFor(compiled, subtotal) {
+  const { constant, razorpayPercentage } = compiled.platformFee;
+
+  // Razorpay fee is calculated on the subtotal (before adding platform fee)
+  const razorpayFee = (subtotal * razorpayPercentage) / 100;
+  const total = constant + razorpayFee;
+
+  return {
+    constant,
+    razorpayFee,
+    razorpayPercentage,
+    total: Math.round(total * 100) / 100 // Round to 2 decimal places
+  };
+}
+
+/**
+ * Determine if address is local or national
+ * @param {Object} address - Address object with pincode, city, and state
+ * @returns {string} - 'local' or 'national'
+ */
+export function getDeliveryType(address) {
+  return deliveryTypeFor(getCompiledConfig(), address);
+}
+
+/**
+ * Build an aggregation expression that is true when getDeliveryType() would
+ * return 'local' for the address at addressPath (same config, evaluated in MongoDB)
+ * @param {string} addressPath - Field path of the address, e.g. '$address'
+ * @returns {Object|boolean} - Boolean aggregation expression
+ */
+export function getLocalDeliveryExpression(addressPath = '$address') {
+  const compiled = getCompiledConfig();
+  const field = (name) => ({ $toString: { $ifNull: [`${addressPath}.${name}`, ''] } });
+  const normalized = (name) => ({ $toLower: { $trim: { input: field(name) } } });
+  const conditions = [];
+
+  if (compiled.usePincodeLogic && compiled.localPincodePrefixes.length > 0) {
+    const pincode = { $trim: { input: field('pincode') } };
+    conditions.push({
+      $or: compiled.localPincodePrefixes.map(prefix => ({ $eq: [{ $indexOfCP: [pincode, prefix] }, 0] }))
+    });
+  }
+
+  if (!compiled.usePincodeLogic && compiled.localCities.size > 0) {
+    conditions.push({ $in: [normalized('city'), [...compiled.localCities]] });
+  }
+
+  if (compiled.localState) {
+    conditions.push({ $eq: [normalized('state'), compiled.localState] });
+  }
+
+  return conditions.length > 0 ? { $or: conditions } : false;
+}
+
+/**
+ * Get the delivery charge for a delivery type
+ * @param {string} deliveryType - 'local' or 'national'
+ * @returns {number} - Delivery charge in rupees
+ */
+export function getDeliveryCharge(deliveryType) {
+  return getCompiledConfig().deliveryCharges[deliveryType === 'local' ? 'local' : 'national'];
+}
+
 /**
  * Calculate delivery charges based on address
  * @param {Object} address - Address object
  * @returns {number} - Delivery charge in rupees
  */
 export function calculateDeliveryCharge(address) {
-  const config = loadPricingConfig();
-  const deliveryType = getDeliveryType(address);
-  
-  if (deliveryType === 'local') {
-    return config.delivery?.local?.price || 50;
-  } else {
-    return config.delivery?.national?.price || 150;
-  }
+  const compiled = getCompiledConfig();
+  return compiled.deliveryCharges[deliveryTypeFor(compiled, address)];
 }
 
 /**
@@ -119,20 +266,7 @@ export function calculateDeliveryCharge(address) {
  * @returns {Object} - { constant: number, razorpayFee: number, total: number }
  */
 export function calculatePlatformFee(subtotal) {
-  const config = loadPricingConfig();
-  const constant = config.platformFee?.constant || 5;
-  const razorpayPercentage = config.platformFee?.razorpayPercentage || 2.0;
-  
-  // Razorpay fee is calculated on the subtotal (before adding platform fee)
-  const razorpayFee = (subtotal * razorpayPercentage) / 100;
-  const total = constant + razorpayFee;
-  
-  return {
-    constant,
-    razorpayFee,
-    razorpayPercentage,
-    total: Math.round(total * 100) / 100 // Round to 2 decimal places
-  };
+  return platformFeeFor(getCompiledConfig(), subtotal);
 }
 
 /**
@@ -142,14 +276,17 @@ export function calculatePlatformFee(subtotal) {
  * @returns {Object} - Complete pricing breakdown
  */
 export function calculatePricingBreakdown(subtotal, address) {
-  const deliveryCharge = calculateDeliveryCharge(address);
-  const platformFee = calculatePlatformFee(subtotal);
+  // One config snapshot for the whole breakdown, even if a reload lands mid-call
+  const compiled = getCompiledConfig();
+  const deliveryType = deliveryTypeFor(compiled, address);
+  const deliveryCharge = compiled.deliveryCharges[deliveryType];
+  const platformFee = platformFeeFor(compiled, subtotal);
   const total = subtotal + deliveryCharge + platformFee.total;
 
   return {
     subtotal: Math.round(subtotal * 100) / 100,
     deliveryCharge: Math.round(deliveryCharge * 100) / 100,
-    deliveryType: getDeliveryType(address),
+    deliveryType,
     platformFee: {
       constant: platformFee.constant,
       razorpayFee: Math.round(platformFee.razorpayFee * 100) / 100,
@@ -160,11 +297,78 @@ export function calculatePricingBreakdown(subtotal, address) {
   };
 }
 
+/**
+ * Quote delivery for many addresses at once (labels, exports, reports)
+ * Uses one config snapshot for the batch and memoizes repeated locations.
+ * @param {Array} addresses - Address objects
+ * @returns {Array} - [{ deliveryType, deliveryCharge }] in input order
+ */
+export function quote(addresses) {
+  const compiled = getCompiledConfig();
+  const byLocation = new Map();
+
+  return addresses.map(address => {
+    const { pincode, city, state } = address || {};
+    const locationKey = `${pincode ?? ''}|${city ?? ''}|${state ?? ''}`;
+
+    let result = byLocation.get(locationKey);
+    if (!result) {
+      const deliveryType = deliveryTypeFor(compiled, address);
+      result = { deliveryType, deliveryCharge: compiled.deliveryCharges[deliveryType] };
+      byLocation.set(locationKey, result);
+    }
+    return result;
+  });
+}
+
 /**
  * Reload pricing config (useful for hot-reloading in development)
+ * Keeps the current config if the file is missing or invalid.
  */
 export function reloadPricingConfig() {
-  pricingConfig = null;
-  return loadPricingConfig();
+  try {
+    compiledConfig = readPricingConfig();
+    console.log('Pricing config reloaded');
+  } catch (error) {
+    console.error('Error reloading pricing config, keeping previous config:', error.message);
+  }
+  return getCompiledConfig().source;
 }
 
+/**
+ * Watch pricing.yaml and hot-swap the compiled config when it changes
+ * Watches the directory so editors that save via rename are picked up.
+ */
+export function watchPricingConfig() {
+  if (configWatcher) {
+    return;
+  }
+
+  let reloadTimer = null;
+  const configFile = path.basename(CONFIG_PATH);
+
+  try {
+    configWatcher = fs.watch(path.dirname(CONFIG_PATH), (eventType, filename) => {
+      if (filename && filename !== configFile) {
+        return;
+      }
+      // Editors often write in several steps; reload once they're done
+      clearTimeout(reloadTimer);
+      reloadTimer = setTimeout(reloadPricingConfig, RELOAD_DEBOUNCE_MS);
+    });
+    configWatcher.unref();
+    console.log('Watching pricing config for changes');
+  } catch (error) {
+    console.error('Error watching pricing config:', error.message);
+  }
+}
+
+/**
+ * Stop watching pricing.yaml
+ */
+export function stopWatchingPricingConfig() {
+  if (configWatcher) {
+    configWatcher.close();
+    configWatcher = null;
+  }
+}
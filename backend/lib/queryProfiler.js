@@ -0,0 +1,283 @@
+/**
+ * Slow Query Profiler
+ *
+ * Mongoose plugin (QUERY_PROFILER=true) that times every query and
+ * aggregation. Operations slower than QUERY_PROFILER_THRESHOLD_MS are
+ * recorded with:
+ * - the filter/pipeline shape (operators and fields, values replaced by "?")
+ * - the explain() winning plan, e.g. "FETCH <- IXSCAN status_1_expiresAt_1"
+ *   or "COLLSCAN", with keys/docs examined vs. returned
+ *
+ * Records go to an in-memory ring buffer (GET /api/db/slow-queries) and an
+ * NDJSON log (QUERY_PROFILER_LOG). explain re-runs the operation, so each
+ * shape is explained at most once per EXPLAIN_COOLDOWN_MS, one at a time.
+ *
+ * Must be imported before any model is compiled (server.js).
+ */
+
+import fs from "fs";
+import path from "path";
+import mongoose from "mongoose";
+
+const ENABLED = process.env.QUERY_PROFILER === "true";
+const THRESHOLD_MS = parseInt(process.env.QUERY_PROFILER_THRESHOLD_MS) || 100;
+const BUFFER_SIZE = parseInt(process.env.QUERY_PROFILER_BUFFER) || 200;
+const LOG_PATH = process.env.QUERY_PROFILER_LOG ?? "logs/slow-queries.ndjson";
+const EXPLAIN_COOLDOWN_MS = 10 * 60 * 1000;
+
+// Queries whose filter can be explained as a find
+const QUERY_OPERATIONS = [
+  "find",
+  "findOne",
+  "countDocuments",
+  "distinct",
+  "findOneAndUpdate",
+  "findOneAndDelete",
+  "findOneAndReplace",
+  "updateOne",
+  "updateMany",
+  "replaceOne",
+  "deleteOne",
+  "deleteMany",
+];
+
+const startTimer = Symbol("profilerStart");
+
+const buffer = [];
+let nextSlot = 0;
+const explainCache = new Map(); // shape key -> { explainedAt, explain }
+let explainInFlight = false;
+let logStream = null;
+let profilerStats = {
+  startTime: new Date(),
+  slowQueries: 0,
+  explains: 0,
+  explainErrors: 0,
+};
+
+const isPlainObject = (value) =>
+  value !== null && typeof value === "object" &&
+  [Object.prototype, null].includes(Object.getPrototypeOf(value));
+
+/**
+ * Filter with every value replaced by "?", keeping fields and operators
+ * ({ phoneNumber: { $regex: "98", $options: "i" } } -> { phoneNumber: { $regex: "?", $options: "?" } })
+ */
+export const shapeOf = (value) => {
+  if (Array.isArray(value)) {
+    // $and/$or/$nor hold sub-filters; $in/$nin hold values
+    return value.length > 0 && isPlainObject(value[0]) ? value.map(shapeOf) : "?";
+  }
+  if (isPlainObject(value)) {
+    return Object.fromEntries(Object.entries(value).map(([key, inner]) => [key, shapeOf(inner)]));
+  }
+  return "?";
+};
+
+const pipelineShape = (pipeline) => pipeline.map((stage) => {
+  const [name] = Object.keys(stage);
+  return name === "$match" ? { $match: shapeOf(stage.$match) } : name;
+});
+
+// FETCH <- IXSCAN status_1_expiresAt_1
+const describePlan = (plan) => {
+  if (!plan) return null;
+  const node = plan.queryPlan || plan;
+  const label = node.indexName ? `${node.stage} ${node.indexName}` : node.stage;
+  const inputs = node.inputStage ? [node.inputStage] : node.inputStages || [];
+  const inner = inputs.map(describePlan).filter(Boolean);
+  if (inner.length === 0) return label;
+  return inner.length === 1 ? `${label} <- ${inner[0]}` : `${label} <- (${inner.join(", ")})`;
+};
+
+const summarizeExplain = (explain) => {
+  // Aggregations not fully pushed down to the query layer nest it in $cursor
+  const cursor = explain.stages?.[0]?.$cursor || explain;
+  const planner = cursor.queryPlanner || {};
+  const execution = cursor.executionStats || {};
+  const winningPlan = describePlan(planner.winningPlan);
+  const returned = execution.nReturned ?? null;
+  const docsExamined = execution.totalDocsExamined ?? null;
+
+  return {
+    winningPlan,
+    collectionScan: /COLLSCAN/.test(winningPlan || ""),
+    keysExamined: execution.totalKeysExamined ?? null,
+    docsExamined,
+    returned,
+    // Docs read per doc returned; high values mean a missing or poor index
+    examinedPerReturned: docsExamined !== null && returned !== null
+      ? Math.round((docsExamined / Math.max(returned, 1)) * 10) / 10
+      : null,
+  };
+};
+
+const writeLog = (entry) => {
+  if (!LOG_PATH) return;
+  try {
+    if (!logStream) {
+      fs.mkdirSync(path.dirname(path.resolve(LOG_PATH)), { recursive: true });
+      logStream = fs.createWriteStream(LOG_PATH, { flags: "a" });
+      logStream.on("error", (error) => {
+        console.error("Error writing slow query log:", error.message);
+      });
+    }
+    logStream.write(`${JSON.stringify(entry)}\n`);
+  } catch (error) {
+    console.error("Error writing slow query log:", error.message);
+  }
+};
+
+const explainOnce = async (shapeKey, runExplain) => {
+  const cached = explainCache.get(shapeKey);
+  if (cached && Date.now() - cached.explainedAt < EXPLAIN_COOLDOWN_MS) {
+    return cached.explain;
+  }
+  if (explainInFlight) {
+    return null;
+  }
+
+  explainInFlight = true;
+  try {
+    const explain = summarizeExplain(await runExplain());
+    profilerStats.explains++;
+    explainCache.set(shapeKey, { explainedAt: Date.now(), explain });
+    return explain;
+  } catch (error) {
+    profilerStats.explainErrors++;
+    return { error: error.message };
+  } finally {
+    explainInFlight = false;
+  }
+};
+
+const recordSlowQuery = async (entry, runExplain) => {
+  profilerStats.slowQueries++;
+  const shapeKey = `${entry.collection}:${entry.operation}:${JSON.stringify(entry.shape)}`;
+
+  entry.explain = await explainOnce(shapeKey, runExplain);
+
+  buffer[nextSlot] = entry;
+  nextSlot = (nextSlot + 1) % BUFFER_SIZE;
+  writeLog(entry);
+};
+
+const elapsedMs = (start) => Number(process.hrtime.bigint() - start) / 1e6;
+
+const profileQuery = function () {
+  if (!this[startTimer]) return;
+  const durationMs = elapsedMs(this[startTimer]);
+  if (durationMs < THRESHOLD_MS) return;
+
+  const collection = this.model.collection;
+  const filter = this.getFilter();
+  const options = this.getOptions();
+  const entry = {
+    at: new Date().toISOString(),
+    model: this.model.modelName,
+    collection: collection.collectionName,
+    operation: this.op,
+    durationMs: Math.round(durationMs),
+    shape: shapeOf(filter),
+    sort: options.sort || null,
+    limit: this.op === "findOne" ? 1 : options.limit ?? null,
+  };
+
+  // Native driver, so the explain itself isn't profiled
+  const runExplain = () => collection
+    .find(filter, {
+      projection: this.op === "find" || this.op === "findOne" ? this.projection() : undefined,
+      sort: options.sort,
+      skip: options.skip,
+      limit: entry.limit ?? undefined,
+    })
+    .explain("executionStats");
+
+  recordSlowQuery(entry, runExplain).catch((error) => {
+    console.error("Error recording slow query:", error.message);
+  });
+};
+
+const profileAggregate = function () {
+  if (!this[startTimer]) return;
+  const durationMs = elapsedMs(this[startTimer]);
+  if (durationMs < THRESHOLD_MS) return;
+
+  const collection = this._model.collection;
+  const pipeline = this.pipeline();
+  const entry = {
+    at: new Date().toISOString(),
+    model: this._model.modelName,
+    collection: collection.collectionName,
+    operation: "aggregate",
+    durationMs: Math.round(durationMs),
+    shape: pipelineShape(pipeline),
+  };
+
+  const runExplain = () => collection.aggregate(pipeline, this.options).explain("executionStats");
+
+  recordSlowQuery(entry, runExplain).catch((error) => {
+    console.error("Error recording slow query:", error.message);
+  });
+};
+
+if (ENABLED) {
+  mongoose.plugin((schema) => {
+    const start = function () {
+      this[startTimer] = process.hrtime.bigint();
+    };
+
+    schema.pre(QUERY_OPERATIONS, start);
+    schema.post(QUERY_OPERATIONS, profileQuery);
+    schema.pre("aggregate", start);
+    schema.post("aggregate", profileAggregate);
+  });
+}
+
+/**
+ * Recorded slow queries, newest first
+ * @param {Object} options - { limit }
+ */
+export const getSlowQueries = ({ limit = BUFFER_SIZE } = {}) => {
+  const ordered = [...buffer.slice(nextSlot), ...buffer.slice(0, nextSlot)].filter(Boolean).reverse();
+  return ordered.slice(0, limit);
+};
+
+// Slow queries grouped by shape, slowest total time first
+export const getSlowQuerySummary = () => {
+  const groups = new Map();
+  for (const entry of getSlowQueries()) {
+    const key = `${entry.collection}:${entry.operation}:${JSON.stringify(entry.shape)}`;
+    const group = groups.get(key) || {
+      model: entry.model,
+      operation: entry.operation,
+      shape: entry.shape,
+      count: 0,
+      totalMs: 0,
+      maxMs: 0,
+      explain: null,
+    };
+    group.count++;
+    group.totalMs += entry.durationMs;
+    group.maxMs = Math.max(group.maxMs, entry.durationMs);
+    group.explain = group.explain || entry.explain;
+    groups.set(key, group);
+  }
+  return [...groups.values()].sort((a, b) => b.totalMs - a.totalMs);
+};
+
+export const clearSlowQueries = () => {
+  buffer.length = 0;
+  nextSlot = 0;
+  explainCache.clear();
+};
+
+// Get profiler statistics for monitoring
+export const getQueryProfilerStats = () => ({
+  enabled: ENABLED,
+  thresholdMs: THRESHOLD_MS,
+  bufferSize: BUFFER_SIZE,
+  logPath: LOG_PATH || null,
+  ...profilerStats,
+  buffered: buffer.filter(Boolean).length,
+});
@@ -0,0 +1,100 @@
+/**
+ * Reservation Ledger
+ *
+ * One StockReservation entry per hold line, written together with the
+ * reservedQuantity increment. Releases and commits move entries out of
+ * "active" one at a time with a conditional update, and the counters change
+ * only for entries that actually moved. Releasing a hold twice (the expiry
+ * sweeper racing a cancel, a retried webhook) therefore gives its stock back
+ * once.
+ *
+ * A product's reserved counter should equal the sum of its active entries;
+ * lib/stockReconciliation.js checks that.
+ *
+ * Holds created before the ledger existed have no entries; stockHold.js
+ * releases those from the order lines as before.
+ */
+
+import StockReservation from "../models/stockReservation.model.js";
+
+// Sum quantities per product (one entry per product and hold)
+const mergeItems = (items) => {
+  const quantities = new Map();
+  for (const { productId, quantity } of items) {
+    const id = String(productId);
+    quantities.set(id, (quantities.get(id) || 0) + quantity);
+  }
+  return [...quantities.entries()].map(([productId, quantity]) => ({ productId, quantity }));
+};
+
+/* =======================
+   Entries
+======================= */
+/**
+ * Record a hold's reservations (after its counters were incremented)
+ * @param {ObjectId} holdId - ID the hold order is created with
+ * @param {Array} items - [{ productId, quantity }]
+ * @param {Date} expiresAt - Hold expiry
+ */
+export const recordReservations = async (holdId, items, expiresAt) => {
+  await StockReservation.insertMany(
+    mergeItems(items).map(({ productId, quantity }) => ({
+      order: holdId,
+      product: productId,
+      quantity,
+      expiresAt,
+    }))
+  );
+};
+
+/**
+ * Move a hold's active entries to released or committed
+ * @param {ObjectId} holdId
+ * @param {string} state - "released" or "committed"
+ * @param {string} reason - Why (expired, cancelled, payment_failed, ...)
+ * @returns {Object|null} - { entries, settled: [{ productId, quantity }] }
+ *   (settled: entries moved by this call), or null if the hold has no entries
+ */
+export const settleReservations = async (holdId, state, reason) => {
+  const entries = await StockReservation.find({ order: holdId }).select("product quantity state").lean();
+  if (entries.length === 0) {
+    return null;
+  }
+
+  const settled = [];
+  for (const entry of entries) {
+    if (entry.state !== "active") {
+      continue;
+    }
+    const moved = await StockReservation.updateOne(
+      { _id: entry._id, state: "active" },
+      { $set: { state, settledAt: new Date(), reason } }
+    );
+    if (moved.modifiedCount === 1) {
+      settled.push({ productId: entry.product, quantity: entry.quantity });
+    }
+  }
+  return { entries, settled };
+};
+
+/**
+ * Undo settleReservations(holdId, "committed") for the given products
+ * (finalize rolled back its stock changes)
+ */
+export const reactivateReservations = async (holdId, productIds) => {
+  if (productIds.length === 0) {
+    return;
+  }
+  await StockReservation.updateMany(
+    { order: holdId, product: { $in: productIds }, state: "committed" },
+    { $set: { state: "active" }, $unset: { settledAt: "", reason: "" } }
+  );
+};
+
+/**
+ * Holds with entries still active this long after their expiry
+ * @param {Date} before - Expiry cutoff
+ * @returns {Array<ObjectId>}
+ */
+export const findStaleReservationHolds = (before) =>
+  StockReservation.distinct("order", { state: "active", expiresAt: { $lte: before } });
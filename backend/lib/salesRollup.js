@@ -0,0 +1,293 @@
+/**
+ * Sales Rollup Service
+ *
+ * Maintains hourly and daily sales counters (total and per product) so the
+ * analytics dashboard reads a handful of pre-aggregated documents instead of
+ * aggregating every order on each load.
+ *
+ * - Incremental: recordOrderSale() is called when an order becomes paid
+ * - Rebuild: rebuildSalesRollups() recomputes buckets from order history
+ *
+ * Buckets are aligned to ROLLUP_TIMEZONE (Asia/Kolkata by default).
+ */
+
+import Order from "../models/order.model.js";
+import SalesRollup from "../models/salesRollup.model.js";
+
+export const ROLLUP_TIMEZONE = process.env.ANALYTICS_TIMEZONE || "Asia/Kolkata";
+export const ROLLUP_PERIODS = ["hour", "day"];
+
+const HOUR_MS = 60 * 60 * 1000;
+const DAY_MS = 24 * HOUR_MS;
+const KEY_FORMATS = { hour: "%Y-%m-%dT%H", day: "%Y-%m-%d" };
+
+const pad = (value) => String(value).padStart(2, "0");
+
+// Intl formatters are expensive to create, so keep one per timezone
+const formatters = new Map();
+const getFormatter = (timeZone) => {
+  if (!formatters.has(timeZone)) {
+    formatters.set(timeZone, new Intl.DateTimeFormat("en-CA", {
+      timeZone,
+      hourCycle: "h23",
+      year: "numeric",
+      month: "2-digit",
+      day: "2-digit",
+      hour: "2-digit",
+      minute: "2-digit",
+      second: "2-digit",
+    }));
+  }
+  return formatters.get(timeZone);
+};
+
+/**
+ * Get wall-clock parts of a date in a timezone, plus the zone's UTC offset
+ * @param {Date} date - Instant to convert
+ * @param {string} timeZone - IANA timezone name
+ * @returns {Object} - { year, month, day, hour, offsetMs }
+ */
+export function getZonedParts(date, timeZone = ROLLUP_TIMEZONE) {
+  const parts = {};
+  for (const part of getFormatter(timeZone).formatToParts(date)) {
+    parts[part.type] = Number(part.value);
+  }
+  const wallClockAsUtc = Date.UTC(parts.year, parts.month - 1, parts.day, parts.hour, parts.minute, parts.second);
+  const offsetMs = wallClockAsUtc - Math.floor(date.getTime() / 1000) * 1000;
+  return { year: parts.year, month: parts.month, day: parts.day, hour: parts.hour, offsetMs };
+}
+
+/**
+ * Get the bucket an instant falls into
+ * Rollups are stored by hour and day; week (Monday start) and month buckets
+ * are used when querying.
+ * @param {Date|string} date - Instant (e.g. order.createdAt)
+ * @param {string} period - 'hour', 'day', 'week' or 'month'
+ * @param {string} timeZone - IANA timezone name
+ * @returns {Object} - { bucketStart: Date, bucketKey: string }
+ */
+export function getBucket(date, period, timeZone = ROLLUP_TIMEZONE) {
+  const { year, month, day, hour, offsetMs } = getZonedParts(new Date(date), timeZone);
+  let wallClockStart;
+  let bucketKey;
+
+  if (period === "hour") {
+    wallClockStart = Date.UTC(year, month - 1, day, hour);
+    bucketKey = `${year}-${pad(month)}-${pad(day)}T${pad(hour)}`;
+  } else if (period === "week") {
+    const dayStart = Date.UTC(year, month - 1, day);
+    const daysSinceMonday = (new Date(dayStart).getUTCDay() + 6) % 7;
+    wallClockStart = dayStart - daysSinceMonday * DAY_MS;
+    bucketKey = new Date(wallClockStart).toISOString().slice(0, 10);
+  } else if (period === "month") {
+    wallClockStart = Date.UTC(year, month - 1, 1);
+    bucketKey = `${year}-${pad(month)}`;
+  } else {
+    wallClockStart = Date.UTC(year, month - 1, day);
+    bucketKey = `${year}-${pad(month)}-${pad(day)}`;
+  }
+
+  // Use the offset in force at the bucket start, in case a DST change falls inside it
+  const startOffsetMs = getZonedParts(new Date(wallClockStart - offsetMs), timeZone).offsetMs;
+
+  return { bucketStart: new Date(wallClockStart - startOffsetMs), bucketKey };
+}
+
+// Jump from a bucket start into the middle of the next bucket, so DST shifts
+// and month lengths can't skip or repeat one
+const NEXT_BUCKET_STEP_MS = {
+  hour: 1.5 * HOUR_MS,
+  day: 1.5 * DAY_MS,
+  week: 7.5 * DAY_MS,
+  month: 32 * DAY_MS,
+};
+
+/**
+ * Get the bucket following the given one
+ * @returns {Object} - { bucketStart, bucketKey }
+ */
+export function getNextBucket(bucket, period, timeZone = ROLLUP_TIMEZONE) {
+  return getBucket(new Date(bucket.bucketStart.getTime() + NEXT_BUCKET_STEP_MS[period]), period, timeZone);
+}
+
+/**
+ * List buckets covering a date range (inclusive)
+ * @returns {Array} - [{ bucketStart, bucketKey }]
+ */
+export function getBucketsInRange(startDate, endDate, period, timeZone = ROLLUP_TIMEZONE) {
+  const buckets = [];
+  let bucket = getBucket(startDate, period, timeZone);
+
+  while (bucket.bucketStart <= endDate) {
+    buckets.push(bucket);
+    bucket = getNextBucket(bucket, period, timeZone);
+  }
+
+  return buckets;
+}
+
+/**
+ * List local day buckets covering a date range (inclusive)
+ * @returns {Array} - [{ bucketStart, bucketKey }]
+ */
+export function getDayBucketsInRange(startDate, endDate, timeZone = ROLLUP_TIMEZONE) {
+  return getBucketsInRange(startDate, endDate, "day", timeZone);
+}
+
+const incrementOp = (period, bucket, scope, product, counters) => ({
+  updateOne: {
+    filter: { period, scope, bucketStart: bucket.bucketStart },
+    update: {
+      $inc: counters,
+      $setOnInsert: { bucketKey: bucket.bucketKey, product },
+    },
+    upsert: true,
+  },
+});
+
+/**
+ * Add a newly paid order to the hourly and daily rollups
+ * Call exactly once per order, when it transitions to paid.
+ * @param {Object} order - Order document (products, totalAmount, createdAt)
+ */
+export const recordOrderSale = async (order) => {
+  const byProduct = new Map();
+  let units = 0;
+
+  // Merge duplicate lines so each product counts the order once
+  for (const item of order.products || []) {
+    const scope = item.product.toString();
+    const entry = byProduct.get(scope) || { product: item.product, units: 0, revenue: 0 };
+    entry.units += item.quantity;
+    entry.revenue += item.quantity * item.price;
+    byProduct.set(scope, entry);
+    units += item.quantity;
+  }
+
+  const ops = [];
+  for (const period of ROLLUP_PERIODS) {
+    const bucket = getBucket(order.createdAt, period);
+    ops.push(incrementOp(period, bucket, "total", null, { orders: 1, units, revenue: order.totalAmount || 0 }));
+    for (const [scope, entry] of byProduct) {
+      ops.push(incrementOp(period, bucket, scope, entry.product, { orders: 1, units: entry.units, revenue: entry.revenue }));
+    }
+  }
+
+  await SalesRollup.bulkWrite(ops, { ordered: false });
+};
+
+/**
+ * Record a sale without blocking the caller (errors are logged; a rebuild repairs gaps)
+ */
+export const recordOrderSaleInBackground = (order) => {
+  recordOrderSale(order).catch(err => {
+    console.error(`Error updating sales rollups for order ${order._id}:`, err);
+  });
+};
+
+/**
+ * Recompute rollups from paid order history
+ * The range is widened to whole local days; buckets in it are replaced.
+ * Run during quiet periods: sales recorded while it runs may be overwritten
+ * by the recomputed totals (which normally already include them).
+ * @param {Object} options - { from?: Date, to?: Date }
+ * @returns {Object} - { from, to, buckets }
+ */
+export const rebuildSalesRollups = async ({ from = null, to = null } = {}) => {
+  const range = {};
+  if (from) {
+    range.$gte = getBucket(from, "day").bucketStart;
+  }
+  if (to) {
+    range.$lt = getNextBucket(getBucket(to, "day"), "day").bucketStart;
+  }
+
+  const hasRange = Object.keys(range).length > 0;
+  await SalesRollup.deleteMany(hasRange ? { bucketStart: range } : {});
+
+  const match = { status: "paid", ...(hasRange ? { createdAt: range } : {}) };
+  const merge = {
+    $merge: {
+      into: SalesRollup.collection.name,
+      on: ["period", "scope", "bucketStart"],
+      whenMatched: "replace",
+      whenNotMatched: "insert",
+    },
+  };
+
+  for (const period of ROLLUP_PERIODS) {
+    const bucketStart = { $dateTrunc: { date: "$createdAt", unit: period, timezone: ROLLUP_TIMEZONE } };
+    const bucketKey = { $dateToString: { date: "$createdAt", format: KEY_FORMATS[period], timezone: ROLLUP_TIMEZONE } };
+    const timestamps = { createdAt: "$$NOW", updatedAt: "$$NOW" };
+
+    // Whole-order totals
+    await Order.aggregate([
+      { $match: match },
+      {
+        $group: {
+          _id: bucketStart,
+          bucketKey: { $first: bucketKey },
+          orders: { $sum: 1 },
+          units: { $sum: { $sum: "$products.quantity" } },
+          revenue: { $sum: "$totalAmount" },
+        },
+      },
+      {
+        $project: {
+          _id: 0,
+          period: { $literal: period },
+          bucketStart: "$_id",
+          bucketKey: 1,
+          scope: { $literal: "total" },
+          product: { $literal: null },
+          orders: 1,
+          units: 1,
+          revenue: 1,
+          ...timestamps,
+        },
+      },
+      merge,
+    ]);
+
+    // Per-product counters (grouped per order first so duplicate lines count one order)
+    await Order.aggregate([
+      { $match: match },
+      { $unwind: "$products" },
+      {
+        $group: {
+          _id: { bucketStart, product: "$products.product", order: "$_id" },
+          bucketKey: { $first: bucketKey },
+          units: { $sum: "$products.quantity" },
+          revenue: { $sum: { $multiply: ["$products.quantity", "$products.price"] } },
+        },
+      },
+      {
+        $group: {
+          _id: { bucketStart: "$_id.bucketStart", product: "$_id.product" },
+          bucketKey: { $first: "$bucketKey" },
+          orders: { $sum: 1 },
+          units: { $sum: "$units" },
+          revenue: { $sum: "$revenue" },
+        },
+      },
+      {
+        $project: {
+          _id: 0,
+          period: { $literal: period },
+          bucketStart: "$_id.bucketStart",
+          bucketKey: 1,
+          scope: { $toString: "$_id.product" },
+          product: "$_id.product",
+          orders: 1,
+          units: 1,
+          revenue: 1,
+          ...timestamps,
+        },
+      },
+      merge,
+    ]);
+  }
+
+  const buckets = await SalesRollup.countDocuments(hasRange ? { bucketStart: range } : {});
+  return { from: range.$gte || null, to: range.$lt || null, buckets };
+};
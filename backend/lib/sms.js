@@ -0,0 +1,53 @@
+/**
+ * Order SMS
+ * Customer notifications about order status, sent by the order.statusSms
+ * job (lib/jobs.js)
+ */
+
+import twilio from "twilio";
+
+// Twilio configuration
+const accountSid = process.env.TWILIO_ACCOUNT_SID;
+const authToken = process.env.TWILIO_AUTH_TOKEN;
+const twilioPhoneNumber = process.env.TWILIO_PHONE_NUMBER;
+
+let twilioClient = null;
+if (accountSid && authToken) {
+  twilioClient = twilio(accountSid, authToken);
+}
+
+/**
+ * Send the shipped/delivered SMS for an order (order.statusSms job)
+ * Currently logs the message instead of sending it.
+ * @returns {Object} - { success, reason?, logged? }
+ */
+export const sendOrderStatusSMS = async (phoneNumber, orderPublicId, status) => {
+  try {
+    let message = "";
+    if (status === "shipped") {
+      message = `Your order #${orderPublicId} has been shipped! Track your order to see delivery updates.`;
+    } else if (status === "delivered") {
+      message = `Your order #${orderPublicId} has been delivered! Thank you for shopping with us.`;
+    } else {
+      // Don't send SMS for other statuses
+      return { success: false, reason: "Status not eligible for SMS" };
+    }
+
+    // Log SMS instead of sending (SMS sending disabled)
+    console.log(`[SMS LOG] Would send SMS to ${phoneNumber} for order ${orderPublicId}`);
+    console.log(`[SMS LOG] Message: ${message}`);
+    console.log(`[SMS LOG] Status: ${status}`);
+
+    // Original SMS sending code (commented out):
+    // await twilioClient.messages.create({
+    //   body: message,
+    //   from: twilioPhoneNumber,
+    //   to: `+91${phoneNumber}`,
+    // });
+
+    return { success: true, logged: true };
+  } catch (error) {
+    console.error(`[SMS LOG] Error logging SMS for ${phoneNumber}:`, error.message);
+    return { success: false, reason: error.message };
+  }
+};
@@ -5,6 +5,13 @@
  * When a user starts checkout, we create a HOLD order and optionally reserve stock.
  * If payment succeeds, we atomically decrement stock.
  * If payment fails or hold expires, we release the reserved stock.
+ *
+ * With INVENTORY_MODE=redis the counters are kept in Redis instead and
+ * written back to the products asynchronously (see lib/inventory.js).
+ *
+ * Each reserved line is also recorded in the reservation ledger
+ * (lib/reservationLedger.js); releases and commits go through the ledger,
+ * so they apply to each line at most once.
  */
 
 import Order from "../models/order.model.js";
@@ -17,16 +24,43 @@ function generatePublicOrderId(orderData) {
   return base62;
 }
 import Product from "../models/product.model.js";
+import { scheduleLabelPrerender } from "./labelPdf.js";
+import { recordOrderSaleInBackground } from "./salesRollup.js";
+import { recordHoldSweep, recordStockReservation } from "./metrics.js";
+import { publishHoldStatus } from "./holdEvents.js";
+import {
+  commitInventory,
+  getAvailableInventory,
+  isRedisInventory,
+  releaseInventory,
+  reserveInventory
+} from "./inventory.js";
+import {
+  findStaleReservationHolds,
+  reactivateReservations,
+  recordReservations,
+  settleReservations
+} from "./reservationLedger.js";
 
 // Hold duration in milliseconds (15 minutes)
 const HOLD_DURATION_MS = 15 * 60 * 1000;
 
+// Ledger entries still active this long after expiry belong to no live hold
+const ORPHAN_GRACE_MS = 5 * 60 * 1000;
+
+// Expiry for a hold created now
+export const getHoldExpiry = () => new Date(Date.now() + HOLD_DURATION_MS);
+
 /**
  * Check if sufficient stock is available for the given products
  * @param {Array} products - Array of { productId, quantity }
  * @returns {Object} - { success: boolean, insufficientItems: Array }
  */
 export const checkStockAvailability = async (products) => {
+  if (isRedisInventory()) {
+    return checkInventoryAvailability(products);
+  }
+
   const insufficientItems = [];
   
   for (const item of products) {
@@ -66,12 +100,81 @@ export const checkStockAvailability = async (products) => {
   };
 };
 
+// checkStockAvailability from the Redis counters
+const checkInventoryAvailability = async (products) => {
+  const requests = products.map(item => ({
+    productId: String(item._id || item.id || item.product),
+    requested: item.quantity || 1,
+    name: item.name,
+  }));
+  const available = await getAvailableInventory(requests.map(r => r.productId));
+
+  const insufficientItems = [];
+  for (const { productId, requested, name } of requests) {
+    const availableStock = available.get(productId);
+    if (availableStock === null) {
+      insufficientItems.push({ productId, name: name || "Unknown", requested, available: 0, error: "Product not found" });
+    } else if (availableStock < requested) {
+      const product = name ? null : await Product.findById(productId).select("name").lean();
+      insufficientItems.push({
+        productId,
+        name: name || product?.name || "Unknown",
+        requested,
+        available: Math.max(0, availableStock),
+        error: "Insufficient stock"
+      });
+    }
+  }
+
+  return {
+    success: insufficientItems.length === 0,
+    insufficientItems
+  };
+};
+
+// Order lines / cart items -> [{ productId, quantity }]
+const toInventoryItems = (products) => products.map(item => ({
+  productId: item.product || item._id || item.id,
+  quantity: item.quantity || 1
+}));
+
 /**
  * Reserve stock for products (increment reservedQuantity)
  * @param {Array} products - Array of { productId, quantity }
+ * @param {Object} hold - { holdId, expiresAt } of the hold order to be created,
+ *   recorded in the reservation ledger
  * @returns {boolean} - true if successful
  */
-export const reserveStock = async (products) => {
+export const reserveStock = async (products, hold = null) => {
+  try {
+    const reserved = await reserveAll(products);
+    if (reserved && hold) {
+      await recordLedger(products, hold);
+    }
+    recordStockReservation(reserved ? "success" : "insufficient_stock");
+    return reserved;
+  } catch (error) {
+    recordStockReservation("error");
+    throw error;
+  }
+};
+
+// Ledger entries for a successful reservation; undoes the reservation if they can't be written
+const recordLedger = async (products, { holdId, expiresAt }) => {
+  try {
+    await recordReservations(holdId, toInventoryItems(products), expiresAt);
+  } catch (error) {
+    await releaseReservedStock(products);
+    throw error;
+  }
+};
+
+// All-or-nothing reservation; rolls back partial reservations on failure
+const reserveAll = async (products) => {
+  if (isRedisInventory()) {
+    return (await reserveInventory(toInventoryItems(products))).success;
+  }
+
   const updates = [];
   
   for (const item of products) {
@@ -122,11 +225,28 @@ export const reserveStock = async (products) => {
 /**
  * Release reserved stock for products
  * @param {Array} products - Array of { product (id), quantity }
+ * @param {ObjectId} holdId - Hold whose ledger entries to release; only entries
+ *   still active are given back. Holds without entries release `products`
+ * @param {string} reason - Recorded on the ledger entries
  */
-export const releaseReservedStock = async (products) => {
-  for (const item of products) {
-    const productId = item.product || item._id || item.id;
-    const qty = item.quantity || 1;
+export const releaseReservedStock = async (products, holdId = null, reason = "released") => {
+  let items = toInventoryItems(products);
+  if (holdId) {
+    const ledger = await settleReservations(holdId, "released", reason);
+    if (ledger) {
+      items = ledger.settled;
+    }
+  }
+  if (items.length === 0) {
+    return;
+  }
+
+  if (isRedisInventory()) {
+    await releaseInventory(items);
+    return;
+  }
+
+  for (const { productId, quantity: qty } of items) {
     
     // Use $max to prevent reservedQuantity from going below 0
     await Product.findByIdAndUpdate(
@@ -150,7 +270,8 @@ export const releaseReservedStock = async (products) => {
  * @returns {Object} - Created order with hold status
  */
 export const createHoldOrder = async (orderData) => {
-  const expiresAt = new Date(Date.now() + HOLD_DURATION_MS);
+  // _id / expiresAt may be preset to match the reservation ledger
+  const expiresAt = orderData.expiresAt || getHoldExpiry();
   const publicOrderId = generatePublicOrderId(orderData);
   const holdOrder = new Order({
     ...orderData,
@@ -194,17 +315,43 @@ export const finalizeOrder = async (orderId) => {
     order.status = "expired";
     await order.save();
     // Release reserved stock
-    await releaseReservedStock(order.products);
+    await releaseReservedStock(order.products, order._id, "expired");
+    publishHoldStatus(order);
     return { success: false, error: "Order hold has expired" };
   }
   
+  // Commit the hold's ledger entries; reserved only goes down by what they still held
+  const ledger = await settleReservations(order._id, "committed", "paid");
+  const lines = withReservedQuantity(order.products, ledger);
+  const rollbackLedger = () => ledger
+    ? reactivateReservations(order._id, ledger.settled.map(e => e.productId))
+    : Promise.resolve();
+  
+  if (isRedisInventory()) {
+    const committed = await commitInventory(lines);
+    if (!committed.success) {
+      await rollbackLedger();
+      const item = order.products.find(p => String(p.product) === String(committed.productId));
+      const product = await Product.findById(committed.productId).select("name").lean();
+      return {
+        success: false,
+        error: "Insufficient stock for some items",
+        insufficientItems: [{
+          productId: committed.productId,
+          name: product?.name || "Unknown",
+          requested: item?.quantity || 0,
+          available: committed.available
+        }]
+      };
+    }
+    return markOrderPaid(order);
+  }
+  
   // Atomically decrement stock for each product
   const insufficientItems = [];
   const successfulDecrements = [];
   
-  for (const item of order.products) {
-    const productId = item.product;
-    const qty = item.quantity;
+  for (const { productId, quantity: qty, reserved } of lines) {
     
     // Atomically decrement stock only if sufficient quantity available
     // Use aggregation pipeline to safely handle null reservedQuantity
@@ -217,7 +364,7 @@ export const finalizeOrder = async (orderId) => {
         {
           $set: {
             stockQuantity: { $subtract: ["$stockQuantity", qty] },
-            reservedQuantity: { $max: [0, { $subtract: [{ $ifNull: ["$reservedQuantity", 0] }, qty] }] },
+            reservedQuantity: { $max: [0, { $subtract: [{ $ifNull: ["$reservedQuantity", 0] }, reserved] }] },
             sold: { $add: [{ $ifNull: ["$sold", 0] }, qty] }
           }
         }
@@ -235,7 +382,7 @@ export const finalizeOrder = async (orderId) => {
         available: product?.stockQuantity || 0
       });
     } else {
-      successfulDecrements.push({ productId, qty });
+      successfulDecrements.push({ productId, qty, reserved });
     }
   }
   
@@ -245,11 +392,12 @@ export const finalizeOrder = async (orderId) => {
       await Product.findByIdAndUpdate(dec.productId, {
         $inc: {
           stockQuantity: dec.qty,
-          reservedQuantity: dec.qty,
+          reservedQuantity: dec.reserved,
           sold: -dec.qty
         }
       });
     }
+    await rollbackLedger();
     
     return {
       success: false,
@@ -258,7 +406,27 @@ export const finalizeOrder = async (orderId) => {
     };
   }
   
-  // All stock decrements successful - mark order as paid
+  return markOrderPaid(order);
+};
+
+// Order lines with the part of each quantity still reserved for the hold:
+// all of it without a ledger, otherwise what this finalize moved out of active
+const withReservedQuantity = (products, ledger) => {
+  const remaining = new Map(
+    (ledger?.settled || []).map(({ productId, quantity }) => [String(productId), quantity])
+  );
+  return toInventoryItems(products).map(({ productId, quantity }) => {
+    if (!ledger) {
+      return { productId, quantity, reserved: quantity };
+    }
+    const reserved = Math.min(quantity, remaining.get(String(productId)) || 0);
+    remaining.set(String(productId), (remaining.get(String(productId)) || 0) - reserved);
+    return { productId, quantity, reserved };
+  });
+};
+
+// All stock decrements successful - mark order as paid
+const markOrderPaid = async (order) => {
   order.status = "paid";
   order.trackingStatus = "processing";
   order.trackingHistory.push({
@@ -267,6 +435,11 @@ export const finalizeOrder = async (orderId) => {
     note: "Payment confirmed - order processing"
   });
   await order.save();
+  publishHoldStatus(order);
+
+  // Pre-render the shipping label in the background so print runs are fast
+  scheduleLabelPrerender(order._id);
+  recordOrderSaleInBackground(order);
   
   return { success: true, order };
 };
@@ -286,11 +459,12 @@ export const releaseExpiredHolds = async () => {
   
   let releasedCount = 0;
   let errors = 0;
+  const releasedExpiresAt = [];
   
   for (const order of expiredOrders) {
     try {
       // Release reserved stock
-      await releaseReservedStock(order.products);
+      await releaseReservedStock(order.products, order._id, "expired");
       
       // Update order status
       order.status = "expired";
@@ -300,8 +474,10 @@ export const releaseExpiredHolds = async () => {
         note: "Order hold expired - payment not completed"
       });
       await order.save();
+      publishHoldStatus(order);
       
       releasedCount++;
+      releasedExpiresAt.push(order.expiresAt);
     } catch (err) {
       console.error(`Error releasing hold for order ${order._id}:`, err);
       errors++;
@@ -315,32 +491,78 @@ export const releaseExpiredHolds = async () => {
   if (errors > 0) {
     console.error(`✗ Failed to release ${errors} hold orders`);
   }
+
+  recordHoldSweep(releasedExpiresAt);
+
+  try {
+    const orphaned = await releaseOrphanedReservations();
+    if (orphaned > 0) {
+      console.log(`✓ Released orphaned reservations of ${orphaned} holds`);
+    }
+  } catch (err) {
+    console.error("✗ Failed to release orphaned reservations:", err);
+  }
   
   return releasedCount;
 };
 
+/**
+ * Release ledger entries still active well after their expiry whose hold is
+ * not on hold (a crash between reserving and creating the hold order, or an
+ * order settled without releasing them). Holds still on hold are left to
+ * releaseExpiredHolds.
+ * @returns {number} - Holds released
+ */
+export const releaseOrphanedReservations = async () => {
+  const holdIds = await findStaleReservationHolds(new Date(Date.now() - ORPHAN_GRACE_MS));
+  if (holdIds.length === 0) {
+    return 0;
+  }
+
+  const onHold = new Set(
+    (await Order.find({ _id: { $in: holdIds }, status: "hold" }).distinct("_id")).map(String)
+  );
+  let released = 0;
+  for (const holdId of holdIds) {
+    if (onHold.has(String(holdId))) {
+      continue;
+    }
+    await releaseReservedStock([], holdId, "orphaned");
+    released++;
+  }
+  return released;
+};
+
 /**
  * Get hold order info including time remaining
  * @param {string} orderId - The order ID
  * @returns {Object} - Order info with time remaining
  */
 export const getHoldOrderInfo = async (orderId) => {
-  const order = await Order.findById(orderId);
+  const order = await Order.findById(orderId).select("status expiresAt").lean();
   
   if (!order) {
     return null;
   }
   
+  return describeHold(order._id, order.status, order.expiresAt);
+};
+
+/**
+ * Hold info for a known status, without reading the order
+ * (hold status streams recompute the countdown from a published status)
+ */
+export const describeHold = (orderId, status, expiresAt) => {
   const now = new Date();
-  const expiresAt = order.expiresAt ? new Date(order.expiresAt) : null;
-  const remainingMs = expiresAt ? Math.max(0, expiresAt - now) : 0;
+  const expiry = expiresAt ? new Date(expiresAt) : null;
+  const remainingMs = expiry ? Math.max(0, expiry - now) : 0;
   
   return {
-    orderId: order._id,
-    status: order.status,
-    expiresAt: order.expiresAt,
+    orderId,
+    status,
+    expiresAt,
     remainingSeconds: Math.floor(remainingMs / 1000),
-    isExpired: remainingMs <= 0 && order.status === "hold"
+    isExpired: remainingMs <= 0 && status === "hold"
   };
 };
 
@@ -356,7 +578,7 @@ export const cancelHoldOrder = async (orderId) => {
   }
   
   // Release reserved stock
-  await releaseReservedStock(order.products);
+  await releaseReservedStock(order.products, order._id, "cancelled");
   
   // Update order status
   order.status = "cancelled";
@@ -366,6 +588,7 @@ export const cancelHoldOrder = async (orderId) => {
     note: "Order cancelled by user"
   });
   await order.save();
+  publishHoldStatus(order);
   
   return { success: true, order };
 };
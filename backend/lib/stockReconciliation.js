@@ -0,0 +1,169 @@
+/**
+ * Stock Reconciliation
+ *
+ * Recomputes what reservedQuantity and sold should be for every product and
+ * corrects the counters that disagree:
+ *
+ *   reserved = active reservation ledger entries (lib/reservationLedger.js)
+ *              + lines of holds created before the ledger (no entries)
+ *   sold     = lines of paid orders and of manual orders (a manual order
+ *              takes its stock when created, paid or not)
+ *
+ * The expected values come from one aggregation: paid and manual orders,
+ * with the ledger and the legacy holds pulled in by $unionWith, grouped by
+ * product. MongoDB does the summing; no order is loaded into the process.
+ * Products are read once and corrected with one bulkWrite (Redis counters,
+ * with INVENTORY_MODE=redis, with one adjust script).
+ *
+ * A checkout or payment in flight can be between its counter and its order
+ * or ledger write. Only products that differ by the same amount on a second
+ * look are corrected, and by the difference ($inc), so changes landing in
+ * between are kept. Safe to run while the shop is open (nightly:
+ * `npm run stock:reconcile`).
+ */
+
+import Order from "../models/order.model.js";
+import Product from "../models/product.model.js";
+import StockReservation from "../models/stockReservation.model.js";
+import { adjustInventory, getInventoryCounters, isRedisInventory } from "./inventory.js";
+
+const RECHECK_DELAY_MS = 2000;
+
+// Counter fields: Product field -> expected value field
+const FIELDS = { reservedQuantity: "reserved", sold: "sold" };
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Expected { reserved, sold } per product, run on the orders collection
+const expectedCountersPipeline = () => [
+  // Sold: paid orders and manual orders (status_1_createdAt_1)
+  { $match: { $or: [{ status: "paid" }, { status: "pending", isManualOrder: true }] } },
+  { $unwind: "$products" },
+  { $project: { _id: 0, product: "$products.product", reserved: { $literal: 0 }, sold: "$products.quantity" } },
+  // Reserved: active ledger entries (state_1_product_1)
+  {
+    $unionWith: {
+      coll: StockReservation.collection.name,
+      pipeline: [
+        { $match: { state: "active" } },
+        { $project: { _id: 0, product: 1, reserved: "$quantity", sold: { $literal: 0 } } },
+      ],
+    },
+  },
+  // Reserved: holds without ledger entries (created before the ledger)
+  {
+    $unionWith: {
+      coll: Order.collection.name,
+      pipeline: [
+        { $match: { status: "hold" } },
+        { $lookup: { from: StockReservation.collection.name, localField: "_id", foreignField: "order", as: "ledger" } },
+        { $match: { ledger: { $size: 0 } } },
+        { $unwind: "$products" },
+        { $project: { _id: 0, product: "$products.product", reserved: "$products.quantity", sold: { $literal: 0 } } },
+      ],
+    },
+  },
+  { $group: { _id: "$product", reserved: { $sum: "$reserved" }, sold: { $sum: "$sold" } } },
+];
+
+// Products whose counters differ from the expected values
+const findDrift = async () => {
+  const [rows, products] = await Promise.all([
+    Order.aggregate(expectedCountersPipeline()),
+    Product.find({}).select("name reservedQuantity sold").lean(),
+  ]);
+  const expectedById = new Map(rows.map(({ _id, reserved, sold }) => [String(_id), { reserved, sold }]));
+
+  // In Redis mode loaded products are compared by their Redis counters.
+  // Products not loaded yet are compared (and corrected) in MongoDB, which
+  // they load from on first use; reading never loads them, so a dry run
+  // changes nothing
+  const redisCounters = isRedisInventory()
+    ? await getInventoryCounters()
+    : new Map();
+
+  const drifted = [];
+  for (const product of products) {
+    const productId = String(product._id);
+    const expected = expectedById.get(productId) || { reserved: 0, sold: 0 };
+    const counters = redisCounters.get(productId);
+    const current = counters
+      ? { reserved: counters.reserved, sold: counters.sold }
+      : { reserved: product.reservedQuantity || 0, sold: product.sold || 0 };
+
+    const fields = {};
+    for (const [field, key] of Object.entries(FIELDS)) {
+      if (current[key] !== expected[key]) {
+        fields[field] = { current: current[key], expected: expected[key] };
+      }
+    }
+    if (Object.keys(fields).length > 0) {
+      drifted.push({ productId, name: product.name, source: counters ? "redis" : "mongo", fields });
+    }
+  }
+  return { products: products.length, drifted };
+};
+
+// The same fields off by the same amounts
+const sameDifference = (a, b) => {
+  if (!a || a.source !== b.source) {
+    return false;
+  }
+  const fields = Object.keys(b.fields);
+  return fields.length === Object.keys(a.fields).length && fields.every(field =>
+    a.fields[field] &&
+    a.fields[field].expected - a.fields[field].current === b.fields[field].expected - b.fields[field].current
+  );
+};
+
+const difference = (fields, field) =>
+  fields[field] ? fields[field].expected - fields[field].current : 0;
+
+/**
+ * Compare reservedQuantity and sold of every product with the values the
+ * orders and the reservation ledger call for, and correct them
+ * @param {Object} options - { dryRun: report only }
+ * @returns {Object} - { checkedAt, products, drifted: [{ productId, name, source, fields }], corrected }
+ *   fields: { reservedQuantity?, sold? } -> { current, expected }
+ */
+export const reconcileStock = async ({ dryRun = false } = {}) => {
+  let { products, drifted } = await findDrift();
+  if (drifted.length > 0) {
+    // Keep products that still differ by the same amount a moment later
+    await sleep(RECHECK_DELAY_MS);
+    const first = new Map(drifted.map(d => [d.productId, d]));
+    drifted = (await findDrift()).drifted.filter(d => sameDifference(first.get(d.productId), d));
+  }
+
+  let corrected = 0;
+  if (!dryRun && drifted.length > 0) {
+    const inMongo = drifted.filter(d => d.source === "mongo");
+    const inRedis = drifted.filter(d => d.source === "redis");
+
+    if (inMongo.length > 0) {
+      const result = await Product.bulkWrite(
+        inMongo.map(({ productId, fields }) => ({
+          updateOne: {
+            filter: { _id: productId },
+            update: {
+              $inc: Object.fromEntries(Object.keys(fields).map(field => [field, difference(fields, field)])),
+            },
+          },
+        })),
+        { ordered: false }
+      );
+      corrected += result.modifiedCount;
+    }
+
+    if (inRedis.length > 0) {
+      await adjustInventory(inRedis.map(({ productId, fields }) => ({
+        productId,
+        reserved: difference(fields, "reservedQuantity"),
+        sold: difference(fields, "sold"),
+      })));
+      corrected += inRedis.length;
+    }
+  }
+
+  return { checkedAt: new Date(), products, drifted, corrected };
+};
@@ -0,0 +1,256 @@
+/**
+ * Waitlist Notification Dispatcher
+ *
+ * Sends back-in-stock SMS to a product's waitlist in parallel while staying
+ * under the SMS provider's rate limit.
+ *
+ * - Bounded concurrency: at most WAITLIST_SMS_CONCURRENCY sends in flight
+ * - Rate limit: token bucket, WAITLIST_SMS_RATE messages per second
+ * - Per-entry removal: a subscriber is removed from the waitlist right after
+ *   their message is sent, so a crash loses no one and repeats at most the
+ *   messages that were in flight
+ * - Retries: transient provider errors (429, 5xx, network) are retried with
+ *   exponential backoff; entries still failing stay on the waitlist
+ * - Resumable: products being dispatched are tracked in Redis and picked up
+ *   again on startup (resumePendingWaitlistDispatches)
+ */
+
+import crypto from "crypto";
+import twilio from "twilio";
+import { redis } from "./redis.js";
+import Product from "../models/product.model.js";
+
+// Twilio configuration
+const accountSid = process.env.TWILIO_ACCOUNT_SID;
+const authToken = process.env.TWILIO_AUTH_TOKEN;
+const twilioPhoneNumber = process.env.TWILIO_PHONE_NUMBER;
+
+let twilioClient = null;
+if (accountSid && authToken) {
+  twilioClient = twilio(accountSid, authToken);
+}
+
+const CONCURRENCY = parseInt(process.env.WAITLIST_SMS_CONCURRENCY) || 20;
+const RATE_PER_SECOND = parseFloat(process.env.WAITLIST_SMS_RATE) || 30;
+const MAX_ATTEMPTS = 4;
+const BASE_BACKOFF_MS = 500;
+const SCAN_BATCH = 200;
+
+// Lock per product so two restocks don't notify the same list twice
+const LOCK_TTL_MS = 60 * 1000;
+const PENDING_SET_KEY = "waitlist:dispatch:pending";
+
+const waitlistKey = (productId) => `waitlist:${productId}`;
+const lockKey = (productId) => `waitlist:dispatch:lock:${productId}`;
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+let dispatchStats = {
+  totalRuns: 0,
+  totalSent: 0,
+  totalFailed: 0,
+  totalRetries: 0,
+  activeRuns: 0,
+  lastRun: null,
+};
+
+/**
+ * Token bucket shared by all sends in this process
+ */
+const rateLimiter = {
+  tokens: RATE_PER_SECOND,
+  updatedAt: Date.now(),
+
+  async take() {
+    for (;;) {
+      const now = Date.now();
+      this.tokens = Math.min(RATE_PER_SECOND, this.tokens + ((now - this.updatedAt) / 1000) * RATE_PER_SECOND);
+      this.updatedAt = now;
+
+      if (this.tokens >= 1) {
+        this.tokens -= 1;
+        return;
+      }
+      await sleep(Math.ceil(((1 - this.tokens) / RATE_PER_SECOND) * 1000));
+    }
+  },
+};
+
+// Rate limiting, server errors and network failures are worth retrying;
+// anything else (invalid number, unsubscribed, ...) won't succeed later
+const isRetryable = (error) => {
+  const status = error.status || error.statusCode;
+  return !status || status === 429 || status >= 500;
+};
+
+const sendRestockSms = async (phoneNumber, productName) => {
+  const message = `Great news! ${productName} is back in stock. Order now!`;
+
+  if (!twilioClient || !twilioPhoneNumber) {
+    // Development mode - just log
+    console.log(`  📱 Would send SMS to ${phoneNumber}: ${productName} is back in stock!`);
+    return;
+  }
+
+  await twilioClient.messages.create({
+    body: message,
+    from: twilioPhoneNumber,
+    to: `+91${phoneNumber}`, // Assuming Indian phone numbers
+  });
+};
+
+/**
+ * Send to one subscriber with retries, then remove them from the waitlist
+ * @returns {string} - 'sent', 'failed' (removed) or 'kept' (retry later)
+ */
+const notifySubscriber = async (productId, phoneNumber, productName, run) => {
+  for (let attempt = 1; attempt <= MAX_ATTEMPTS; attempt++) {
+    await rateLimiter.take();
+    try {
+      await sendRestockSms(phoneNumber, productName);
+    } catch (error) {
+      if (!isRetryable(error)) {
+        console.error(`  ✗ Failed to send SMS to ${phoneNumber}:`, error.message);
+        await redis.hdel(waitlistKey(productId), phoneNumber);
+        return "failed";
+      }
+      if (attempt === MAX_ATTEMPTS) {
+        console.error(`  ✗ Giving up on ${phoneNumber} for now after ${attempt} attempts:`, error.message);
+        return "kept";
+      }
+      run.retries++;
+      // Exponential backoff with jitter so retries don't arrive in bursts
+      await sleep(BASE_BACKOFF_MS * 2 ** (attempt - 1) * (0.5 + Math.random()));
+      continue;
+    }
+
+    await redis.hdel(waitlistKey(productId), phoneNumber);
+    return "sent";
+  }
+  return "kept";
+};
+
+/**
+ * Notify everyone on a product's waitlist
+ * @param {string} productId - The product ID
+ * @returns {Object} - { success, notified, failed, pending, durationMs } or { success, skipped }
+ */
+export const dispatchWaitlist = async (productId) => {
+  const token = crypto.randomBytes(8).toString("hex");
+  const acquired = await redis.set(lockKey(productId), token, "PX", LOCK_TTL_MS, "NX");
+  if (!acquired) {
+    console.log(`Waitlist dispatch for product ${productId} already running`);
+    return { success: true, skipped: true };
+  }
+
+  await redis.sadd(PENDING_SET_KEY, productId);
+
+  const lockRefresh = setInterval(() => {
+    redis.pexpire(lockKey(productId), LOCK_TTL_MS).catch(() => {});
+  }, LOCK_TTL_MS / 3);
+
+  const run = { productId, startedAt: new Date(), sent: 0, failed: 0, kept: 0, retries: 0 };
+  dispatchStats.activeRuns++;
+
+  try {
+    const product = await Product.findById(productId).select("name").lean();
+    if (!product) {
+      console.log(`Product ${productId} not found`);
+      await redis.srem(PENDING_SET_KEY, productId);
+      return { success: false, error: "Product not found" };
+    }
+
+    console.log(`📱 Notifying waitlist for ${product.name} (concurrency ${CONCURRENCY}, ${RATE_PER_SECOND}/s)`);
+
+    // Entries are read page by page (HSCAN) and fed to a fixed pool of workers
+    const queue = [];
+    const seen = new Set();
+    let cursor = "0";
+    let scanDone = false;
+    let scanning = null;
+
+    const scanPage = async () => {
+      const [nextCursor, fields] = await redis.hscan(waitlistKey(productId), cursor, "COUNT", SCAN_BATCH);
+      cursor = nextCursor;
+      scanDone = cursor === "0";
+      // HSCAN returns [field, value, field, value, ...] and may repeat a field
+      for (let i = 0; i < fields.length; i += 2) {
+        if (!seen.has(fields[i])) {
+          seen.add(fields[i]);
+          queue.push(fields[i]);
+        }
+      }
+    };
+
+    const nextPhoneNumber = async () => {
+      while (queue.length === 0 && !scanDone) {
+        // One scan at a time; idle workers wait for the same page
+        scanning = scanning || scanPage().finally(() => { scanning = null; });
+        await scanning;
+      }
+      return queue.shift();
+    };
+
+    const worker = async () => {
+      for (let phoneNumber = await nextPhoneNumber(); phoneNumber; phoneNumber = await nextPhoneNumber()) {
+        const outcome = await notifySubscriber(productId, phoneNumber, product.name, run);
+        run[outcome]++;
+      }
+    };
+
+    await Promise.all(Array.from({ length: CONCURRENCY }, worker));
+
+    // Anything kept for retry is picked up by the next dispatch or restart
+    if (run.kept === 0) {
+      await redis.srem(PENDING_SET_KEY, productId);
+    }
+
+    const durationMs = Date.now() - run.startedAt.getTime();
+    console.log(`✓ Notified ${run.sent} users, ${run.failed} failed, ${run.kept} pending (${durationMs}ms)`);
+
+    return { success: true, notified: run.sent, failed: run.failed, pending: run.kept, durationMs };
+  } finally {
+    clearInterval(lockRefresh);
+    dispatchStats.activeRuns--;
+    dispatchStats.totalRuns++;
+    dispatchStats.totalSent += run.sent;
+    dispatchStats.totalFailed += run.failed;
+    dispatchStats.totalRetries += run.retries;
+
+    const durationMs = Date.now() - run.startedAt.getTime();
+    dispatchStats.lastRun = {
+      ...run,
+      durationMs,
+      messagesPerSecond: durationMs > 0 ? Math.round((run.sent / durationMs) * 1000 * 10) / 10 : 0,
+    };
+
+    // Release the lock only if it is still ours
+    const current = await redis.get(lockKey(productId)).catch(() => null);
+    if (current === token) {
+      await redis.del(lockKey(productId)).catch(() => {});
+    }
+  }
+};
+
+/**
+ * Resume dispatches interrupted by a restart (or with entries kept for retry)
+ */
+export const resumePendingWaitlistDispatches = async () => {
+  const productIds = await redis.smembers(PENDING_SET_KEY);
+  for (const productId of productIds) {
+    console.log(`Resuming waitlist dispatch for product ${productId}`);
+    dispatchWaitlist(productId).catch(err => {
+      console.error(`Error resuming waitlist dispatch for ${productId}:`, err);
+    });
+  }
+  return productIds.length;
+};
+
+// Get dispatcher statistics for monitoring
+export const getWaitlistDispatchStats = () => {
+  return {
+    ...dispatchStats,
+    concurrency: CONCURRENCY,
+    ratePerSecond: RATE_PER_SECOND,
+  };
+};
@@ -0,0 +1,197 @@
+/**
+ * Idempotency Keys
+ *
+ * Clients send `Idempotency-Key: <unique value per attempt>` and reuse it when
+ * retrying. The first request with a key runs; its response is stored in
+ * Redis (per user and key) and replayed to every retry, so a retried checkout
+ * doesn't reserve stock or call Razorpay again.
+ *
+ * - Retries while the first request is still running wait for its response
+ *   (same process: shared promise; other processes: polling), or get 409
+ *   if it takes longer than WAIT_TIMEOUT_MS
+ * - Reusing a key with a different body: 422
+ * - Server errors, 429 and 503 are not stored; a retry runs again
+ * - Requests without the header are handled as before
+ */
+
+import crypto from "crypto";
+import { redis } from "../lib/redis.js";
+
+const RESULT_TTL_MS = 24 * 60 * 60 * 1000;
+// Longest a request may hold a key; a crashed process frees it after this
+const LOCK_TTL_MS = 60 * 1000;
+const WAIT_TIMEOUT_MS = 15 * 1000;
+const POLL_INTERVAL_MS = 100;
+const MAX_KEY_LENGTH = 255;
+
+// Returns the stored entry, or nil after taking the key for this request
+redis.defineCommand("idempotencyBegin", {
+	numberOfKeys: 1,
+	lua: `
+		local existing = redis.call('GET', KEYS[1])
+		if existing then return existing end
+		redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+		return nil
+	`,
+});
+
+const localInFlight = new Map(); // redis key -> promise of the stored entry
+
+let idempotencyStats = {
+	startTime: new Date(),
+	requests: 0,
+	replayed: 0,
+	coalesced: 0,
+	inProgressConflicts: 0,
+	bodyMismatches: 0,
+	errors: 0,
+};
+
+const isStorable = (status) => status < 500 && status !== 429;
+
+const fingerprintOf = (req) =>
+	crypto.createHash("sha256").update(`${req.method} ${req.baseUrl}${req.path} ${JSON.stringify(req.body ?? null)}`).digest("hex");
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Wait for the request holding the key to store its response
+const waitForResult = async (key) => {
+	const local = localInFlight.get(key);
+	if (local) {
+		return local;
+	}
+
+	const deadline = Date.now() + WAIT_TIMEOUT_MS;
+	while (Date.now() < deadline) {
+		await sleep(POLL_INTERVAL_MS);
+		const value = await redis.get(key);
+		if (!value) {
+			return null; // the first request failed; this one may run
+		}
+		const entry = JSON.parse(value);
+		if (entry.state === "done") {
+			return entry;
+		}
+	}
+	return { state: "in_progress" };
+};
+
+const replay = (res, entry) => {
+	res.set("Idempotent-Replayed", "true");
+	return res.status(entry.status).json(entry.body);
+};
+
+// Run the request and store its response under the key
+const runFirst = (req, res, next, key, fingerprint) => {
+	let settle;
+	localInFlight.set(key, new Promise(resolve => { settle = resolve; }));
+
+	let stored = false;
+	const finish = (entry) => {
+		if (stored) return;
+		stored = true;
+		localInFlight.delete(key);
+		settle(entry);
+
+		const write = entry
+			? redis.set(key, JSON.stringify(entry), "PX", RESULT_TTL_MS)
+			: redis.del(key);
+		write.catch(error => {
+			idempotencyStats.errors++;
+			console.log("Error storing idempotent response", error.message);
+		});
+	};
+
+	const json = res.json.bind(res);
+	res.json = (body) => {
+		finish(isStorable(res.statusCode) ? { state: "done", fingerprint, status: res.statusCode, body } : null);
+		return json(body);
+	};
+	// Responses not sent through res.json (or aborted) aren't replayable
+	res.on("close", () => finish(null));
+
+	next();
+};
+
+/**
+ * Make the routes below idempotent for requests carrying Idempotency-Key
+ * Must come after the auth middleware, so keys are scoped per user
+ * @param {string} scope - Namespace for the keys, e.g. "checkout"
+ */
+export const idempotent = (scope) => async (req, res, next) => {
+	const idempotencyKey = req.get("Idempotency-Key");
+	if (!idempotencyKey) {
+		return next();
+	}
+
+	if (idempotencyKey.length > MAX_KEY_LENGTH || !/^[\x21-\x7e]+$/.test(idempotencyKey)) {
+		return res.status(400).json({ message: "Invalid Idempotency-Key header" });
+	}
+
+	idempotencyStats.requests++;
+	// Guests are not scoped by IP: a phone retrying after switching networks
+	// must still match, and keys are random per attempt
+	const owner = req.user?._id ? `user:${req.user._id}` : "guest";
+	const key = `idempotency:${scope}:${owner}:${idempotencyKey}`;
+	const fingerprint = fingerprintOf(req);
+
+	let acquired = false;
+	try {
+		for (let attempt = 0; attempt < 2 && !acquired; attempt++) {
+			const existing = await redis.idempotencyBegin(key, JSON.stringify({ state: "in_progress", fingerprint }), LOCK_TTL_MS);
+
+			if (!existing) {
+				acquired = true;
+				break;
+			}
+
+			let entry = JSON.parse(existing);
+			if (entry.fingerprint !== fingerprint) {
+				idempotencyStats.bodyMismatches++;
+				return res.status(422).json({
+					message: "This Idempotency-Key was already used for a different request",
+					reason: "idempotency_key_reused",
+				});
+			}
+
+			if (entry.state !== "done") {
+				idempotencyStats.coalesced++;
+				entry = await waitForResult(key);
+				if (!entry) {
+					continue; // first request failed without storing a response; run this one
+				}
+				if (entry.state !== "done") {
+					idempotencyStats.inProgressConflicts++;
+					res.set("Retry-After", "1");
+					return res.status(409).json({
+						message: "A request with this Idempotency-Key is still being processed",
+						reason: "idempotency_in_progress",
+					});
+				}
+			}
+
+			idempotencyStats.replayed++;
+			return replay(res, entry);
+		}
+
+	} catch (error) {
+		// Without Redis the request runs unprotected rather than failing checkout
+		idempotencyStats.errors++;
+		console.log("Error in idempotent middleware", error.message);
+		return next();
+	}
+
+	if (acquired) {
+		return runFirst(req, res, next, key, fingerprint);
+	}
+
+	// Lost the key to another retry twice in a row; let the client retry again
+	res.set("Retry-After", "1");
+	return res.status(409).json({
+		message: "A request with this Idempotency-Key is still being processed",
+		reason: "idempotency_in_progress",
+	});
+};
+
+// Get idempotency statistics for monitoring
+export const getIdempotencyStats = () => ({ ...idempotencyStats });
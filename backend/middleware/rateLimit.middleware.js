@@ -0,0 +1,203 @@
+/**
+ * Rate Limiting and Admission Control
+ *
+ * Token buckets in Redis, shared by every process (cluster workers, several
+ * servers). Each request takes one token from the client's IP bucket and,
+ * when it carries a valid access token, from the user's bucket, for its
+ * route class. Both are checked and taken in one atomic script.
+ *
+ * - Over the limit: 429 with Retry-After
+ * - maxInFlight (per process): requests beyond it get 503 straight away,
+ *   instead of queueing behind slow checkout work
+ * - Redis unavailable: requests are let through (fail open)
+ *
+ * Behind a proxy or load balancer set TRUST_PROXY, or every client shares
+ * the proxy's IP. RATE_LIMIT_ENABLED=false turns limiting off.
+ */
+
+import jwt from "jsonwebtoken";
+import { redis } from "../lib/redis.js";
+import { recordRateLimit } from "../lib/metrics.js";
+
+const ENABLED = process.env.RATE_LIMIT_ENABLED !== "false";
+
+// burst: bucket size; perSecond: refill rate. IP limits are looser than user
+// limits because carrier NAT puts many buyers behind one address
+export const RATE_LIMITS = {
+	catalog: {
+		ip: { burst: 120, perSecond: 10 },
+		user: { burst: 60, perSecond: 5 },
+	},
+	cart: {
+		ip: { burst: 60, perSecond: 5 },
+		user: { burst: 30, perSecond: 2 },
+	},
+	// Each order creation reserves stock and calls Razorpay
+	checkout: {
+		ip: { burst: 20, perSecond: 0.5 },
+		user: { burst: 5, perSecond: 0.1 },
+		maxInFlight: 50,
+	},
+	admin: {
+		ip: { burst: 60, perSecond: 5 },
+		user: { burst: 60, perSecond: 5 },
+	},
+};
+
+// KEYS: buckets; ARGV: burst and perSecond per bucket
+// Returns { allowed (1/0), retry after ms, tokens left in the emptiest bucket }
+redis.defineCommand("rateLimitTake", {
+	lua: `
+		local time = redis.call('TIME')
+		local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+		local tokens = {}
+		local waitMs = 0
+
+		for i, key in ipairs(KEYS) do
+			local burst = tonumber(ARGV[i * 2 - 1])
+			local perSecond = tonumber(ARGV[i * 2])
+			local state = redis.call('HMGET', key, 'tokens', 'ts')
+			local available = tonumber(state[1]) or burst
+			local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+			available = math.min(burst, available + elapsed * perSecond / 1000)
+			if available < 1 then
+				waitMs = math.max(waitMs, math.ceil((1 - available) * 1000 / perSecond))
+			end
+			tokens[i] = available
+		end
+
+		-- Denied requests take nothing, so the buckets keep refilling
+		if waitMs > 0 then
+			return { 0, waitMs, 0 }
+		end
+
+		local remaining = nil
+		for i, key in ipairs(KEYS) do
+			local burst = tonumber(ARGV[i * 2 - 1])
+			local perSecond = tonumber(ARGV[i * 2])
+			local left = tokens[i] - 1
+			redis.call('HSET', key, 'tokens', tostring(left), 'ts', now)
+			-- Idle buckets expire once they would be full again
+			redis.call('PEXPIRE', key, math.ceil(burst * 1000 / perSecond) + 1000)
+			if remaining == nil or left < remaining then remaining = left end
+		end
+		return { 1, 0, math.floor(remaining) }
+	`,
+});
+
+let rateLimitStats = {
+	startTime: new Date(),
+	allowed: 0,
+	limited: 0,
+	rejectedBusy: 0,
+	errors: 0,
+	byClass: {},
+};
+
+const count = (routeClass, result) => {
+	rateLimitStats[result]++;
+	const classStats = rateLimitStats.byClass[routeClass] ||= { allowed: 0, limited: 0, rejectedBusy: 0, errors: 0 };
+	classStats[result]++;
+	recordRateLimit(routeClass, result);
+};
+
+// User from the access token cookie, without a database lookup
+const getTokenUserId = (req) => {
+	const accessToken = req.cookies?.accessToken;
+	if (!accessToken) {
+		return null;
+	}
+	try {
+		return jwt.verify(accessToken, process.env.ACCESS_TOKEN_SECRET).userId || null;
+	} catch (error) {
+		return null;
+	}
+};
+
+/**
+ * Limit the routes below to their class's token buckets
+ * @param {string} routeClass - Key of RATE_LIMITS
+ */
+export const rateLimit = (routeClass) => {
+	const limits = RATE_LIMITS[routeClass];
+	if (!limits) {
+		throw new Error(`Unknown rate limit class: ${routeClass}`);
+	}
+	let inFlight = 0;
+
+	return async (req, res, next) => {
+		if (!ENABLED) {
+			return next();
+		}
+
+		if (limits.maxInFlight && inFlight >= limits.maxInFlight) {
+			count(routeClass, "rejectedBusy");
+			res.set("Retry-After", "1");
+			return res.status(503).json({
+				message: "Server is busy, please try again in a moment",
+				reason: "busy",
+				retryAfter: 1,
+			});
+		}
+
+		if (limits.maxInFlight) {
+			inFlight++;
+			let released = false;
+			const release = () => {
+				if (!released) {
+					released = true;
+					inFlight--;
+				}
+			};
+			res.on("finish", release);
+			res.on("close", release);
+		}
+
+		const keys = [`ratelimit:${routeClass}:ip:${req.ip}`];
+		const args = [limits.ip.burst, limits.ip.perSecond];
+		const userId = getTokenUserId(req);
+		if (userId) {
+			keys.push(`ratelimit:${routeClass}:user:${userId}`);
+			args.push(limits.user.burst, limits.user.perSecond);
+		}
+
+		let allowed = 1;
+		let retryAfterMs = 0;
+		let remaining = null;
+		try {
+			[allowed, retryAfterMs, remaining] = await redis.rateLimitTake(keys.length, ...keys, ...args);
+		} catch (error) {
+			// Better to serve without limits than to fail every request
+			count(routeClass, "errors");
+			console.log("Error in rateLimit middleware", error.message);
+			return next();
+		}
+
+		const limit = userId ? Math.min(limits.ip.burst, limits.user.burst) : limits.ip.burst;
+		res.set("RateLimit-Limit", String(limit));
+
+		if (!allowed) {
+			count(routeClass, "limited");
+			const retryAfter = Math.max(1, Math.ceil(retryAfterMs / 1000));
+			res.set("Retry-After", String(retryAfter));
+			res.set("RateLimit-Remaining", "0");
+			res.set("RateLimit-Reset", String(retryAfter));
+			return res.status(429).json({
+				message: `Too many requests. Please try again in ${retryAfter} second(s)`,
+				reason: "rate_limited",
+				retryAfter,
+			});
+		}
+
+		count(routeClass, "allowed");
+		res.set("RateLimit-Remaining", String(remaining));
+		next();
+	};
+};
+
+// Get rate limiting statistics for monitoring
+export const getRateLimitStats = () => ({
+	enabled: ENABLED,
+	...rateLimitStats,
+	limits: RATE_LIMITS,
+});
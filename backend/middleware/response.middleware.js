@@ -0,0 +1,254 @@
+/**
+ * Response Optimization Middleware
+ *
+ * - compressResponses: brotli/gzip negotiated from Accept-Encoding, for
+ *   compressible types above a size threshold; streamed, never buffered
+ * - cachePolicy: per-route Cache-Control
+ * - weakEtag: cheap ETag function (length + CRC32) for app.set("etag")
+ *
+ * Savings are counted in-process (getResponseStats).
+ */
+
+import crypto from "crypto";
+import zlib from "zlib";
+
+const COMPRESSION_THRESHOLD = parseInt(process.env.COMPRESSION_THRESHOLD) || 1024;
+
+// Brotli's default (11) is meant for static assets; 4 compresses dynamic
+// responses better than gzip at similar CPU cost
+const BROTLI_QUALITY = 4;
+const GZIP_LEVEL = 6;
+
+const COMPRESSIBLE_TYPE = /^(text\/(?!event-stream)|application\/(json|javascript|xml|[\w.-]+\+(json|xml))|image\/svg\+xml)/i;
+
+export const CACHE_POLICIES = {
+	// Same for every visitor, briefly stale is fine (product list, recommendations)
+	catalog: "public, max-age=30, stale-while-revalidate=120",
+	// Per-user data: browser keeps it but revalidates with the ETag every time
+	private: "private, no-cache",
+	// Auth, OTP, payments and holds
+	noStore: "no-store",
+};
+
+const emptyEncodingStats = () => ({ responses: 0, bytesIn: 0, bytesOut: 0 });
+
+let responseStats = {
+	startTime: new Date(),
+	responses: 0,
+	notModified: 0,
+	compressed: { br: emptyEncodingStats(), gzip: emptyEncodingStats() },
+	skipped: { small: 0, type: 0, noEncoding: 0, other: 0 },
+};
+
+/**
+ * Pick br or gzip from an Accept-Encoding header (null for identity)
+ */
+export const negotiateEncoding = (acceptEncoding) => {
+	if (!acceptEncoding) {
+		return null;
+	}
+
+	const weights = {};
+	for (const part of acceptEncoding.split(",")) {
+		const [name, ...params] = part.trim().toLowerCase().split(";");
+		const q = params.find(param => param.trim().startsWith("q="));
+		weights[name] = q ? parseFloat(q.trim().slice(2)) || 0 : 1;
+	}
+
+	const weightOf = (name) => weights[name] ?? weights["*"] ?? 0;
+	const br = weightOf("br");
+	const gzip = weightOf("gzip");
+
+	if (br > 0 && br >= gzip) return "br";
+	if (gzip > 0) return "gzip";
+	return null;
+};
+
+const chunkLength = (chunk, encoding) => {
+	if (!chunk) return 0;
+	return Buffer.isBuffer(chunk) ? chunk.length : Buffer.byteLength(chunk, encoding);
+};
+
+// Why a response is sent as is; null when it should be compressed
+const skipReason = (req, res, length) => {
+	if (req.method === "HEAD" || res.statusCode < 200 || res.statusCode === 204 || res.statusCode === 304) {
+		return "other";
+	}
+	const contentEncoding = res.getHeader("Content-Encoding");
+	if (contentEncoding && contentEncoding !== "identity") {
+		return "other";
+	}
+	if (/no-transform/.test(res.getHeader("Cache-Control") || "")) {
+		return "other";
+	}
+	if (!COMPRESSIBLE_TYPE.test(res.getHeader("Content-Type") || "")) {
+		return "type";
+	}
+	if (length !== null && length < COMPRESSION_THRESHOLD) {
+		return "small";
+	}
+	return null;
+};
+
+const createEncoder = (encoding, length) => {
+	if (encoding === "br") {
+		const params = { [zlib.constants.BROTLI_PARAM_QUALITY]: BROTLI_QUALITY };
+		if (length) params[zlib.constants.BROTLI_PARAM_SIZE_HINT] = length;
+		return zlib.createBrotliCompress({ params });
+	}
+	return zlib.createGzip({ level: GZIP_LEVEL });
+};
+
+/**
+ * Compress responses for clients that accept it
+ */
+export const compressResponses = () => (req, res, next) => {
+	const encoding = negotiateEncoding(req.headers["accept-encoding"]);
+	const write = res.write;
+	const end = res.end;
+
+	let decided = false;
+	let encoder = null;
+	let bytesIn = 0;
+	let bytesOut = 0;
+
+	res.on("finish", () => {
+		responseStats.responses++;
+		if (res.statusCode === 304) responseStats.notModified++;
+	});
+
+	// Decided on the first write, before headers go out. With res.send the
+	// full length is known; streamed bodies of unknown length are compressed
+	const decide = (chunk, chunkEncoding, isLast) => {
+		decided = true;
+		const contentLength = res.getHeader("Content-Length");
+		const length = contentLength !== undefined
+			? Number(contentLength)
+			: isLast ? chunkLength(chunk, chunkEncoding) : null;
+
+		const reason = skipReason(req, res, length);
+		if (reason) {
+			responseStats.skipped[reason]++;
+			return;
+		}
+
+		res.vary("Accept-Encoding");
+		if (!encoding) {
+			responseStats.skipped.noEncoding++;
+			return;
+		}
+
+		encoder = createEncoder(encoding, length);
+		res.setHeader("Content-Encoding", encoding);
+		res.removeHeader("Content-Length");
+
+		encoder.on("data", (data) => {
+			bytesOut += data.length;
+			// Respect backpressure from the socket
+			if (write.call(res, data) === false) {
+				encoder.pause();
+			}
+		});
+		res.on("drain", () => encoder.resume());
+		// Writers wait for "drain" when res.write returns false, which now
+		// reflects the encoder's buffer rather than the socket's
+		encoder.on("drain", () => res.emit("drain"));
+		encoder.on("end", () => {
+			const stats = responseStats.compressed[encoding];
+			stats.responses++;
+			stats.bytesIn += bytesIn;
+			stats.bytesOut += bytesOut;
+			end.call(res);
+		});
+		encoder.on("error", (error) => {
+			console.error("Error compressing response:", error.message);
+			res.destroy(error);
+		});
+	};
+
+	res.write = function (chunk, chunkEncoding, callback) {
+		if (typeof chunkEncoding === "function") {
+			callback = chunkEncoding;
+			chunkEncoding = undefined;
+		}
+
+		if (!decided) decide(chunk, chunkEncoding, false);
+		if (!encoder) return write.call(this, chunk, chunkEncoding, callback);
+
+		bytesIn += chunkLength(chunk, chunkEncoding);
+		return encoder.write(chunk, chunkEncoding, callback);
+	};
+
+	res.end = function (chunk, chunkEncoding, callback) {
+		if (typeof chunk === "function") {
+			callback = chunk;
+			chunk = undefined;
+		} else if (typeof chunkEncoding === "function") {
+			callback = chunkEncoding;
+			chunkEncoding = undefined;
+		}
+
+		if (!decided) decide(chunk, chunkEncoding, true);
+		if (!encoder) return end.call(this, chunk, chunkEncoding, callback);
+
+		if (callback) this.once("finish", callback);
+		if (chunk) {
+			bytesIn += chunkLength(chunk, chunkEncoding);
+			encoder.end(chunk, chunkEncoding);
+		} else {
+			encoder.end();
+		}
+		return this;
+	};
+
+	next();
+};
+
+/**
+ * Set Cache-Control for the routes below (later calls override earlier ones)
+ * @param {string} policy - Cache-Control value, usually from CACHE_POLICIES
+ */
+export const cachePolicy = (policy) => (req, res, next) => {
+	res.setHeader("Cache-Control", policy);
+	next();
+};
+
+/**
+ * Weak ETag from length and CRC32 of the body
+ * Much cheaper than Express's default SHA-1 on multi-MB exports; weak
+ * validators only need to change when the content does
+ */
+export const weakEtag = (body, encoding) => {
+	const buffer = Buffer.isBuffer(body) ? body : Buffer.from(body, encoding);
+	const checksum = zlib.crc32
+		? zlib.crc32(buffer).toString(16)
+		: crypto.createHash("sha1").update(buffer).digest("base64").slice(0, 27);
+	return `W/"${buffer.length.toString(16)}-${checksum}"`;
+};
+
+// Get response optimization statistics for monitoring
+export const getResponseStats = () => {
+	const encodings = {};
+	let bytesIn = 0;
+	let bytesOut = 0;
+
+	for (const [name, stats] of Object.entries(responseStats.compressed)) {
+		bytesIn += stats.bytesIn;
+		bytesOut += stats.bytesOut;
+		encodings[name] = {
+			...stats,
+			ratio: stats.bytesIn > 0 ? Math.round((stats.bytesOut / stats.bytesIn) * 1000) / 1000 : null,
+		};
+	}
+
+	return {
+		startTime: responseStats.startTime,
+		responses: responseStats.responses,
+		notModified: responseStats.notModified,
+		compressed: encodings,
+		skipped: responseStats.skipped,
+		bytesSaved: bytesIn - bytesOut,
+		savedPercent: bytesIn > 0 ? Math.round((1 - bytesOut / bytesIn) * 1000) / 10 : 0,
+		threshold: COMPRESSION_THRESHOLD,
+	};
+};
@@ -0,0 +1,41 @@
+import mongoose from "mongoose";
+
+/**
+ * LabelRender Model - Pre-rendered shipping label per order
+ * Stores the deflated PDF content stream for an order's label so batch
+ * print runs only have to place stored streams onto pages.
+ */
+const labelRenderSchema = new mongoose.Schema(
+  {
+    order: {
+      type: mongoose.Schema.Types.ObjectId,
+      ref: "Order",
+      required: true,
+      unique: true,
+    },
+    // Layout version the label was rendered with; stale versions are re-rendered
+    layoutVersion: {
+      type: Number,
+      required: true,
+    },
+    deliveryType: {
+      type: String,
+      enum: ["local", "national"],
+      required: true,
+    },
+    // Deflated PDF content stream, drawn in label-local coordinates
+    content: {
+      type: Buffer,
+      required: true,
+    },
+    renderedAt: {
+      type: Date,
+      default: Date.now,
+    },
+  },
+  { timestamps: true }
+);
+
+const LabelRender = mongoose.model("LabelRender", labelRenderSchema);
+
+export default LabelRender;
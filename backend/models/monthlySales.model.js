@@ -0,0 +1,58 @@
+import mongoose from "mongoose";
+
+/**
+ * MonthlySales Model - Stored sales figures for closed months
+ * Written once a month has closed (see lib/monthlySales.js) and served as-is
+ * afterwards, so finance views don't re-aggregate old orders.
+ */
+const monthlySalesSchema = new mongoose.Schema(
+  {
+    year: {
+      type: Number,
+      required: true,
+    },
+    month: {
+      type: Number,
+      required: true,
+      min: 1,
+      max: 12,
+    },
+    // Product revenue only (excludes delivery/platform fees)
+    totalSales: {
+      type: Number,
+      required: true,
+      min: 0,
+    },
+    totalDeliveryCharges: {
+      type: Number,
+      default: 0,
+    },
+    totalPlatformFeeConstant: {
+      type: Number,
+      default: 0,
+    },
+    totalPlatformFeeRazorpay: {
+      type: Number,
+      default: 0,
+    },
+    totalPlatformFees: {
+      type: Number,
+      default: 0,
+    },
+    razorpayPercentage: {
+      type: Number,
+      default: 0,
+    },
+    orderCount: {
+      type: Number,
+      default: 0,
+    },
+  },
+  { timestamps: true }
+);
+
+monthlySalesSchema.index({ year: 1, month: 1 }, { unique: true });
+
+const MonthlySales = mongoose.model("MonthlySales", monthlySalesSchema);
+
+export default MonthlySales;
@@ -119,6 +119,24 @@ orderSchema.index(
   { unique: true, partialFilterExpression: { razorpayPaymentId: { $exists: true, $type: "string" } } }
 );
 
+// Paid-order range scans (finance months, sales rollup rebuilds)
+orderSchema.index({ status: 1, createdAt: 1 });
+
+/**
+ * Hot query indexes (docs/DATABASE_INDEXES.md; `npm run indexes:check` diffs
+ * them against the database, tests/test_indexes.py checks the plans):
+ * - user + createdAt: "my orders" (newest first) and admin phone search (user $in)
+ * - status + expiresAt: hold expiry sweep and reservation cleanup
+ * - trackingStatus + createdAt: admin order list filtered by status, oldest first
+ * - trackingStatus + labelPrintedAt + createdAt: label print queue (unprinted/printed)
+ * - createdAt: unfiltered admin order list
+ */
+orderSchema.index({ user: 1, createdAt: -1 });
+orderSchema.index({ status: 1, expiresAt: 1 });
+orderSchema.index({ trackingStatus: 1, createdAt: 1 });
+orderSchema.index({ trackingStatus: 1, labelPrintedAt: 1, createdAt: 1 });
+orderSchema.index({ createdAt: 1 });
+
 // Pre-save middleware to add initial tracking history
 orderSchema.pre("save", function (next) {
   if (this.isNew && this.trackingHistory.length === 0) {
@@ -24,6 +24,18 @@ const productSchema = new mongoose.Schema(
 			type: String,
 			required: [true, "Image is required"],
 		},
+		// Resized derivatives of `image` for listings (see lib/imageStorage.js)
+		imageVariants: {
+			thumb: String,
+			card: String,
+			large: String,
+		},
+		// Inline (data URL) image being stored by the product.uploadImage job;
+		// `image` keeps the previous image until the job replaces it
+		pendingImage: {
+			uploadId: String,
+			requestedAt: Date,
+		},
 		category: {
 			type: String,
 			required: false,
@@ -48,6 +60,9 @@ const productSchema = new mongoose.Schema(
 	{ timestamps: true }
 );
 
+// Category listings and filters (docs/DATABASE_INDEXES.md)
+productSchema.index({ category: 1 });
+
 const Product = mongoose.model("Product", productSchema);
 
 export default Product;
@@ -0,0 +1,58 @@
+import mongoose from "mongoose";
+
+/**
+ * SalesRollup Model - Pre-aggregated sales counters for analytics
+ * One document per (period, bucket, scope). Scope is "total" for whole-order
+ * totals or a product id for per-product counters. Buckets are aligned to the
+ * analytics timezone (see lib/salesRollup.js).
+ */
+const salesRollupSchema = new mongoose.Schema(
+  {
+    period: {
+      type: String,
+      enum: ["hour", "day"],
+      required: true,
+    },
+    // Start of the bucket (UTC instant of the local hour/day start)
+    bucketStart: {
+      type: Date,
+      required: true,
+    },
+    // Local bucket label, e.g. "2024-12-02" or "2024-12-02T14"
+    bucketKey: {
+      type: String,
+      required: true,
+    },
+    scope: {
+      type: String,
+      required: true,
+    },
+    product: {
+      type: mongoose.Schema.Types.ObjectId,
+      ref: "Product",
+      default: null,
+    },
+    // Paid orders in the bucket (for a product: orders containing it)
+    orders: {
+      type: Number,
+      default: 0,
+    },
+    units: {
+      type: Number,
+      default: 0,
+    },
+    // Total scope: order totalAmount; product scope: line value (qty x price)
+    revenue: {
+      type: Number,
+      default: 0,
+    },
+  },
+  { timestamps: true }
+);
+
+// Unique bucket per scope; also serves range reads for a scope
+salesRollupSchema.index({ period: 1, scope: 1, bucketStart: 1 }, { unique: true });
+
+const SalesRollup = mongoose.model("SalesRollup", salesRollupSchema);
+
+export default SalesRollup;
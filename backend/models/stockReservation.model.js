@@ -0,0 +1,59 @@
+import mongoose from "mongoose";
+
+/**
+ * StockReservation Model - Reservation ledger, one entry per hold line
+ * reservedQuantity on a product equals the sum of its active entries; each
+ * entry is released or committed once, so releases can be retried safely
+ * (lib/reservationLedger.js).
+ */
+const stockReservationSchema = new mongoose.Schema(
+  {
+    // The hold order (its ID is chosen before stock is reserved)
+    order: {
+      type: mongoose.Schema.Types.ObjectId,
+      ref: "Order",
+      required: true,
+    },
+    product: {
+      type: mongoose.Schema.Types.ObjectId,
+      ref: "Product",
+      required: true,
+    },
+    quantity: {
+      type: Number,
+      required: true,
+      min: 1,
+    },
+    // active: counted in reservedQuantity; released: given back; committed: sold
+    state: {
+      type: String,
+      enum: ["active", "released", "committed"],
+      default: "active",
+    },
+    expiresAt: {
+      type: Date,
+      required: true,
+    },
+    // When the entry left "active", and why (expired, cancelled, payment_failed, ...)
+    settledAt: {
+      type: Date,
+    },
+    reason: {
+      type: String,
+    },
+  },
+  { timestamps: true }
+);
+
+// One entry per hold line
+stockReservationSchema.index({ order: 1, product: 1 }, { unique: true });
+// Reconciliation: active quantity per product
+stockReservationSchema.index({ state: 1, product: 1 });
+// Active entries past their expiry (orphaned holds)
+stockReservationSchema.index({ state: 1, expiresAt: 1 });
+// Settled entries are kept for 30 days
+stockReservationSchema.index({ settledAt: 1 }, { expireAfterSeconds: 30 * 24 * 60 * 60 });
+
+const StockReservation = mongoose.model("StockReservation", stockReservationSchema);
+
+export default StockReservation;
@@ -95,6 +95,10 @@ userSchema.methods.comparePassword = async function (password) {
 	return bcrypt.compare(password, this.password);
 };
 
+// phoneNumber (unique, sparse) and email (sparse) are indexed via their path
+// options: OTP login and checkout look users up by phone, admin order search
+// matches it with $regex (docs/DATABASE_INDEXES.md)
+
 const User = mongoose.model("User", userSchema);
 
 export default User;
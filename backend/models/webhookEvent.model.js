@@ -0,0 +1,79 @@
+import mongoose from "mongoose";
+
+/**
+ * WebhookEvent Model - Inbox of received payment provider webhooks
+ * Each delivery is stored once per event ID and acknowledged straight away;
+ * the payment.webhook job applies it to the order later (lib/paymentWebhooks.js).
+ */
+const webhookEventSchema = new mongoose.Schema(
+  {
+    // x-razorpay-event-id, or a hash of the body when the header is missing
+    eventId: {
+      type: String,
+      required: true,
+      unique: true,
+    },
+    provider: {
+      type: String,
+      enum: ["razorpay"],
+      default: "razorpay",
+    },
+    // e.g. payment.captured, payment.failed
+    event: {
+      type: String,
+      required: true,
+    },
+    // Events with the same key (the Razorpay order ID) are applied in order
+    orderKey: {
+      type: String,
+      required: true,
+    },
+    paymentId: {
+      type: String,
+    },
+    payload: {
+      type: mongoose.Schema.Types.Mixed,
+      required: true,
+    },
+    // When Razorpay created the event (its created_at); defines the order per key
+    eventCreatedAt: {
+      type: Date,
+      required: true,
+    },
+    receivedAt: {
+      type: Date,
+      default: Date.now,
+    },
+    status: {
+      type: String,
+      enum: ["pending", "processing", "processed", "failed"],
+      default: "pending",
+    },
+    attempts: {
+      type: Number,
+      default: 0,
+    },
+    // What processing did, e.g. "finalized", "already_paid", "ignored"
+    result: {
+      type: String,
+    },
+    lastError: {
+      type: String,
+    },
+    processedAt: {
+      type: Date,
+    },
+  },
+  { timestamps: true }
+);
+
+// Earlier unprocessed events for the same order (processing order check)
+webhookEventSchema.index({ orderKey: 1, eventCreatedAt: 1 });
+// Backlog sweep: oldest pending events first
+webhookEventSchema.index({ status: 1, receivedAt: 1 });
+// Processed events are kept for 30 days, then removed (pending/failed never expire)
+webhookEventSchema.index({ processedAt: 1 }, { expireAfterSeconds: 30 * 24 * 60 * 60 });
+
+const WebhookEvent = mongoose.model("WebhookEvent", webhookEventSchema);
+
+export default WebhookEvent;
@@ -1,17 +1,26 @@
 import express from "express";
 import { adminRoute, protectRoute } from "../middleware/auth.middleware.js";
-import { getAnalyticsData, getDailySalesData } from "../controllers/analytics.controller.js";
+import { getAnalyticsData, getSalesAnalytics } from "../controllers/analytics.controller.js";
+import { parseSalesQuery, querySales } from "../lib/analyticsQuery.js";
 
 const router = express.Router();
 
 router.get("/", protectRoute, adminRoute, async (req, res) => {
 	try {
-		const analyticsData = await getAnalyticsData();
+		// Defaults to the last 7 days; from/to/timezone may override it
+		const { query, error } = parseSalesQuery({
+			from: req.query.from,
+			to: req.query.to,
+			timezone: req.query.timezone,
+			granularity: "day",
+		});
+		if (error) {
+			return res.status(400).json({ message: error });
+		}
 
-		const endDate = new Date();
-		const startDate = new Date(endDate.getTime() - 7 * 24 * 60 * 60 * 1000);
+		const [analyticsData, salesReport] = await Promise.all([getAnalyticsData(), querySales(query)]);
 
-		const dailySalesData = await getDailySalesData(startDate, endDate);
+		const dailySalesData = salesReport.series.map(({ date, sales, revenue }) => ({ date, sales, revenue }));
 
 		res.json({
 			analyticsData,
@@ -23,4 +32,6 @@ router.get("/", protectRoute, adminRoute, async (req, res) => {
 	}
 });
 
+router.get("/sales", protectRoute, adminRoute, getSalesAnalytics);
+
 export default router;
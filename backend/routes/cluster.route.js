@@ -0,0 +1,22 @@
+import express from "express";
+import { adminRoute, protectRoute } from "../middleware/auth.middleware.js";
+import { getClusterHealth } from "../lib/cluster.js";
+
+const router = express.Router();
+
+// Per-worker health as last reported to the cluster primary
+// (just this process when not running in cluster mode)
+router.get("/health", protectRoute, adminRoute, async (req, res) => {
+	try {
+		const health = await getClusterHealth();
+		res.json({
+			success: true,
+			...health,
+		});
+	} catch (error) {
+		console.log("Error in cluster health route", error.message);
+		res.status(500).json({ message: "Server error", error: error.message });
+	}
+});
+
+export default router;
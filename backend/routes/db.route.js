@@ -0,0 +1,47 @@
+import express from "express";
+import { adminRoute, protectRoute } from "../middleware/auth.middleware.js";
+import {
+	clearSlowQueries,
+	getQueryProfilerStats,
+	getSlowQueries,
+	getSlowQuerySummary,
+} from "../lib/queryProfiler.js";
+import { checkInventoryDrift, getInventoryStats, isRedisInventory } from "../lib/inventory.js";
+
+const router = express.Router();
+
+// Slow queries recorded by this process (QUERY_PROFILER=true), newest first,
+// plus a per-shape summary with the explain() winning plan
+router.get("/slow-queries", protectRoute, adminRoute, (req, res) => {
+	const limit = Math.min(parseInt(req.query.limit) || 50, 500);
+	res.json({
+		success: true,
+		profiler: getQueryProfilerStats(),
+		summary: getSlowQuerySummary(),
+		queries: getSlowQueries({ limit }),
+	});
+});
+
+// Start over, e.g. after adding an index
+router.delete("/slow-queries", protectRoute, adminRoute, (req, res) => {
+	clearSlowQueries();
+	res.json({ success: true, message: "Slow query buffer cleared" });
+});
+
+// Inventory mode, flush counters and the last drift check (INVENTORY_MODE=redis);
+// ?check=true runs a drift check now
+router.get("/inventory", protectRoute, adminRoute, async (req, res) => {
+	try {
+		const drift = req.query.check === "true" && isRedisInventory() ? await checkInventoryDrift() : null;
+		res.json({
+			success: true,
+			...(await getInventoryStats()),
+			drift,
+		});
+	} catch (error) {
+		console.log("Error in inventory stats route", error.message);
+		res.status(500).json({ message: "Server error", error: error.message });
+	}
+});
+
+export default router;
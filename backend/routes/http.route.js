@@ -0,0 +1,22 @@
+import express from "express";
+import { adminRoute, protectRoute } from "../middleware/auth.middleware.js";
+import { getResponseStats } from "../middleware/response.middleware.js";
+import { getRateLimitStats } from "../middleware/rateLimit.middleware.js";
+import { getIdempotencyStats } from "../middleware/idempotency.middleware.js";
+import { getHoldEventStats } from "../lib/holdEvents.js";
+
+const router = express.Router();
+
+// Compression savings, conditional-request hits, rate limiter decisions,
+// idempotent replays and hold status streams for this process
+router.get("/stats", protectRoute, adminRoute, (req, res) => {
+	res.json({
+		success: true,
+		...getResponseStats(),
+		rateLimits: getRateLimitStats(),
+		idempotency: getIdempotencyStats(),
+		holdEvents: getHoldEventStats(),
+	});
+});
+
+export default router;
@@ -0,0 +1,22 @@
+import express from "express";
+import { adminRoute, protectRoute } from "../middleware/auth.middleware.js";
+import { getJobQueueStats } from "../lib/jobQueue.js";
+import { getWebhookStats } from "../lib/paymentWebhooks.js";
+
+const router = express.Router();
+
+router.get("/stats", protectRoute, adminRoute, async (req, res) => {
+	try {
+		const [stats, webhooks] = await Promise.all([getJobQueueStats(), getWebhookStats()]);
+		res.json({
+			success: true,
+			...stats,
+			webhooks,
+		});
+	} catch (error) {
+		console.log("Error in job stats route", error.message);
+		res.status(500).json({ message: "Server error", error: error.message });
+	}
+});
+
+export default router;
@@ -0,0 +1,28 @@
+import express from "express";
+import { register } from "../lib/metrics.js";
+
+const router = express.Router();
+
+// Scrapers can't log in; with METRICS_TOKEN set they send it as a bearer token
+const requireMetricsToken = (req, res, next) => {
+	const token = process.env.METRICS_TOKEN;
+	if (token && req.headers.authorization !== `Bearer ${token}`) {
+		return res.status(401).json({ message: "Unauthorized - Invalid metrics token" });
+	}
+	next();
+};
+
+// Prometheus text exposition format, for this process only
+router.get("/", requireMetricsToken, async (req, res) => {
+	try {
+		const metrics = await register.metrics();
+		res.set("Content-Type", register.contentType);
+		res.set("Cache-Control", "no-store");
+		res.send(metrics);
+	} catch (error) {
+		console.log("Error in metrics route", error.message);
+		res.status(500).json({ message: "Server error", error: error.message });
+	}
+});
+
+export default router;
@@ -1,12 +1,14 @@
 import express from "express";
 import { adminRoute, protectRoute } from "../middleware/auth.middleware.js";
-import { getOrdersData, getUserOrders, updateOrderTracking, getOrderTracking, exportOrdersCSV, getAddressSheet, getBulkAddressSheets, createManualOrder, getOrdersForLabels, markLabelsAsPrinted, exportLabelsSummaryCSV } from "../controllers/orders.controller.js";
+import { idempotent } from "../middleware/idempotency.middleware.js";
+import { getOrdersData, getUserOrders, updateOrderTracking, getOrderTracking, exportOrdersCSV, getAddressSheet, getBulkAddressSheets, createManualOrder, createManualOrdersBulk, getOrdersForLabels, markLabelsAsPrinted, exportLabelsSummaryCSV } from "../controllers/orders.controller.js";
 
 
 const router = express.Router();
 
 router.get("/", protectRoute, adminRoute, getOrdersData);
 router.post("/manual", protectRoute, adminRoute, createManualOrder);
+router.post("/manual/bulk", protectRoute, adminRoute, idempotent("manual-orders"), createManualOrdersBulk);
 router.get("/export/csv", protectRoute, adminRoute, exportOrdersCSV);
 router.get("/labels", protectRoute, adminRoute, getOrdersForLabels);
 router.get("/labels/summary-csv", protectRoute, adminRoute, exportLabelsSummaryCSV);
@@ -1,26 +1,33 @@
 import express from "express";
 import { optionalAuth } from "../middleware/auth.middleware.js";
+import { idempotent } from "../middleware/idempotency.middleware.js";
 import {
   createRazorpayOrder,
   verifyRazorpayPayment,
   razorpayWebhook,
   getHoldStatus,
+  streamHoldStatus,
   cancelHold,
 } from "../controllers/payments.razorpay.controller.js";
 import { calculatePricing } from "../controllers/pricing.controller.js";
 import { getHoldExpiryJobStats } from "../lib/stockHold.js";
+import { getClusterHealth, isClusterWorker } from "../lib/cluster.js";
 
 const router = express.Router();
 
 router.post("/calculate-pricing", optionalAuth, calculatePricing);
-router.post("/razorpay-create-order", optionalAuth, createRazorpayOrder);
-router.post("/razorpay-verify", optionalAuth, verifyRazorpayPayment);
+// Retries with the same Idempotency-Key replay the first response
+router.post("/razorpay-create-order", optionalAuth, idempotent("checkout"), createRazorpayOrder);
+router.post("/razorpay-verify", optionalAuth, idempotent("verify"), verifyRazorpayPayment);
 router.get("/hold-status", optionalAuth, getHoldStatus);
-router.post("/cancel-hold", optionalAuth, cancelHold);
+// Server-Sent Events; GET /hold-status?wait=25 is the long-poll fallback
+router.get("/hold-status/stream", optionalAuth, streamHoldStatus);
+router.post("/cancel-hold", optionalAuth, idempotent("cancel-hold"), cancelHold);
 
-router.get("/hold-expiry-job-health", (req, res) => {
+router.get("/hold-expiry-job-health", async (req, res) => {
   try {
-    const stats = getHoldExpiryJobStats();
+    // In cluster mode only one worker runs the job; ask the primary for its stats
+    const stats = isClusterWorker() ? (await getClusterHealth()).holdExpiryJob : getHoldExpiryJobStats();
     res.json({
       success: true,
       ...stats
@@ -6,6 +6,7 @@ import {
 	getRecommendedProducts,
 	updateProduct,
 	updateProductStock,
+	uploadProductImage,
 } from "../controllers/product.controller.js";
 import {
 	addToWaitlist,
@@ -13,12 +14,15 @@ import {
 	removeFromWaitlist,
 } from "../controllers/waitlist.controller.js";
 import { adminRoute, protectRoute } from "../middleware/auth.middleware.js";
+import { getWaitlistDispatchStats } from "../lib/waitlistDispatcher.js";
+import { CACHE_POLICIES, cachePolicy } from "../middleware/response.middleware.js";
 
 const router = express.Router();
 
-router.get("/", getAllProducts);
-router.get("/recommendations", getRecommendedProducts);
+router.get("/", cachePolicy(CACHE_POLICIES.catalog), getAllProducts);
+router.get("/recommendations", cachePolicy(CACHE_POLICIES.catalog), getRecommendedProducts);
 router.post("/", protectRoute, adminRoute, createProduct);
+router.post("/images", protectRoute, adminRoute, uploadProductImage);
 router.put("/:id", protectRoute, adminRoute, updateProduct);
 router.patch("/:id/stock", protectRoute, adminRoute, updateProductStock);
 router.delete("/:id", protectRoute, adminRoute, deleteProduct);
@@ -27,5 +31,8 @@ router.delete("/:id", protectRoute, adminRoute, deleteProduct);
 router.post("/:id/waitlist", addToWaitlist);
 router.get("/:id/waitlist", protectRoute, adminRoute, getWaitlist);
 router.delete("/:id/waitlist", removeFromWaitlist);
+router.get("/waitlist/dispatch-stats", protectRoute, adminRoute, (req, res) => {
+	res.json({ success: true, ...getWaitlistDispatchStats() });
+});
 
 export default router;
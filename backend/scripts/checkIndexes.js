@@ -0,0 +1,73 @@
+/**
+ * Compare declared indexes with the ones that exist in MongoDB
+ * Exits with 1 when a declared index is missing (usable as a deploy check)
+ *
+ * Usage: node backend/scripts/checkIndexes.js [--create]
+ *   --create  Build missing indexes (never drops undeclared ones)
+ */
+
+import dotenv from "dotenv";
+import mongoose from "mongoose";
+import { connectDB } from "../lib/db.js";
+import { diffIndexes } from "../lib/indexes.js";
+import "../models/expense.model.js";
+import "../models/labelRender.model.js";
+import "../models/monthlySales.model.js";
+import "../models/order.model.js";
+import "../models/partnerBalance.model.js";
+import "../models/product.model.js";
+import "../models/productBOM.model.js";
+import "../models/reimbursement.model.js";
+import "../models/salesRollup.model.js";
+import "../models/stockReservation.model.js";
+import "../models/user.model.js";
+import "../models/webhookEvent.model.js";
+
+dotenv.config({ path: "./.env" });
+
+const run = async () => {
+  try {
+    const create = process.argv.includes("--create");
+
+    await connectDB();
+
+    let results = await diffIndexes();
+
+    if (create && results.some(r => r.missing.length > 0)) {
+      for (const { model, missing } of results) {
+        if (missing.length > 0) {
+          console.log(`Building ${missing.length} index(es) on ${model}...`);
+          await mongoose.model(model).createIndexes();
+        }
+      }
+      results = await diffIndexes();
+    }
+
+    for (const { model, collection, declared, missing, extra, error } of results) {
+      const ok = missing.length === 0 && extra.length === 0 && !error;
+      console.log(`\n${ok ? "✓" : "✗"} ${model} (${collection}): ${declared.length} declared`);
+      for (const name of missing) console.log(`  - missing:    ${name}`);
+      for (const name of extra) console.log(`  - undeclared: ${name}`);
+      if (error) console.log(`  - build error: ${error}`);
+    }
+
+    const missingCount = results.reduce((sum, r) => sum + r.missing.length, 0);
+    const extraCount = results.reduce((sum, r) => sum + r.extra.length, 0);
+
+    if (missingCount > 0) {
+      console.log(`\n❌ ${missingCount} declared index(es) missing${create ? "" : " (run with --create to build them)"}`);
+      process.exit(1);
+    }
+    if (extraCount > 0) {
+      console.log(`\n⚠ ${extraCount} undeclared index(es); drop them if nothing relies on them`);
+    }
+    console.log("\n✅ All declared indexes exist");
+    process.exit(0);
+
+  } catch (error) {
+    console.error("❌ Error checking indexes:", error);
+    process.exit(1);
+  }
+};
+
+run();
@@ -0,0 +1,57 @@
+/**
+ * Compare the Redis inventory counters (INVENTORY_MODE=redis) with MongoDB
+ * Exits with 1 when products have drifted
+ *
+ * Usage: node backend/scripts/checkInventoryDrift.js [--fix]
+ *   --fix  Correct drifted products in MongoDB to match Redis
+ */
+
+import dotenv from "dotenv";
+import { connectDB } from "../lib/db.js";
+import { checkInventoryDrift, flushInventory, repairInventoryDrift } from "../lib/inventory.js";
+
+dotenv.config({ path: "./.env" });
+
+const run = async () => {
+  try {
+    const fix = process.argv.includes("--fix");
+
+    await connectDB();
+
+    // Write this moment's pending deltas first, so only real drift remains
+    const flushed = await flushInventory();
+    if (flushed > 0) {
+      console.log(`Flushed pending changes for ${flushed} product(s)`);
+    }
+
+    const { products, drifted } = await checkInventoryDrift();
+    console.log(`Checked ${products} product(s) with Redis counters`);
+
+    for (const { productId, name, fields } of drifted) {
+      console.log(`\n✗ ${name} (${productId})`);
+      for (const [field, { redis: redisValue, pending, mongo }] of Object.entries(fields)) {
+        console.log(`  - ${field}: redis ${redisValue} (pending ${pending}), mongo ${mongo}`);
+      }
+    }
+
+    if (drifted.length === 0) {
+      console.log("\n✅ Redis and MongoDB agree");
+      process.exit(0);
+    }
+
+    if (fix) {
+      const fixed = await repairInventoryDrift(drifted);
+      console.log(`\n✅ Corrected ${fixed} product(s) in MongoDB`);
+      process.exit(0);
+    }
+
+    console.log(`\n❌ ${drifted.length} product(s) drifted (run with --fix to correct MongoDB)`);
+    process.exit(1);
+
+  } catch (error) {
+    console.error("❌ Error checking inventory drift:", error);
+    process.exit(1);
+  }
+};
+
+run();
@@ -0,0 +1,64 @@
+/**
+ * Generate image derivatives (thumb/card/large) for existing products
+ * Run once after deploying image variants, or after changing IMAGE_VARIANTS
+ * 
+ * Usage: node backend/scripts/generateImageVariants.js [--all]
+ *   --all  Regenerate for every product, not only those missing variants
+ */
+
+import dotenv from "dotenv";
+import mongoose from "mongoose";
+import { connectDB } from "../lib/db.js";
+import Product from "../models/product.model.js";
+import { getImageVariants } from "../lib/imageStorage.js";
+
+dotenv.config({ path: "./.env" });
+
+const run = async () => {
+  try {
+    const all = process.argv.includes("--all");
+
+    console.log(`Generating image variants (${all ? "all products" : "products missing variants"})...`);
+
+    await connectDB();
+
+    const filter = all
+      ? { image: { $nin: [null, ""] } }
+      : { image: { $nin: [null, ""] }, "imageVariants.thumb": { $in: [null, ""] } };
+    const products = await Product.find(filter).select("name image").lean();
+
+    let updated = 0;
+    let skipped = 0;
+    let failed = 0;
+
+    for (const product of products) {
+      try {
+        const imageVariants = await getImageVariants(product.image, { generate: true });
+        if (Object.keys(imageVariants).length === 0) {
+          // Inline images get variants from the upload job; other URLs can't be resized
+          skipped++;
+          continue;
+        }
+        await Product.updateOne({ _id: product._id, image: product.image }, { $set: { imageVariants } });
+        updated++;
+        console.log(`  ✓ ${product.name}`);
+      } catch (error) {
+        failed++;
+        console.error(`  ✗ ${product.name}:`, error.message);
+      }
+    }
+
+    console.log(`\n  - Updated: ${updated}`);
+    console.log(`  - Skipped (no stored image): ${skipped}`);
+    console.log(`  - Failed: ${failed}`);
+    console.log("\n✅ Image variants generated!");
+    await mongoose.disconnect();
+    process.exit(failed > 0 ? 1 : 0);
+
+  } catch (error) {
+    console.error("❌ Error generating image variants:", error);
+    process.exit(1);
+  }
+};
+
+run();
@@ -0,0 +1,52 @@
+/**
+ * Rebuild the analytics sales rollups from order history
+ * Run once after deploying rollups, or to repair buckets after a failed update
+ * 
+ * Usage: node backend/scripts/rebuildSalesRollups.js [--from 2024-01-01] [--to 2024-12-31]
+ */
+
+import dotenv from "dotenv";
+import { connectDB } from "../lib/db.js";
+import { rebuildSalesRollups } from "../lib/salesRollup.js";
+import { invalidateSalesQueryCache } from "../lib/analyticsQuery.js";
+
+dotenv.config({ path: "./.env" });
+
+const getArg = (name) => {
+  const index = process.argv.indexOf(`--${name}`);
+  if (index === -1 || !process.argv[index + 1]) {
+    return null;
+  }
+  const date = new Date(process.argv[index + 1]);
+  if (Number.isNaN(date.getTime())) {
+    throw new Error(`Invalid --${name} date: ${process.argv[index + 1]}`);
+  }
+  return date;
+};
+
+const run = async () => {
+  try {
+    const from = getArg("from");
+    const to = getArg("to");
+
+    console.log(`Rebuilding sales rollups (${from ? from.toISOString() : "beginning"} → ${to ? to.toISOString() : "now"})...`);
+
+    await connectDB();
+
+    const result = await rebuildSalesRollups({ from, to });
+
+    console.log(`  - Buckets written: ${result.buckets}`);
+
+    // Cached analytics for closed periods were computed from the old rollups
+    await invalidateSalesQueryCache();
+    console.log("  - Analytics cache invalidated");
+    console.log("\n✅ Rollup rebuild completed successfully!");
+    process.exit(0);
+
+  } catch (error) {
+    console.error("❌ Error rebuilding rollups:", error);
+    process.exit(1);
+  }
+};
+
+run();
@@ -0,0 +1,59 @@
+/**
+ * Reconcile reservedQuantity and sold of every product with the orders
+ * and the reservation ledger, and print what differs
+ * Exits with 1 when a dry run finds differences
+ *
+ * Usage: node backend/scripts/reconcileStock.js [--dry-run]
+ *   --dry-run  Report only: no holds are released and nothing is corrected
+ */
+
+import dotenv from "dotenv";
+import { connectDB } from "../lib/db.js";
+import { releaseExpiredHolds } from "../lib/stockHold.js";
+import { reconcileStock } from "../lib/stockReconciliation.js";
+
+dotenv.config({ path: "./.env" });
+
+const run = async () => {
+  try {
+    const dryRun = process.argv.includes("--dry-run");
+
+    await connectDB();
+
+    if (!dryRun) {
+      // Expired holds (and orphaned ledger entries) first, as the expiry job would
+      const released = await releaseExpiredHolds();
+      console.log(`Released ${released} expired hold orders`);
+    }
+
+    const { products, drifted, corrected } = await reconcileStock({ dryRun });
+    console.log(`Checked ${products} product(s)`);
+
+    for (const { productId, name, source, fields } of drifted) {
+      console.log(`\n${dryRun ? "✗" : "✓"} ${name} (${productId})${source === "redis" ? " [redis]" : ""}`);
+      for (const [field, { current, expected }] of Object.entries(fields)) {
+        const change = expected - current;
+        console.log(`  - ${field}: ${current} → ${expected} (${change > 0 ? "+" : ""}${change})`);
+      }
+    }
+
+    if (drifted.length === 0) {
+      console.log("\n✅ All counters match the orders");
+      process.exit(0);
+    }
+
+    if (dryRun) {
+      console.log(`\n❌ ${drifted.length} product(s) differ (run without --dry-run to correct them)`);
+      process.exit(1);
+    }
+
+    console.log(`\n✅ Corrected ${corrected} product(s)`);
+    process.exit(0);
+
+  } catch (error) {
+    console.error("❌ Error reconciling stock:", error);
+    process.exit(1);
+  }
+};
+
+run();
@@ -0,0 +1,92 @@
+/**
+ * Find products whose image is still an inline base64 data URL, or whose
+ * inline image upload never finished, and store the inline images
+ * Exits with 1 when anything is left that needs attention, so it can run
+ * from cron as an alert
+ *
+ * Usage: node backend/scripts/storeInlineImages.js [--dry-run]
+ *   --dry-run  Report only; nothing is stored
+ */
+
+import dotenv from "dotenv";
+import mongoose from "mongoose";
+import { connectDB } from "../lib/db.js";
+import Product from "../models/product.model.js";
+import { deleteStoredImage, storeDataUrlImage } from "../lib/imageStorage.js";
+
+dotenv.config({ path: "./.env" });
+
+// The upload job retries for a few minutes; older pending uploads have failed
+const STALE_UPLOAD_MS = 60 * 60 * 1000;
+
+const run = async () => {
+  try {
+    const dryRun = process.argv.includes("--dry-run");
+
+    await connectDB();
+
+    const inline = await Product.find({ image: /^data:image/ }).select("name image").lean();
+    const stale = await Product.find({ "pendingImage.requestedAt": { $lt: new Date(Date.now() - STALE_UPLOAD_MS) } })
+      .select("name pendingImage")
+      .lean();
+
+    console.log(`Found ${inline.length} product(s) with an inline image`);
+
+    let stored = 0;
+    let failed = 0;
+
+    for (const product of inline) {
+      if (dryRun) {
+        console.log(`  ✗ ${product.name} (${product._id})`);
+        continue;
+      }
+      try {
+        const image = await storeDataUrlImage(product.image);
+        const updated = await Product.updateOne(
+          { _id: product._id, image: product.image },
+          { $set: { image: image.url, imageVariants: image.variants } }
+        );
+        if (updated.modifiedCount === 0) {
+          // Changed meanwhile
+          await deleteStoredImage(image.url).catch(() => {});
+          continue;
+        }
+        stored++;
+        console.log(`  ✓ ${product.name}`);
+      } catch (error) {
+        failed++;
+        console.error(`  ✗ ${product.name}:`, error.message);
+      }
+    }
+
+    // The data URL of a failed upload only lived in its job, so these need a new image
+    if (stale.length > 0) {
+      console.log(`\nFound ${stale.length} product(s) whose inline image upload never finished (upload the image again):`);
+      for (const product of stale) {
+        console.log(`  ✗ ${product.name} (${product._id}), requested ${product.pendingImage.requestedAt.toISOString()}`);
+      }
+    }
+
+    await mongoose.disconnect();
+
+    if (!dryRun) {
+      console.log(`\n  - Stored: ${stored}`);
+      console.log(`  - Failed: ${failed}`);
+    }
+
+    const remaining = (dryRun ? inline.length : failed) + stale.length;
+    if (remaining > 0) {
+      console.log(`\n❌ ${remaining} product image(s) need attention`);
+      process.exit(1);
+    }
+
+    console.log("\n✅ No inline product images left");
+    process.exit(0);
+
+  } catch (error) {
+    console.error("❌ Error storing inline images:", error);
+    process.exit(1);
+  }
+};
+
+run();
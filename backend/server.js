@@ -1,3 +1,6 @@
+// First, so their mongoose plugins apply to every model compiled below
+import { httpMetrics } from "./lib/metrics.js";
+import "./lib/queryProfiler.js";
 import dotenv from "dotenv";
 import express from "express";
 import cookieParser from "cookie-parser";
@@ -15,31 +18,73 @@ import addressRoutes from "./routes/address.route.js";
 import expenseRoutes from "./routes/expense.route.js";
 import bomRoutes from "./routes/bom.route.js";
 import financeRoutes from "./routes/finance.route.js";
+import jobRoutes from "./routes/jobs.route.js";
+import httpRoutes from "./routes/http.route.js";
+import clusterRoutes from "./routes/cluster.route.js";
+import metricsRoutes from "./routes/metrics.route.js";
+import dbRoutes from "./routes/db.route.js";
 import { connectDB } from "./lib/db.js";
-import { startHoldExpiryJob, stopHoldExpiryJob } from "./lib/stockHold.js";
+import { verifyIndexes } from "./lib/indexes.js";
+import { getHoldExpiryJobStats, startHoldExpiryJob, stopHoldExpiryJob } from "./lib/stockHold.js";
+import { watchPricingConfig, stopWatchingPricingConfig } from "./lib/pricing.js";
+import { resumePendingWaitlistDispatches } from "./lib/waitlistDispatcher.js";
+import { startJobWorkers, stopJobWorkers } from "./lib/jobQueue.js";
+import { startWebhookSweep, stopWebhookSweep } from "./lib/paymentWebhooks.js";
+import { startInventorySync, stopInventorySync } from "./lib/inventory.js";
+import { LOCAL_UPLOAD_DIR } from "./lib/imageStorage.js";
+import { closeHoldWatchers } from "./lib/holdEvents.js";
+import { isClusterWorker, startWorkerHealthReports, stopWorkerHealthReports } from "./lib/cluster.js";
+import {
+  CACHE_POLICIES,
+  cachePolicy,
+  compressResponses,
+  weakEtag,
+} from "./middleware/response.middleware.js";
+import { rateLimit } from "./middleware/rateLimit.middleware.js";
+import "./lib/jobs.js";
 
 dotenv.config();
 
 const app = express();
+
+// Behind a proxy/load balancer: number of hops (or a trusted address list),
+// so req.ip is the client's address for rate limiting
+if (process.env.TRUST_PROXY) {
+  const hops = Number(process.env.TRUST_PROXY);
+  app.set("trust proxy", Number.isInteger(hops) ? hops : process.env.TRUST_PROXY);
+}
+
 const PORT = process.env.PORT || 5000;
 const CLIENT_URL = process.env.CLIENT_URL;
 const __dirname = path.resolve();
 
+// Weak ETags on every res.send/res.json; unchanged responses become 304s
+app.set("etag", weakEtag);
+
+// Route latency and in-flight requests for GET /metrics
+app.use(httpMetrics);
+
 /* =======================
-   CORS (MUST BE FIRST)
+   CORS
 ======================= */
 app.use(
   cors({
     origin: CLIENT_URL,
     credentials: true,
     methods: ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-    allowedHeaders: ["Content-Type", "Authorization"]
+    allowedHeaders: ["Content-Type", "Authorization", "Idempotency-Key"],
+    exposedHeaders: ["Retry-After", "Idempotent-Replayed"]
   })
 );
 
 // Allow preflight requests
 app.options("*", cors());
 
+/* =======================
+   Response Compression
+======================= */
+app.use(compressResponses());
+
 /* =======================
    Razorpay Webhook
    (RAW BODY ONLY HERE)
@@ -56,9 +101,38 @@ app.post(
 /* =======================
    Global Middlewares
 ======================= */
-app.use(express.json({ limit: "10mb" }));
 app.use(cookieParser());
 
+/* =======================
+   Rate Limiting
+   (before body parsing, so rejected requests cost little; the Razorpay
+   webhook and OTP endpoints, which throttle per phone, are not limited)
+======================= */
+app.use("/api/products", rateLimit("catalog"));
+app.use(
+  ["/api/cart", "/api/address", "/api/payments/calculate-pricing", "/api/payments/razorpay-verify", "/api/payments/hold-status", "/api/payments/cancel-hold"],
+  rateLimit("cart")
+);
+app.use("/api/payments/razorpay-create-order", rateLimit("checkout"));
+app.use(
+  ["/api/orders", "/api/analytics", "/api/expenses", "/api/bom", "/api/finance", "/api/jobs", "/api/http", "/api/cluster", "/api/db"],
+  rateLimit("admin")
+);
+
+// Product images are uploaded as multipart streams (POST /api/products/images),
+// so JSON bodies stay small
+app.use(express.json({ limit: process.env.JSON_BODY_LIMIT || "1mb" }));
+
+// Images kept by the local image store (IMAGE_STORAGE=local)
+app.use("/uploads", express.static(LOCAL_UPLOAD_DIR, { maxAge: "7d", immutable: true }));
+
+/* =======================
+   Cache Policies
+   (routes may override, e.g. the public product list)
+======================= */
+app.use("/api", cachePolicy(CACHE_POLICIES.private));
+app.use(["/api/auth", "/api/otp", "/api/payments"], cachePolicy(CACHE_POLICIES.noStore));
+
 /* =======================
    Routes
 ======================= */
@@ -73,23 +147,73 @@ app.use("/api/analytics", analyticsRoutes);
 app.use("/api/expenses", expenseRoutes);
 app.use("/api/bom", bomRoutes);
 app.use("/api/finance", financeRoutes);
+app.use("/api/jobs", jobRoutes);
+app.use("/api/http", httpRoutes);
+app.use("/api/cluster", clusterRoutes);
+app.use("/api/db", dbRoutes);
+
+// Prometheus scrape endpoint (outside /api; METRICS_TOKEN protects it)
+app.use("/metrics", metricsRoutes);
 
 /* =======================
    Start Server
 ======================= */
 const server = app.listen(PORT, async () => {
   console.log(`Server running on port ${PORT}`);
+
+  // In cluster mode (cluster.js) the primary assigns the hold expiry job to
+  // exactly one worker as soon as it is listening; a standalone server runs it itself
+  startWorkerHealthReports({
+    holdJob: { start: startHoldExpiryJob, stop: stopHoldExpiryJob, getStats: getHoldExpiryJobStats },
+  });
+
   await connectDB();
-  startHoldExpiryJob();
+  watchPricingConfig();
+  // INVENTORY_MODE=redis only: write counters back to MongoDB
+  startInventorySync();
+
+  // Warn about missing or undeclared indexes (once per cluster)
+  if (!isClusterWorker() || process.env.CLUSTER_WORKER_SLOT === "0") {
+    verifyIndexes();
+  }
+
+  if (!isClusterWorker()) {
+    startHoldExpiryJob();
+  }
+
+  // Background jobs run here unless dedicated workers (npm run worker) handle them
+  if (process.env.RUN_JOB_WORKERS !== "false") {
+    startJobWorkers();
+    startWebhookSweep();
+
+    // Finish waitlist notifications interrupted by the last shutdown
+    resumePendingWaitlistDispatches().catch(err => {
+      console.error("Error resuming waitlist dispatches:", err);
+    });
+  }
 });
 
 /* =======================
    Graceful Shutdown
 ======================= */
+let shuttingDown = false;
+
 const shutdown = () => {
+  if (shuttingDown) {
+    return;
+  }
+  shuttingDown = true;
   console.log("Shutting down gracefully...");
+  stopWorkerHealthReports();
   stopHoldExpiryJob();
-  server.close(() => {
+  stopWebhookSweep();
+  stopWatchingPricingConfig();
+  // Hold status streams and long-polls stay open until the hold ends;
+  // server.close() would wait for them
+  closeHoldWatchers();
+  server.close(async () => {
+    await stopJobWorkers();
+    await stopInventorySync();
     console.log("Server closed");
     process.exit(0);
   });
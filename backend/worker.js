@@ -0,0 +1,46 @@
+/**
+ * Background job worker process
+ * Runs queued jobs (lib/jobs.js) outside the API server.
+ *
+ * Usage: npm run worker
+ * Set RUN_JOB_WORKERS=false on the API servers to leave all jobs to workers.
+ */
+
+import dotenv from "dotenv";
+import { connectDB } from "./lib/db.js";
+import { startJobWorkers, stopJobWorkers } from "./lib/jobQueue.js";
+import { startWebhookSweep, stopWebhookSweep } from "./lib/paymentWebhooks.js";
+import { startInventorySync, stopInventorySync } from "./lib/inventory.js";
+import { resumePendingWaitlistDispatches } from "./lib/waitlistDispatcher.js";
+import "./lib/jobs.js";
+
+dotenv.config();
+
+const start = async () => {
+  await connectDB();
+  startJobWorkers();
+  startWebhookSweep();
+  // Webhook jobs finalize orders; with INVENTORY_MODE=redis flush their counters
+  startInventorySync();
+
+  // Finish waitlist notifications interrupted by the last shutdown
+  resumePendingWaitlistDispatches().catch(err => {
+    console.error("Error resuming waitlist dispatches:", err);
+  });
+};
+
+const shutdown = async () => {
+  console.log("Worker shutting down, finishing in-flight jobs...");
+  stopWebhookSweep();
+  await stopJobWorkers();
+  await stopInventorySync();
+  process.exit(0);
+};
+
+process.on("SIGTERM", shutdown);
+process.on("SIGINT", shutdown);
+
+start().catch(err => {
+  console.error("Error starting worker:", err);
+  process.exit(1);
+});
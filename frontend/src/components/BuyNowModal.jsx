@@ -5,6 +5,7 @@ import toast from "react-hot-toast";
 import { useUserStore } from "../stores/useUserStore";
 import { useNavigate } from "react-router-dom";
 import PhoneAuthModal from "./PhoneAuthModal";
+import { getProductImage } from "../lib/productImage";
 
 const MAX_QUANTITY_PER_ITEM = 5; // Maximum quantity allowed per item
 
@@ -99,7 +100,7 @@ const BuyNowModal = ({ isOpen, onClose, product }) => {
           {/* Product Info */}
           <div className="mb-6 flex gap-4">
             <img 
-              src={product.image} 
+              src={getProductImage(product, "thumb")} 
               alt={product.name}
               className="h-24 w-24 rounded-md object-cover border border-stone-200"
             />
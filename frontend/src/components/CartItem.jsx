@@ -1,5 +1,6 @@
 import { Minus, Plus, Trash } from "lucide-react";
 import { useCartStore } from "../stores/useCartStore";
+import { getProductImage } from "../lib/productImage";
 
 const CartItem = ({ item }) => {
 	const { removeFromCart, updateQuantity } = useCartStore();
@@ -8,7 +9,7 @@ const CartItem = ({ item }) => {
 		<div className='border border-stone-200 rounded-lg p-4 bg-white shadow-sm'>
 			<div className='flex items-center gap-4'>
 				<div className='shrink-0'>
-					<img className='w-16 h-16 object-cover rounded-md' src={item.image} alt={item.name} />
+					<img className='w-16 h-16 object-cover rounded-md' src={getProductImage(item, "thumb")} alt={item.name} />
 				</div>
 
 				<div className='flex-1 min-w-0'>
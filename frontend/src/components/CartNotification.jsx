@@ -3,6 +3,7 @@ import { useCartStore } from "../stores/useCartStore";
 import { useNavigate } from "react-router-dom";
 import { ShoppingBag, X } from "lucide-react";
 import { useEffect } from "react";
+import { getProductImage } from "../lib/productImage";
 
 const CartNotification = () => {
 	const { showCartNotification, lastAddedItem, hideCartNotification, cart } = useCartStore();
@@ -41,7 +42,7 @@ const CartNotification = () => {
 							{/* Product image */}
 							<div className="w-12 h-12 rounded-lg overflow-hidden flex-shrink-0 bg-stone-800">
 								<img
-									src={lastAddedItem.image}
+									src={getProductImage(lastAddedItem, "thumb")}
 									alt={lastAddedItem.name}
 									className="w-full h-full object-cover"
 								/>
@@ -3,7 +3,7 @@ import { motion } from "framer-motion";
 import { PlusCircle, Upload, Loader } from "lucide-react";
 import { useProductStore } from "../stores/useProductStore";
 import toast from "react-hot-toast";
-import { validateImageFile, readFileAsBase64 } from "../lib/imageValidation";
+import { validateImageFile, uploadImageFile } from "../lib/imageValidation";
 
 const CreateProductForm = () => {
 	const [newProduct, setNewProduct] = useState({
@@ -15,6 +15,8 @@ const CreateProductForm = () => {
 		stockQuantity: "",
 	});
 
+	const [uploadingImage, setUploadingImage] = useState(false);
+
 	const { createProduct, loading } = useProductStore();
 
 	const handleSubmit = async (e) => {
@@ -32,12 +34,15 @@ const CreateProductForm = () => {
 		const validatedFile = validateImageFile(file, e.target);
 		
 		if (validatedFile) {
+			setUploadingImage(true);
 			try {
-				const base64 = await readFileAsBase64(validatedFile);
-				setNewProduct({ ...newProduct, image: base64 });
+				const url = await uploadImageFile(validatedFile);
+				setNewProduct((product) => ({ ...product, image: url }));
 			} catch (error) {
-				toast.error('Failed to read image file');
+				toast.error(error.response?.data?.message || 'Failed to upload image');
 				e.target.value = '';
+			} finally {
+				setUploadingImage(false);
 			}
 		}
 	};
@@ -151,7 +156,8 @@ const CreateProductForm = () => {
 						<Upload className='h-5 w-5 inline-block mr-2' />
 						Upload Image
 					</label>
-					{newProduct.image && <span className='ml-3 text-sm text-gray-400'>Image uploaded </span>}
+					{uploadingImage && <span className='ml-3 text-sm text-gray-400'>Uploading...</span>}
+					{!uploadingImage && newProduct.image && <span className='ml-3 text-sm text-gray-400'>Image uploaded </span>}
 				</div>
 
 				<button
@@ -159,7 +165,7 @@ const CreateProductForm = () => {
 					className='w-full flex justify-center py-2 px-4 border border-transparent rounded-md 
 					shadow-sm text-sm font-medium text-white bg-emerald-600 hover:bg-emerald-700 
 					focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-emerald-500 disabled:opacity-50'
-					disabled={loading}
+					disabled={loading || uploadingImage}
 				>
 					{loading ? (
 						<>
@@ -2,6 +2,7 @@ import { useEffect, useState } from "react";
 import { ChevronLeft, ChevronRight, ShoppingCart } from "lucide-react";
 import { useCartStore } from "../stores/useCartStore";
 import toast from "react-hot-toast";
+import { getProductImage } from "../lib/productImage";
 
 const FeaturedProducts = ({ featuredProducts }) => {
 	const [currentIndex, setCurrentIndex] = useState(0);
@@ -57,7 +58,7 @@ const FeaturedProducts = ({ featuredProducts }) => {
 										<div className='border border-stone-200 rounded-lg bg-white overflow-hidden h-full transition-all hover:shadow-xl'>
 											<div className='overflow-hidden bg-stone-100 rounded-t-lg'>
 												<img
-													src={product.image}
+													src={getProductImage(product, "card")}
 													alt={product.name}
 													className='w-full h-48 object-cover transition-transform duration-700 ease-out hover:scale-105'
 												/>
@@ -84,6 +84,7 @@ const LabelsTab = () => {
       
       // Pass selected order IDs to print only those
       params.append("orderIds", selectedOrders.join(','));
+      params.append("format", "pdf");
       
       const url = `${baseURL}/orders/bulk-address-sheets?${params.toString()}`;
       window.open(url, '_blank');
@@ -117,6 +118,7 @@ const LabelsTab = () => {
     } else {
       params.append("status", filter.status);
     }
+    params.append("format", "pdf");
     
     const url = `${baseURL}/orders/bulk-address-sheets?${params.toString()}`;
     window.open(url, '_blank');
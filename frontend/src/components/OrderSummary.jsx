@@ -5,6 +5,8 @@ import { useAddressStore } from "../stores/useAddressStore";
 import { Link, useNavigate } from "react-router-dom";
 import { MoveRight, MapPin, Plus, ChevronDown } from "lucide-react";
 import axios from "../lib/axios";
+import { idempotentPost } from "../lib/idempotentPost";
+import { watchHoldStatus } from "../lib/holdStatus";
 import toast from "react-hot-toast";
 import { useState, useEffect } from "react";
 import PhoneAuthModal from "./PhoneAuthModal";
@@ -150,7 +152,7 @@ const OrderSummary = () => {
 
 		setIsProcessing(true);
 		try {
-			const res = await axios.post("/payments/razorpay-create-order", {
+			const res = await idempotentPost("/payments/razorpay-create-order", {
 				products: cart,
 				address: address,
 			});
@@ -186,7 +188,7 @@ const OrderSummary = () => {
 				order_id: orderId,
 				handler: async function (response) {
 					try {
-						const verifyRes = await axios.post("/payments/razorpay-verify", {
+						const verifyRes = await idempotentPost("/payments/razorpay-verify", {
 							razorpay_order_id: response.razorpay_order_id,
 							razorpay_payment_id: response.razorpay_payment_id,
 							razorpay_signature: response.razorpay_signature,
@@ -233,7 +235,7 @@ const OrderSummary = () => {
 						// Optionally cancel the hold
 						if (localOrderId) {
 							try {
-								await axios.post("/payments/cancel-hold", { localOrderId });
+								await idempotentPost("/payments/cancel-hold", { localOrderId });
 							} catch {
 								// Silent fail - hold will expire automatically
 							}
@@ -304,6 +306,17 @@ const OrderSummary = () => {
 		setIsProcessing(false);
 	};
 
+	// The server reports the hold expiring (e.g. the countdown drifted or
+	// the tab slept), so the timer isn't the only source of truth
+	const localOrderId = holdInfo?.localOrderId;
+	useEffect(() => {
+		if (!localOrderId) return;
+		return watchHoldStatus(localOrderId, ({ status }) => {
+			if (status === "expired") handleHoldExpire();
+		});
+		// eslint-disable-next-line react-hooks/exhaustive-deps
+	}, [localOrderId]);
+
 	return (
 		<motion.div
 			className='space-y-4 rounded-lg border border-stone-200 bg-white p-4 shadow-sm sm:p-6'
@@ -404,7 +404,7 @@ const OrderslistTab = () => {
                         <Search className="absolute left-3 top-1/2 transform -translate-y-1/2 w-4 h-4 text-gray-400" />
                         <input
                             type="text"
-                            placeholder="Search by phone..."
+                            placeholder="Phone number or its first digits..."
                             value={filters.phoneNumber}
                             onChange={(e) => handleFilterChange('phoneNumber', e.target.value)}
                             className="w-full pl-10 pr-3 py-2 bg-gray-700 border border-gray-600 rounded-md text-white placeholder-gray-400 focus:outline-none focus:ring-2 focus:ring-emerald-500"
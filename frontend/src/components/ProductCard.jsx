@@ -4,6 +4,7 @@ import toast from "react-hot-toast";
 import { useState } from "react";
 import BuyNowModal from "./BuyNowModal";
 import WaitlistModal from "./WaitlistModal";
+import { getProductImage } from "../lib/productImage";
 
 const ProductCard = ({ product }) => {
 	const { addToCart, cart, updateQuantity } = useCartStore();
@@ -56,7 +57,7 @@ const ProductCard = ({ product }) => {
 				<div className='relative flex h-56 sm:h-64 overflow-hidden bg-stone-100 rounded-t-xl'>
 					<img 
 						className='object-cover w-full transition-transform duration-500 ease-out group-hover:scale-[1.03]' 
-						src={product.image} 
+						src={getProductImage(product, "card")} 
 						alt={product.name} 
 					/>
 					
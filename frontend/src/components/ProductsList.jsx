@@ -3,11 +3,13 @@ import { Trash, Edit } from "lucide-react";
 import { useProductStore } from "../stores/useProductStore";
 import { useState } from "react";
 import toast from "react-hot-toast";
-import { validateImageFile, readFileAsBase64 } from "../lib/imageValidation";
+import { validateImageFile, uploadImageFile } from "../lib/imageValidation";
+import { getProductImage } from "../lib/productImage";
 
 const ProductsList = () => {
   const { deleteProduct, products, updateProduct } = useProductStore();
   const [editingProduct, setEditingProduct] = useState(null);
+  const [uploadingImage, setUploadingImage] = useState(false);
   const [editForm, setEditForm] = useState({
     name: "",
     description: "",
@@ -97,12 +99,15 @@ const ProductsList = () => {
     const validatedFile = validateImageFile(file, e.target);
     
     if (validatedFile) {
+      setUploadingImage(true);
       try {
-        const base64 = await readFileAsBase64(validatedFile);
-        setEditForm({ ...editForm, image: base64 });
+        const url = await uploadImageFile(validatedFile);
+        setEditForm((form) => ({ ...form, image: url }));
       } catch (error) {
-        toast.error('Failed to read image file');
+        toast.error(error.response?.data?.message || 'Failed to upload image');
         e.target.value = '';
+      } finally {
+        setUploadingImage(false);
       }
     }
   };
@@ -156,7 +161,7 @@ const ProductsList = () => {
                       <div className="flex-shrink-0 h-10 w-10">
                         <img
                           className="h-10 w-10 rounded-full object-cover"
-                          src={product.image}
+                          src={getProductImage(product, "thumb")}
                           alt={product.name}
                         />
                       </div>
@@ -218,7 +223,7 @@ const ProductsList = () => {
             aria-labelledby={`product-${product._id}-name`}
           >
             <img
-              src={product.image}
+              src={getProductImage(product, "thumb")}
               alt={product.name}
               className="h-16 w-16 rounded-md object-cover flex-shrink-0"
             />
@@ -348,9 +353,10 @@ const ProductsList = () => {
               <div className="flex gap-3 mt-6">
                 <button
                   onClick={handleEditSave}
-                  className="flex-1 bg-emerald-600 text-white px-4 py-2 rounded-md hover:bg-emerald-700 focus:outline-none focus:ring-2 focus:ring-emerald-500"
+                  disabled={uploadingImage}
+                  className="flex-1 bg-emerald-600 text-white px-4 py-2 rounded-md hover:bg-emerald-700 focus:outline-none focus:ring-2 focus:ring-emerald-500 disabled:opacity-50"
                 >
-                  Save Changes
+                  {uploadingImage ? "Uploading image..." : "Save Changes"}
                 </button>
                 <button
                   onClick={handleEditCancel}
@@ -18,6 +18,7 @@ import {
 } from "lucide-react";
 import { useProductStore } from "../stores/useProductStore";
 import axios from "../lib/axios";
+import { getProductImage } from "../lib/productImage";
 import toast from "react-hot-toast";
 
 const ORDER_SOURCES = [
@@ -72,7 +73,7 @@ const RegisterOrderForm = () => {
   const [errors, setErrors] = useState({});
 
   useEffect(() => {
-    fetchAllProducts();
+    fetchAllProducts({ fresh: true });
   }, [fetchAllProducts]);
 
   // Clear field error when user types
@@ -109,7 +110,7 @@ const RegisterOrderForm = () => {
           name: product.name,
           price: product.price,
           actualPrice: product.actualPrice,
-          image: product.image,
+          image: getProductImage(product, "thumb"),
           quantity: 1,
           maxStock: product.stockQuantity,
         },
@@ -238,7 +239,7 @@ const RegisterOrderForm = () => {
         setSelectedProducts([]);
         
         // Refresh products to update stock
-        fetchAllProducts();
+        fetchAllProducts({ fresh: true });
       }
     } catch (error) {
       console.error("Error creating manual order:", error);
@@ -499,7 +500,7 @@ const RegisterOrderForm = () => {
                       className="w-full flex items-center gap-3 p-3 hover:bg-gray-600 transition-colors text-left"
                     >
                       <img 
-                        src={product.image} 
+                        src={getProductImage(product, "thumb")} 
                         alt={product.name}
                         className="w-10 h-10 rounded object-cover"
                       />
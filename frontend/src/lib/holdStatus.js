@@ -0,0 +1,57 @@
+import axios from "./axios";
+
+const LONG_POLL_SECONDS = 25;
+const LONG_POLL_RETRY_MS = 3000;
+
+const isFinal = (status) => status && status !== "hold";
+
+// Long-poll GET /payments/hold-status?wait=25 until the hold ends or stop()
+const longPoll = (localOrderId, onStatus) => {
+	let stopped = false;
+
+	const loop = async () => {
+		while (!stopped) {
+			try {
+				const { data } = await axios.get("/payments/hold-status", {
+					params: { localOrderId, wait: LONG_POLL_SECONDS },
+					timeout: (LONG_POLL_SECONDS + 10) * 1000,
+				});
+				if (stopped) return;
+				onStatus(data);
+				if (isFinal(data.status)) return;
+			} catch (error) {
+				if (error.response?.status === 404) return;
+				await new Promise((resolve) => setTimeout(resolve, LONG_POLL_RETRY_MS));
+			}
+		}
+	};
+	loop();
+
+	return () => {
+		stopped = true;
+	};
+};
+
+// Watch a hold for paid / expired / cancelled. Uses the Server-Sent Events
+// stream, or long-polling where EventSource isn't available.
+// Returns a function that stops watching.
+export const watchHoldStatus = (localOrderId, onStatus) => {
+	if (typeof EventSource === "undefined") {
+		return longPoll(localOrderId, onStatus);
+	}
+
+	const baseURL = import.meta.env.VITE_API_URL || "";
+	const url = `${baseURL}/payments/hold-status/stream?localOrderId=${encodeURIComponent(localOrderId)}`;
+	const source = new EventSource(url, { withCredentials: true });
+
+	source.addEventListener("status", (event) => {
+		const data = JSON.parse(event.data);
+		onStatus(data);
+		// The server ends the stream here; don't let EventSource reconnect
+		if (isFinal(data.status)) source.close();
+	});
+	// Reconnects are automatic; EventSource only gives up on HTTP errors
+	// (e.g. 404), and then there is nothing left to watch
+
+	return () => source.close();
+};
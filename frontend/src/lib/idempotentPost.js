@@ -0,0 +1,33 @@
+import axios from "./axios";
+
+const MAX_RETRIES = 2;
+
+const newIdempotencyKey = () =>
+	typeof crypto !== "undefined" && crypto.randomUUID
+		? crypto.randomUUID()
+		: `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+
+// Worth sending again: no response (timeout, dropped connection), the first
+// attempt still running, or a busy/unavailable server
+const isRetryable = (error) => {
+	const response = error.response;
+	if (!response) return true;
+	if (response.status === 409) return response.data?.reason === "idempotency_in_progress";
+	return [502, 503, 504].includes(response.status);
+};
+
+// POST with an Idempotency-Key, retried with the same key, so the server
+// runs it at most once (checkout, payment verification, cancel hold)
+export const idempotentPost = async (url, data) => {
+	const headers = { "Idempotency-Key": newIdempotencyKey() };
+
+	for (let attempt = 0; ; attempt++) {
+		try {
+			return await axios.post(url, data, { headers });
+		} catch (error) {
+			if (attempt >= MAX_RETRIES || !isRetryable(error)) throw error;
+			const retryAfter = Number(error.response?.headers?.["retry-after"]) || 0;
+			await new Promise((resolve) => setTimeout(resolve, Math.max(retryAfter * 1000, 500 * 2 ** attempt)));
+		}
+	}
+};
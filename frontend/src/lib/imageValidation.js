@@ -1,4 +1,5 @@
 import toast from "react-hot-toast";
+import axios from "./axios";
 
 export const validateImageFile = (file, inputElement) => {
 	if (!file) return null;
@@ -22,11 +23,12 @@ export const validateImageFile = (file, inputElement) => {
 	return file;
 };
 
-export const readFileAsBase64 = (file) => {
-	return new Promise((resolve, reject) => {
-		const reader = new FileReader();
-		reader.onloadend = () => resolve(reader.result);
-		reader.onerror = reject;
-		reader.readAsDataURL(file);
+// Streams the file to the server as multipart form data; resolves to the stored image URL
+export const uploadImageFile = async (file) => {
+	const formData = new FormData();
+	formData.append("image", file);
+	const res = await axios.post("/products/images", formData, {
+		headers: { "Content-Type": "multipart/form-data" },
 	});
+	return res.data.url;
 };
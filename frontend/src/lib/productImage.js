@@ -0,0 +1,6 @@
+// Picks a resized derivative of a product image, falling back to the original
+// size: "thumb" (~200px), "card" (~480px) or "large" (~1200px)
+export const getProductImage = (product, size = "card") => {
+	if (!product) return "";
+	return product.imageVariants?.[size] || product.image;
+};
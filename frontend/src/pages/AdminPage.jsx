@@ -91,7 +91,7 @@ const AdminPage = () => {
   const { fetchAllProducts } = useProductStore();
 
   useEffect(() => {
-    fetchAllProducts();
+    fetchAllProducts({ fresh: true });
   }, [fetchAllProducts]);
 
   return (
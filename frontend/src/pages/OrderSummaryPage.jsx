@@ -5,6 +5,8 @@ import { ShoppingBag, MapPin, Plus, ChevronDown } from "lucide-react";
 import { useUserStore } from "../stores/useUserStore";
 import { useAddressStore } from "../stores/useAddressStore";
 import axios from "../lib/axios";
+import { idempotentPost } from "../lib/idempotentPost";
+import { watchHoldStatus } from "../lib/holdStatus";
 import toast from "react-hot-toast";
 import AddressModal from "../components/AddressModal";
 import InsufficientStockModal from "../components/InsufficientStockModal";
@@ -145,7 +147,7 @@ const OrderSummaryPage = () => {
 				price: orderData.product.price
 			}];
 
-			const res = await axios.post("/payments/razorpay-create-order", {
+			const res = await idempotentPost("/payments/razorpay-create-order", {
 				products: orderProducts.map(item => ({
 					...item,
 					_id: item.product,
@@ -186,7 +188,7 @@ const OrderSummaryPage = () => {
 				order_id: orderId,
 				handler: async function (response) {
 					try {
-						const verifyRes = await axios.post("/payments/razorpay-verify", {
+						const verifyRes = await idempotentPost("/payments/razorpay-verify", {
 							razorpay_order_id: response.razorpay_order_id,
 							razorpay_payment_id: response.razorpay_payment_id,
 							razorpay_signature: response.razorpay_signature,
@@ -234,7 +236,7 @@ const OrderSummaryPage = () => {
 						// Optionally cancel the hold
 						if (localOrderId) {
 							try {
-								await axios.post("/payments/cancel-hold", { localOrderId });
+								await idempotentPost("/payments/cancel-hold", { localOrderId });
 							} catch {
 								// Silent fail - hold will expire automatically
 							}
@@ -299,6 +301,17 @@ const OrderSummaryPage = () => {
 		setIsProcessing(false);
 	};
 
+	// The server reports the hold expiring (e.g. the countdown drifted or
+	// the tab slept), so the timer isn't the only source of truth
+	const localOrderId = holdInfo?.localOrderId;
+	useEffect(() => {
+		if (!localOrderId) return;
+		return watchHoldStatus(localOrderId, ({ status }) => {
+			if (status === "expired") handleHoldExpire();
+		});
+		// eslint-disable-next-line react-hooks/exhaustive-deps
+	}, [localOrderId]);
+
 	if (!orderData) {
 		return (
 			<div className='min-h-screen bg-stone-50 flex items-center justify-center'>
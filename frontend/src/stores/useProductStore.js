@@ -20,10 +20,11 @@ export const useProductStore = create((set) => ({
 			set({ loading: false });
 		}
 	},
-	fetchAllProducts: async () => {
+	// The product list is browser-cached briefly; admin views pass fresh to skip that
+	fetchAllProducts: async ({ fresh = false } = {}) => {
 		set({ loading: true });
 		try {
-			const response = await axios.get("/products");
+			const response = await axios.get("/products", fresh ? { params: { t: Date.now() } } : undefined);
 			set({ products: response.data.products, loading: false });
 		} catch (error) {
 			set({ error: "Failed to fetch products", loading: false });
@@ -2,20 +2,36 @@
 API Client Module
 
 Provides a reusable HTTP client for making API requests with authentication support.
+
+APIClient uses requests (one session per client). AsyncAPIClient has the same
+methods as coroutines on aiohttp, for asyncio tests that simulate many
+shoppers in one event loop.
+
+Both clients can record their requests for replay: pass a TrafficRecorder,
+or set TEST_TRAFFIC_CAPTURE to record every client (see traffic.py).
 """
 
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+import aiohttp
 import requests
+from multidict import CIMultiDictProxy
 from typing import Optional, Dict, Any
-from config import API_BASE_URL, REQUEST_TIMEOUT
+from config import API_BASE_URL, REQUEST_TIMEOUT, ASYNC_CONNECTION_LIMIT, TRAFFIC_CAPTURE_FILE
+from traffic import TrafficRecorder, shared_recorder
 
 
 class APIClient:
     """HTTP client for making API requests to the e-commerce backend."""
     
-    def __init__(self, base_url: str = API_BASE_URL):
+    def __init__(self, base_url: str = API_BASE_URL, recorder: Optional[TrafficRecorder] = None):
         self.base_url = base_url.rstrip('/')
         self.session = requests.Session()
         self.user: Optional[Dict] = None
+        self.recorder = recorder or shared_recorder(TRAFFIC_CAPTURE_FILE)
         
     def _get_headers(self, custom_headers: Optional[Dict] = None) -> Dict:
         """Build request headers."""
@@ -41,6 +57,7 @@ class APIClient:
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
         request_headers = self._get_headers(headers)
         
+        started = time.time()
         response = self.session.request(
             method=method,
             url=url,
@@ -49,6 +66,11 @@ class APIClient:
             headers=request_headers,
             timeout=timeout
         )
+        if self.recorder:
+            self.recorder.record(
+                self, method, endpoint, params, data,
+                started, response.status_code, response.elapsed.total_seconds() * 1000
+            )
         return response
     
     def get(self, endpoint: str, params: Optional[Dict] = None, **kwargs) -> requests.Response:
@@ -115,6 +137,29 @@ class APIClient:
         """Get the current user's profile."""
         return self.get('/auth/profile')
 
+    # ============ OTP Methods ============
+    
+    def send_otp(self, phone_number: str, is_signup: bool = False) -> requests.Response:
+        """Send an OTP for signup or login."""
+        return self.post('/otp/send', {
+            'phoneNumber': phone_number,
+            'isSignup': is_signup
+        })
+    
+    def resend_otp(self, phone_number: str) -> requests.Response:
+        """Resend the OTP (subject to cooldown and resend limits)."""
+        return self.post('/otp/resend', {'phoneNumber': phone_number})
+    
+    def verify_otp(self, phone_number: str, otp: str, name: Optional[str] = None) -> requests.Response:
+        """Verify an OTP; logs in (or signs up with name) on success."""
+        payload = {'phoneNumber': phone_number, 'otp': otp}
+        if name:
+            payload['name'] = name
+        response = self.post('/otp/verify', payload)
+        if response.status_code == 200:
+            self.user = response.json().get('user')
+        return response
+
     # ============ Product Methods ============
     
     def get_products(self) -> requests.Response:
@@ -222,3 +267,329 @@ class APIClient:
     def update_order_tracking(self, order_id: str, tracking_data: Dict) -> requests.Response:
         """Update order tracking (admin only)."""
         return self.patch(f'/orders/{order_id}/tracking', tracking_data)
+
+
+class AsyncResponse:
+    """
+    Response of AsyncAPIClient, read in full.
+
+    Has the attributes tests use on requests.Response (status_code, headers,
+    text, json(), ok, elapsed), so test code reads the same for both clients.
+    headers is aiohttp's case-insensitive multidict: headers['content-type']
+    works as with requests, and headers.getall('Set-Cookie') returns every
+    cookie header.
+    """
+    
+    def __init__(self, status_code: int, headers: CIMultiDictProxy, text: str, elapsed: timedelta):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+        self.elapsed = elapsed
+    
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+    
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class AsyncAPIClient:
+    """
+    asyncio HTTP client with the same methods as APIClient, as coroutines.
+
+    All clients share one connection pool (ASYNC_CONNECTION_LIMIT connections
+    per event loop); each client has its own cookie jar, so each one is a
+    separate shopper session. Close clients with `await client.close()` (or
+    `async with AsyncAPIClient() as client`), and the pool with
+    `await AsyncAPIClient.close_connector()` when the loop is done.
+    """
+    
+    _connector: Optional[aiohttp.TCPConnector] = None
+    _connector_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def __init__(self, base_url: str = API_BASE_URL, recorder: Optional[TrafficRecorder] = None):
+        self.base_url = base_url.rstrip('/')
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.user: Optional[Dict] = None
+        self.recorder = recorder or shared_recorder(TRAFFIC_CAPTURE_FILE)
+    
+    async def __aenter__(self) -> "AsyncAPIClient":
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+    
+    @classmethod
+    def _get_connector(cls) -> aiohttp.TCPConnector:
+        """Shared connection pool of the running event loop."""
+        loop = asyncio.get_running_loop()
+        if cls._connector is None or cls._connector.closed or cls._connector_loop is not loop:
+            cls._connector = aiohttp.TCPConnector(limit=ASYNC_CONNECTION_LIMIT)
+            cls._connector_loop = loop
+        return cls._connector
+    
+    @classmethod
+    async def close_connector(cls):
+        """Close the shared connection pool."""
+        if cls._connector is not None and not cls._connector.closed:
+            await cls._connector.close()
+        cls._connector = None
+        cls._connector_loop = None
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=self._get_connector(),
+                connector_owner=False,
+                # unsafe: keep cookies for IP hosts (127.0.0.1) too
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+            )
+        return self.session
+    
+    async def close(self):
+        """Close this client's session (the shared pool stays open)."""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+    
+    def _get_headers(self, custom_headers: Optional[Dict] = None) -> Dict:
+        """Build request headers."""
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+        }
+        # Authentication is handled via cookies in the session's cookie jar
+        if custom_headers:
+            headers.update(custom_headers)
+        return headers
+    
+    async def _make_request(
+        self, 
+        method: str, 
+        endpoint: str, 
+        data: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+        headers: Optional[Dict] = None,
+        timeout: int = REQUEST_TIMEOUT
+    ) -> AsyncResponse:
+        """Make an HTTP request to the API and read the whole response."""
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        request_headers = self._get_headers(headers)
+        # requests drops None params; aiohttp rejects them
+        if params:
+            params = {key: value for key, value in params.items() if value is not None}
+        
+        sent_at = time.time()
+        started = time.perf_counter()
+        async with self._get_session().request(
+            method,
+            url,
+            json=data,
+            params=params,
+            headers=request_headers,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            text = await response.text()
+            result = AsyncResponse(
+                response.status,
+                response.headers,
+                text,
+                timedelta(seconds=time.perf_counter() - started)
+            )
+        if self.recorder:
+            self.recorder.record(
+                self, method, endpoint, params, data,
+                sent_at, result.status_code, result.elapsed.total_seconds() * 1000
+            )
+        return result
+    
+    async def get(self, endpoint: str, params: Optional[Dict] = None, **kwargs) -> AsyncResponse:
+        """Make a GET request."""
+        return await self._make_request('GET', endpoint, params=params, **kwargs)
+    
+    async def post(self, endpoint: str, data: Optional[Dict] = None, **kwargs) -> AsyncResponse:
+        """Make a POST request."""
+        return await self._make_request('POST', endpoint, data=data, **kwargs)
+    
+    async def put(self, endpoint: str, data: Optional[Dict] = None, **kwargs) -> AsyncResponse:
+        """Make a PUT request."""
+        return await self._make_request('PUT', endpoint, data=data, **kwargs)
+    
+    async def patch(self, endpoint: str, data: Optional[Dict] = None, **kwargs) -> AsyncResponse:
+        """Make a PATCH request."""
+        return await self._make_request('PATCH', endpoint, data=data, **kwargs)
+    
+    async def delete(self, endpoint: str, data: Optional[Dict] = None, **kwargs) -> AsyncResponse:
+        """Make a DELETE request."""
+        return await self._make_request('DELETE', endpoint, data=data, **kwargs)
+
+    # ============ Authentication Methods ============
+    
+    async def signup(self, name: str, email: str, password: str) -> AsyncResponse:
+        """Register a new user."""
+        response = await self.post('/auth/signup', {
+            'name': name,
+            'email': email,
+            'password': password
+        })
+        if response.status_code == 201:
+            self.user = response.json()
+        return response
+    
+    async def login(self, email: str, password: str) -> AsyncResponse:
+        """Login with email and password."""
+        response = await self.post('/auth/login', {
+            'email': email,
+            'password': password
+        })
+        if response.status_code == 200:
+            self.user = response.json()
+        return response
+    
+    async def logout(self) -> AsyncResponse:
+        """Logout the current user."""
+        response = await self.post('/auth/logout')
+        self.user = None
+        return response
+    
+    async def create_guest_user(self, name: str, phone_number: str) -> AsyncResponse:
+        """Create a guest user account."""
+        return await self.post('/auth/guest', {
+            'name': name,
+            'phoneNumber': phone_number
+        })
+    
+    async def get_profile(self) -> AsyncResponse:
+        """Get the current user's profile."""
+        return await self.get('/auth/profile')
+
+    # ============ OTP Methods ============
+    
+    async def send_otp(self, phone_number: str, is_signup: bool = False) -> AsyncResponse:
+        """Send an OTP for signup or login."""
+        return await self.post('/otp/send', {
+            'phoneNumber': phone_number,
+            'isSignup': is_signup
+        })
+    
+    async def resend_otp(self, phone_number: str) -> AsyncResponse:
+        """Resend the OTP (subject to cooldown and resend limits)."""
+        return await self.post('/otp/resend', {'phoneNumber': phone_number})
+    
+    async def verify_otp(self, phone_number: str, otp: str, name: Optional[str] = None) -> AsyncResponse:
+        """Verify an OTP; logs in (or signs up with name) on success."""
+        payload = {'phoneNumber': phone_number, 'otp': otp}
+        if name:
+            payload['name'] = name
+        response = await self.post('/otp/verify', payload)
+        if response.status_code == 200:
+            self.user = response.json().get('user')
+        return response
+
+    # ============ Product Methods ============
+    
+    async def get_products(self) -> AsyncResponse:
+        """Get all products."""
+        return await self.get('/products')
+    
+    async def get_featured_products(self) -> AsyncResponse:
+        """Get featured products."""
+        return await self.get('/products/featured')
+    
+    async def get_products_by_category(self, category: str) -> AsyncResponse:
+        """Get products by category."""
+        return await self.get(f'/products/category/{category}')
+    
+    async def get_recommendations(self) -> AsyncResponse:
+        """Get product recommendations."""
+        return await self.get('/products/recommendations')
+    
+    async def create_product(self, product_data: Dict) -> AsyncResponse:
+        """Create a new product (admin only)."""
+        return await self.post('/products', product_data)
+    
+    async def update_product_stock(self, product_id: str, stock_quantity: int) -> AsyncResponse:
+        """Update product stock (admin only)."""
+        return await self.patch(f'/products/{product_id}/stock', {
+            'stockQuantity': stock_quantity
+        })
+    
+    async def delete_product(self, product_id: str) -> AsyncResponse:
+        """Delete a product (admin only)."""
+        return await self.delete(f'/products/{product_id}')
+
+    # ============ Cart Methods ============
+    
+    async def get_cart(self) -> AsyncResponse:
+        """Get cart items."""
+        return await self.get('/cart')
+    
+    async def add_to_cart(self, product_id: str) -> AsyncResponse:
+        """Add a product to cart."""
+        return await self.post('/cart', {'productId': product_id})
+    
+    async def update_cart_quantity(self, product_id: str, quantity: int) -> AsyncResponse:
+        """Update cart item quantity."""
+        return await self.put(f'/cart/{product_id}', {'quantity': quantity})
+    
+    async def remove_from_cart(self, product_id: str) -> AsyncResponse:
+        """Remove item from cart."""
+        return await self.delete('/cart', {'productId': product_id})
+    
+    async def clear_cart(self) -> AsyncResponse:
+        """Clear the entire cart."""
+        return await self.delete('/cart')
+    
+    async def sync_cart(self, guest_cart: list) -> AsyncResponse:
+        """Sync guest cart after login."""
+        return await self.post('/cart/sync', {'guestCart': guest_cart})
+
+    # ============ Payment/Checkout Methods ============
+    
+    async def create_razorpay_order(self, products: list, address: Dict) -> AsyncResponse:
+        """Create a Razorpay order with stock hold."""
+        return await self.post('/payments/razorpay-create-order', {
+            'products': products,
+            'address': address
+        })
+    
+    async def verify_razorpay_payment(
+        self, 
+        razorpay_order_id: str, 
+        razorpay_payment_id: str, 
+        razorpay_signature: str,
+        local_order_id: str
+    ) -> AsyncResponse:
+        """Verify Razorpay payment."""
+        return await self.post('/payments/razorpay-verify', {
+            'razorpay_order_id': razorpay_order_id,
+            'razorpay_payment_id': razorpay_payment_id,
+            'razorpay_signature': razorpay_signature,
+            'localOrderId': local_order_id
+        })
+    
+    async def get_hold_status(self, local_order_id: str) -> AsyncResponse:
+        """Get the status of a hold order."""
+        return await self.get('/payments/hold-status', params={'localOrderId': local_order_id})
+    
+    async def cancel_hold(self, local_order_id: str) -> AsyncResponse:
+        """Cancel a hold order."""
+        return await self.post('/payments/cancel-hold', {'localOrderId': local_order_id})
+
+    # ============ Order Methods ============
+    
+    async def get_orders(self) -> AsyncResponse:
+        """Get all orders (admin only)."""
+        return await self.get('/orders')
+    
+    async def get_my_orders(self) -> AsyncResponse:
+        """Get current user's orders."""
+        return await self.get('/orders/my-orders')
+    
+    async def get_order_tracking(self, order_id: str) -> AsyncResponse:
+        """Get order tracking info."""
+        return await self.get(f'/orders/{order_id}/tracking')
+    
+    async def update_order_tracking(self, order_id: str, tracking_data: Dict) -> AsyncResponse:
+        """Update order tracking (admin only)."""
+        return await self.patch(f'/orders/{order_id}/tracking', tracking_data)
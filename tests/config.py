@@ -36,6 +36,15 @@ HOLD_DURATION_SECONDS = 15 * 60  # 15 minutes (matches backend)
 MAX_CONCURRENT_USERS = 10
 CONCURRENT_TEST_ITERATIONS = 5
 
+# Async concurrency tests (AsyncAPIClient): simulated shoppers in one event
+# loop, sharing a pool of this many connections
+ASYNC_CONCURRENT_SHOPPERS = int(os.getenv("TEST_ASYNC_SHOPPERS", "1000"))
+ASYNC_CONNECTION_LIMIT = int(os.getenv("TEST_ASYNC_CONNECTIONS", "200"))
+
+# Traffic capture: when set, every API client appends its requests to this
+# JSONL file (see traffic.py and replay_traffic.py)
+TRAFFIC_CAPTURE_FILE = os.getenv("TEST_TRAFFIC_CAPTURE", "")
+
 # Test data settings
 TEST_PRODUCT_STOCK = 10
 TEST_PRODUCT_PRICE = 100.00
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Traffic Replay
+
+Replays a traffic capture (see traffic.py) against the backend with the
+original timing, and compares latency distributions between runs.
+
+Usage:
+    python replay_traffic.py import-log access.log -o capture.jsonl      # capture from an access log
+    python replay_traffic.py replay capture.jsonl -o run.jsonl           # replay at 1x
+    python replay_traffic.py replay capture.jsonl -o run.jsonl --speed 4 # 4x faster
+    python replay_traffic.py compare capture.jsonl run.jsonl             # latency per route
+
+To capture test traffic instead, run tests with TEST_TRAFFIC_CAPTURE=capture.jsonl.
+
+Each session of the capture replays on its own AsyncAPIClient (own cookies).
+A request is sent at its original offset from the start of the capture,
+divided by --speed, but not before the session's previous response, as a
+real client would. How late requests went out is reported as lag; a high lag
+means the server (or this machine) could not keep up with the capture.
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+import aiohttp
+
+# Add tests directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from api_client import AsyncAPIClient
+from config import API_BASE_URL
+from traffic import compare, import_access_log, percentile, read_records, summarize, write_records
+
+
+# Head start so every session is scheduled before the first request is due
+START_DELAY_SECONDS = 0.5
+
+
+async def replay_session(
+    client: AsyncAPIClient,
+    records: List[Dict],
+    start: float,
+    t0: float,
+    speed: float,
+    results: List[Dict]
+):
+    """Send one session's requests in order, each at its scaled offset."""
+    loop = asyncio.get_running_loop()
+    for record in records:
+        due = start + (record['ts'] - t0) / speed
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        lag_ms = max(0.0, loop.time() - due) * 1000
+
+        sent_at = time.time()
+        try:
+            response = await client._make_request(record['method'], record['route'], data=record.get('body'))
+            status = response.status_code
+            latency_ms = response.elapsed.total_seconds() * 1000
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            status = 0
+            latency_ms = (time.time() - sent_at) * 1000
+
+        results.append({
+            'ts': round(sent_at, 3),
+            'session': record['session'],
+            'method': record['method'],
+            'route': record['route'],
+            'body': record.get('body'),
+            'status': status,
+            'latency_ms': round(latency_ms, 1),
+            'lag_ms': round(lag_ms, 1),
+            'original_status': record.get('status'),
+        })
+
+
+async def replay(records: List[Dict], base_url: str = API_BASE_URL, speed: float = 1.0) -> List[Dict]:
+    """Replay records (in time order); returns one result record per request."""
+    if not records:
+        return []
+
+    sessions: Dict[str, List[Dict]] = OrderedDict()
+    for record in records:
+        sessions.setdefault(record['session'], []).append(record)
+
+    results: List[Dict] = []
+    clients = [AsyncAPIClient(base_url) for _ in sessions]
+    for client in clients:
+        # Replays are results, not captures
+        client.recorder = None
+
+    start = asyncio.get_running_loop().time() + START_DELAY_SECONDS
+    t0 = records[0]['ts']
+    try:
+        await asyncio.gather(*(
+            replay_session(client, session_records, start, t0, speed, results)
+            for client, session_records in zip(clients, sessions.values())
+        ))
+    finally:
+        await asyncio.gather(*(client.close() for client in clients))
+        await AsyncAPIClient.close_connector()
+
+    return sorted(results, key=lambda r: r['ts'])
+
+
+def format_change(change) -> str:
+    return '-' if change is None else f"{change:+.0%}"
+
+
+def print_comparison(rows: List[Dict], min_count: int):
+    """Print p50/p99 of both runs per route."""
+    print(f"{'Route':<48} {'Count':>11} {'p50 ms':>17} {'p99 ms':>17} {'Δp50':>6} {'Δp99':>6}")
+    print("-" * 110)
+    for row in rows:
+        baseline = row['baseline'] or {'count': 0, 'p50': 0, 'p99': 0}
+        candidate = row['candidate'] or {'count': 0, 'p50': 0, 'p99': 0}
+        if row['key'] != '*' and max(baseline['count'], candidate['count']) < min_count:
+            continue
+        print(
+            f"{('ALL' if row['key'] == '*' else row['key'])[:48]:<48} "
+            f"{baseline['count']:>5}/{candidate['count']:<5} "
+            f"{baseline['p50']:>8.1f}/{candidate['p50']:<8.1f} "
+            f"{baseline['p99']:>8.1f}/{candidate['p99']:<8.1f} "
+            f"{format_change(row['p50_change']):>6} {format_change(row['p99_change']):>6}"
+        )
+
+
+def cmd_import_log(args) -> int:
+    with open(args.log, encoding='utf-8', errors='replace') as f:
+        count = write_records(args.output, sorted(import_access_log(f, args.prefix), key=lambda r: r['ts']))
+    print(f"✓ Imported {count} requests into {args.output}")
+    return 0 if count else 1
+
+
+def cmd_replay(args) -> int:
+    if args.speed <= 0:
+        print("❌ --speed must be greater than 0")
+        return 1
+
+    records = read_records(args.capture)
+    if not records:
+        print(f"❌ No requests in {args.capture}")
+        return 1
+    span = records[-1]['ts'] - records[0]['ts']
+    sessions = len({r['session'] for r in records})
+    print(f"Replaying {len(records)} requests from {sessions} sessions against {args.base_url}")
+    print(f"Capture spans {span:.1f}s; at {args.speed:g}x this takes about {span / args.speed:.1f}s")
+
+    started = time.time()
+    results = asyncio.run(replay(records, args.base_url, args.speed))
+    write_records(args.output, results)
+
+    lags = sorted(r['lag_ms'] for r in results)
+    changed = sum(1 for r in results if r['original_status'] is not None and r['status'] != r['original_status'])
+    overall = summarize(results)['*']
+    print(f"\n✓ Replayed in {time.time() - started:.1f}s, results in {args.output}")
+    print(f"  Latency: p50 {overall['p50']:.1f} ms, p99 {overall['p99']:.1f} ms, errors {overall['errors']}")
+    print(f"  Send lag: p50 {percentile(lags, 50):.1f} ms, p99 {percentile(lags, 99):.1f} ms")
+    print(f"  Status different from the capture: {changed}")
+    return 0
+
+
+def cmd_compare(args) -> int:
+    rows = compare(read_records(args.baseline), read_records(args.candidate))
+    print(f"Baseline:  {args.baseline}")
+    print(f"Candidate: {args.candidate}\n")
+    print_comparison(rows, args.min_count)
+
+    overall = rows[0]['p99_change'] if rows and rows[0]['key'] == '*' else None
+    if args.max_p99_increase is not None and overall is not None and overall > args.max_p99_increase:
+        print(f"\n❌ Overall p99 up {overall:.0%} (limit {args.max_p99_increase:.0%})")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Capture, replay and compare API traffic')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_log = commands.add_parser('import-log', help='Convert an access log (combined format) into a capture')
+    import_log.add_argument('log', help='Access log file')
+    import_log.add_argument('-o', '--output', required=True, help='Capture file to write')
+    import_log.add_argument('--prefix', default='/api', help='API path prefix to keep and strip (default: /api)')
+    import_log.set_defaults(run=cmd_import_log)
+
+    replay_cmd = commands.add_parser('replay', help='Replay a capture against the backend')
+    replay_cmd.add_argument('capture', help='Capture file')
+    replay_cmd.add_argument('-o', '--output', required=True, help='Results file to write')
+    replay_cmd.add_argument('--speed', type=float, default=1.0, help='Speed factor (2 = twice as fast)')
+    replay_cmd.add_argument('--base-url', default=API_BASE_URL, help=f'API base URL (default: {API_BASE_URL})')
+    replay_cmd.set_defaults(run=cmd_replay)
+
+    compare_cmd = commands.add_parser('compare', help='Compare the latency distributions of two runs')
+    compare_cmd.add_argument('baseline', help='Capture or results file')
+    compare_cmd.add_argument('candidate', help='Capture or results file')
+    compare_cmd.add_argument('--min-count', type=int, default=1, help='Hide routes with fewer requests')
+    compare_cmd.add_argument('--max-p99-increase', type=float, default=None,
+                             help='Exit with 1 if the overall p99 grew by more than this fraction (0.2 = 20%%)')
+    compare_cmd.set_defaults(run=cmd_compare)
+
+    args = parser.parse_args()
+    sys.exit(args.run(args))
+
+
+if __name__ == '__main__':
+    main()
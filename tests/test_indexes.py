@@ -0,0 +1,188 @@
+"""
+Index Coverage Tests
+
+Runs explain() on every hot query shape directly against MongoDB and checks
+that the winning plan uses an index scan, not a collection scan. Point
+lookups must also examine only the index keys they return.
+
+The shapes mirror the queries in the backend (see docs/DATABASE_INDEXES.md).
+When a test fails, either the index is missing from the database
+(`npm run indexes:check`) or a query changed shape and needs a new index.
+
+Requires MongoDB at MONGO_URI (the database the server uses); the server
+itself does not need to run, but must have started once so indexes exist.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import ConfigurationError, PyMongoError
+
+from config import MONGODB_URI
+
+
+NOW = datetime.now(timezone.utc)
+SOME_USER = ObjectId()
+OTHER_USER = ObjectId()
+
+# (id, collection, filter, sort, expected index names)
+HOT_QUERIES = [
+    ("my_orders", "orders",
+     {"user": SOME_USER}, [("createdAt", -1)],
+     {"user_1_createdAt_-1"}),
+    ("admin_orders_by_phone", "orders",
+     {"user": {"$in": [SOME_USER, OTHER_USER]}}, [("createdAt", 1)],
+     {"user_1_createdAt_-1"}),
+    ("admin_orders_all", "orders",
+     {}, [("createdAt", 1)],
+     {"createdAt_1"}),
+    ("admin_orders_by_status", "orders",
+     {"trackingStatus": "processing"}, [("createdAt", 1)],
+     {"trackingStatus_1_createdAt_1", "trackingStatus_1_labelPrintedAt_1_createdAt_1"}),
+    ("label_queue_unprinted", "orders",
+     {"trackingStatus": "processing", "labelPrintedAt": None}, [("createdAt", 1)],
+     {"trackingStatus_1_labelPrintedAt_1_createdAt_1"}),
+    ("label_queue_printed", "orders",
+     {"trackingStatus": "processing", "labelPrintedAt": {"$ne": None}}, [("createdAt", 1)],
+     {"trackingStatus_1_labelPrintedAt_1_createdAt_1"}),
+    ("hold_expiry_sweep", "orders",
+     {"status": "hold", "expiresAt": {"$lte": NOW}}, None,
+     {"status_1_expiresAt_1"}),
+    ("active_holds", "orders",
+     {"status": "hold", "expiresAt": {"$gt": NOW}}, None,
+     {"status_1_expiresAt_1"}),
+    ("paid_orders_in_month", "orders",
+     {"status": "paid", "createdAt": {"$gte": NOW - timedelta(days=30), "$lt": NOW}}, None,
+     {"status_1_createdAt_1"}),
+    ("sold_orders", "orders",
+     {"$or": [{"status": "paid"}, {"status": "pending", "isManualOrder": True}]}, None,
+     {"status_1_createdAt_1", "status_1_expiresAt_1"}),
+    ("order_by_public_id", "orders",
+     {"publicOrderId": "ORD-TEST"}, None,
+     {"publicOrderId_1"}),
+    ("order_by_razorpay_id", "orders",
+     {"razorpayOrderId": "order_test"}, None,
+     {"razorpayOrderId_1"}),
+    ("products_by_category", "products",
+     {"category": "vegetables"}, None,
+     {"category_1"}),
+    ("user_by_phone", "users",
+     {"phoneNumber": "9876543210"}, None,
+     {"phoneNumber_1"}),
+    ("user_phone_search", "users",
+     {"phoneNumber": {"$regex": "^98765"}}, None,
+     {"phoneNumber_1"}),
+    ("user_by_email", "users",
+     {"email": "user@test.com"}, None,
+     {"email_1"}),
+    ("hold_reservations", "stockreservations",
+     {"order": ObjectId()}, None,
+     {"order_1_product_1"}),
+    ("active_reservations_by_product", "stockreservations",
+     {"state": "active", "product": {"$in": [ObjectId(), ObjectId()]}}, None,
+     {"state_1_product_1"}),
+    ("stale_active_reservations", "stockreservations",
+     {"state": "active", "expiresAt": {"$lte": NOW}}, None,
+     {"state_1_expiresAt_1"}),
+]
+
+# Lookups whose index bounds cover only the matching keys: an IXSCAN alone
+# does not prove that, since a full index scan is an IXSCAN too
+BOUNDED_LOOKUPS = {
+    "order_by_public_id", "order_by_razorpay_id", "user_by_phone",
+    "user_phone_search", "user_by_email",
+}
+
+
+@pytest.fixture(scope="module")
+def db():
+    """Database the backend uses; skips the module when MongoDB is unreachable."""
+    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=3000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        pytest.skip(f"MongoDB not reachable at {MONGODB_URI}: {e}")
+
+    try:
+        database = client.get_default_database()
+    except ConfigurationError:
+        # No database in the URI: mongoose uses "test"
+        database = client["test"]
+
+    yield database
+    client.close()
+
+
+def plan_stages(plan):
+    """Flatten a winning plan into [(stage, indexName), ...]."""
+    if not plan:
+        return []
+    # Slot-based engine plans nest the classic plan under queryPlan
+    plan = plan.get("queryPlan", plan)
+    stages = [(plan.get("stage"), plan.get("indexName"))]
+    children = [plan["inputStage"]] if "inputStage" in plan else plan.get("inputStages", [])
+    for child in children:
+        stages.extend(plan_stages(child))
+    return stages
+
+
+class TestHotQueryIndexes:
+    """Every hot query shape must be served by an index."""
+
+    @pytest.mark.parametrize(
+        "collection,query,sort,expected_indexes",
+        [case[1:] for case in HOT_QUERIES],
+        ids=[case[0] for case in HOT_QUERIES],
+    )
+    def test_query_uses_index(self, db, collection, query, sort, expected_indexes):
+        """Test the winning plan is an index scan on one of the expected indexes."""
+        if collection not in db.list_collection_names():
+            pytest.skip(f"Collection '{collection}' does not exist yet; start the server once")
+
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = cursor.limit(20).explain()
+
+        stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+        stage_names = [stage for stage, _ in stages]
+        used_indexes = {index for stage, index in stages if stage and "IXSCAN" in stage}
+
+        assert "COLLSCAN" not in stage_names, \
+            f"{collection} {query} does a collection scan: {stage_names}"
+        assert used_indexes & expected_indexes, \
+            f"{collection} {query} uses {used_indexes or 'no index'}, expected one of {expected_indexes}"
+
+    @pytest.mark.parametrize(
+        "collection,query",
+        [case[1:3] for case in HOT_QUERIES if case[0] in BOUNDED_LOOKUPS],
+        ids=[case[0] for case in HOT_QUERIES if case[0] in BOUNDED_LOOKUPS],
+    )
+    def test_lookup_examines_only_matches(self, db, collection, query):
+        """Test a lookup reads the matching index keys, not the whole index."""
+        if collection not in db.list_collection_names():
+            pytest.skip(f"Collection '{collection}' does not exist yet; start the server once")
+
+        explain = db.command("explain", {"find": collection, "filter": query}, verbosity="executionStats")
+        stats = explain["executionStats"]
+
+        # One extra key: the scan stops at the first key past the bounds
+        assert stats["totalKeysExamined"] <= stats["nReturned"] + 1, \
+            f"{collection} {query} examined {stats['totalKeysExamined']} keys for {stats['nReturned']} documents"
+
+    def test_hot_query_indexes_exist(self, db):
+        """Test every index the hot queries rely on exists."""
+        expected = {}
+        for _, collection, _, _, indexes in HOT_QUERIES:
+            expected.setdefault(collection, set()).update(indexes)
+
+        missing = []
+        for collection, indexes in expected.items():
+            if collection not in db.list_collection_names():
+                continue
+            existing = set(db[collection].index_information())
+            missing.extend(f"{collection}.{name}" for name in sorted(indexes - existing))
+
+        assert not missing, f"Missing indexes: {missing} (run `npm run indexes:check -- --create`)"
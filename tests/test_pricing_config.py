@@ -0,0 +1,106 @@
+"""
+Pricing Config Reload Tests
+
+Runs backend/lib/pricing.js under node against a temporary pricing.yaml
+(PRICING_CONFIG_PATH) and checks that a reload only swaps in complete
+configs. No server or database needed; skips when node or the backend
+dependencies (npm install in backend/) are missing.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+PRICING_MODULE = os.path.join(BACKEND_DIR, 'lib', 'pricing.js')
+
+VALID_CONFIG = """
+delivery:
+  local:
+    price: 84
+  national:
+    price: 154
+  usePincodeLogic: true
+  localPincodePrefixes:
+    - "180"
+platformFee:
+  constant: 7
+  razorpayPercentage: 2.0
+"""
+
+# Loads the config, then for each replacement file content: writes it,
+# reloads, and reports what pricing then uses
+RELOAD_SCRIPT = """
+import fs from 'fs';
+import { pathToFileURL } from 'url';
+const pricing = await import(pathToFileURL(process.env.PRICING_MODULE).href);
+const address = { pincode: '180001' };
+const snapshot = () => ({
+  deliveryType: pricing.getDeliveryType(address),
+  deliveryCharge: pricing.calculateDeliveryCharge(address),
+  platformFee: pricing.calculatePlatformFee(0).constant,
+});
+const results = [snapshot()];
+for (const contents of JSON.parse(process.env.REPLACEMENTS)) {
+  fs.writeFileSync(process.env.PRICING_CONFIG_PATH, contents);
+  pricing.reloadPricingConfig();
+  results.push(snapshot());
+}
+console.log(JSON.stringify(results));
+"""
+
+
+def run_reloads(tmp_path, replacements):
+    """Pricing snapshots: after the first load, then after each replacement."""
+    if not shutil.which('node'):
+        pytest.skip('node is not installed')
+    if not os.path.isdir(os.path.join(BACKEND_DIR, 'node_modules', 'js-yaml')):
+        pytest.skip('backend dependencies are not installed (npm install in backend/)')
+
+    config_path = tmp_path / 'pricing.yaml'
+    config_path.write_text(VALID_CONFIG)
+    result = subprocess.run(
+        ['node', '--input-type=module', '-e', RELOAD_SCRIPT],
+        cwd=BACKEND_DIR,
+        env={
+            **os.environ,
+            'PRICING_CONFIG_PATH': str(config_path),
+            'PRICING_MODULE': PRICING_MODULE,
+            'REPLACEMENTS': json.dumps(replacements),
+        },
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestPricingConfigReload:
+    """Test suite for hot-reloading pricing.yaml."""
+
+    LOADED = {'deliveryType': 'local', 'deliveryCharge': 84, 'platformFee': 7}
+
+    def test_empty_file_keeps_previous_config(self, tmp_path):
+        """Test that an empty file (truncated mid-save) leaves the old config in place."""
+        results = run_reloads(tmp_path, [''])
+
+        assert results[0] == self.LOADED
+        assert results[1] == self.LOADED
+
+    def test_incomplete_file_keeps_previous_config(self, tmp_path):
+        """Test that a half-written file is not swapped in."""
+        half_written = VALID_CONFIG[:VALID_CONFIG.index('  usePincodeLogic')]
+        results = run_reloads(tmp_path, [half_written, 'delivery: {}\n'])
+
+        assert results == [self.LOADED] * 3
+
+    def test_complete_file_is_swapped_in(self, tmp_path):
+        """Test that a complete edit is picked up."""
+        results = run_reloads(tmp_path, [VALID_CONFIG.replace('price: 84', 'price: 90')])
+
+        assert results[1] == dict(self.LOADED, deliveryCharge=90)
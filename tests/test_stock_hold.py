@@ -8,12 +8,14 @@ Comprehensive test cases for the stock hold system including:
 - Edge cases
 """
 
+import asyncio
 import pytest
 import time
 import threading
 import queue
 from typing import List, Dict, Tuple
-from api_client import APIClient
+from api_client import APIClient, AsyncAPIClient
+from config import ASYNC_CONCURRENT_SHOPPERS
 from test_data import generate_user_data, generate_address, generate_order_products
 
 
@@ -549,6 +551,95 @@ class TestConcurrentCheckout:
             f"Expected {stock} successful holds, got {len(hold_orders)}"
 
 
+@pytest.mark.concurrent
+@pytest.mark.slow
+class TestAsyncConcurrentCheckout:
+    """
+    Concurrent checkout with many shoppers in one asyncio event loop.
+
+    Threads stop at a few dozen shoppers; AsyncAPIClient runs
+    ASYNC_CONCURRENT_SHOPPERS guest shoppers, each with its own cookie jar,
+    over one shared connection pool. Checkout is rate limited per IP, so run
+    the server with RATE_LIMIT_ENABLED=false to let every shopper through.
+    """
+    
+    async def _checkout(self, product: Dict, quantity: int) -> Tuple[int, Dict]:
+        """Guest checkout of one shopper; returns (status code, body)."""
+        async with AsyncAPIClient() as client:
+            order_products = [{
+                '_id': product['_id'],
+                'id': product['_id'],
+                'name': product.get('name', 'Product'),
+                'price': product.get('price', 100),
+                'quantity': quantity,
+                'image': product.get('image', '')
+            }]
+            try:
+                response = await client.create_razorpay_order(order_products, generate_address())
+                return (response.status_code, response.json())
+            except Exception as e:
+                return (0, {'error': str(e)})
+    
+    async def _cancel_holds(self, order_ids: List[str]):
+        async with AsyncAPIClient() as client:
+            await asyncio.gather(
+                *(client.cancel_hold(order_id) for order_id in order_ids),
+                return_exceptions=True
+            )
+    
+    @pytest.mark.asyncio
+    async def test_many_shoppers_never_oversell(self):
+        """
+        Test that many simultaneous checkouts never reserve more than the stock.
+        
+        Scenario:
+        - Product has limited stock
+        - ASYNC_CONCURRENT_SHOPPERS guests check out 1 unit each, at once
+        - Successful holds must not exceed the stock
+        """
+        try:
+            async with AsyncAPIClient() as client:
+                products_response = await client.get_products()
+                assert products_response.status_code == 200
+                
+                data = products_response.json()
+                products = data if isinstance(data, list) else data.get('products', [])
+            
+            # Smallest stock that still lets several shoppers through
+            candidates = [p for p in products if p.get('stockQuantity', 0) >= 3]
+            if not candidates:
+                pytest.skip("No suitable product for concurrent test")
+            target_product = min(candidates, key=lambda p: p['stockQuantity'])
+            stock = target_product['stockQuantity']
+            
+            started = time.time()
+            results = await asyncio.gather(
+                *(self._checkout(target_product, 1) for _ in range(ASYNC_CONCURRENT_SHOPPERS))
+            )
+            duration = time.time() - started
+            
+            successful = [body for status, body in results if status == 200]
+            # 429/503: turned away by rate limiting or admission control
+            throttled = [status for status, _ in results if status in (429, 503)]
+            errors = [body for status, body in results if status == 0 or (status >= 500 and status != 503)]
+            
+            print(f"\nAsync concurrent checkout results:")
+            print(f"  Stock: {stock}")
+            print(f"  Shoppers: {ASYNC_CONCURRENT_SHOPPERS}")
+            print(f"  Successful: {len(successful)}")
+            print(f"  Throttled: {len(throttled)}")
+            print(f"  Errors: {len(errors)}")
+            print(f"  Duration: {duration:.2f}s")
+            
+            await self._cancel_holds([b['localOrderId'] for b in successful if 'localOrderId' in b])
+            
+            assert len(successful) <= stock, \
+                f"Oversold: {len(successful)} holds for stock {stock}"
+            assert not errors, f"{len(errors)} checkouts errored, e.g. {errors[0]}"
+        finally:
+            await AsyncAPIClient.close_connector()
+
+
 class TestEdgeCases:
     """Test suite for edge cases and error handling."""
     
@@ -0,0 +1,138 @@
+"""
+Traffic Capture Tests
+
+Tests for the capture format helpers in traffic.py (access log import,
+anonymization, latency summaries). These run offline; no server needed.
+"""
+
+import json
+
+from traffic import (
+    TrafficRecorder,
+    anonymize,
+    build_route,
+    compare,
+    import_access_log,
+    read_records,
+    route_key,
+    summarize,
+)
+
+
+ACCESS_LOG = [
+    '203.0.113.7 - - [19/Oct/2026:10:00:00 +0000] "GET /api/products?category=veg HTTP/1.1" 200 512 "-" "Mozilla/5.0" 0.042',
+    '203.0.113.7 - - [19/Oct/2026:10:00:02 +0000] "POST /api/payments/razorpay-create-order HTTP/1.1" 200 90 "-" "Mozilla/5.0" 0.310',
+    '198.51.100.2 - - [19/Oct/2026:10:00:01 +0000] "GET /assets/index.js HTTP/1.1" 200 9000 "-" "curl/8.0"',
+    'not an access log line',
+]
+
+
+class Client:
+    """Stands in for an API client; the recorder only needs its identity."""
+
+
+class TestAccessLogImport:
+    """Test suite for importing access logs."""
+
+    def test_keeps_api_requests_only(self):
+        """Test that only requests under the API prefix are imported, prefix stripped."""
+        records = list(import_access_log(ACCESS_LOG))
+
+        assert [r['route'] for r in records] == [
+            '/products?category=veg',
+            '/payments/razorpay-create-order',
+        ]
+        assert records[0]['method'] == 'GET'
+        assert records[1]['status'] == 200
+
+    def test_timing_and_sessions(self):
+        """Test timestamps, request times and sessions from the log."""
+        records = list(import_access_log(ACCESS_LOG))
+
+        assert records[1]['ts'] - records[0]['ts'] == 2
+        assert records[0]['latency_ms'] == 42.0
+        # Same IP and user agent: same session, and the IP is not in it
+        assert records[0]['session'] == records[1]['session']
+        assert '203.0.113.7' not in records[0]['session']
+        assert records[0]['body'] is None
+
+
+class TestAnonymization:
+    """Test suite for pseudonymizing captured bodies."""
+
+    def test_personal_fields_replaced(self):
+        """Test that personal fields are replaced at any depth, other fields kept."""
+        body = {
+            'email': 'asha@example.com',
+            'password': 'secret123',
+            'address': {'phoneNumber': '9876543210', 'city': 'Pune', 'pincode': '411001'},
+            'products': [{'_id': 'abc', 'quantity': 2}],
+        }
+        result = anonymize(body, 'salt')
+
+        assert 'asha' not in json.dumps(result)
+        assert result['password'] != 'secret123'
+        assert result['address']['phoneNumber'] != '9876543210'
+        assert len(result['address']['phoneNumber']) == 10
+        assert result['address']['city'] == 'Pune'
+        assert result['products'] == body['products']
+
+    def test_pseudonyms_stable(self):
+        """Test that a value maps to the same pseudonym, so signup then login still match."""
+        signup = anonymize({'email': 'asha@example.com', 'password': 'secret123'}, 'salt')
+        login = anonymize({'email': 'asha@example.com', 'password': 'secret123'}, 'salt')
+
+        assert signup == login
+        assert anonymize({'email': 'asha@example.com'}, 'other')['email'] != signup['email']
+
+
+class TestRecorder:
+    """Test suite for recording client requests."""
+
+    def test_records_one_line_per_request(self, tmp_path):
+        """Test that each client gets its own anonymous session."""
+        path = str(tmp_path / 'capture.jsonl')
+        recorder = TrafficRecorder(path, salt='salt')
+        first, second = Client(), Client()
+
+        recorder.record(first, 'GET', '/payments/hold-status', {'localOrderId': 'x1'}, None, 100.0, 200, 12.34)
+        recorder.record(second, 'POST', '/auth/login', None, {'email': 'a@b.co', 'password': 'p'}, 100.5, 401, 30.0)
+        recorder.record(first, 'GET', '/products', None, None, 101.0, 200, 8.0)
+        recorder.close()
+
+        records = read_records(path)
+        assert [r['route'] for r in records] == [
+            '/payments/hold-status?localOrderId=x1', '/auth/login', '/products'
+        ]
+        assert records[0]['session'] == records[2]['session'] != records[1]['session']
+        assert records[1]['body']['email'] != 'a@b.co'
+        assert records[0]['latency_ms'] == 12.3
+
+
+class TestLatencySummary:
+    """Test suite for latency distributions."""
+
+    def test_route_key_groups_ids(self):
+        """Test that IDs in paths are grouped together."""
+        assert route_key('GET', '/orders/65f0c1a2b3c4d5e6f7a8b9c0/tracking') == 'GET /orders/:id/tracking'
+        assert route_key('GET', '/products/category/veg?page=2') == 'GET /products/category/veg'
+        assert build_route('/products', {'page': 2, 'sort': None}) == '/products?page=2'
+
+    def test_summarize_and_compare(self):
+        """Test percentiles per route and the change between two runs."""
+        baseline = [
+            {'method': 'GET', 'route': '/products', 'status': 200, 'latency_ms': float(ms)}
+            for ms in range(1, 101)
+        ]
+        candidate = [dict(r, latency_ms=r['latency_ms'] * 2) for r in baseline]
+        candidate[0]['status'] = 503
+
+        summary = summarize(baseline)
+        assert summary['*']['count'] == 100
+        assert summary['GET /products']['p50'] == 50.0
+        assert summary['GET /products']['p99'] == 99.0
+
+        rows = compare(baseline, candidate)
+        assert rows[0]['key'] == '*'
+        assert rows[0]['p99_change'] == 1.0
+        assert rows[0]['candidate']['errors'] == 1
@@ -0,0 +1,279 @@
+"""
+Traffic Capture Module
+
+Capture format for replaying real traffic shapes against the backend
+(see replay_traffic.py). A capture is a JSONL file, one request per line:
+
+    {"ts": 1760863212.418, "session": "s-9f2c41d07a3e", "method": "POST",
+     "route": "/payments/razorpay-create-order", "body": {...},
+     "status": 200, "latency_ms": 143.2}
+
+- ts: when the request was sent (epoch seconds); replays keep the gaps
+- session: anonymous ID of the client session (one cookie jar on replay)
+- route: path under the API base URL, with its query string
+- body: JSON body, personal fields pseudonymized (None for access logs)
+- status, latency_ms: what the original request got, for comparison
+
+Captures come from APIClient / AsyncAPIClient (a TrafficRecorder, or
+TEST_TRAFFIC_CAPTURE=<file> for every client) or from access logs
+(import_access_log). Replay results are written in the same format.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+
+# Body fields holding personal data, replaced by stable pseudonyms
+PERSONAL_FIELDS = {
+    'name', 'email', 'password', 'phoneNumber', 'otp',
+    'customerName', 'customerPhone', 'customerEmail',
+    'houseNumber', 'streetAddress', 'landmark',
+}
+
+# Path segments that are IDs (ObjectIds, public order IDs, numbers)
+ID_SEGMENT = re.compile(r'^([0-9a-f]{24}|[A-Z]{2,4}-[0-9A-Z-]+|\d+)$')
+
+# Combined log format (nginx/Apache), optionally followed by the request
+# time in seconds (nginx $request_time)
+ACCESS_LOG_LINE = re.compile(
+    r'^(?P<ip>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] '
+    r'"(?P<method>[A-Z]+) (?P<target>\S+) [^"]*" (?P<status>\d{3}) \S+'
+    r'(?: "[^"]*" "(?P<agent>[^"]*)")?'
+    r'(?: (?P<request_time>\d+(?:\.\d+)?))?'
+)
+
+
+def _digest(salt: str, value: str) -> str:
+    return hashlib.sha256(f"{salt}:{value}".encode()).hexdigest()
+
+
+def pseudonymize(value: Any, field: str, salt: str) -> Any:
+    """Stable stand-in for a personal value: the same input gives the same output."""
+    if not isinstance(value, str) or not value:
+        return value
+    digest = _digest(salt, value)
+    if 'email' in field.lower():
+        return f"u{digest[:12]}@replay.test"
+    if 'phone' in field.lower():
+        return '9' + str(int(digest[:16], 16))[:9]
+    if field == 'otp':
+        return str(int(digest[:8], 16))[:len(value)].zfill(len(value))
+    if field == 'password':
+        return f"Replay-{digest[:16]}"
+    return f"Replay {digest[:8]}"
+
+
+def anonymize(body: Any, salt: str) -> Any:
+    """Copy of a JSON body with PERSONAL_FIELDS pseudonymized, at any depth."""
+    if isinstance(body, dict):
+        return {
+            key: pseudonymize(value, key, salt) if key in PERSONAL_FIELDS and not isinstance(value, (dict, list))
+            else anonymize(value, salt)
+            for key, value in body.items()
+        }
+    if isinstance(body, list):
+        return [anonymize(item, salt) for item in body]
+    return body
+
+
+def build_route(endpoint: str, params: Optional[Dict] = None) -> str:
+    """Route as stored in a capture: path plus query string."""
+    route = '/' + endpoint.lstrip('/')
+    if params:
+        query = urlencode({key: value for key, value in params.items() if value is not None}, doseq=True)
+        if query:
+            route += ('&' if '?' in route else '?') + query
+    return route
+
+
+def route_key(method: str, route: str) -> str:
+    """Group key of a request: method and path, with IDs and query removed."""
+    path = urlsplit(route).path
+    segments = [':id' if ID_SEGMENT.match(segment) else segment for segment in path.split('/')]
+    return f"{method} {'/'.join(segments)}"
+
+
+class TrafficRecorder:
+    """
+    Appends the requests of API clients to a capture file.
+
+    Pass it to APIClient / AsyncAPIClient (recorder=...). Each client is one
+    session. Safe to share between threads.
+    """
+
+    def __init__(self, path: str, salt: Optional[str] = None):
+        self.path = path
+        # Pseudonyms are stable within one capture, not across captures
+        self.salt = salt or uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def session_id(self, client: Any) -> str:
+        """Anonymous session ID of a client, assigned on its first request."""
+        session = getattr(client, '_traffic_session', None)
+        if session is None:
+            session = f"s-{uuid.uuid4().hex[:12]}"
+            client._traffic_session = session
+        return session
+
+    def record(
+        self,
+        client: Any,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict],
+        body: Optional[Dict],
+        started: float,
+        status: int,
+        latency_ms: float
+    ):
+        """Append one request."""
+        line = json.dumps({
+            'ts': round(started, 3),
+            'session': self.session_id(client),
+            'method': method,
+            'route': build_route(endpoint, params),
+            'body': anonymize(body, self.salt),
+            'status': status,
+            'latency_ms': round(latency_ms, 1),
+        })
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+_shared_recorders: Dict[str, TrafficRecorder] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_recorder(path: Optional[str]) -> Optional[TrafficRecorder]:
+    """One recorder per capture file for the whole process (None: no capture)."""
+    if not path:
+        return None
+    with _shared_lock:
+        if path not in _shared_recorders:
+            _shared_recorders[path] = TrafficRecorder(path)
+        return _shared_recorders[path]
+
+
+def read_records(path: str) -> List[Dict]:
+    """Records of a capture or replay file, in time order."""
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted(records, key=lambda r: r['ts'])
+
+
+def write_records(path: str, records: Iterable[Dict]) -> int:
+    """Write records to a JSONL file; returns how many were written."""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+            count += 1
+    return count
+
+
+def import_access_log(lines: Iterable[str], api_prefix: str = '/api', salt: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Records from access log lines in combined log format.
+
+    Only requests under api_prefix are kept (the prefix is stripped). A
+    session is one client IP and user agent, hashed. Access logs have no
+    bodies, so body is None; latency_ms is set when the line ends with the
+    request time in seconds.
+    """
+    salt = salt or uuid.uuid4().hex
+    prefix = api_prefix.rstrip('/')
+    for line in lines:
+        match = ACCESS_LOG_LINE.match(line.strip())
+        if not match:
+            continue
+        target = match.group('target')
+        if prefix and not (target == prefix or target.startswith(prefix + '/') or target.startswith(prefix + '?')):
+            continue
+        request_time = match.group('request_time')
+        yield {
+            'ts': datetime.strptime(match.group('time'), '%d/%b/%Y:%H:%M:%S %z').timestamp(),
+            'session': f"s-{_digest(salt, match.group('ip') + (match.group('agent') or ''))[:12]}",
+            'method': match.group('method'),
+            'route': target[len(prefix):] or '/',
+            'body': None,
+            'status': int(match.group('status')),
+            'latency_ms': round(float(request_time) * 1000, 1) if request_time else None,
+        }
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(records: Iterable[Dict]) -> Dict[str, Dict]:
+    """
+    Latency distribution per route_key, plus '*' for all requests.
+
+    Returns {key: {count, errors, p50, p90, p99, max}}; errors counts
+    status 5xx and failed connections (status 0). Records without a latency
+    are counted but not in the percentiles.
+    """
+    groups: Dict[str, Dict] = {}
+    for record in records:
+        for key in ('*', route_key(record['method'], record['route'])):
+            group = groups.setdefault(key, {'count': 0, 'errors': 0, 'latencies': []})
+            group['count'] += 1
+            if record.get('status', 0) == 0 or record['status'] >= 500:
+                group['errors'] += 1
+            if record.get('latency_ms') is not None:
+                group['latencies'].append(record['latency_ms'])
+
+    summary = {}
+    for key, group in groups.items():
+        latencies = sorted(group['latencies'])
+        summary[key] = {
+            'count': group['count'],
+            'errors': group['errors'],
+            'p50': percentile(latencies, 50),
+            'p90': percentile(latencies, 90),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else 0.0,
+        }
+    return summary
+
+
+def compare(baseline: Iterable[Dict], candidate: Iterable[Dict]) -> List[Dict]:
+    """
+    Latency distributions of two runs side by side, per route_key.
+
+    Returns rows {key, baseline, candidate, p50_change, p99_change}, with the
+    changes as a fraction of the baseline (None when either side lacks the
+    route or a latency), '*' first, then by baseline count.
+    """
+    before = summarize(baseline)
+    after = summarize(candidate)
+
+    def change(key: str, field: str) -> Optional[float]:
+        if key not in before or key not in after or not before[key][field]:
+            return None
+        return (after[key][field] - before[key][field]) / before[key][field]
+
+    keys = sorted(set(before) | set(after), key=lambda k: (k != '*', -before.get(k, {}).get('count', 0), k))
+    return [{
+        'key': key,
+        'baseline': before.get(key),
+        'candidate': after.get(key),
+        'p50_change': change(key, 'p50'),
+        'p99_change': change(key, 'p99'),
+    } for key in keys]